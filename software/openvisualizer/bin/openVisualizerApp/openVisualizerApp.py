@@ -15,11 +15,15 @@ import json
 log = logging.getLogger('openVisualizerApp')
 
 from openvisualizer.eventBus      import eventBusMonitor
+from openvisualizer.eventBus      import snifferMerger
 from openvisualizer.moteProbe     import moteProbe
 from openvisualizer.moteConnector import moteConnector
+from openvisualizer.moteConnector import ParserInfoErrorCritical
 from openvisualizer.moteState     import moteState
+from openvisualizer.moteState     import moteIndex
 from openvisualizer.RPL           import RPL
 from openvisualizer.openLbr       import openLbr
+from openvisualizer.openLbr       import networkPipeline
 from openvisualizer.openTun       import openTun
 from openvisualizer.RPL           import UDPLatency
 from openvisualizer.RPL           import topology
@@ -33,7 +37,7 @@ class OpenVisualizerApp(object):
     top-level functionality for several UI clients.
     '''
     
-    def __init__(self,confdir,datadir,logdir,simulatorMode,numMotes,trace,debug,simTopology,iotlabmotes, pathTopo):
+    def __init__(self,confdir,datadir,logdir,simulatorMode,numMotes,trace,debug,simTopology,iotlabmotes, pathTopo, pcapFile=None, udpGatewayPorts=None, networks=None, networkProcesses=False):
         
         # store params
         self.confdir              = confdir
@@ -48,13 +52,26 @@ class OpenVisualizerApp(object):
         
         # local variables
         self.eventBusMonitor      = eventBusMonitor.eventBusMonitor()
+        if pcapFile:
+            self.eventBusMonitor.setPcapFile(pcapFile)
+        self.snifferMerger        = snifferMerger.SnifferMerger()
         self.openLbr              = openLbr.OpenLbr()
-        self.rpl                  = RPL.RPL()
+        self.rpl                  = RPL.RPL(debug=self.debug)
         self.topology             = topology.topology()
         self.udpLatency           = UDPLatency.UDPLatency()
         self.DAGrootList          = []
         # create openTun call last since indicates prefix
-        self.openTun              = openTun.create() 
+        self.openTun              = openTun.create(udpGatewayPorts) 
+        
+        # create a pipeline for each additional network, with its motes
+        self.networks             = []
+        networkPorts              = []
+        for (prefix,ports) in networks or []:
+            if networkProcesses:
+                self.networks    += [networkPipeline.NetworkProcess(prefix,ports)]
+            else:
+                self.networks    += [networkPipeline.NetworkPipeline(prefix,ports)]
+            networkPorts         += ports
         if self.simulatorMode:
             from openvisualizer.SimEngine import SimEngine, MoteHandler
             
@@ -96,7 +113,7 @@ class OpenVisualizerApp(object):
             # in "hardware" mode, motes are connected to the serial port
             
             self.moteProbes       = [
-                moteProbe.moteProbe(serialport=p) for p in moteProbe.findSerialPorts()
+                moteProbe.moteProbe(serialport=p) for p in moteProbe.findSerialPorts() if p not in networkPorts
             ]
         
         # create a moteConnector for each moteProbe
@@ -109,6 +126,22 @@ class OpenVisualizerApp(object):
             moteState.moteState(mc) for mc in self.moteConnectors
         ]
         
+        # the motes of the networks running in this process are shown too
+        for network in self.networks:
+            if isinstance(network,networkPipeline.NetworkPipeline):
+                self.moteStates  += network.moteStates
+        
+        # aggregates the errors reported by all motes
+        self.errorAggregator      = ParserInfoErrorCritical.ErrorAggregator()
+        
+        # index the moteStates, for fast lookup by address or serial port
+        self.moteIndex            = moteIndex.moteIndex()
+        for network in self.networks:
+            if isinstance(network,networkPipeline.NetworkPipeline):
+                self.moteIndex.addNetwork(network.network)
+        for ms in self.moteStates:
+            self.moteIndex.addMote(ms)
+        
         # boot all emulated motes, if applicable
         if self.simulatorMode:
             self.simengine.pause()
@@ -176,9 +209,17 @@ class OpenVisualizerApp(object):
         
         log.info('Closing OpenVisualizer')
         self.openTun.close()
+        self.openLbr.close()
         self.rpl.close()
+        self.topology.close()
+        self.udpLatency.close()
+        self.errorAggregator.close()
+        self.snifferMerger.close()
+        self.eventBusMonitor.close()
         for probe in self.moteProbes:
             probe.close()
+        for network in self.networks:
+            network.close()
                 
     def getMoteState(self, moteid):
         '''
@@ -187,14 +228,33 @@ class OpenVisualizerApp(object):
         :param moteid: 16-bit ID of mote
         :rtype:        moteState or None if not found
         '''
-        for ms in self.moteStates:
-            idManager = ms.getStateElem(ms.ST_IDMANAGER)
-            if idManager and idManager.get16bAddr():
-                addr = ''.join(['%02x'%b for b in idManager.get16bAddr()])
-                if addr == moteid:
-                    return ms
-        else:
-            return None
+        return self.moteIndex.getBy16bId(moteid)
+    
+    def getMoteStateByEui64(self, eui64):
+        '''
+        Returns the moteState object for the provided connected mote.
+        
+        :param eui64: EUI-64 of mote, as a list of 8 bytes
+        :rtype:       moteState or None if not found
+        '''
+        return self.moteIndex.getByEui64(eui64)
+    
+    def getMoteStateBySerialPort(self, serialport):
+        '''
+        Returns the moteState object for the mote attached to the provided
+        serial port.
+        
+        :param serialport: name of the serial port
+        :rtype:            moteState or None if not found
+        '''
+        return self.moteIndex.getBySerialPort(serialport)
+    
+    def getAllMotes(self):
+        '''
+        Returns the serial port, 16-bit ID, EUI-64 and moteState of all
+        connected motes. See moteIndex.getAllMotes().
+        '''
+        return self.moteIndex.getAllMotes()
         
 
 #============================ main ============================================
@@ -262,6 +322,10 @@ def main(parser=None):
         simTopology     = argspace.simTopology,
         iotlabmotes     = argspace.iotlabmotes,
         pathTopo        = argspace.pathTopo,
+        pcapFile        = argspace.pcapFile,
+        udpGatewayPorts = _parseUdpGatewayPorts(argspace.udpGateway),
+        networks        = _parseNetworks(argspace.networks),
+        networkProcesses= argspace.networkProcesses,
     )
 
 def _addParserArgs(parser):
@@ -313,6 +377,69 @@ def _addParserArgs(parser):
         action     = 'store',
         help       = 'a topology can be loaded from a json file'
     )
+    parser.add_argument('--pcap',
+        dest       = 'pcapFile',
+        default    = '',
+        action     = 'store',
+        help       = 'captures the mesh frames to a pcapng file (rotated as it grows)'
+    )
+    parser.add_argument('--udpGateway',
+        dest       = 'udpGateway',
+        default    = '',
+        action     = 'store',
+        help       = 'replaces the TUN interface by local UDP sockets, comma-separated list of meshPort:localPort:appPort (e.g. "5683:15683:25683")'
+    )
+    parser.add_argument('--network',
+        dest       = 'networks',
+        default    = [],
+        action     = 'append',
+        help       = 'runs the motes of some serial ports as a separate network, with its own 64-bit prefix, as prefix=port,port (e.g. "bbbb:0:0:1=/dev/ttyUSB0,/dev/ttyUSB1"), can be repeated'
+    )
+    parser.add_argument('--networkProcesses',
+        dest       = 'networkProcesses',
+        default    = False,
+        action     = 'store_true',
+        help       = 'runs each network of --network in its own process'
+    )
+
+def _parseUdpGatewayPorts(spec):
+    '''
+    Parses the --udpGateway option.
+    
+    :returns: A dictionary of (localPort,appPort), indexed by mesh port, or
+        None if the option is not set.
+    '''
+    if not spec:
+        return None
+    returnVal = {}
+    for item in spec.split(','):
+        try:
+            (meshPort,localPort,appPort) = [int(p) for p in item.split(':')]
+        except ValueError:
+            raise ValueError('invalid UDP gateway ports "{0}", expecting meshPort:localPort:appPort'.format(item))
+        returnVal[meshPort] = (localPort,appPort)
+    return returnVal
+    
+def _parseNetworks(specs):
+    '''
+    Parses the --network options.
+    
+    :returns: A list of (prefix,serialPorts) tuples, the prefix a list of 8
+        bytes.
+    '''
+    returnVal = []
+    for spec in specs:
+        try:
+            (prefix,ports) = spec.split('=',1)
+            groups         = [int(g,16) for g in prefix.split(':')]
+            assert len(groups)==4 and all([0<=g<=0xffff for g in groups])
+        except (ValueError,AssertionError):
+            raise ValueError('invalid network "{0}", expecting prefix=port,port (e.g. "bbbb:0:0:1=/dev/ttyUSB0")'.format(spec))
+        returnVal += [(
+            [b for g in groups for b in [g>>8,g&0xff]],
+            [p for p in ports.split(',') if p],
+        )]
+    return returnVal
     
 def _forceSlashSep(ospath, debug):
     '''
@@ -29,6 +29,7 @@ except ImportError:
 from   cmd         import Cmd
 import openVisualizerApp
 import openvisualizer.openvisualizer_utils as u
+from openvisualizer.RPL import UDPLatency
 
 
 class OpenVisualizerCli(Cmd):
@@ -88,10 +89,10 @@ class OpenVisualizerCli(Cmd):
                 self.stdout.write('  <none>')
             self.stdout.write('\n')
         else:
-            for ms in self.app.moteStates:
+            ms = self.app.getMoteStateBySerialPort(arg)
+            if ms:
                 try:
-                    if (ms.moteConnector.serialport==arg):
-                        ms.triggerAction(moteState.moteState.TRIGGER_DAGROOT)
+                    ms.triggerAction(moteState.moteState.TRIGGER_DAGROOT)
                 except ValueError as err:
                     self.stdout.write(err)
     
@@ -111,10 +112,10 @@ class OpenVisualizerCli(Cmd):
         else:
             try:
                 [port,image,command,parameter] = arg.split(' ')
-                for ms in self.app.moteStates:
+                ms = self.app.getMoteStateBySerialPort(port)
+                if ms:
                     try:
-                        if (ms.moteConnector.serialport==port):
-                            ms.triggerAction([moteState.moteState.SET_COMMAND,image,command,parameter])
+                        ms.triggerAction([moteState.moteState.SET_COMMAND,image,command,parameter])
                     except ValueError as err:
                         self.stdout.write(err)
             except ValueError as err:
@@ -144,6 +145,120 @@ class OpenVisualizerCli(Cmd):
                 except AttributeError:
                     pass
     
+    def do_flows(self, arg):
+        """
+        Prints the flows which carried the most traffic through the mesh.
+        Usage: flows [packets|bytes] [num]
+        """
+        args   = arg.split()
+        sortBy = args[0] if len(args)>0 else 'packets'
+        try:
+            num    = int(args[1]) if len(args)>1 else 10
+            flows  = self.app.openLbr.getTopFlows(num,sortBy)
+        except ValueError as err:
+            self.stdout.write('{0}\n'.format(err))
+            return
+        
+        output  = []
+        output += ['{0:>4} {1:>8} {2:>8} {3:>5} {4:>5}  {5} -> {6}'.format(
+            'dir','packets','bytes','proto','port','src','dst',
+        )]
+        for f in flows:
+            output += ['{0:>4} {1:>8} {2:>8} {3:>5} {4:>5}  {5} -> {6}'.format(
+                f['direction'],
+                f['packets'],
+                f['bytes'],
+                f['proto'],
+                f['port'] if f['port'] is not None else '-',
+                f['src'],
+                f['dst'],
+            )]
+        self.stdout.write('\n'.join(output))
+        self.stdout.write('\n')
+    
+    def do_roots(self, arg):
+        """
+        Prints the traffic through each DAGroot.
+        Usage: roots
+        """
+        output  = []
+        output += ['{0:<23} {1:<12} {2:>9} {3:>10} {4:>9} {5:>10}'.format(
+            'DAGroot','port','pkts down','bytes down','pkts up','bytes up',
+        )]
+        for (root,stats) in sorted(self.app.openLbr.getDagRootStats().items()):
+            output += ['{0:<23} {1:<12} {2:>9} {3:>10} {4:>9} {5:>10}'.format(
+                u.formatAddr(root),
+                stats['serialPort'] or '-',
+                stats['packetsToMesh'],
+                stats['bytesToMesh'],
+                stats['packetsFromMesh'],
+                stats['bytesFromMesh'],
+            )]
+        self.stdout.write('\n'.join(output))
+        self.stdout.write('\n')
+    
+    def do_networks(self, arg):
+        """
+        Prints the traffic through the pipeline of each additional network.
+        Usage: networks
+        """
+        output  = []
+        output += ['{0:<20} {1:<20} {2:>9} {3:>9} {4:>7} {5:>5}'.format(
+            'network','prefix','pkts down','pkts up','clients','DAOs',
+        )]
+        for network in self.app.networks:
+            stats = network.getStats()
+            if not stats:
+                continue
+            output += ['{0:<20} {1:<20} {2:>9} {3:>9} {4:>7} {5:>5}'.format(
+                stats['network'],
+                stats['prefix'],
+                stats['toMesh'],
+                stats['toInternet'],
+                stats['bus']['clients'],
+                stats['daos']['daos'],
+            )]
+        self.stdout.write('\n'.join(output))
+        self.stdout.write('\n')
+    
+    def do_latency(self, arg):
+        """
+        Prints the latency and packet loss of each mote running the
+        UDPLatency application, over the whole run, or over the last 1, 5 or
+        15 minutes.
+        Usage: latency [minutes]
+        """
+        window  = None
+        if arg:
+            try:
+                window = int(arg)
+                assert window in UDPLatency.WINDOWS
+            except (ValueError,AssertionError):
+                self.stdout.write('invalid window {0}, expecting one of {1}\n'.format(arg,UDPLatency.WINDOWS))
+                return
+        output  = []
+        output += ['{0:<23} {1:>6} {2:>5} {3:>6} {4:>6} {5:>6} {6:>6} {7:>6}'.format(
+            'mote','rcvd','lost','PLR %','p50','p90','p99','max',
+        )]
+        for (addr,stats) in sorted(self.app.udpLatency.getLatencyStats().items()):
+            if window:
+                stats   = stats['windows'][window]
+                latency = stats
+            else:
+                latency = stats['latency']
+            output += ['{0:<23} {1:>6} {2:>5} {3:>6.1f} {4:>6} {5:>6} {6:>6} {7:>6}'.format(
+                u.formatAddr(bytearray(addr)),
+                stats['received'],
+                stats['lost'],
+                stats['plr'],
+                latency['p50'],
+                latency['p90'],
+                latency['p99'],
+                latency['max'],
+            )]
+        self.stdout.write('\n'.join(output))
+        self.stdout.write('\n')
+    
     def do_quit(self, arg):
         self.app.close()
         return True
@@ -55,6 +55,9 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient):
     server.
     '''
 
+    # default number of flows returned by /flows
+    NUM_TOP_FLOWS = 20
+
     def __init__(self,app,websrv):
         '''
         :param app:    OpenVisualizerApp
@@ -102,6 +105,14 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient):
         self.websrv.route(path='/moteview',                               callback=self._showMoteview)
         self.websrv.route(path='/moteview/:moteid',                       callback=self._showMoteview)
         self.websrv.route(path='/motedata/:moteid',                       callback=self._getMoteData)
+        self.websrv.route(path='/motehistory/:moteid',                    callback=self._getMoteHistoryNames)
+        self.websrv.route(path='/motehistory/:moteid/:metric',            callback=self._getMoteHistory)
+        self.websrv.route(path='/errors',                                 callback=self._getErrors)
+        self.websrv.route(path='/flows',                                  callback=self._getFlows)
+        self.websrv.route(path='/flows/:sortBy/:num',                     callback=self._getFlows)
+        self.websrv.route(path='/dagroots',                               callback=self._getDagRoots)
+        self.websrv.route(path='/networks',                               callback=self._getNetworks)
+        self.websrv.route(path='/latency',                                callback=self._getLatency)
         self.websrv.route(path='/toggleDAGroot/:moteid',                  callback=self._toggleDAGroot)
         self.websrv.route(path='/eventBus',                               callback=self._showEventBus)
         self.websrv.route(path='/routing',                                callback=self._showRouting)
@@ -128,13 +139,7 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient):
         '''
         log.debug("moteview moteid parameter is {0}".format(moteid));
 
-        motelist = []
-        for ms in self.app.moteStates:
-            addr = ms.getStateElem(moteState.moteState.ST_IDMANAGER).get16bAddr()
-            if addr:
-                motelist.append( ''.join(['%02x'%b for b in addr]) )
-            else:
-                motelist.append(ms.moteConnector.serialport)
+        motelist = self.app.moteIndex.getMoteIds()
 
         tmplData = {
             'motelist'       : motelist,
@@ -191,6 +196,111 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient):
             states = {}
         return states
 
+    def _getMoteHistoryNames(self, moteid):
+        '''
+        Lists the metrics for which the provided mote has a history.
+
+        :param moteid: 16-bit ID of mote
+        '''
+        ms = self.app.getMoteState(moteid)
+        if ms:
+            return { 'metrics': ms.getHistoryNames() }
+        else:
+            log.debug('Mote {0} not found in moteStates'.format(moteid))
+            return { 'metrics': [] }
+
+    def _getMoteHistory(self, moteid, metric):
+        '''
+        Collects the history of a metric of the provided mote. The optional
+        'start' and 'end' query parameters (seconds since the epoch) bound the
+        time range, the optional 'resolution' query parameter is one of 'raw',
+        '10s' or '1min'.
+
+        :param moteid: 16-bit ID of mote
+        :param metric: name of the metric
+        '''
+        query      = bottle.request.query
+        try:
+            start  = float(query['start']) if query.get('start') else None
+            end    = float(query['end'])   if query.get('end')   else None
+        except ValueError:
+            bottle.abort(400, 'start and end must be numbers of seconds since the epoch')
+        resolution = query.get('resolution') or 'raw'
+
+        ms = self.app.getMoteState(moteid)
+        if not ms:
+            log.debug('Mote {0} not found in moteStates'.format(moteid))
+            return {}
+        try:
+            return ms.getHistory(metric,start,end,resolution)
+        except ValueError as err:
+            log.debug(str(err))
+            return {}
+
+    def _getErrors(self):
+        '''
+        Collects the errors reported by all motes, with the number of times
+        each was seen.
+        '''
+        return {
+            'errors':     self.app.errorAggregator.getErrors(),
+            'numEvicted': self.app.errorAggregator.getNumEvicted(),
+        }
+
+    def _getFlows(self, sortBy='packets', num=NUM_TOP_FLOWS):
+        '''
+        Collects the flows which carried the most traffic through the mesh.
+
+        :param sortBy: 'packets' or 'bytes'
+        :param num:    maximum number of flows
+        '''
+        try:
+            flows = self.app.openLbr.getTopFlows(int(num),sortBy)
+        except ValueError as err:
+            log.debug(str(err))
+            return {}
+        return {
+            'flows':      flows,
+            'stats':      self.app.openLbr.getFlowStats(),
+        }
+
+    def _getDagRoots(self):
+        '''
+        Collects the traffic through each DAGroot.
+        '''
+        dagRoots = []
+        for (root,stats) in sorted(self.app.openLbr.getDagRootStats().items()):
+            stats['eui64'] = u.formatAddr(root)
+            dagRoots      += [stats]
+        return {
+            'dagroots':   dagRoots,
+        }
+
+    def _getNetworks(self):
+        '''
+        Collects the statistics of the pipeline of each additional network.
+        '''
+        return {
+            'networks':   [network.getStats() for network in self.app.networks],
+        }
+
+    def _getLatency(self):
+        '''
+        Collects the latency statistics of each mote running the UDPLatency
+        application.
+        '''
+        motes = []
+        for (addr,stats) in sorted(self.app.udpLatency.getLatencyStats().items()):
+            stats['mote']    = u.formatAddr(bytearray(addr))
+            stats['parent']  = u.formatAddr(bytearray(stats['parent']))
+            stats['windows'] = dict([
+                ('{0}min'.format(window),windowStats) for (window,windowStats) in stats['windows'].items()
+            ])
+            motes           += [stats]
+        return {
+            'motes':      motes,
+        }
+
     def _setWiresharkDebug(self, enabled):
         '''
         Selects whether eventBus must export debug packets.
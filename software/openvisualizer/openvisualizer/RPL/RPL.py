@@ -16,6 +16,7 @@ log = logging.getLogger('RPL')
 log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
+import collections
 import threading
 import struct
 from datetime import datetime
@@ -31,6 +32,36 @@ class RPL(eventBusClient.eventBusClient):
     _TARGET_INFORMATION_TYPE           = 0x05
     _TRANSIT_INFORMATION_TYPE          = 0x06
     
+    # RPL DAO (RFC6550): RPLInstanceID, flags, reserved, sequence, DODAGID
+    _DAO_HEADER_LEN                    = 4+16
+    _DAO_SEQUENCE_OFFSET               = 3
+    # Transit Information option: type, length, flags, path control,
+    # path sequence, path lifetime, parent address (prefix, then EUI64)
+    _TRANSIT_INFORMATION_LEN           = 6+16
+    _TRANSIT_PATH_LIFETIME_OFFSET      = 5
+    _TRANSIT_PARENT_OFFSET             = 14
+    # Target option: type, length, flags, prefix length, target address
+    # (prefix, then EUI64)
+    _TARGET_INFORMATION_LEN            = 4+16
+    _TARGET_CHILD_OFFSET               = 12
+    
+    # Path Lifetime of a DAO which never expires (RFC6550, section 6.7.8)
+    PATH_LIFETIME_INFINITE             = 0xFF
+    # Duration of a unit of Path Lifetime, in seconds. This deviates from
+    # RFC6550, which defaults it to 0xFFFF seconds when no DODAG
+    # Configuration option is sent, as here: the entries would in practice
+    # never expire. The firmware sends a DAO with a Path Lifetime of 0xAA
+    # about every minute (its default DAO period, see the 'daoPeriod'
+    # command), so with 1s units an entry outlives a couple of lost DAOs,
+    # and the parents of a mote which left are dropped within 3 minutes.
+    LIFETIME_UNIT                      = 1
+    # Window of comparison of lollipop sequence counters (RFC6550, section 7.2)
+    SEQUENCE_WINDOW                    = 16
+    
+    # DAOs received within this period, in seconds, are applied to the
+    # topology together.
+    DAO_BATCH_WINDOW                   = 0.25
+    
     # Period between successive DIOs, in seconds.
     DIO_PERIOD                         = 10
     
@@ -50,17 +81,32 @@ class RPL(eventBusClient.eventBusClient):
     PRF_DIO_B                          = 1<<1
     PRF_DIO_C                          = 1<<0
     
-    def __init__(self):
+    def __init__(self,debug=False,batchWindow=DAO_BATCH_WINDOW,network=None,lifetimeUnit=LIFETIME_UNIT):
+        '''
+        :param debug:        [in] If True, each DAO received is printed.
+        :param batchWindow:  [in] DAOs received within this period, in
+            seconds, are applied to the topology together. If None, each
+            DAO is applied as soon as it is received.
+        :param network:      [in] The network the instance is connected to,
+            see eventBusClient. If None, the global event bus.
+        :param lifetimeUnit: [in] Duration of a unit of Path Lifetime, in
+            seconds, see LIFETIME_UNIT. It should make the Path Lifetime
+            the motes send last several of their DAO periods.
+        '''
         
         # log
         log.info("create instance")
         
         # store params
+        self.debug                = debug
+        self.batchWindow          = batchWindow
+        self.lifetimeUnit         = lifetimeUnit
         
         # initialize parent class
         eventBusClient.eventBusClient.__init__(
             self,
             name                  = 'RPL',
+            network               = network,
             registrations         =  [
                 {
                     'sender'      : self.WILDCARD,
@@ -84,15 +130,44 @@ class RPL(eventBusClient.eventBusClient):
         self.stateLock            = threading.Lock()
         self.state                = {}
         self.networkPrefix        = None
-        self.dagRootEui64         = None
-        self.sourceRoute          = SourceRoute.SourceRoute()
+        self.dagRoots             = set() # EUI64 tuples of the DAGroots
+        self.sourceRoute          = SourceRoute.SourceRoute(network=network)
         self.latencyStats         = {}
+        self.daoLock              = threading.Lock()
+        self.daoBuffer            = collections.OrderedDict() # source -> (sequence,parents,lifetime)
+        self.numDAOs              = 0
+        self.numDAOsDropped       = 0
+        self.numBatches           = 0
+        self.goOn                 = True
+        self.daoEvent             = threading.Event()
+        self.closeEvent           = threading.Event()
+        
+        # start the batching thread
+        if self.batchWindow is not None:
+            self.batchThread          = threading.Thread(target=self._runBatches)
+            self.batchThread.name     = 'RPL'
+            self.batchThread.daemon   = True
+            self.batchThread.start()
     
     #======================== public ==========================================
     
     def close(self):
-        # nothing to do
-        pass
+        self.goOn = False
+        self.closeEvent.set()
+        self.daoEvent.set()
+    
+    def getDAOStats(self):
+        '''
+        :returns: A dictionary with the number of 'daos' received, the
+            number 'dropped' because superseded by a newer DAO from the same
+            mote in the same batch, and the number of 'batches' applied.
+        '''
+        with self.daoLock:
+            return {
+                'daos':    self.numDAOs,
+                'dropped': self.numDAOsDropped,
+                'batches': self.numBatches,
+            }
     
     #======================== private =========================================
     
@@ -108,7 +183,10 @@ class RPL(eventBusClient.eventBusClient):
     
     def _infoDagRoot_notif(self,sender,signal,data):
         '''
-        Record the DAGroot's EUI64 address.
+        Record the DAGroots' EUI64 addresses.
+        
+        Several DAGroots can be attached, the DAOs sent to any of them are
+        received.
         '''
         
         # stop of we don't have a networkPrefix assigned yet
@@ -119,10 +197,10 @@ class RPL(eventBusClient.eventBusClient):
         newDagRootEui64 = data['eui64'][:]
         
         with self.stateLock:
-           sameDAGroot = (self.dagRootEui64==newDagRootEui64)
+           knownDAGroot = (tuple(newDagRootEui64) in self.dagRoots)
         
         # register the DAGroot
-        if data['isDAGroot']==1 and (not sameDAGroot):
+        if data['isDAGroot']==1 and (not knownDAGroot):
             
             # log
             log.info("registering DAGroot {0}".format(u.formatAddr(newDagRootEui64)))
@@ -140,10 +218,10 @@ class RPL(eventBusClient.eventBusClient):
             
             # store DAGroot
             with self.stateLock:
-                self.dagRootEui64 = newDagRootEui64
+                self.dagRoots.add(tuple(newDagRootEui64))
         
         # unregister the DAGroot
-        if data['isDAGroot']==0 and sameDAGroot:
+        if data['isDAGroot']==0 and knownDAGroot:
             
             # log
             log.info("unregistering DAGroot {0}".format(u.formatAddr(newDagRootEui64)))
@@ -161,7 +239,7 @@ class RPL(eventBusClient.eventBusClient):
             
             # clear DAGroot
             with self.stateLock:
-                self.dagRootEui64 = None
+                self.dagRoots.discard(tuple(newDagRootEui64))
     
     def _fromMoteDataLocal_notif(self,sender,signal,data):
         '''
@@ -192,7 +270,7 @@ class RPL(eventBusClient.eventBusClient):
                 source=source[len(source)-8:]
             dao                   = tup[1]
         except IndexError:
-            log.warning("DAO too short ({0} bytes), no space for destination and source".format(len(dao)))
+            log.warning("DAO too short, no space for destination and source")
             return
         
         # log
@@ -204,76 +282,161 @@ class RPL(eventBusClient.eventBusClient):
             output                = '\n'.join(output)
             log.debug(output)
         
-        # retrieve DAO header
-        dao_header                = {}
-        dao_transit_information   = {}
-        dao_target_information    = {}
-        
+        # parse DAO
         try:
-            # RPL header
-            dao_header['RPL_InstanceID']    = dao[0]
-            dao_header['RPL_flags']         = dao[1]
-            dao_header['RPL_Reserved']      = dao[2]
-            dao_header['RPL_DAO_Sequence']  = dao[3]
-            # DODAGID
-            dao_header['DODAGID']           = dao[4:20]
-           
-            dao                             = dao[20:]
-            # retrieve transit information header and parents
-            parents                         = []
-            children                        = []
-                          
-            while (len(dao)>0):  
-                if   dao[0]==self._TRANSIT_INFORMATION_TYPE: 
-                    # transit information option
-                    dao_transit_information['Transit_information_type']             = dao[0]
-                    dao_transit_information['Transit_information_length']           = dao[1]
-                    dao_transit_information['Transit_information_flags']            = dao[2]
-                    dao_transit_information['Transit_information_path_control']     = dao[3]
-                    dao_transit_information['Transit_information_path_sequence']    = dao[4]
-                    dao_transit_information['Transit_information_path_lifetime']    = dao[5]
-                    # address of the parent
-                    prefix        =  dao[6:14]
-                    parents      += [dao[14:22]]
-                    dao           = dao[22:]
-                elif dao[0]==self._TARGET_INFORMATION_TYPE:
-                    dao_target_information['Target_information_type']               = dao[0]
-                    dao_target_information['Target_information_length']             = dao[1]
-                    dao_target_information['Target_information_flags']              = dao[2]
-                    dao_target_information['Target_information_prefix_length']      = dao[3]
-                    # address of the child
-                    prefix        =  dao[4:12]
-                    children     += [dao[12:20]]
-                    dao           = dao[20:]
-                else:
-                    log.warning("DAO with wrong Option {0}. Neither Transit nor Target.".format(dao[0]))
-                    return
-        except IndexError:
-            log.warning("DAO too short ({0} bytes), no space for DAO header".format(len(dao)))
+            (sequence,parents,children,lifetimes) = self._parseDAO(dao)
+        except ValueError as err:
+            log.warning(err)
             return
         
         # log
-        output               = []
-        output              += ['']
-        output              += ['received RPL DAO from {0}'.format(u.formatAddr(source))]
-        output              += ['- parents:']
-        for p in parents:
-            output          += ['   . {0}'.format(u.formatAddr(p))]
-        output              += ['- children:']
-        for p in children:
-            output          += ['   . {0}'.format(u.formatAddr(p))]
-        output               = '\n'.join(output)
-        if log.isEnabledFor(logging.DEBUG):
-            log.debug(output)
-        print output
+        if self.debug or log.isEnabledFor(logging.DEBUG):
+            output               = []
+            output              += ['']
+            output              += ['received RPL DAO from {0}'.format(u.formatAddr(source))]
+            output              += ['- parents:']
+            for p in parents:
+                output          += ['   . {0}'.format(u.formatAddr(p))]
+            output              += ['- children:']
+            for p in children:
+                output          += ['   . {0}'.format(u.formatAddr(p))]
+            output               = '\n'.join(output)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(output)
+            if self.debug:
+                print output
         
         # if you get here, the DAO was parsed correctly
         
+        # the entry lives as long as the longest lived path, in seconds
+        if (not lifetimes) or (self.PATH_LIFETIME_INFINITE in lifetimes):
+            lifetime         = None
+        else:
+            lifetime         = max(lifetimes)*self.lifetimeUnit
+        
         # update parents information with parents collected -- calls topology module.
-        self.dispatch(          
-            signal          = 'updateParents',
-            data            =  (tuple(source),parents)  
+        self._bufferDAO(tuple(source),sequence,parents,lifetime)
+        if self.batchWindow is None:
+            self._flushDAOs()
+    
+    def _bufferDAO(self,source,sequence,parents,lifetime):
+        '''
+        Buffer the content of a DAO until the end of the batch, replacing
+        any older DAO from the same mote.
+        '''
+        with self.daoLock:
+            self.numDAOs                 += 1
+            buffered = self.daoBuffer.get(source)
+            if buffered:
+                self.numDAOsDropped      += 1
+                if self._isNewerSequence(buffered[0],sequence):
+                    return
+            else:
+                # first DAO of the batch from this mote
+                if not self.daoBuffer:
+                    self.daoEvent.set()
+            self.daoBuffer[source] = (sequence,parents,lifetime)
+    
+    def _flushDAOs(self):
+        '''
+        Apply the buffered DAOs to the topology, in a single batch.
+        '''
+        with self.daoLock:
+            if not self.daoBuffer:
+                return
+            batch            = [
+                (source,parents,lifetime)
+                for (source,(sequence,parents,lifetime)) in self.daoBuffer.items()
+            ]
+            self.daoBuffer   = collections.OrderedDict()
+            self.numBatches += 1
+        
+        self.dispatch(
+            signal          = 'updateParentsBatch',
+            data            = batch,
         )
+    
+    def _runBatches(self):
+        while self.goOn:
+            # wait for the first DAO of a batch
+            self.daoEvent.wait()
+            self.daoEvent.clear()
+            if not self.goOn:
+                break
+            # collect the other DAOs of the batch
+            self.closeEvent.wait(self.batchWindow)
+            try:
+                self._flushDAOs()
+            except Exception as err:
+                log.critical('could not apply DAOs: {0}'.format(err))
+    
+    def _isNewerSequence(self,a,b):
+        '''
+        Compare two lollipop sequence counters (RFC6550, section 7.2).
+        
+        Values 128-255 are the linear part of the lollipop, used after a
+        reboot, values 0-127 its circular part. Counters which cannot be
+        compared are considered newer, so the last DAO received is kept.
+        
+        :returns: True if sequence a is newer than sequence b.
+        '''
+        if a==b:
+            return False
+        if a>127 and b<=127:
+            # a in the linear part, b in the circular part
+            return (256+b-a)>self.SEQUENCE_WINDOW
+        if a<=127 and b>127:
+            # a in the circular part, b in the linear part
+            return (256+a-b)<=self.SEQUENCE_WINDOW
+        if a>127:
+            diff = a-b
+        else:
+            diff = (a-b)%128
+            if diff>64:
+                diff -= 128
+        if abs(diff)>self.SEQUENCE_WINDOW:
+            # not comparable
+            return True
+        return diff>0
+    
+    def _parseDAO(self,dao):
+        '''
+        Parse the options of a DAO, reading each field at its offset.
+        
+        :param dao: [in] The DAO, starting at the RPLInstanceID field.
+        
+        :raises: ValueError if the DAO is truncated or contains an option
+            which is neither Transit Information nor Target.
+        
+        :returns: A tuple (sequence,parents,children,lifetimes), with the DAO
+            Sequence, the EUI64 of the parents in the Transit Information
+            options, the EUI64 of the children in the Target options, and the
+            Path Lifetime of each Transit Information option.
+        '''
+        parents              = []
+        children             = []
+        lifetimes            = []
+        
+        if len(dao)<self._DAO_HEADER_LEN:
+            raise ValueError("DAO too short ({0} bytes), no space for DAO header".format(len(dao)))
+        
+        ptr                  = self._DAO_HEADER_LEN
+        end                  = len(dao)
+        while ptr<end:
+            optionType       = dao[ptr]
+            if   optionType==self._TRANSIT_INFORMATION_TYPE:
+                optionEnd    = ptr+self._TRANSIT_INFORMATION_LEN
+                if optionEnd>end:
+                    raise ValueError("DAO too short ({0} bytes), no space for Transit Information option".format(len(dao)))
+                lifetimes   += [dao[ptr+self._TRANSIT_PATH_LIFETIME_OFFSET]]
+                parents     += [dao[ptr+self._TRANSIT_PARENT_OFFSET:optionEnd]]
+            elif optionType==self._TARGET_INFORMATION_TYPE:
+                optionEnd    = ptr+self._TARGET_INFORMATION_LEN
+                if optionEnd>end:
+                    raise ValueError("DAO too short ({0} bytes), no space for Target option".format(len(dao)))
+                children    += [dao[ptr+self._TARGET_CHILD_OFFSET:optionEnd]]
+            else:
+                raise ValueError("DAO with wrong Option {0}. Neither Transit nor Target.".format(optionType))
+            ptr              = optionEnd
         
-        #with self.dataLock:
-        #    self.parents.update({tuple(source):parents})
+        return (dao[self._DAO_SEQUENCE_OFFSET],parents,children,lifetimes)
@@ -16,6 +16,7 @@ log = logging.getLogger('SourceRoute')
 log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
+import collections
 import threading
 
 import openvisualizer.openvisualizer_utils as u
@@ -23,18 +24,41 @@ from openvisualizer.eventBus import eventBusClient
 
 
 class SourceRoute(eventBusClient.eventBusClient):
+    '''
+    Computes source routes from the parents reported in DAOs.
+    
+    Routes are cached per destination. The cache keeps a reverse index from
+    each node to the destinations whose route goes through it, so that when
+    the parents of a node change, only the routes through that node are
+    dropped.
+    '''
        
-    def __init__(self):
+    def __init__(self,network=None):
+        '''
+        :param network: [in] The network the instance is connected to, see
+            eventBusClient. If None, the global event bus.
+        '''
         
         # local variables
         self.dataLock        = threading.Lock()
         self.parents         = {}
+        self.routes          = {} # destination -> route
+        self.routesThrough   = {} # node -> set of destinations whose route goes through node
+        self.numHits         = 0
+        self.numMisses       = 0
         
         # initialize parent class
         eventBusClient.eventBusClient.__init__(
             self,
             name             = 'SourceRoute',
-            registrations =  []
+            network          = network,
+            registrations =  [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'parentsChanged',
+                    'callback'    : self._parentsChanged_notif,
+                },
+            ]
         )
     
     #======================== public ==========================================
@@ -49,45 +73,159 @@ class SourceRoute(eventBusClient.eventBusClient):
             destination to source.
         '''
         
-        sourceRoute = []
+        dest = tuple(destAddr)
+        
         with self.dataLock:
+            route = self.routes.get(dest)
+            if route:
+                self.numHits           += 1
+                return list(route)
+            self.numMisses             += 1
+            
             try:
-                parents=self._dispatchAndGetResult(signal='getParents',data=None)
-                self._getSourceRoute_internal(destAddr,sourceRoute,parents)
+                parents = self._getParents()
+                route   = self._getSourceRoute_internal(destAddr,parents)
             except Exception as err:
                 log.error(err)
                 raise
+            
+            if route:
+                self._cacheRoute(dest,route)
         
-        return sourceRoute
+        return list(route)
+    
+    def computeAllRoutes(self):
+        '''
+        Compute the source routes to all motes, and cache them.
+        
+        The routes are computed in one breadth-first traversal of the DODAG,
+        from the roots down, each route being that of the parent, prefixed
+        by the mote itself.
+        
+        :returns: A dictionary mapping the EUI64 tuple of each mote which
+            has parents to its source route.
+        '''
+        
+        with self.dataLock:
+            parents  = self._getParents()
+            
+            # index the children of each node, through their preferred parent
+            children = {}
+            for (node,nodeParents) in parents.items():
+                if not nodeParents:
+                    continue
+                children.setdefault(tuple(nodeParents[0]),[]).append(node)
+            
+            # walk down from the roots, i.e. the nodes without parents
+            routes   = {}
+            toVisit  = collections.deque()
+            for root in children.keys():
+                if not parents.get(root):
+                    toVisit.append((root,[list(root)]))
+            while toVisit:
+                (node,tail) = toVisit.popleft()
+                for child in children.get(node,[]):
+                    route          = [list(child)]+tail
+                    routes[child]  = route
+                    toVisit.append((child,route))
+            
+            # nodes which are not connected to a root have a loop in their route
+            for node in parents.keys():
+                if node not in routes and parents[node]:
+                    routes[node] = self._getSourceRoute_internal(list(node),parents)
+            
+            self.routes          = {}
+            self.routesThrough   = {}
+            for (dest,route) in routes.items():
+                self._cacheRoute(dest,route)
+        
+        return dict([(dest,list(route)) for (dest,route) in routes.items()])
+    
+    def getStats(self):
+        '''
+        Retrieve statistics about the route cache.
+        
+        :returns: A dictionary with the number of 'hits' and 'misses' of the
+            route cache, and the number of 'routes' it contains.
+        '''
+        with self.dataLock:
+            return {
+                'hits':   self.numHits,
+                'misses': self.numMisses,
+                'routes': len(self.routes),
+            }
     
     #======================== private =========================================
     
-    def _getSourceRoute_internal(self,destAddr,sourceRoute,parents):
+    def _getParents(self):
+        return self._dispatchAndGetResult(signal='getParents',data=None)
+    
+    def _getSourceRoute_internal(self,destAddr,parents):
+        '''
+        Walk up the preferred parents, from the destination until a node
+        without parents, or a node already in the route.
+        '''
         
         if not destAddr:
-            # no more parents
-            return
+            return []
         
         if not parents.get(tuple(destAddr)):
             # this node does not have a list of parents
-            return
-        
-        # first time add destination address
-        if destAddr not in sourceRoute:
-            sourceRoute     += [destAddr]
+            return []
         
-        # pick a parent
-        parent               = parents.get(tuple(destAddr))[0]
-        
-        # avoid loops
-        if parent not in sourceRoute:
-            sourceRoute     += [parent]
+        sourceRoute          = [destAddr]
+        inRoute              = set([tuple(destAddr)])
+        node                 = destAddr
+        while True:
+            nodeParents      = parents.get(tuple(node))
+            if not nodeParents:
+                # no more parents
+                break
+            
+            # pick a parent
+            parent           = nodeParents[0]
             
-            # add non empty parents recursively
-            nextparent       = self._getSourceRoute_internal(parent,sourceRoute,parents)
+            # avoid loops
+            if tuple(parent) in inRoute:
+                break
             
-            if nextparent:
-                sourceRoute += [nextparent]
+            sourceRoute     += [parent]
+            inRoute.add(tuple(parent))
+            node             = parent
+        
+        return sourceRoute
+    
+    def _cacheRoute(self,dest,route):
+        '''
+        Cache a route. Expects dataLock to be held.
+        
+        The route depends on the parents of each node in it, including the
+        last one, so all of them are indexed.
+        '''
+        self.routes[dest]        = route
+        for hop in route:
+            self.routesThrough.setdefault(tuple(hop),set()).add(dest)
     
-    #======================== helpers =========================================
-    
\ No newline at end of file
+    def _parentsChanged_notif(self,sender,signal,data):
+        '''
+        Drop the cached routes through motes whose parents changed, then
+        dispatch 'sourceRoutesChanged' with the same motes, for the caches
+        built on these routes.
+        '''
+        with self.dataLock:
+            for node in data:
+                for dest in self.routesThrough.pop(tuple(node),set()):
+                    route = self.routes.pop(dest,None)
+                    if not route:
+                        continue
+                    for hop in route:
+                        through = self.routesThrough.get(tuple(hop))
+                        if through:
+                            through.discard(dest)
+                            if not through:
+                                del self.routesThrough[tuple(hop)]
+        
+        self.dispatch(
+            signal           = 'sourceRoutesChanged',
+            data             = data,
+        )
@@ -14,118 +14,373 @@ log = logging.getLogger('udpLatency')
 log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
+import collections
 import threading
+import time
 import openvisualizer.openvisualizer_utils as u
-from   datetime import datetime
 
-from openvisualizer.eventBus import eventBusClient
+from openvisualizer.eventBus      import eventBusClient
+from openvisualizer.moteConnector import ParserData
 
-#import math
+#============================ defines =========================================
+
+# the windows over which the statistics are also computed, in minutes
+WINDOWS               = [1,5,15]
+
+# the percentiles of the latency reported
+PERCENTILES           = [50,90,99]
+
+#============================ helper classes ==================================
+
+class LatencyHistogram(object):
+    '''
+    Histogram of latency values, in log buckets.
+
+    As in HDR histograms, each power of 2 is split into SUB_BUCKETS linear
+    buckets, so the percentiles are known within 1/SUB_BUCKETS of their
+    value, whatever the number of samples, in a fixed number of buckets.
+    The values below 2*SUB_BUCKETS have a bucket each.
+    '''
+
+    # number of buckets per power of 2
+    SUB_BUCKETS           = 16
+    # largest value recorded, larger values are recorded as this one
+    MAX_VALUE             = 0xffff
+
+    def __init__(self):
+        self.counts       = [0]*(self._index(self.MAX_VALUE)+1)
+        self.numSamples   = 0
+        self.total        = 0
+        self.min          = None
+        self.max          = None
+
+    #======================== public ==========================================
+
+    def record(self,value):
+        value             = min(max(int(value),0),self.MAX_VALUE)
+        self.counts[self._index(value)] += 1
+        self.numSamples  += 1
+        self.total       += value
+        if self.min is None or value<self.min:
+            self.min      = value
+        if self.max is None or value>self.max:
+            self.max      = value
+
+    def merge(self,other):
+        for (i,count) in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.numSamples  += other.numSamples
+        self.total       += other.total
+        for value in [other.min,other.max]:
+            if value is not None:
+                if self.min is None or value<self.min:
+                    self.min  = value
+                if self.max is None or value>self.max:
+                    self.max  = value
+
+    def getPercentile(self,percentile):
+        '''
+        :returns: The highest value of the bucket holding the percentile,
+            bounded by the largest value recorded, None if no value was
+            recorded.
+        '''
+        if not self.numSamples:
+            return None
+        rank              = max(1,int(-(-percentile*self.numSamples//100)))
+        seen              = 0
+        for (i,count) in enumerate(self.counts):
+            seen         += count
+            if seen>=rank:
+                return min(self._highestValue(i),self.max)
+
+    def getStats(self):
+        '''
+        :returns: A dictionary with the 'min', 'max' and 'avg' latency, and
+            the latency percentiles, 'p50', 'p90' and 'p99'. All are None if
+            no value was recorded.
+        '''
+        returnVal = {
+            'min':        self.min,
+            'max':        self.max,
+            'avg':        None,
+        }
+        if self.numSamples:
+            returnVal['avg'] = float(self.total)/self.numSamples
+        for percentile in PERCENTILES:
+            returnVal['p{0}'.format(percentile)] = self.getPercentile(percentile)
+        return returnVal
+
+    #======================== private =========================================
+
+    def _index(self,value):
+        if value<2*self.SUB_BUCKETS:
+            return value
+        shift             = value.bit_length()-self.SUB_BUCKETS.bit_length()
+        return shift*self.SUB_BUCKETS+(value>>shift)
+
+    def _highestValue(self,index):
+        if index<2*self.SUB_BUCKETS:
+            return index
+        shift             = index/self.SUB_BUCKETS-1
+        return ((index%self.SUB_BUCKETS+self.SUB_BUCKETS+1)<<shift)-1
+
+class _MinuteStats(object):
+    '''
+    The samples of a mote received during one minute.
+    '''
+
+    def __init__(self,minute):
+        self.minute       = minute
+        self.histogram    = LatencyHistogram()
+        self.lost         = 0
+
+class _MoteStats(object):
+    '''
+    The latency statistics of a mote.
+    '''
+
+    def __init__(self):
+        self.histogram    = LatencyHistogram()
+        self.minutes      = [None]*max(WINDOWS)  # _MinuteStats, indexed by minute modulo
+        self.lastSN       = None
+        self.missing      = {}                   # SN of a lost packet -> minute it was counted in
+        self.lost         = 0
+        self.duplicates   = 0
+        self.reordered    = 0
+        self.parent       = None
+        self.parentSwitches = 0
+        self.lastLatency  = None
+        self.lastSeen     = None
+
+    def getMinute(self,minute):
+        slot              = self.minutes[minute%len(self.minutes)]
+        if slot is None or slot.minute!=minute:
+            slot          = _MinuteStats(minute)
+            self.minutes[minute%len(self.minutes)] = slot
+        return slot
+
+#============================ main class ======================================
 
 class UDPLatency(eventBusClient.eventBusClient):
-   
+    '''
+    Latency statistics of the motes running the UDPLatency application.
+
+    For each mote, the latencies are recorded in a LatencyHistogram, over
+    the whole run and per minute, from which the statistics over the last
+    WINDOWS minutes are computed. The packets lost are derived from the
+    gaps in the sequence numbers.
+
+    The statistics of at most maxMotes motes are kept, the least recently
+    heard mote being evicted to make room.
+    '''
+
     UDP_LATENCY_PORT  = 61001
-    
-    def __init__(self):
-                # initialize parent class
+
+    # period at which the latency samples queued by ParserData are processed, in seconds
+    DRAIN_PERIOD      = 0.5
+
+    # maximum number of motes statistics are kept for
+    MAX_MOTES         = 256
+
+    # modulo of the sequence numbers, and distance below which a sequence
+    # number is ahead of another one
+    SN_MODULO         = 0x10000
+    SN_HALF           = SN_MODULO/2
+
+    # number of sequence numbers a late packet may lag behind; a larger
+    # backward jump means the mote restarted its sequence numbers, e.g. when
+    # it rebooted
+    REORDER_WINDOW    = 64
+
+    def __init__(self,network=None,maxMotes=MAX_MOTES,clock=time.time):
+        '''
+        :param network:  [in] The network the instance is connected to, see
+            eventBusClient. If None, the global event bus.
+        :param maxMotes: [in] Maximum number of motes statistics are kept
+            for.
+        :param clock:    [in] Function returning the current time, in
+            seconds.
+        '''
+
+        # store params
+        self.maxMotes        = maxMotes
+        self.clock           = clock
+
+        # initialize parent class
         eventBusClient.eventBusClient.__init__(
             self,
             name                  = 'UDPLatency',
-            registrations         =  [
-               {
-                    'sender'      : self.WILDCARD,
-                    'signal'      : 'latency',
-                    'callback'    : self._latency_notif,
-                },
-            ]
+            network               = network,
+            registrations         =  []
         )
 
         # local variables
         self.stateLock       = threading.Lock()
-        self.latencyStats    = {}
-        
-    
+        self.latencyStats    = collections.OrderedDict() # mote address (bytes) -> _MoteStats, least recently heard first
+        self.numSamples      = 0
+        self.numEvicted      = 0
+        self.latencySamples  = ParserData.getLatencySamples(network)
+        self.goOn            = True
+        self.closeEvent      = threading.Event()
+
+        # start the thread processing the latency samples
+        self.drainThread     = threading.Thread(target=self._drainLatencySamples)
+        self.drainThread.name   = 'UDPLatency'
+        self.drainThread.daemon = True
+        self.drainThread.start()
+
     #======================== public ==========================================
-    #Triggered by parser data as a hack 
-    def _latency_notif(self,sender,signal,data):
+
+    def close(self):
+        self.goOn = False
+        self.closeEvent.set()
+
+    def getLatencyStats(self):
+        '''
+        Retrieve the latency statistics of each mote.
+
+        :returns: A dictionary indexed by mote address (bytes), each value a
+            dictionary with the 'parent' address (bytes), the number of
+            'parentSwitches', of packets 'received', 'lost', 'duplicates'
+            and 'reordered', the packet loss ratio 'plr' (in percent), the
+            'lastLatency', the time the mote was 'lastSeen', the 'latency'
+            statistics over the whole run, see LatencyHistogram.getStats(),
+            and the same statistics, with the number of packets 'received'
+            and 'lost' and the 'plr', over the last minutes ('windows',
+            indexed by number of minutes). The latencies are in ms.
+        '''
+        minute = int(self.clock()//60)
+        with self.stateLock:
+            return dict([
+                (addr,self._formatMoteStats(stats,minute))
+                for (addr,stats) in self.latencyStats.items()
+            ])
+
+    def getStats(self):
+        '''
+        :returns: A dictionary with the number of 'motes' statistics are
+            kept for, the number of latency 'samples' processed and the
+            number of motes 'evicted' to make room.
+        '''
+        with self.stateLock:
+            return {
+                'motes':   len(self.latencyStats),
+                'samples': self.numSamples,
+                'evicted': self.numEvicted,
+            }
+
+    #======================== private =========================================
+
+    def _drainLatencySamples(self):
+        '''
+        Processes the latency samples queued by ParserData, away from the
+        thread which forwards the data.
+        '''
+        while self.goOn:
+            self.closeEvent.wait(self.DRAIN_PERIOD)
+            if not self.goOn:
+                break
+            while True:
+                try:
+                    sample = self.latencySamples.popleft()
+                except IndexError:
+                    break
+                try:
+                    self._latency_notif(*sample)
+                except Exception as err:
+                    log.error('could not process latency sample {0}: {1}'.format(sample,err))
+
+    #Triggered by parser data as a hack
+    def _latency_notif(self,node,latency,parent,SN):
         '''
         This method is invoked whenever a UDP packet is send from a mote from
-        UDPLatency application. This application listens at port 61001 and 
+        UDPLatency application. This application listens at port 61001 and
         computes the latency of a packet. Note that this app is crosslayer
         since the mote sends the data within a UDP packet and OpenVisualizer
         (ParserData) handles that packet and reads UDP payload to compute time
         difference.
-        
+
         At the bridge module on the DAGroot, the ASN of the DAGroot is appended
         to the serial port to be able to know what is the ASN at reception
         side.
-        
+
         Calculate latency values are in ms[SUPERFRAMELENGTH].
+
+        :param node:    [in] Address of the mote, as a byte string.
+        :param latency: [in] Latency of the packet.
+        :param parent:  [in] Address of the mote's parent, as a byte string.
+        :param SN:      [in] Sequence number of the packet, as an int.
         '''
-        address    = ",".join(hex(c) for c in data[0])
-        latency    = data[1]
-        parent     = ",".join(hex(c) for c in data[2])
-        SN         = u.buf2int(data[3])
-        
-        stats      = {} # dictionary of stats
-        
-        if (self.latencyStats.get(str(address)) is None):
-            
-            # none for this node... create initial stats
-            stats.update({'min':latency})
-            stats.update({'max':latency})
-            stats.update({'avg':latency})
-            stats.update({'pktRcvd':1})
-            stats.update({'pktSent':(SN + 1)})
-            stats.update({'DUP':0})
-            
+        node           = bytes(node)
+        parent         = bytes(parent)
+        now            = self.clock()
+
+        with self.stateLock:
+            self.numSamples           += 1
+
+            stats = self.latencyStats.pop(node,None)
+            if stats is None:
+                if len(self.latencyStats)>=self.maxMotes:
+                    self.latencyStats.popitem(last=False)
+                    self.numEvicted   += 1
+                stats = _MoteStats()
+            # most recently heard last
+            self.latencyStats[node]    = stats
+
+            minuteStats = stats.getMinute(int(now//60))
+
+            # sequence number
+            if stats.lastSN is not None:
+                gap = (SN-stats.lastSN)%self.SN_MODULO
+                if gap==0:
+                    stats.duplicates  += 1
+                    return
+                elif gap<self.SN_HALF:
+                    # the packets in between were lost
+                    stats.lost        += gap-1
+                    minuteStats.lost  += gap-1
+                    for missingSN in range(stats.lastSN+max(1,gap-self.REORDER_WINDOW),stats.lastSN+gap):
+                        stats.missing[missingSN%self.SN_MODULO] = minuteStats.minute
+                    stats.lastSN       = SN
+                    # forget the losses too old to be reordered packets
+                    for missingSN in stats.missing.keys():
+                        if (SN-missingSN)%self.SN_MODULO>self.REORDER_WINDOW:
+                            del stats.missing[missingSN]
+                elif self.SN_MODULO-gap<=self.REORDER_WINDOW:
+                    lostMinute = stats.missing.pop(SN,None)
+                    if lostMinute is None:
+                        # already received
+                        stats.duplicates += 1
+                        return
+                    # older than the last one, it was counted as lost
+                    stats.reordered   += 1
+                    stats.lost        -= 1
+                    lostSlot = stats.minutes[lostMinute%len(stats.minutes)]
+                    if lostSlot is not None and lostSlot.minute==lostMinute:
+                        lostSlot.lost -= 1
+                else:
+                    log.info('{0} restarted its sequence numbers at {1}'.format(u.formatAddr(bytearray(node)),SN))
+                    stats.lastSN       = SN
+                    stats.missing      = {}
+            else:
+                stats.lastSN           = SN
+
+            # latency
+            stats.histogram.record(latency)
+            minuteStats.histogram.record(latency)
+            stats.lastLatency          = latency
+            stats.lastSeen             = now
+
             # changes of parent
-            stats.update({'parentSwitch':1})
-        else:
-            # get and update
-            stats = self.latencyStats.get(str(address))
-           
-            if (stats.get('min') > latency):
-                stats.update({'min':latency})
-           
-            if (stats.get('max') < latency):
-                stats.update({'max':latency})
-           
-            stats.update({'avg':((stats.get('avg') * stats.get('pktRcvd')) + latency) / (stats.get('pktRcvd') + 1)})
-            stats.update({'pktRcvd':(stats.get('pktRcvd') + 1)})
-           
-            if (stats.get('prefParent') != parent):
-               stats.update({'parentSwitch':(stats.get('parentSwitch')+1)})# record parent change since last message
-            
-            # check if packet is a duplicate
-            if (SN == stats.get('SN')):
-                # increment duplicated
-                stats.update({'DUP':(stats.get('DUP') + 1)})
-            
-            # update pktSent
-            if (SN > stats.get('pktSent')):
-                stats.update({'pktSent':SN + 1})
-        
-        # these fields are common
-        stats.update({'SN':SN})
-        
-        # calculate PLR
-        PLR = self._calculatePLR(stats.get('pktRcvd'), stats.get('pktSent'))
-        stats.update({'PLR':PLR})
-        
-        stats.update({'lastVal':latency})
-        stats.update({'prefParent':parent})
-        stats.update({'lastMsg':datetime.now()})
-        
-        # add to dictionary and compute stats...
-        self.stateLock.acquire()
-        self.latencyStats.update({str(address):stats})
-        self.stateLock.release()
-        
-        # log stats
-        if log.isEnabledFor(logging.DEBUG):
-            log.debug(self._formatUDPLatencyStat(self.latencyStats.get(str(address)), str(address)))
-    
+            if stats.parent!=parent:
+                stats.parentSwitches  += 1
+                stats.parent           = parent
+
+            # log stats
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(self._formatUDPLatencyStat(self._formatMoteStats(stats,int(now//60)),node))
+
     # this is not activated as this function are not bound to a signal
     def _infoDagRoot_notif(self,sender,signal,data):
         '''
@@ -137,47 +392,84 @@ class UDPLatency(eventBusClient.eventBusClient):
                 self.dagRootEui64     +=[int(c)]
         # signal to which this component is subscribed.
         signal=(self.networkPrefix + self.dagRootEui64,self.PROTO_UDP,self.UDP_LATENCY_PORT)
-        
+
         #register as soon as I get an address
-        self._register(self,self.WILDCARD,signal,self._latency_notif)    
-    
+        self._register(self,self.WILDCARD,signal,self._latency_notif)
+
     def _networkPrefix_notif(self, sender, signal, data):
         '''
         Record the network prefix.
         '''
         with self.stateLock:
             self.networkPrefix    = data
-    
-    def _calculatePLR(self, rcvdPkt, sentPkt):
+
+    def _calculatePLR(self, rcvdPkt, lostPkt):
         '''
         Calculate Packet Loss Ratio for the sender.
         '''
-        return float(sentPkt-rcvdPkt)/sentPkt*100
-        
-        
-        
-    
+        if not rcvdPkt+lostPkt:
+            return 0.0
+        return float(lostPkt)/(rcvdPkt+lostPkt)*100
+
+    def _formatMoteStats(self,stats,minute):
+        '''
+        Expects stateLock to be held.
+        '''
+        windows = {}
+        for window in WINDOWS:
+            histogram = LatencyHistogram()
+            lost      = 0
+            for slot in stats.minutes:
+                if slot is not None and minute-window<slot.minute<=minute:
+                    histogram.merge(slot.histogram)
+                    lost += slot.lost
+            windows[window] = histogram.getStats()
+            windows[window].update({
+                'received':   histogram.numSamples,
+                'lost':       lost,
+                'plr':        self._calculatePLR(histogram.numSamples,lost),
+            })
+        return {
+            'parent':         stats.parent,
+            'parentSwitches': stats.parentSwitches,
+            'received':       stats.histogram.numSamples,
+            'lost':           stats.lost,
+            'duplicates':     stats.duplicates,
+            'reordered':      stats.reordered,
+            'plr':            self._calculatePLR(stats.histogram.numSamples,stats.lost),
+            'lastLatency':    stats.lastLatency,
+            'lastSeen':       stats.lastSeen,
+            'latency':        stats.histogram.getStats(),
+            'windows':        windows,
+        }
+
     #===== formatting
-    
-    def _formatUDPLatencyStat(self, stats, str):
-        
+
+    def _formatUDPLatencyStat(self, stats, addr):
+
         output  = []
         output += ['']
         output += ['']
         output += ['============================= UDPLatency statistics =============================']
         output += ['']
-        output += ['Mote address:             {0}'.format(str)]
-        output += ['Min latency:              {0}ms'.format(stats.get('min'))]
-        output += ['Max latency:              {0}ms'.format(stats.get('max'))]
-        output += ['Packets received:         {0}'.format(stats.get('pktRcvd'))]
-        output += ['Packets sent:             {0}'.format(stats.get('pktSent'))]
-        output += ['Avg latency:              {0}ms'.format(stats.get('avg'))]
-        output += ['Latest latency:           {0}ms'.format(stats.get('lastVal'))]
-        output += ['Preferred parent:         {0}'.format(stats.get('prefParent'))]
-        output += ['Sequence Number:          {0}'.format(stats.get('SN'))]
-        output += ['Duplicated packets:       {0}'.format(stats.get('DUP'))]
-        output += ['PLR:                      {0}%'.format(stats.get('PLR'))]
-        output += ['Received:                 {0}'.format(stats.get('lastMsg'))]
+        output += ['Mote address:             {0}'.format(u.formatAddr(bytearray(addr)))]
+        output += ['Min latency:              {0}ms'.format(stats['latency']['min'])]
+        output += ['Max latency:              {0}ms'.format(stats['latency']['max'])]
+        output += ['Avg latency:              {0}ms'.format(stats['latency']['avg'])]
+        output += ['Latency p50/p90/p99:      {0}/{1}/{2}ms'.format(
+            stats['latency']['p50'],
+            stats['latency']['p90'],
+            stats['latency']['p99'],
+        )]
+        output += ['Latest latency:           {0}ms'.format(stats['lastLatency'])]
+        output += ['Packets received:         {0}'.format(stats['received'])]
+        output += ['Packets lost:             {0}'.format(stats['lost'])]
+        output += ['Preferred parent:         {0}'.format(u.formatAddr(bytearray(stats['parent'])))]
+        output += ['Parent switches:          {0}'.format(stats['parentSwitches'])]
+        output += ['Duplicated packets:       {0}'.format(stats['duplicates'])]
+        output += ['Reordered packets:        {0}'.format(stats['reordered'])]
+        output += ['PLR:                      {0}%'.format(stats['plr'])]
+        output += ['Received:                 {0}'.format(stats['lastSeen'])]
         output += ['']
         output += ['']
         return '\n'.join(output)
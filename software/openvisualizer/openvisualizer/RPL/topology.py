@@ -16,28 +16,147 @@ log = logging.getLogger('topology')
 log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
+import math
 import threading
+import time
 
 import openvisualizer.openvisualizer_utils as u
 from openvisualizer.eventBus import eventBusClient
 
+class TimerWheel(object):
+    '''
+    Hashed timer wheel.
+    
+    Each timer is stored in the slot of the tick it expires at, modulo the
+    number of slots, so scheduling and cancelling a timer are O(1). The
+    wheel is only advanced when asked to, by the number of ticks elapsed
+    since the last time.
+    '''
+    
+    def __init__(self,numSlots,tick,now):
+        
+        # store params
+        self.numSlots        = numSlots
+        self.tick            = tick
+        
+        # local variables
+        self.slots           = [set() for _ in range(numSlots)]
+        self.deadlines       = {} # key -> tick the timer expires at
+        self.currentTick     = self._toTick(now)
+    
+    def __len__(self):
+        return len(self.deadlines)
+    
+    #======================== public ==========================================
+    
+    def schedule(self,key,timeout,now):
+        '''
+        (Re)arm the timer of a key, to expire timeout seconds from now.
+        '''
+        self.cancel(key)
+        deadline             = max(int(math.ceil((now+timeout)/self.tick)),self.currentTick+1)
+        self.deadlines[key]  = deadline
+        self.slots[deadline%self.numSlots].add(key)
+    
+    def cancel(self,key):
+        deadline             = self.deadlines.pop(key,None)
+        if deadline is not None:
+            self.slots[deadline%self.numSlots].discard(key)
+    
+    def isScheduled(self,key):
+        return key in self.deadlines
+    
+    def advance(self,now):
+        '''
+        Advance the wheel to the current time.
+        
+        :returns: The list of the keys whose timer expired.
+        '''
+        target               = self._toTick(now)
+        if target<=self.currentTick:
+            return []
+        
+        # no need to visit a slot more than once
+        numTicks             = min(target-self.currentTick,self.numSlots)
+        expired              = []
+        for tick in range(target-numTicks+1,target+1):
+            slot             = self.slots[tick%self.numSlots]
+            for key in [k for k in slot if self.deadlines[k]<=target]:
+                slot.remove(key)
+                del self.deadlines[key]
+                expired.append(key)
+        self.currentTick     = target
+        return expired
+    
+    #======================== private =========================================
+    
+    def _toTick(self,now):
+        return int(math.floor(now/self.tick))
+
 class topology(eventBusClient.eventBusClient):
+    '''
+    DODAG built from the parents reported in DAOs.
     
-    def __init__(self):
+    Besides the parents of each node, an index of the children of each node
+    through its preferred parent (the first one listed) is kept up to date
+    as DAOs arrive, together with the size of the subtree below each node.
+    Each change of the DODAG increments its version.
+    
+    Entries expire after the path lifetime advertised in the DAO, unless
+    refreshed by a new DAO. Expired entries are removed, and signaled with
+    'parentsChanged' like any other change.
+    '''
+    
+    # period at which expired entries are removed, in seconds
+    EXPIRY_PERIOD            = 1
+    # number of slots in the timer wheel, one per second
+    NUM_TIMER_SLOTS          = 512
+    
+    def __init__(self,clock=time.time,expiryPeriod=EXPIRY_PERIOD,network=None):
+        '''
+        :param clock:        [in] Function returning the current time, in
+            seconds.
+        :param expiryPeriod: [in] Period at which a thread removes expired
+            entries, in seconds. If None, no thread is started, and expired
+            entries are only removed when a DAO is received, or
+            expireParents() is called.
+        :param network:      [in] The network the instance is connected to,
+            see eventBusClient. If None, the global event bus.
+        '''
+        
+        # store params
+        self.clock           = clock
         
         # local variables
         self.dataLock        = threading.Lock()
-        self.parents         = {}
+        self.parents         = {} # node -> list of parents, preferred first
+        self.preferred       = {} # node -> preferred parent
+        self.children        = {} # node -> set of nodes with that preferred parent
+        self.subtreeSize     = {} # node -> number of nodes in its subtree, itself included
+        self.version         = 0
+        self.dagCache        = None # (version,(states,edges))
+        self.timers          = TimerWheel(self.NUM_TIMER_SLOTS,1,self.clock())
+        self.numExpired      = 0
+        self.numRefreshed    = 0
+        self.numNoPath       = 0
+        self.goOn            = True
+        self.closeEvent      = threading.Event()
         
         eventBusClient.eventBusClient.__init__(
             self,
             name                  = 'topology',
+            network               = network,
             registrations         =  [
                 {
                     'sender'      : self.WILDCARD,
                     'signal'      : 'updateParents',
                     'callback'    : self.updateParents,
                 },
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'updateParentsBatch',
+                    'callback'    : self.updateParentsBatch,
+                },
                 {
                     'sender'      : self.WILDCARD,
                     'signal'      : 'getParents',
@@ -45,18 +164,40 @@ class topology(eventBusClient.eventBusClient):
                 },
             ]
         )
+        
+        # start the expiry thread
+        if expiryPeriod is not None:
+            self.expiryPeriod              = expiryPeriod
+            self.expiryThread              = threading.Thread(target=self._runExpiry)
+            self.expiryThread.name         = 'topology'
+            self.expiryThread.daemon       = True
+            self.expiryThread.start()
     
     #======================== public ==========================================
     
+    def close(self):
+        self.goOn = False
+        self.closeEvent.set()
+    
     def getParents(self,sender,signal,data):
         return self.parents
     
     def getDAG(self):
-        states = []
-        edges = []
-        motes = []
+        '''
+        Retrieve the DODAG, in the format expected by the web interface.
         
+        The result is computed once per version of the DODAG.
+        
+        :returns: A tuple (states,edges).
+        '''
         with self.dataLock:
+            if self.dagCache and self.dagCache[0]==self.version:
+                return self.dagCache[1]
+            
+            states = []
+            edges = []
+            motes = []
+            
             for src, dsts in self.parents.iteritems():
                 src_s = ''.join(['%02X' % x for x in src[-2:] ])
                 motes.append(src_s)
@@ -68,15 +209,290 @@ class topology(eventBusClient.eventBusClient):
             for mote in motes:
                 d = { 'id': mote, 'value': { 'label': mote } } 
                 states.append(d)
+            
+            self.dagCache = (self.version,(states,edges))
+            
+            return self.dagCache[1]
+    
+    def getVersion(self):
+        '''
+        :returns: The version of the DODAG, incremented at each change.
+        '''
+        with self.dataLock:
+            return self.version
+    
+    def getChildren(self,node):
+        '''
+        :param node: [in] The EUI64 of a node, as a tuple.
+        :returns: The list of the nodes which have node as preferred parent.
+        '''
+        with self.dataLock:
+            return list(self.children.get(tuple(node),[]))
+    
+    def getDepth(self,node):
+        '''
+        Number of hops from a node to the root of its DODAG, in O(depth).
         
-        return (states,edges)
+        :param node: [in] The EUI64 of a node, as a tuple.
+        :returns: The depth of the node, 0 for a root, or None if the node
+            is unknown or its preferred parents form a loop.
+        '''
+        node = tuple(node)
+        with self.dataLock:
+            if node not in self.preferred and node not in self.children:
+                return None
+            (ancestors,rooted) = self._getAncestors(node)
+            if not rooted:
+                return None
+            return len(ancestors)
+    
+    def getSubtreeSize(self,node):
+        '''
+        :param node: [in] The EUI64 of a node, as a tuple.
+        :returns: The number of nodes in the subtree of the node, itself
+            included, or None if the node has neither parents nor children,
+            or is not connected to a root.
+        '''
+        with self.dataLock:
+            return self.subtreeSize.get(tuple(node))
+    
+    def getRoots(self):
+        '''
+        :returns: The list of the nodes which have children, but no parents.
+        '''
+        with self.dataLock:
+            return [n for n in self.children.keys() if n not in self.preferred]
+    
+    def getOrphans(self,root=None):
+        '''
+        List the nodes which are not connected to a root.
         
+        :param root: [in] The EUI64 of the DAGroot, as a tuple. If given, the
+            nodes not in its subtree are listed. Otherwise, the nodes whose
+            preferred parents form a loop, or lead to a loop, are listed.
+        :returns: A list of nodes.
+        '''
+        with self.dataLock:
+            if root is None:
+                return [n for n in self.preferred.keys() if n not in self.subtreeSize]
+            
+            connected = set()
+            toVisit   = [tuple(root)]
+            while toVisit:
+                n = toVisit.pop()
+                for child in self.children.get(n,[]):
+                    connected.add(child)
+                    toVisit.append(child)
+            return [n for n in self.preferred.keys() if n not in connected]
+    
+    def getExpiryStats(self):
+        '''
+        :returns: A dictionary with the number of entries which 'expired',
+            were 'refreshed' before expiring, or removed by a 'noPath' DAO,
+            and the number of 'timers' running.
+        '''
+        with self.dataLock:
+            return {
+                'expired':   self.numExpired,
+                'refreshed': self.numRefreshed,
+                'noPath':    self.numNoPath,
+                'timers':    len(self.timers),
+            }
+    
     def updateParents(self,sender,signal,data):
-        ''' inserts parent information into the parents dictionary '''
+        '''
+        Inserts parent information into the parents dictionary.
+        
+        data is a tuple (node,parents), or (node,parents,lifetime) with the
+        lifetime of the entry in seconds, None meaning infinite. A lifetime
+        of 0 (No-Path DAO) removes the entry.
+        
+        If the parents of nodes changed, dispatches 'parentsChanged' with
+        the list of nodes whose parents changed, so cached source routes
+        through them can be invalidated.
+        '''
+        self.updateParentsBatch(sender,signal,[data])
+    
+    def updateParentsBatch(self,sender,signal,data):
+        '''
+        Inserts the parent information of several nodes at once.
+        
+        data is a list of tuples, in the same format as for updateParents.
+        All entries are applied while holding the lock once, and a single
+        'parentsChanged' is dispatched for the whole batch.
+        '''
         with self.dataLock:
-            #data[0] == source address, data[1] == list of parents
-            self.parents.update({data[0]:data[1]})
+            now     = self.clock()
+            changed = self._expire(now)
+            
+            for entry in data:
+                node       = entry[0]
+                parents    = entry[1]
+                lifetime   = entry[2] if len(entry)>2 else None
+                
+                if lifetime==0:
+                    self.numNoPath         += 1
+                    self.timers.cancel(node)
+                    parents                 = None
+                elif lifetime is None:
+                    self.timers.cancel(node)
+                else:
+                    if self.timers.isScheduled(node):
+                        self.numRefreshed  += 1
+                    self.timers.schedule(node,lifetime,now)
+                
+                if self._setParents(node,parents) and node not in changed:
+                    changed.append(node)
+        
+        if changed:
+            self.dispatch(
+                signal          = 'parentsChanged',
+                data            = changed,
+            )
+    
+    def expireParents(self):
+        '''
+        Remove the entries whose lifetime elapsed.
+        '''
+        with self.dataLock:
+            changed = self._expire(self.clock())
+        
+        if changed:
+            self.dispatch(
+                signal          = 'parentsChanged',
+                data            = changed,
+            )
     
     #======================== private =========================================
     
+    def _runExpiry(self):
+        while self.goOn:
+            self.closeEvent.wait(self.expiryPeriod)
+            try:
+                self.expireParents()
+            except Exception as err:
+                log.critical('could not expire parents: {0}'.format(err))
+    
+    def _expire(self,now):
+        '''
+        Remove the entries whose lifetime elapsed. Expects dataLock to be held.
+        
+        :returns: The list of nodes removed.
+        '''
+        expired = [n for n in self.timers.advance(now) if n in self.parents]
+        for node in expired:
+            self._setParents(node,None)
+            log.info('parents of {0} expired'.format(u.formatAddr(node)))
+        self.numExpired += len(expired)
+        return expired
+    
+    def _setParents(self,node,parents):
+        '''
+        Update the parents of a node. Expects dataLock to be held.
+        
+        :param node:    [in] The EUI64 of the node, as a tuple.
+        :param parents: [in] The new list of parents, or None to remove the
+            node.
+        :returns: True if the parents of the node changed.
+        '''
+        if self.parents.get(node)==parents:
+            return False
+        
+        if parents is None:
+            del self.parents[node]
+        else:
+            self.parents[node] = parents
+        
+        oldPreferred = self.preferred.get(node)
+        newPreferred = tuple(parents[0]) if parents else None
+        if oldPreferred!=newPreferred:
+            self._changePreferred(node,oldPreferred,newPreferred)
+        
+        self.version += 1
+        return True
+    
+    def _changePreferred(self,node,oldPreferred,newPreferred):
+        '''
+        Move a node, and its subtree, to a new preferred parent.
+        
+        The subtree sizes are updated along the old and new ancestors only,
+        in O(depth). If the node was, or becomes, part of a loop, they are
+        recomputed from scratch instead.
+        '''
+        
+        # size of the subtree being moved
+        size = self.subtreeSize.get(node)
+        if size is None and node not in self.children:
+            size = 1
+        (oldAncestors,oldRooted) = self._getAncestors(node)
+        
+        # update the children index
+        if oldPreferred:
+            self.children[oldPreferred].discard(node)
+            if not self.children[oldPreferred]:
+                del self.children[oldPreferred]
+        if newPreferred:
+            self.preferred[node] = newPreferred
+            self.children.setdefault(newPreferred,set()).add(node)
+        else:
+            self.preferred.pop(node,None)
+        
+        (newAncestors,newRooted) = self._getAncestors(node)
+        
+        if size is None or not oldRooted or not newRooted:
+            self._recomputeSubtreeSizes()
+            return
+        
+        for a in oldAncestors:
+            self.subtreeSize[a]     -= size
+        for a in newAncestors:
+            self.subtreeSize[a]      = self.subtreeSize.get(a,1)+size
+        self.subtreeSize[node]       = size
+        
+        # forget a root left without children
+        if oldAncestors:
+            oldRoot = oldAncestors[-1]
+            if oldRoot not in self.children:
+                del self.subtreeSize[oldRoot]
+        if not newPreferred and node not in self.children:
+            del self.subtreeSize[node]
+    
+    def _getAncestors(self,node):
+        '''
+        Walk up the preferred parents of a node.
+        
+        :returns: A tuple (ancestors,rooted), where ancestors is the list of
+            the ancestors of the node, closest first, and rooted is False if
+            the walk ended on a loop.
+        '''
+        ancestors = []
+        seen      = set([node])
+        current   = self.preferred.get(node)
+        while current is not None:
+            if current in seen:
+                return (ancestors,False)
+            ancestors.append(current)
+            seen.add(current)
+            current = self.preferred.get(current)
+        return (ancestors,True)
+    
+    def _recomputeSubtreeSizes(self):
+        '''
+        Compute the size of the subtree of all the nodes connected to a root.
+        '''
+        sizes = {}
+        for root in self.children.keys():
+            if root in self.preferred:
+                continue
+            # depth-first, children before their parent
+            order   = []
+            toVisit = [root]
+            while toVisit:
+                n = toVisit.pop()
+                order.append(n)
+                toVisit.extend(self.children.get(n,[]))
+            for n in reversed(order):
+                sizes[n] = 1+sum([sizes[c] for c in self.children.get(n,[])])
+        self.subtreeSize = sizes
+    
     #======================== helpers =========================================
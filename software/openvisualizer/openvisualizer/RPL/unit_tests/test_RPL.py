@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # RPL/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import json
+import time
+
+import pytest
+
+import RPL
+import topology
+from openvisualizer.eventBus import eventBusClient
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_RPL.log'
+
+import logging
+log = logging.getLogger('test_RPL')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_RPL',
+                   'RPL',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+PREFIX   = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
+DODAGID  = PREFIX+[0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+ROOT_1   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+ROOT_2   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]
+MOTE_A   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]
+MOTE_B   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0b]
+MOTE_C   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0c]
+
+NUM_BENCHMARK = 20000
+
+#============================ helpers =========================================
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+def _dao(parents,children,lifetime=0xaa,sequence=0x01):
+    dao      = [0x00,0x00,0x00,sequence]+DODAGID
+    for p in parents:
+        #       type flags path control, sequence, lifetime
+        dao += [0x06,0x14,0x00,0x00,0x00,lifetime]+PREFIX+p
+    for c in children:
+        #       type length flags prefix length
+        dao += [0x05,0x12,0x00,0x80]+PREFIX+c
+    return dao
+
+def _newRPL(batchWindow=None):
+    rpl          = RPL.RPL(batchWindow=batchWindow)
+    rpl.notifs   = []
+    rpl.dispatch = lambda signal,data: rpl.notifs.append((signal,data))
+    return rpl
+
+#============================ fixtures ========================================
+
+EXPECTEDDAO = [
+    #           parents           children          lifetime
+    json.dumps(([MOTE_A],         [],               0xaa)),
+    json.dumps(([MOTE_A,MOTE_B],  [MOTE_C],         0x10)),
+    json.dumps(([],               [MOTE_B,MOTE_C],  0xaa)),
+]
+
+@pytest.fixture(params=EXPECTEDDAO)
+def expectedDAO(request):
+    return request.param
+
+#============================ tests ===========================================
+
+def test_parseDAO(expectedDAO):
+    
+    (parents,children,lifetime) = json.loads(expectedDAO)
+    
+    rpl = _newRPL()
+    
+    assert rpl._parseDAO(_dao(parents,children,lifetime,0x2a))==(
+        0x2a,
+        parents,
+        children,
+        [lifetime]*len(parents),
+    )
+
+def test_parseDAO_invalid():
+    
+    rpl = _newRPL()
+    
+    # truncated header
+    with pytest.raises(ValueError):
+        rpl._parseDAO(_dao([],[])[:19])
+    
+    # truncated option
+    with pytest.raises(ValueError):
+        rpl._parseDAO(_dao([MOTE_A],[])[:-1])
+    
+    # unknown option
+    with pytest.raises(ValueError):
+        rpl._parseDAO(_dao([MOTE_A],[])+[0x07,0x00])
+
+def test_indicateDAO():
+    
+    rpl = _newRPL()
+    
+    rpl._indicateDAO((PREFIX+MOTE_C,_dao([MOTE_A,MOTE_B],[],0x3c)))
+    rpl._indicateDAO((PREFIX+MOTE_B,_dao([MOTE_A],[],RPL.RPL.PATH_LIFETIME_INFINITE)))
+    rpl._indicateDAO((PREFIX+MOTE_A,_dao([MOTE_A],[])[:-1]))
+    
+    assert rpl.notifs==[
+        ('updateParentsBatch',[(tuple(MOTE_C),[MOTE_A,MOTE_B],0x3c)]),
+        ('updateParentsBatch',[(tuple(MOTE_B),[MOTE_A],None)]),
+    ]
+
+def test_multipleDagRoots():
+    
+    rpl = _newRPL()
+    rpl._networkPrefix_notif(None,'networkPrefix',PREFIX)
+    for root in [ROOT_1,ROOT_2]:
+        rpl._infoDagRoot_notif(None,'infoDagRoot',{'isDAGroot': 1, 'eui64': root})
+    
+    # the DAOs sent to either DAGroot are received
+    for (root,mote) in [(ROOT_1,MOTE_A),(ROOT_2,MOTE_B)]:
+        handled = rpl._eventBusNotification(
+            (tuple(PREFIX+root),rpl.PROTO_ICMPv6,rpl.IANA_ICMPv6_RPL_TYPE),
+            'test',
+            (PREFIX+mote,_dao([root],[])),
+        )
+        assert handled==True
+    assert [data[0][:2] for (signal,data) in rpl.notifs]==[
+        (tuple(MOTE_A),[ROOT_1]),
+        (tuple(MOTE_B),[ROOT_2]),
+    ]
+    
+    # the DAOs sent to a DAGroot which is not anymore are not
+    rpl._infoDagRoot_notif(None,'infoDagRoot',{'isDAGroot': 0, 'eui64': ROOT_1})
+    assert rpl._eventBusNotification(
+        (tuple(PREFIX+ROOT_1),rpl.PROTO_ICMPv6,rpl.IANA_ICMPv6_RPL_TYPE),
+        'test',
+        (PREFIX+MOTE_A,_dao([ROOT_1],[])),
+    ) is None
+    assert rpl.dagRoots==set([tuple(ROOT_2)])
+
+def test_lifetime():
+    
+    network = 'test_RPL'
+    clock   = FakeClock()
+    rpl     = RPL.RPL(batchWindow=None,network=network,lifetimeUnit=2)
+    topo    = topology.topology(clock=clock,expiryPeriod=None,network=network)
+    try:
+        # a DAO with a Path Lifetime of 10, i.e. 20s, refreshed every 19s
+        for sequence in range(1,11):
+            rpl._indicateDAO((PREFIX+MOTE_A,_dao([ROOT_1],[],10,sequence)))
+            clock.now += 19
+            topo.expireParents()
+            assert topo.getParents(None,'getParents',None)=={tuple(MOTE_A): [ROOT_1]}
+        
+        # the mote stops sending DAOs
+        clock.now += 2
+        topo.expireParents()
+        assert topo.getParents(None,'getParents',None)=={}
+        assert topo.getExpiryStats()['expired']==1
+    finally:
+        topo.close()
+        rpl.close()
+        eventBusClient.closeNetwork(network)
+
+def test_isNewerSequence():
+    
+    rpl = _newRPL()
+    
+    # circular part
+    assert rpl._isNewerSequence(5,4)
+    assert not rpl._isNewerSequence(4,5)
+    assert not rpl._isNewerSequence(4,4)
+    assert rpl._isNewerSequence(2,126)          # wrapped
+    assert not rpl._isNewerSequence(126,2)
+    
+    # linear part, i.e. after a reboot
+    assert rpl._isNewerSequence(241,240)
+    assert rpl._isNewerSequence(5,250)          # left the linear part
+    assert rpl._isNewerSequence(129,100)        # rebooted
+    assert not rpl._isNewerSequence(100,255)
+    
+    # not comparable, the last one received wins
+    assert rpl._isNewerSequence(60,10)
+    assert rpl._isNewerSequence(10,60)
+
+def test_batchDAO():
+    
+    rpl = _newRPL(batchWindow=60)
+    
+    try:
+        rpl._indicateDAO((PREFIX+MOTE_C,_dao([MOTE_A],[],sequence=0x10)))
+        rpl._indicateDAO((PREFIX+MOTE_B,_dao([MOTE_A],[],sequence=0x01)))
+        rpl._indicateDAO((PREFIX+MOTE_C,_dao([MOTE_B],[],sequence=0x11)))
+        # older than the one buffered, arrived out of order
+        rpl._indicateDAO((PREFIX+MOTE_C,_dao([MOTE_A],[],sequence=0x0f)))
+        assert rpl.notifs==[]
+        
+        rpl._flushDAOs()
+        rpl._flushDAOs()
+    finally:
+        rpl.close()
+    
+    assert rpl.notifs==[
+        ('updateParentsBatch',[
+            (tuple(MOTE_C),[MOTE_B],0xaa),
+            (tuple(MOTE_B),[MOTE_A],0xaa),
+        ]),
+    ]
+    assert rpl.getDAOStats()=={'daos': 4, 'dropped': 2, 'batches': 1}
+
+def test_batchDAOThread():
+    
+    rpl = _newRPL(batchWindow=0.05)
+    
+    try:
+        rpl._indicateDAO((PREFIX+MOTE_C,_dao([MOTE_A],[])))
+        rpl._indicateDAO((PREFIX+MOTE_B,_dao([MOTE_A],[])))
+        for _ in range(100):
+            if rpl.notifs:
+                break
+            time.sleep(0.01)
+    finally:
+        rpl.close()
+    
+    assert rpl.notifs==[
+        ('updateParentsBatch',[
+            (tuple(MOTE_C),[MOTE_A],0xaa),
+            (tuple(MOTE_B),[MOTE_A],0xaa),
+        ]),
+    ]
+
+def test_benchmarkDAO():
+    '''
+    Log the number of DAOs per second RPL processes.
+    '''
+    
+    rpl = _newRPL()
+    rpl.dispatch = lambda signal,data: None
+    
+    daos  = [
+        (PREFIX+[0x14,0x15,0x92,0x00,0x00,0x00,i>>8,i&0xff],_dao([MOTE_A,MOTE_B],[]))
+        for i in range(500)
+    ]
+    
+    # measure with debug logging disabled, as when running
+    rplLog = logging.getLogger('RPL')
+    level  = rplLog.level
+    rplLog.setLevel(logging.INFO)
+    try:
+        start = time.time()
+        for i in range(NUM_BENCHMARK):
+            rpl._indicateDAO(daos[i%len(daos)])
+        duration = time.time()-start
+    finally:
+        rplLog.setLevel(level)
+    
+    log.info("{0:.0f} DAOs/s".format(NUM_BENCHMARK/max(duration,1e-9)))
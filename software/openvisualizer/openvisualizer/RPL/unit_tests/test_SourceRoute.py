@@ -10,6 +10,8 @@ sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'
 import logging
 import logging.handlers
 import json
+import random
+import time
 
 import pytest
 
@@ -42,6 +44,10 @@ MOTE_A = [0xaa]*8
 MOTE_B = [0xbb]*8
 MOTE_C = [0xcc]*8
 MOTE_D = [0xdd]*8
+MOTE_E = [0xee]*8
+
+NUM_BENCHMARK_MOTES = 1000
+NUM_BENCHMARK       = 10000
 
 #============================ fixtures ========================================
 
@@ -57,6 +63,26 @@ def expectedSourceRoute(request):
 
 #============================ helpers =========================================
 
+def _newSourceRoute(parents):
+    '''
+    Create a SourceRoute which reads the parents from a dictionary, rather
+    than from the topology module.
+    '''
+    sourceRoute             = SourceRoute.SourceRoute()
+    sourceRoute._getParents = lambda : parents
+    return sourceRoute
+
+def _syntheticTree(numMotes):
+    '''
+    Random tree of numMotes motes, rooted at mote 0.
+    '''
+    rand    = random.Random(1)
+    motes   = [[0x14,0x15,0x92,0x00,0x00,0x00,i>>8,i&0xff] for i in range(numMotes)]
+    parents = {}
+    for i in range(1,numMotes):
+        parents[tuple(motes[i])] = [motes[rand.randint(max(0,i-10),i-1)]]
+    return (motes,parents)
+
 #============================ tests ===========================================
 
 def test_sourceRoute(expectedSourceRoute):
@@ -101,3 +127,103 @@ def test_sourceRoute(expectedSourceRoute):
         log.debug(output)
     
     assert calculatedRoute==expectedRoute
+
+def test_sourceRouteCache():
+    '''
+    This tests the following topology
+    
+    MOTE_A <- MOTE_B <- MOTE_C
+           <- MOTE_D
+    '''
+    
+    parents = {
+        tuple(MOTE_B): [MOTE_A],
+        tuple(MOTE_C): [MOTE_B],
+        tuple(MOTE_D): [MOTE_A],
+    }
+    sourceRoute = _newSourceRoute(parents)
+    
+    for _ in range(2):
+        assert sourceRoute.getSourceRoute(MOTE_C)==[MOTE_C,MOTE_B,MOTE_A]
+        assert sourceRoute.getSourceRoute(MOTE_D)==[MOTE_D,MOTE_A]
+    assert sourceRoute.getStats()=={'hits': 2, 'misses': 2, 'routes': 2}
+    
+    # the route returned can be modified by the caller
+    sourceRoute.getSourceRoute(MOTE_C).pop()
+    assert sourceRoute.getSourceRoute(MOTE_C)==[MOTE_C,MOTE_B,MOTE_A]
+    
+    # MOTE_B changes parent, only the route to MOTE_C goes through it
+    parents[tuple(MOTE_B)] = [MOTE_E]
+    sourceRoute._parentsChanged_notif(None,'parentsChanged',[tuple(MOTE_B)])
+    assert sourceRoute.getStats()['routes']==1
+    assert sourceRoute.getSourceRoute(MOTE_C)==[MOTE_C,MOTE_B,MOTE_E]
+    
+    # MOTE_E, at the end of the route, gets a parent
+    parents[tuple(MOTE_E)] = [MOTE_A]
+    sourceRoute._parentsChanged_notif(None,'parentsChanged',[tuple(MOTE_E)])
+    assert sourceRoute.getSourceRoute(MOTE_C)==[MOTE_C,MOTE_B,MOTE_E,MOTE_A]
+    assert sourceRoute.getStats()=={'hits': 4, 'misses': 4, 'routes': 2}
+
+def test_sourceRouteLoop():
+    
+    parents = {
+        tuple(MOTE_B): [MOTE_C],
+        tuple(MOTE_C): [MOTE_D],
+        tuple(MOTE_D): [MOTE_B],
+    }
+    sourceRoute = _newSourceRoute(parents)
+    
+    assert sourceRoute.getSourceRoute(MOTE_B)==[MOTE_B,MOTE_C,MOTE_D]
+    assert sourceRoute.getSourceRoute(MOTE_A)==[]
+
+def test_computeAllRoutes():
+    
+    (motes,parents) = _syntheticTree(100)
+    
+    # add a loop, disconnected from the root
+    parents[tuple(MOTE_B)] = [MOTE_C]
+    parents[tuple(MOTE_C)] = [MOTE_B]
+    
+    allRoutes = _newSourceRoute(parents).computeAllRoutes()
+    
+    sourceRoute = _newSourceRoute(parents)
+    assert sorted(allRoutes.keys())==sorted(parents.keys())
+    for (dest,route) in allRoutes.items():
+        assert route==sourceRoute.getSourceRoute(list(dest))
+
+def test_benchmarkSourceRoute():
+    '''
+    Log the number of route lookups per second on a large synthetic tree.
+    '''
+    
+    (motes,parents) = _syntheticTree(NUM_BENCHMARK_MOTES)
+    
+    rand         = random.Random(2)
+    destinations = [motes[rand.randint(1,NUM_BENCHMARK_MOTES-1)] for _ in range(NUM_BENCHMARK)]
+    
+    # walking the parents
+    sourceRoute  = _newSourceRoute(parents)
+    start        = time.time()
+    for dest in destinations:
+        sourceRoute._getSourceRoute_internal(dest,parents)
+    uncached     = time.time()-start
+    
+    # all routes at once
+    start        = time.time()
+    sourceRoute.computeAllRoutes()
+    computeAll   = time.time()-start
+    
+    # from the cache
+    start        = time.time()
+    for dest in destinations:
+        sourceRoute.getSourceRoute(dest)
+    cached       = time.time()-start
+    
+    assert sourceRoute.getStats()['misses']==0
+    
+    log.info("{0} motes: {1:.0f} lookups/s uncached, {2:.0f} lookups/s cached, all routes in {3:.3f}s".format(
+        NUM_BENCHMARK_MOTES,
+        NUM_BENCHMARK/max(uncached,1e-9),
+        NUM_BENCHMARK/max(cached,1e-9),
+        computeAll,
+    ))
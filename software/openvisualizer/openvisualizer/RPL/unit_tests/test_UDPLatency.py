@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # RPL/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import random
+
+import pytest
+
+import UDPLatency
+from openvisualizer.moteConnector import ParserData
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_UDPLatency.log'
+
+import logging
+log = logging.getLogger('test_UDPLatency')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_UDPLatency',
+                   'udpLatency',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+MOTE_A   = bytes(bytearray([0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]))
+MOTE_B   = bytes(bytearray([0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0b]))
+PARENT_1 = bytes(bytearray([0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]))
+PARENT_2 = bytes(bytearray([0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]))
+
+#============================ helpers =========================================
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 6000.0
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def udpLatency(request):
+    clock      = FakeClock()
+    udpLatency = UDPLatency.UDPLatency(network='test_UDPLatency',maxMotes=2,clock=clock)
+    udpLatency.fakeClock = clock
+    request.addfinalizer(udpLatency.close)
+    return udpLatency
+
+#============================ tests ===========================================
+
+def test_histogram():
+
+    histogram = UDPLatency.LatencyHistogram()
+    assert histogram.getStats()=={'min':None,'max':None,'avg':None,'p50':None,'p90':None,'p99':None}
+
+    for value in range(1,1001):
+        histogram.record(value)
+    stats     = histogram.getStats()
+    assert (stats['min'],stats['max'],stats['avg'])==(1,1000,500.5)
+    # within one bucket, 1/16, of the exact percentiles
+    for (percentile,exact) in [('p50',500),('p90',900),('p99',990)]:
+        assert exact<=stats[percentile]<=exact*17/16
+
+    # the small values are exact, the large ones bounded
+    histogram = UDPLatency.LatencyHistogram()
+    for value in [15,30,0x20000]:
+        histogram.record(value)
+    assert histogram.getPercentile(33)==15
+    assert histogram.getPercentile(66)==30
+    assert histogram.getPercentile(100)==0xffff
+    assert len(histogram.counts)==208
+
+def test_histogramBuckets():
+
+    histogram = UDPLatency.LatencyHistogram()
+    for value in range(0x10000):
+        index = histogram._index(value)
+        assert value<=histogram._highestValue(index)
+        assert value==0 or histogram._index(value-1)<=index
+
+def test_loss(udpLatency):
+
+    for SN in [1,2,5,5,4,6]:
+        udpLatency._latency_notif(MOTE_A,30,PARENT_1,SN)
+    stats = udpLatency.getLatencyStats()[MOTE_A]
+
+    # 3 and 4 were missing, 4 arrived late, the second 5 is a duplicate
+    assert stats['received']==5
+    assert stats['lost']==1
+    assert stats['duplicates']==1
+    assert stats['reordered']==1
+    assert abs(stats['plr']-100.0/6)<1e-9
+
+def test_sequenceWrap(udpLatency):
+
+    for SN in [0xfffe,0xffff,0,2]:
+        udpLatency._latency_notif(MOTE_A,30,PARENT_1,SN)
+    stats = udpLatency.getLatencyStats()[MOTE_A]
+    assert (stats['received'],stats['lost'],stats['reordered'])==(4,1,0)
+
+def test_sequenceReset(udpLatency):
+
+    # the mote rebooted after 102
+    for SN in [100,101,102,5,6,8]:
+        udpLatency._latency_notif(MOTE_A,30,PARENT_1,SN)
+    stats = udpLatency.getLatencyStats()[MOTE_A]
+    assert (stats['received'],stats['lost'],stats['reordered'],stats['duplicates'])==(6,1,0,0)
+
+def test_reorderedAcrossMinutes(udpLatency):
+
+    clock = udpLatency.fakeClock
+    # 2 is counted as lost when 3 arrives, and arrives a minute later
+    for SN in [1,3]:
+        udpLatency._latency_notif(MOTE_A,30,PARENT_1,SN)
+    clock.now += 60
+    udpLatency._latency_notif(MOTE_A,30,PARENT_1,4)
+    udpLatency._latency_notif(MOTE_A,30,PARENT_1,2)
+    # arrives again
+    udpLatency._latency_notif(MOTE_A,30,PARENT_1,2)
+
+    stats = udpLatency.getLatencyStats()[MOTE_A]
+    assert (stats['received'],stats['lost'],stats['reordered'],stats['duplicates'])==(4,0,1,1)
+    assert (stats['windows'][1]['received'],stats['windows'][1]['lost'])==(2,0)
+    assert (stats['windows'][5]['received'],stats['windows'][5]['lost'])==(4,0)
+
+def test_windows(udpLatency):
+
+    clock = udpLatency.fakeClock
+    # 300ms 10 minutes ago, 15ms 2 minutes ago, 45ms now
+    clock.now -= 600
+    udpLatency._latency_notif(MOTE_A,300,PARENT_1,1)
+    clock.now += 480
+    udpLatency._latency_notif(MOTE_A,15,PARENT_1,2)
+    clock.now += 120
+    udpLatency._latency_notif(MOTE_A,45,PARENT_2,5)
+
+    stats = udpLatency.getLatencyStats()[MOTE_A]
+    assert (stats['latency']['min'],stats['latency']['max'])==(15,300)
+    assert stats['windows'][1]['received']==1
+    assert stats['windows'][1]['lost']==2
+    assert stats['windows'][1]['p99']==45
+    assert stats['windows'][5]['received']==2
+    assert stats['windows'][5]['max']==45
+    assert stats['windows'][15]['received']==3
+    assert stats['parent']==PARENT_2
+    assert stats['parentSwitches']==2
+    assert stats['lastLatency']==45
+    assert stats['lastSeen']==clock.now
+
+    # the windows slide
+    clock.now += 20*60
+    stats = udpLatency.getLatencyStats()[MOTE_A]
+    assert stats['windows'][15]['received']==0
+    assert stats['windows'][15]['p50'] is None
+    assert stats['latency']['p50']==45
+
+def test_eviction(udpLatency):
+
+    udpLatency._latency_notif(MOTE_A,30,PARENT_1,1)
+    udpLatency._latency_notif(MOTE_B,30,PARENT_1,1)
+    udpLatency._latency_notif(MOTE_A,30,PARENT_1,2)
+    udpLatency._latency_notif(PARENT_2,30,PARENT_1,1)
+
+    # MOTE_B was the least recently heard
+    assert sorted(udpLatency.getLatencyStats().keys())==sorted([MOTE_A,PARENT_2])
+    assert udpLatency.getStats()=={'motes': 2, 'samples': 4, 'evicted': 1}
+
+def test_drain(udpLatency):
+
+    samples = ParserData.getLatencySamples('test_UDPLatency')
+    rand    = random.Random(5)
+    for SN in range(100):
+        samples.append((MOTE_A,rand.randint(15,150),PARENT_1,SN))
+    while udpLatency.getStats()['samples']<100:
+        udpLatency.closeEvent.wait(0.01)
+
+    stats   = udpLatency.getLatencyStats()[MOTE_A]
+    assert stats['received']==100
+    assert stats['lost']==0
+    assert 15<=stats['latency']['p50']<=stats['latency']['p99']<=150
+    assert ParserData.latencySamples is not samples
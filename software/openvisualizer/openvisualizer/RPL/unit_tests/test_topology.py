@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # RPL/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import random
+
+import pytest
+
+import topology
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_topology.log'
+
+import logging
+log = logging.getLogger('test_topology')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_topology',
+                   'topology',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+MOTE_A = [0xaa]*8
+MOTE_B = [0xbb]*8
+MOTE_C = [0xcc]*8
+MOTE_D = [0xdd]*8
+MOTE_E = [0xee]*8
+
+NUM_RANDOM_MOTES   = 30
+NUM_RANDOM_UPDATES = 2000
+
+#============================ helpers =========================================
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+def _newTopology(clock=None):
+    topo          = topology.topology(clock=clock or FakeClock(),expiryPeriod=None)
+    topo.notifs   = []
+    topo.dispatch = lambda signal,data: topo.notifs.append((signal,data))
+    return topo
+
+#============================ tests ===========================================
+
+def test_parentsChanged():
+
+    topo = _newTopology()
+
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A]))
+    topo.updateParents(None,'updateParents',(tuple(MOTE_C),[MOTE_B]))
+
+    assert topo.notifs==[
+        ('parentsChanged',[tuple(MOTE_B)]),
+        ('parentsChanged',[tuple(MOTE_C)]),
+    ]
+
+def test_parentsUnchanged():
+
+    topo = _newTopology()
+
+    # DAOs are sent periodically, most do not change anything
+    for _ in range(3):
+        topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A]))
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_C]))
+
+    assert topo.notifs==[
+        ('parentsChanged',[tuple(MOTE_B)]),
+        ('parentsChanged',[tuple(MOTE_B)]),
+    ]
+    assert topo.getParents(None,'getParents',None)=={tuple(MOTE_B): [MOTE_C]}
+
+def test_parentsChangedBatch():
+
+    topo = _newTopology()
+
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A]))
+    topo.updateParentsBatch(None,'updateParentsBatch',[
+        (tuple(MOTE_B),[MOTE_A]),           # unchanged
+        (tuple(MOTE_C),[MOTE_B],60),
+        (tuple(MOTE_D),[MOTE_C]),
+    ])
+
+    assert topo.notifs==[
+        ('parentsChanged',[tuple(MOTE_B)]),
+        ('parentsChanged',[tuple(MOTE_C),tuple(MOTE_D)]),
+    ]
+    assert topo.getDepth(MOTE_D)==3
+
+def test_dodag():
+    '''
+    This tests the following topology
+    
+    MOTE_A <- MOTE_B <- MOTE_C
+           <- MOTE_D
+    '''
+    
+    topo = _newTopology()
+    
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A]))
+    topo.updateParents(None,'updateParents',(tuple(MOTE_C),[MOTE_B,MOTE_D]))
+    topo.updateParents(None,'updateParents',(tuple(MOTE_D),[MOTE_A]))
+    
+    assert sorted(topo.getChildren(MOTE_A))==[tuple(MOTE_B),tuple(MOTE_D)]
+    assert topo.getChildren(MOTE_B)==[tuple(MOTE_C)]
+    assert topo.getChildren(MOTE_C)==[]
+    assert topo.getDepth(MOTE_A)==0
+    assert topo.getDepth(MOTE_C)==2
+    assert topo.getDepth(MOTE_E)==None
+    assert topo.getSubtreeSize(MOTE_A)==4
+    assert topo.getSubtreeSize(MOTE_B)==2
+    assert topo.getSubtreeSize(MOTE_E)==None
+    assert topo.getRoots()==[tuple(MOTE_A)]
+    assert topo.getOrphans()==[]
+    
+    # MOTE_C switches to its second parent
+    topo.updateParents(None,'updateParents',(tuple(MOTE_C),[MOTE_D,MOTE_B]))
+    assert topo.getChildren(MOTE_B)==[]
+    assert topo.getChildren(MOTE_D)==[tuple(MOTE_C)]
+    assert topo.getSubtreeSize(MOTE_A)==4
+    assert topo.getSubtreeSize(MOTE_B)==1
+    assert topo.getSubtreeSize(MOTE_D)==2
+    
+    # MOTE_B and MOTE_E join through a mote which has not sent a DAO yet
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_E]))
+    assert sorted(topo.getRoots())==[tuple(MOTE_A),tuple(MOTE_E)]
+    assert topo.getOrphans(tuple(MOTE_A))==[tuple(MOTE_B)]
+    assert topo.getSubtreeSize(MOTE_A)==3
+
+def test_dodagLoop():
+    
+    topo = _newTopology()
+    
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A]))
+    topo.updateParents(None,'updateParents',(tuple(MOTE_C),[MOTE_B]))
+    topo.updateParents(None,'updateParents',(tuple(MOTE_D),[MOTE_C]))
+    
+    # MOTE_B picks a parent in its own subtree
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_D]))
+    assert sorted(topo.getOrphans())==[tuple(MOTE_B),tuple(MOTE_C),tuple(MOTE_D)]
+    assert topo.getDepth(MOTE_C)==None
+    assert topo.getSubtreeSize(MOTE_C)==None
+    
+    # the loop is broken
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A]))
+    assert topo.getOrphans()==[]
+    assert topo.getDepth(MOTE_D)==3
+    assert topo.getSubtreeSize(MOTE_A)==4
+
+def test_dodagIncremental():
+    '''
+    Check the subtree sizes maintained incrementally against sizes computed
+    from scratch, over random updates.
+    '''
+    
+    rand  = random.Random(3)
+    motes = [[0x14,0x15,0x92,0x00,0x00,0x00,0x00,i] for i in range(NUM_RANDOM_MOTES)]
+    topo  = _newTopology()
+    
+    for _ in range(NUM_RANDOM_UPDATES):
+        node = tuple(motes[rand.randint(1,NUM_RANDOM_MOTES-1)])
+        if rand.random()<0.05:
+            # leave
+            with topo.dataLock:
+                if node in topo.parents:
+                    topo._setParents(node,None)
+        else:
+            parents = [motes[rand.randint(0,NUM_RANDOM_MOTES-1)] for _ in range(rand.randint(1,2))]
+            topo.updateParents(None,'updateParents',(node,parents))
+        
+        incremental = dict(topo.subtreeSize)
+        with topo.dataLock:
+            topo._recomputeSubtreeSizes()
+        assert incremental==topo.subtreeSize
+
+def test_getDAGCache():
+    
+    topo = _newTopology()
+    
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A]))
+    version = topo.getVersion()
+    dag     = topo.getDAG()
+    assert topo.getDAG() is dag
+    
+    # no change
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A]))
+    assert topo.getVersion()==version
+    assert topo.getDAG() is dag
+    
+    topo.updateParents(None,'updateParents',(tuple(MOTE_C),[MOTE_A]))
+    assert topo.getVersion()==version+1
+    (states,edges) = topo.getDAG()
+    assert sorted([s['id'] for s in states])==['AAAA','BBBB','CCCC']
+    assert len(edges)==2
+
+def test_timerWheel():
+    
+    wheel = topology.TimerWheel(8,1,0)
+    
+    wheel.schedule('a',3,0)
+    wheel.schedule('b',3.5,0)
+    wheel.schedule('c',20,0)     # more than a turn of the wheel
+    assert wheel.advance(2)==[]
+    assert wheel.advance(3)==['a']
+    assert wheel.advance(3.9)==[]
+    
+    # re-arming replaces the previous timer
+    wheel.schedule('b',10,3.9)
+    assert wheel.advance(8)==[]
+    assert len(wheel)==2
+    
+    # jumping more than a turn of the wheel
+    assert sorted(wheel.advance(100))==['b','c']
+    assert len(wheel)==0
+
+def test_expiry():
+    
+    clock = FakeClock()
+    topo  = _newTopology(clock)
+    
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A],60))
+    topo.updateParents(None,'updateParents',(tuple(MOTE_C),[MOTE_B],60))
+    topo.updateParents(None,'updateParents',(tuple(MOTE_D),[MOTE_A],None))
+    del topo.notifs[:]
+    
+    # MOTE_C refreshes its entry, MOTE_B does not
+    clock.now += 30
+    topo.updateParents(None,'updateParents',(tuple(MOTE_C),[MOTE_B],60))
+    clock.now += 30
+    topo.expireParents()
+    assert topo.notifs==[('parentsChanged',[tuple(MOTE_B)])]
+    assert sorted(topo.getParents(None,'getParents',None).keys())==[tuple(MOTE_C),tuple(MOTE_D)]
+    assert topo.getSubtreeSize(MOTE_A)==2
+    
+    # MOTE_D never expires
+    clock.now += 1000
+    topo.expireParents()
+    assert topo.getParents(None,'getParents',None).keys()==[tuple(MOTE_D)]
+    assert topo.getExpiryStats()=={'expired': 2, 'refreshed': 1, 'noPath': 0, 'timers': 0}
+
+def test_noPath():
+    
+    topo = _newTopology()
+    
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A],60))
+    topo.updateParents(None,'updateParents',(tuple(MOTE_B),[MOTE_A],0))
+    
+    assert topo.getParents(None,'getParents',None)=={}
+    assert topo.notifs==[
+        ('parentsChanged',[tuple(MOTE_B)]),
+        ('parentsChanged',[tuple(MOTE_B)]),
+    ]
+    assert topo.getExpiryStats()=={'expired': 0, 'refreshed': 0, 'noPath': 1, 'timers': 0}
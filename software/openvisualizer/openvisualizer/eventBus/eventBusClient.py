@@ -9,10 +9,115 @@ log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
 import threading
+import weakref
 import Queue
 
 from pydispatch import dispatcher
 
+#============================ networks ========================================
+
+class NetworkBus(object):
+    '''
+    The event bus of a network, shared by the eventBusClients created with
+    its name.
+
+    Each network has its own lock and its own list of clients, so the
+    pipelines of independent networks never contend with each other, nor
+    with the global dispatcher. Like the global dispatcher, the bus only
+    holds weak references to its clients.
+    '''
+
+    def __init__(self,name):
+
+        # store params
+        self.name            = name
+
+        # local variables
+        self.busLock         = threading.Lock()
+        self.clients         = []    # weak references to the clients
+        self.numSignals      = {}    # signal, or protocol of tuple signals -> number dispatched
+
+    #======================== public ==========================================
+
+    def join(self,client):
+        with self.busLock:
+            self.clients    += [weakref.ref(client)]
+
+    def leave(self,client):
+        with self.busLock:
+            self.clients     = [ref for ref in self.clients if ref() not in [None,client]]
+
+    def send(self,sender,signal,data):
+        '''
+        Notifies all the clients of the network, in the order they joined.
+
+        :returns: A list of (receiver,returnVal) tuples, as dispatcher.send().
+        '''
+        if type(signal)==tuple:
+            key = signal[1]
+        else:
+            key = signal
+
+        with self.busLock:
+            self.numSignals[key] = self.numSignals.get(key,0)+1
+            clients          = self.clients[:]
+
+        returnVal            = []
+        numDead              = 0
+        for ref in clients:
+            client           = ref()
+            if client is None:
+                numDead     += 1
+                continue
+            returnVal       += [(
+                client._eventBusNotification,
+                client._eventBusNotification(signal=signal,sender=sender,data=data),
+            )]
+
+        # forget the clients which were garbage collected
+        if numDead:
+            with self.busLock:
+                self.clients = [ref for ref in self.clients if ref() is not None]
+
+        return returnVal
+
+    def getStats(self):
+        '''
+        :returns: A dictionary with the number of 'clients' of the network,
+            and the number of notifications dispatched per signal
+            ('signals'), tuple signals being counted per protocol.
+        '''
+        with self.busLock:
+            return {
+                'clients':   len([ref for ref in self.clients if ref() is not None]),
+                'signals':   dict(self.numSignals),
+            }
+
+_networks      = {}      # name -> NetworkBus
+_networksLock  = threading.Lock()
+
+def getNetwork(name):
+    '''
+    :returns: The NetworkBus of a network, created on first use.
+    '''
+    with _networksLock:
+        if name not in _networks:
+            _networks[name] = NetworkBus(name)
+        return _networks[name]
+
+def closeNetwork(name):
+    '''
+    Disconnects all the clients of a network. A new bus is created if the
+    network is used again.
+    '''
+    with _networksLock:
+        bus = _networks.pop(name,None)
+    if bus:
+        with bus.busLock:
+            bus.clients = []
+
+#============================ clients =========================================
+
 class eventBusClient(object):
     
     WILDCARD  = '*'
@@ -24,7 +129,16 @@ class eventBusClient(object):
         PROTO_UDP
     ]
     
-    def __init__(self,name,registrations):
+    def __init__(self,name,registrations,network=None):
+        '''
+        :param name:          [in] The name of the client, the sender of
+            the notifications it dispatches.
+        :param registrations: [in] A list of dictionaries with the
+            'sender', 'signal' and 'callback' of each registration.
+        :param network:       [in] The name of the network the client is
+            connected to, see getNetwork(). If None, the client is connected
+            to the global dispatcher.
+        '''
         
         assert type(name)==str
         assert type(registrations)==list
@@ -45,6 +159,11 @@ class eventBusClient(object):
         
         # local variables
         self.goOn            = True
+        self.network         = network
+        if network is None:
+            self.networkBus  = None
+        else:
+            self.networkBus  = getNetwork(network)
         
         # register registrations
         for r in registrations:
@@ -54,14 +173,23 @@ class eventBusClient(object):
                 callback     = r['callback'],
             )
         
-        # connect to dispatcher
-        dispatcher.connect(
-            receiver = self._eventBusNotification,
-        )
+        # connect to dispatcher, or to the bus of the network
+        if self.networkBus is None:
+            dispatcher.connect(
+                receiver = self._eventBusNotification,
+            )
+        else:
+            self.networkBus.join(self)
     
     #======================== public ==========================================
     
     def dispatch(self,signal,data):
+        if self.networkBus is not None:
+            return self.networkBus.send(
+                sender = self.name,
+                signal = signal,
+                data   = data,
+            )
         return dispatcher.send(
             sender = self.name,
             signal = signal,
@@ -147,10 +275,9 @@ class eventBusClient(object):
         elif type(s1)==type(s2)==tuple:
             assert len(s1)==len(s2)==3
             for i in range(3):
-                if (s1[i]==s2[i]) or (s1[i]==self.WILDCARD) or (s2[i]==self.WILDCARD):
-                    return True
-                else:
+                if not ((s1[i]==s2[i]) or (s1[i]==self.WILDCARD) or (s2[i]==self.WILDCARD)):
                     return False
+            return True
         return False
     
     
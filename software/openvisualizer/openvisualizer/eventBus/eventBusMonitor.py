@@ -17,6 +17,7 @@ import openvisualizer.openvisualizer_utils as u
 
 from pydispatch import dispatcher
 from openvisualizer.openTun    import openTun
+import pcapngWriter
 
 class eventBusMonitor(object):
     
@@ -32,7 +33,9 @@ class eventBusMonitor(object):
         self.stats                     = {}
         self.wiresharkDebugEnabled     = False
         self.dagRootEui64              = [0x00]*8
+        self.dagRootPorts              = {}       # serial port -> DAGroot EUI64
         self.simMode                   = False
+        self.pcapWriter                = None
         
         # give this instance a name
         self.name                      = 'eventBusMonitor'
@@ -74,6 +77,44 @@ class eventBusMonitor(object):
         log.info('%s export of ZEP mesh debug packets to Internet',
                 'Enabled' if self.wiresharkDebugEnabled else 'Disabled')
     
+    def setPcapFile(self,filename,**kwargs):
+        '''
+        Turns on/off the capture of the mesh frames to a pcapng file, with the
+        802.15.4 link type. Unlike the Wireshark debug, this does not go
+        through the Internet interface.
+        
+        :param filename: [in] The name of the file to write to, or None to
+            stop the capture.
+        :param kwargs:   [in] Rotation settings, passed to the
+            pcapngWriter.PcapngWriter.
+        '''
+        with self.dataLock:
+            oldWriter       = self.pcapWriter
+            self.pcapWriter = None
+            if filename:
+                self.pcapWriter = pcapngWriter.PcapngWriter(
+                    filename,
+                    formatFrame = self._formatPcapFrame,
+                    **kwargs
+                )
+        if oldWriter:
+            oldWriter.close()
+        log.info('%s capture of mesh frames to %s',
+                'Enabled' if filename else 'Disabled', filename)
+    
+    def getPcapStats(self):
+        '''
+        :returns: The statistics of the pcapng capture, or None if it is
+            disabled.
+        '''
+        pcapWriter = self.pcapWriter
+        if pcapWriter:
+            return pcapWriter.getStats()
+        return None
+    
+    def close(self):
+        self.setPcapFile(None)
+    
     #======================== private =========================================
     
     def _eventBusNotification(self,signal,sender,data):
@@ -87,13 +128,35 @@ class eventBusMonitor(object):
                 self.stats[key] = 0
             self.stats[key] += 1
         
-        if signal=='infoDagRoot' and data['isDAGroot']==1:
-            self.dagRootEui64 = data['eui64'][:]
+        if signal=='infoDagRoot':
+            if data['isDAGroot']==1:
+                self.dagRootEui64 = data['eui64'][:]
+                self.dagRootPorts[data.get('serialPort')] = data['eui64'][:]
+            else:
+                self.dagRootPorts.pop(data.get('serialPort'),None)
         
         if signal=='wirelessTxStart':
             # this signal only exists is simulation mode
             self.simMode = True
         
+        pcapWriter = self.pcapWriter
+        if pcapWriter:
+            # one queue put per frame, the frame is built by the writer thread
+            if self.simMode:
+                if signal=='wirelessTxStart':
+                    (moteId,frame,frequency) = data
+                    pcapWriter.write(('body',frame[1:-2]))
+            else:
+                if signal=='fromMote.data':
+                    (previousHop,lowpan) = data
+                    pcapWriter.write(('mac',previousHop,self._getDagRoot(sender),lowpan))
+                if signal=='sniffedPacketMerged':
+                    (timestamp,port,channel,frame) = data
+                    pcapWriter.write(('body',frame[0:-3]),timestamp)
+                if signal=='bytesToMesh':
+                    (nextHop,lowpan) = data[:2]
+                    pcapWriter.write(('mac',self._getSendingDagRoot(data),nextHop,lowpan))
+        
         if self.wiresharkDebugEnabled:
             
             if self.simMode:
@@ -136,15 +199,17 @@ class eventBusMonitor(object):
                     
                     zep = self._wrapMacAndZep(
                         previousHop  = previousHop,
-                        nextHop      = self.dagRootEui64,
+                        nextHop      = self._getDagRoot(sender),
                         lowpan       = lowpan,
                     )
                     self._dispatchMeshDebugPacket(zep)
 
-                if signal=='fromMote.sniffedPacket':
-                    body      = data[0:-3]
-                    crc       = data[-3:-1]
-                    frequency = data[-1]
+                if signal=='sniffedPacketMerged':
+                    # the sniffed frames of all the sniffer motes, merged by
+                    # the snifferMerger
+                    (timestamp,port,frequency,frame) = data
+                    body      = frame[0:-3]
+                    crc       = frame[-3:-1]
 
                     # wrap with zep header
                     zep   = self._wrapZepCrc(body,frequency)
@@ -153,10 +218,10 @@ class eventBusMonitor(object):
                 if signal=='bytesToMesh':
                     # Forwards a copy of the 6LoWPAN packet destined for the mesh 
                     # to the tun interface for debugging.
-                    (nextHop,lowpan) = data
+                    (nextHop,lowpan) = data[:2]
                     
                     zep = self._wrapMacAndZep(
-                        previousHop  = self.dagRootEui64,
+                        previousHop  = self._getSendingDagRoot(data),
                         nextHop      = nextHop,
                         lowpan       = lowpan,
                     )
@@ -164,16 +229,30 @@ class eventBusMonitor(object):
         
         
         
+    def _getDagRoot(self, sender):
+        '''
+        Returns the DAGroot which received a 'fromMote.data' notification,
+        from its sender, 'moteConnector@<serial port>'.
+        '''
+        port = sender.split('@',1)[-1] if isinstance(sender,str) else None
+        return self.dagRootPorts.get(port,self.dagRootEui64)
+    
+    def _getSendingDagRoot(self, data):
+        '''
+        Returns the DAGroot which sends a 'bytesToMesh' packet, the third
+        element of the data, if present.
+        '''
+        if len(data)>2:
+            return list(data[2])
+        return self.dagRootEui64
+    
     def _wrapMacAndZep(self, previousHop, nextHop, lowpan):
         '''
         Returns Exegin ZEP protocol header and dummy 802.15.4 header 
         wrapped around outgoing 6LoWPAN layer packet.
         '''
         
-        phop   = previousHop[:]
-        phop.reverse()
-        nhop   = nextHop[:]
-        nhop.reverse()
+        mac    = self._wrapMac(previousHop, nextHop, lowpan)
         
         # ZEP
         zep    = [ord('E'),ord('X')]   # Protocol ID String
@@ -186,7 +265,20 @@ class eventBusMonitor(object):
         zep   += [0x01]*8              # timestamp
         zep   += [0x02]*4              # sequence number
         zep   += [0x00]*10             # reserved
-        zep   += [21+len(lowpan)+2]    # length
+        zep   += [len(mac)]            # length
+        
+        return zep+mac
+    
+    def _wrapMac(self, previousHop, nextHop, lowpan):
+        '''
+        Returns dummy 802.15.4 header and FCS wrapped around 6LoWPAN layer
+        packet.
+        '''
+        
+        phop   = previousHop[:]
+        phop.reverse()
+        nhop   = nextHop[:]
+        nhop.reverse()
         
         # IEEE802.15.4                 (data frame with dummy values)
         mac    = [0x41,0xcc]           # frame control
@@ -198,7 +290,21 @@ class eventBusMonitor(object):
         # CRC
         mac   += u.calculateFCS(mac)
         
-        return zep+mac
+        return mac
+    
+    def _formatPcapFrame(self, record):
+        '''
+        Returns the 802.15.4 frame for a record queued to the pcapngWriter:
+        either ('mac',previousHop,nextHop,lowpan), or ('body',body) for a
+        frame of which only the FCS is missing.
+        '''
+        
+        if record[0]=='mac':
+            (_,previousHop,nextHop,lowpan) = record
+            return self._wrapMac(list(previousHop), list(nextHop), list(lowpan))
+        else:
+            body   = list(record[1])
+            return body+u.calculateFCS(body)
     
     def _wrapZepCrc(self, body, frequency):
         
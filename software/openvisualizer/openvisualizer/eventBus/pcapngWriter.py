@@ -0,0 +1,265 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Writes IEEE802.15.4 frames to pcapng files, which Wireshark opens directly.
+See http://www.tcpdump.org/linktypes.html and
+https://github.com/pcapng/pcapng for the file format.
+'''
+import logging
+log = logging.getLogger('pcapngWriter')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import os
+import Queue
+import struct
+import threading
+import time
+
+#============================ defines =========================================
+
+LINKTYPE_IEEE802_15_4_WITHFCS = 195
+
+BLOCK_SHB                     = 0x0A0D0D0A # Section Header Block
+BLOCK_IDB                     = 0x00000001 # Interface Description Block
+BLOCK_EPB                     = 0x00000006 # Enhanced Packet Block
+BYTE_ORDER_MAGIC              = 0x1A2B3C4D
+SNAPLEN                       = 0          # no limit
+
+#============================ functions =======================================
+
+def _block(blockType,body):
+    '''
+    Wraps the body of a block with its type and (repeated) total length,
+    padding the body to 32 bits.
+    '''
+    body      += '\x00'*(-len(body)%4)
+    totalLen   = 12+len(body)
+    return struct.pack('<II',blockType,totalLen)+body+struct.pack('<I',totalLen)
+
+def fileHeader():
+    '''
+    :returns: The Section Header Block and the Interface Description Block
+        which start each file, as a string.
+    '''
+    shb = _block(BLOCK_SHB,struct.pack('<IHHq',BYTE_ORDER_MAGIC,1,0,-1))
+    # timestamps are in microseconds, the default resolution
+    idb = _block(BLOCK_IDB,struct.pack('<HHI',LINKTYPE_IEEE802_15_4_WITHFCS,0,SNAPLEN))
+    return shb+idb
+
+def packetBlock(timestamp,frame):
+    '''
+    :param timestamp: [in] The capture time, in seconds since the epoch.
+    :param frame:     [in] The 802.15.4 frame, FCS included, as a list of
+        bytes, a bytearray or a string.
+
+    :returns: The Enhanced Packet Block, as a string.
+    '''
+    frame = str(bytearray(frame))
+    ts    = int(timestamp*1e6)
+    return _block(
+        BLOCK_EPB,
+        struct.pack('<IIIII',0,ts>>32,ts&0xffffffff,len(frame),len(frame))+frame,
+    )
+
+#============================ classes =========================================
+
+class PcapngWriter(threading.Thread):
+    '''
+    Thread writing frames to a pcapng file.
+
+    Callers only put the frame on a queue; formatting and buffered writes
+    happen in this thread. The file is rotated, the same way as the
+    logging.handlers.RotatingFileHandler, when it grows larger than
+    maxBytes or older than maxSeconds.
+    '''
+
+    # maximum size of a file before it is rotated
+    MAX_BYTES                = 10*1024*1024
+    # maximum number of seconds a file is written to before it is rotated
+    MAX_SECONDS              = 3600
+    # number of rotated files kept
+    BACKUP_COUNT             = 5
+    # maximum number of frames waiting to be written
+    MAX_QUEUE                = 10000
+    # maximum number of frames written at once
+    MAX_BATCH                = 256
+
+    def __init__(self,filename,formatFrame=None,maxBytes=MAX_BYTES,maxSeconds=MAX_SECONDS,
+            backupCount=BACKUP_COUNT,maxQueue=MAX_QUEUE,clock=time.time):
+        '''
+        :param filename:    [in] The name of the file to write to.
+        :param formatFrame: [in] A function which, given a record passed to
+            write(), returns the 802.15.4 frame, FCS included, or None to
+            skip it. By default, records are frames already.
+        :param maxBytes:    [in] Size, in bytes, above which the file is
+            rotated, or None.
+        :param maxSeconds:  [in] Age, in seconds, above which the file is
+            rotated, or None.
+        :param backupCount: [in] Number of rotated files kept.
+        :param maxQueue:    [in] Maximum number of frames waiting to be
+            written; frames are dropped when the queue is full.
+        :param clock:       [in] Function returning the current time, in
+            seconds.
+        '''
+
+        # store params
+        self.filename             = filename
+        self.formatFrame          = formatFrame or (lambda record: record)
+        self.maxBytes             = maxBytes
+        self.maxSeconds           = maxSeconds
+        self.backupCount          = backupCount
+        self.clock                = clock
+
+        # local variables
+        self.queue                = Queue.Queue(maxQueue)
+        self.dataLock             = threading.Lock()
+        self.file                 = None
+        self.fileBytes            = 0
+        self.fileOpened           = None
+        self.numFrames            = 0
+        self.numDropped           = 0
+        self.numBytes             = 0
+        self.numFiles             = 0
+        self.goOn                 = True
+
+        # initialize the parent class
+        threading.Thread.__init__(self)
+
+        # give this thread a name
+        self.name                 = 'pcapngWriter'
+        self.daemon               = True
+
+        # start myself
+        self.start()
+
+    #======================== thread ==========================================
+
+    def run(self):
+        try:
+            while self.goOn:
+                records = [self.queue.get()]
+                try:
+                    while len(records)<self.MAX_BATCH and records[-1] is not None:
+                        records += [self.queue.get_nowait()]
+                except Queue.Empty:
+                    pass
+                if records[-1] is None:
+                    # close() was called, write what was queued before
+                    records.pop()
+                    self.goOn = False
+                self._writeRecords(records)
+        except Exception as err:
+            log.critical('pcapngWriter crashed: {0}'.format(err))
+        finally:
+            self._closeFile()
+
+    #======================== public ==========================================
+
+    def write(self,record,timestamp=None):
+        '''
+        Queues a frame to be written. Does not block: the frame is dropped if
+        the queue is full.
+
+        :param record:    [in] The frame, or the data formatFrame turns into
+            one.
+        :param timestamp: [in] The capture time, by default now.
+        '''
+        if timestamp is None:
+            timestamp = self.clock()
+        try:
+            self.queue.put_nowait((timestamp,record))
+        except Queue.Full:
+            with self.dataLock:
+                self.numDropped  += 1
+
+    def close(self):
+        '''
+        Writes the frames queued so far, then closes the file.
+        '''
+        if self.isAlive():
+            # blocks until the thread makes room, if the queue is full
+            self.queue.put(None)
+            self.join()
+
+    def getStats(self):
+        '''
+        :returns: A dictionary with the number of 'frames' and 'bytes'
+            written, of frames 'dropped' because the queue was full, and of
+            'files' opened.
+        '''
+        with self.dataLock:
+            return {
+                'frames':  self.numFrames,
+                'bytes':   self.numBytes,
+                'dropped': self.numDropped,
+                'files':   self.numFiles,
+            }
+
+    #======================== private =========================================
+
+    def _writeRecords(self,records):
+        blocks = []
+        for (timestamp,data) in records:
+            try:
+                frame = self.formatFrame(data)
+            except Exception as err:
+                log.error('cannot format frame {0}: {1}'.format(data,err))
+                continue
+            if frame is None:
+                continue
+            blocks += [packetBlock(timestamp,frame)]
+        if not blocks:
+            return
+
+        self._rotateIfNeeded()
+        output = ''.join(blocks)
+        self.file.write(output)
+        self.file.flush()
+        self.fileBytes           += len(output)
+        with self.dataLock:
+            self.numFrames       += len(blocks)
+            self.numBytes        += len(output)
+
+    def _rotateIfNeeded(self):
+        if self.file is not None:
+            if self.maxBytes is not None and self.fileBytes>=self.maxBytes:
+                self._rotate()
+            elif self.maxSeconds is not None and self.clock()-self.fileOpened>=self.maxSeconds:
+                self._rotate()
+        if self.file is None:
+            self._openFile()
+
+    def _rotate(self):
+        self._closeFile()
+        if self.backupCount>0:
+            for i in range(self.backupCount-1,0,-1):
+                src = '{0}.{1}'.format(self.filename,i)
+                dst = '{0}.{1}'.format(self.filename,i+1)
+                if os.path.exists(src):
+                    if os.path.exists(dst):
+                        os.remove(dst)
+                    os.rename(src,dst)
+            dst = '{0}.1'.format(self.filename)
+            if os.path.exists(dst):
+                os.remove(dst)
+            os.rename(self.filename,dst)
+        log.info('rotated {0}'.format(self.filename))
+
+    def _openFile(self):
+        self.file                 = open(self.filename,'wb')
+        header                    = fileHeader()
+        self.file.write(header)
+        self.fileBytes            = len(header)
+        self.fileOpened           = self.clock()
+        with self.dataLock:
+            self.numFiles        += 1
+            self.numBytes        += len(header)
+
+    def _closeFile(self):
+        if self.file is not None:
+            self.file.close()
+            self.file             = None
@@ -0,0 +1,218 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Merges the frames captured by several sniffer motes, typically one per
+channel, into a single stream.
+'''
+import logging
+log = logging.getLogger('snifferMerger')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import collections
+import heapq
+import threading
+import time
+
+import eventBusClient
+
+class SnifferMerger(eventBusClient.eventBusClient):
+    '''
+    Merges the 'fromMote.sniffedPacket' notifications of all the sniffer
+    motes.
+
+    Each frame is tagged with the serial port of the sniffer, its channel
+    (the trailing frequency byte) and its receive timestamp, and is held in
+    a heap for reorderWindow seconds, so the frames the serial port threads
+    deliver out of order are released in timestamp order. A frame
+    identical to one received on the same channel less than dedupWindow
+    seconds before, i.e. heard by several sniffers, is dropped.
+
+    The merged frames are dispatched as 'sniffedPacketMerged', with data
+    (timestamp,port,channel,frame), frame being the data of the original
+    notification.
+    '''
+
+    # number of seconds a frame is held to reorder the streams
+    REORDER_WINDOW            = 0.050
+    # number of seconds during which identical frames are duplicates
+    DEDUP_WINDOW              = 0.200
+
+    def __init__(self,reorderWindow=REORDER_WINDOW,dedupWindow=DEDUP_WINDOW,
+            autoRelease=True,clock=time.time):
+        '''
+        :param reorderWindow: [in] Number of seconds a frame is held.
+        :param dedupWindow:   [in] Number of seconds during which a frame
+            identical to a previous one is dropped.
+        :param autoRelease:   [in] Whether a thread releases the frames, or
+            the caller calls release().
+        :param clock:         [in] Function returning the current time, in
+            seconds.
+        '''
+
+        # store params
+        self.reorderWindow        = reorderWindow
+        self.dedupWindow          = dedupWindow
+        self.clock                = clock
+
+        # log
+        log.info("create instance")
+
+        # initialize parent class
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'snifferMerger',
+            registrations         = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'fromMote.sniffedPacket',
+                    'callback'    : self._sniffedPacket_notif,
+                },
+            ]
+        )
+
+        # local variables
+        self.mergeLock            = threading.Condition()
+        self.heap                 = []    # (timestamp,seqNum,port,channel,frame)
+        self.seqNum               = 0
+        self.lastSeen             = {}    # (channel,frame) -> timestamp
+        self.seenOrder            = collections.deque() # (timestamp,(channel,frame))
+        self.lastReleased         = None
+        self.numFrames            = 0
+        self.numDuplicates        = 0
+        self.numReleased          = 0
+        self.numLate              = 0
+        self.portFrames           = {}    # port -> number of frames
+
+        # start the release thread
+        if autoRelease:
+            self.releaseThread        = threading.Thread(target=self._runRelease)
+            self.releaseThread.name   = 'snifferMerger'
+            self.releaseThread.daemon = True
+            self.releaseThread.start()
+
+    #======================== public ==========================================
+
+    def close(self):
+        self.goOn = False
+        with self.mergeLock:
+            self.mergeLock.notify()
+
+    def addFrame(self,port,frame,timestamp=None):
+        '''
+        Adds a sniffed frame to the merge.
+
+        :param port:      [in] The serial port of the sniffer mote.
+        :param frame:     [in] The frame, followed by its CRC and the
+            frequency byte.
+        :param timestamp: [in] The receive timestamp, by default now.
+
+        :returns: True if the frame was added, False if it is a duplicate.
+        '''
+        if timestamp is None:
+            timestamp = self.clock()
+        channel = frame[-1]
+        key     = (channel,str(bytearray(frame[:-1])))
+
+        with self.mergeLock:
+            self.numFrames              += 1
+            self.portFrames[port]        = self.portFrames.get(port,0)+1
+
+            # forget the frames older than the dedup window
+            while self.seenOrder and self.seenOrder[0][0]<=timestamp-self.dedupWindow:
+                (seen,oldKey) = self.seenOrder.popleft()
+                if self.lastSeen.get(oldKey)==seen:
+                    del self.lastSeen[oldKey]
+
+            if key in self.lastSeen:
+                self.numDuplicates      += 1
+                return False
+            self.lastSeen[key]           = timestamp
+            self.seenOrder.append((timestamp,key))
+
+            heapq.heappush(self.heap,(timestamp,self.seqNum,port,channel,frame))
+            if self.heap[0][1]==self.seqNum:
+                # oldest frame, wake up the release thread to re-arm its timer
+                self.mergeLock.notify()
+            self.seqNum                 += 1
+        return True
+
+    def release(self,now=None):
+        '''
+        Dispatches the frames held for longer than the reorder window.
+
+        :param now: [in] The current time, by default the clock's. Use
+            float('inf') to release all the frames.
+
+        :returns: The number of frames released.
+        '''
+        if now is None:
+            now = self.clock()
+        with self.mergeLock:
+            frames = self._popDue(now)
+
+        for (timestamp,_,port,channel,frame) in frames:
+            self.dispatch(
+                signal          = 'sniffedPacketMerged',
+                data            = (timestamp,port,channel,frame),
+            )
+        return len(frames)
+
+    def getStats(self):
+        '''
+        :returns: A dictionary with the number of 'frames' received, of
+            'duplicates' dropped, of frames 'released', of frames released
+            'late', i.e. after a more recent one because they were delayed
+            more than the reorder window, of frames 'pending' and of frames
+            received per port ('ports').
+        '''
+        with self.mergeLock:
+            return {
+                'frames':     self.numFrames,
+                'duplicates': self.numDuplicates,
+                'released':   self.numReleased,
+                'late':       self.numLate,
+                'pending':    len(self.heap),
+                'ports':      dict(self.portFrames),
+            }
+
+    #======================== private =========================================
+
+    def _sniffedPacket_notif(self,sender,signal,data):
+        # the sender is the moteConnector of the sniffer, 'moteConnector@<port>'
+        port = sender.split('@',1)[-1]
+        self.addFrame(port,data)
+
+    def _popDue(self,now):
+        '''
+        Expects mergeLock to be held.
+        '''
+        frames = []
+        while self.heap and self.heap[0][0]<=now-self.reorderWindow:
+            entry = heapq.heappop(self.heap)
+            if self.lastReleased is not None and entry[0]<self.lastReleased:
+                self.numLate    += 1
+            else:
+                self.lastReleased = entry[0]
+            frames += [entry]
+        self.numReleased        += len(frames)
+        return frames
+
+    def _runRelease(self):
+        while self.goOn:
+            with self.mergeLock:
+                if self.heap:
+                    timeout = self.heap[0][0]+self.reorderWindow-self.clock()
+                else:
+                    timeout = None
+                if timeout is None or timeout>0:
+                    self.mergeLock.wait(timeout)
+            if not self.goOn:
+                break
+            try:
+                self.release()
+            except Exception as err:
+                log.critical('could not release sniffed frames: {0}'.format(err))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # eventBus/
+sys.path.insert(0, os.path.join(here, '..', 'PyDispatcher-2.0.3'))             # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import json
+
+import pytest
+
+import eventBusClient
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_eventBusClient.log'
+
+import logging
+log = logging.getLogger('test_eventBusClient')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_eventBusClient',
+                   'eventBusClient',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+ADDR_A = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]
+ADDR_B = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0b]
+
+#============================ fixtures ========================================
+
+#===== expectedSignalsEquivalent
+
+EXPECTEDSIGNALSEQUIVALENT = [
+    #           s1                            s2                            equivalent
+    json.dumps(('networkPrefix',              'networkPrefix',              True)),
+    json.dumps(('networkPrefix',              '*',                          True)),
+    json.dumps(('networkPrefix',              'infoDagRoot',                False)),
+    json.dumps(([ADDR_A,'udp',[0x16,0x33]],   [ADDR_A,'udp',[0x16,0x33]],   True)),
+    json.dumps((['*','udp',[0x16,0x33]],      [ADDR_A,'udp',[0x16,0x33]],   True)),
+    json.dumps(([ADDR_A,'udp','*'],           [ADDR_A,'udp',[0x16,0x33]],   True)),
+    # all the fields must match, not only the address
+    json.dumps(([ADDR_A,'udp',[0x16,0x33]],   [ADDR_A,'udp',[0xf0,0xb1]],   False)),
+    json.dumps(([ADDR_A,'udp',[0x16,0x33]],   [ADDR_A,'icmpv6',[0x16,0x33]],False)),
+    json.dumps(([ADDR_A,'udp',[0x16,0x33]],   [ADDR_B,'udp',[0x16,0x33]],   False)),
+    json.dumps((['*','udp',[0x16,0x33]],      'udp',                        False)),
+]
+
+@pytest.fixture(params=EXPECTEDSIGNALSEQUIVALENT)
+def expectedSignalsEquivalent(request):
+    return request.param
+
+#============================ helpers =========================================
+
+def _signal(s):
+    # JSON turns the tuples into lists
+    if isinstance(s,list):
+        return tuple([tuple(f) if isinstance(f,list) else str(f) for f in s])
+    return str(s)
+
+#============================ tests ===========================================
+
+def test_signalsEquivalent(expectedSignalsEquivalent):
+
+    (s1,s2,equivalent) = json.loads(expectedSignalsEquivalent)
+    client = eventBusClient.eventBusClient('test_eventBusClient',[])
+
+    assert client._signalsEquivalent(_signal(s1),_signal(s2))==equivalent
+    assert client._signalsEquivalent(_signal(s2),_signal(s1))==equivalent
+
+def test_network():
+
+    received = []
+    def handler(sender,signal,data):
+        received.append((sender,signal,data))
+        return True
+
+    register = [{'sender':'*','signal':'infoDagRoot','callback':handler}]
+    clientA  = eventBusClient.eventBusClient('clientA',register,network='test_networkA')
+    clientA2 = eventBusClient.eventBusClient('clientA2',[],network='test_networkA')
+    clientB  = eventBusClient.eventBusClient('clientB',register,network='test_networkB')
+
+    # only the clients of the network are notified
+    assert clientA2._dispatchProtocol('infoDagRoot',{'isDAGroot':1})==True
+    assert received==[('clientA2','infoDagRoot',{'isDAGroot':1})]
+    assert eventBusClient.getNetwork('test_networkA').getStats()=={
+        'clients': 2,
+        'signals': {'infoDagRoot': 1},
+    }
+    assert eventBusClient.getNetwork('test_networkB').getStats()['signals']=={}
+
+    # nor are the clients of the global dispatcher
+    globalClient = eventBusClient.eventBusClient('global',register)
+    try:
+        assert clientA2._dispatchProtocol('infoDagRoot',{})==True
+        assert len(received)==2
+    finally:
+        eventBusClient.dispatcher.disconnect(globalClient._eventBusNotification)
+
+    # a client which left is not notified
+    eventBusClient.getNetwork('test_networkA').leave(clientA)
+    assert clientA2._dispatchProtocol('infoDagRoot',{})==False
+    assert len(received)==2
+
+    # nor is a garbage collected one
+    del clientB
+    clientB2 = eventBusClient.eventBusClient('clientB2',[],network='test_networkB')
+    assert clientB2.dispatch('infoDagRoot',{})==[(clientB2._eventBusNotification,None)]
+    assert eventBusClient.getNetwork('test_networkB').getStats()['clients']==1
+
+    # a closed network starts over
+    eventBusClient.closeNetwork('test_networkB')
+    assert eventBusClient.getNetwork('test_networkB').getStats()=={'clients': 0, 'signals': {}}
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # eventBus/
+sys.path.insert(0, os.path.join(here, '..', 'PyDispatcher-2.0.3'))             # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import struct
+import threading
+
+import pytest
+
+import pcapngWriter
+import openvisualizer.openvisualizer_utils as u
+from openvisualizer.eventBus import eventBusMonitor
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_pcapngWriter.log'
+
+import logging
+log = logging.getLogger('test_pcapngWriter')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_pcapngWriter',
+                   'pcapngWriter',
+                   'eventBusMonitor',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+MOTE_A   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]
+MOTE_B   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0b]
+
+FRAMES   = [
+    [0x41,0xcc,0x66,0xfe,0xca]+[i]*(10+i)+[0x00,0x00] for i in range(5)
+]
+
+#============================ helpers =========================================
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+def _readPcapng(filename):
+    '''
+    :returns: A tuple (linkType,packets), packets being a list of
+        (timestamp,frame).
+    '''
+    with open(filename,'rb') as f:
+        data = f.read()
+    linkType = None
+    packets  = []
+    while data:
+        (blockType,totalLen) = struct.unpack('<II',data[:8])
+        assert totalLen%4==0
+        assert struct.unpack('<I',data[totalLen-4:totalLen])==(totalLen,)
+        body = data[8:totalLen-4]
+        if   blockType==pcapngWriter.BLOCK_SHB:
+            assert struct.unpack('<I',body[:4])==(pcapngWriter.BYTE_ORDER_MAGIC,)
+        elif blockType==pcapngWriter.BLOCK_IDB:
+            (linkType,) = struct.unpack('<H',body[:2])
+        elif blockType==pcapngWriter.BLOCK_EPB:
+            (_,tsHigh,tsLow,capLen,origLen) = struct.unpack('<IIIII',body[:20])
+            assert capLen==origLen
+            packets += [(((tsHigh<<32)+tsLow)/1e6,[ord(b) for b in body[20:20+capLen]])]
+        data = data[totalLen:]
+    return (linkType,packets)
+
+#============================ tests ===========================================
+
+def test_write(tmpdir):
+
+    filename = str(tmpdir.join('mesh.pcapng'))
+    clock    = FakeClock()
+    writer   = pcapngWriter.PcapngWriter(filename,clock=clock)
+
+    for frame in FRAMES:
+        writer.write(frame)
+        clock.now += 0.5
+    writer.close()
+
+    (linkType,packets) = _readPcapng(filename)
+    assert linkType==pcapngWriter.LINKTYPE_IEEE802_15_4_WITHFCS
+    assert [frame for (ts,frame) in packets]==FRAMES
+    assert [ts for (ts,frame) in packets]==[1000.0,1000.5,1001.0,1001.5,1002.0]
+    assert writer.getStats()=={
+        'frames':  5,
+        'bytes':   os.path.getsize(filename),
+        'dropped': 0,
+        'files':   1,
+    }
+
+def test_rotationSize(tmpdir):
+
+    filename = str(tmpdir.join('mesh.pcapng'))
+    writer   = pcapngWriter.PcapngWriter(filename,maxBytes=1,backupCount=2)
+
+    # one frame per file, the writer thread is flushed after each frame
+    for frame in FRAMES:
+        writer.write(frame)
+        while writer.getStats()['frames']<FRAMES.index(frame)+1:
+            threading.Event().wait(0.001)
+    writer.close()
+
+    assert sorted(os.listdir(str(tmpdir)))==['mesh.pcapng','mesh.pcapng.1','mesh.pcapng.2']
+    assert _readPcapng(filename)[1][0][1]==FRAMES[4]
+    assert _readPcapng(filename+'.1')[1][0][1]==FRAMES[3]
+    assert _readPcapng(filename+'.2')[1][0][1]==FRAMES[2]
+    assert writer.getStats()['files']==5
+
+def test_rotationTime(tmpdir):
+
+    filename = str(tmpdir.join('mesh.pcapng'))
+    clock    = FakeClock()
+    writer   = pcapngWriter.PcapngWriter(filename,maxSeconds=60,clock=clock)
+
+    writer.write(FRAMES[0])
+    while writer.getStats()['frames']<1:
+        threading.Event().wait(0.001)
+    clock.now += 30
+    writer.write(FRAMES[1])
+    while writer.getStats()['frames']<2:
+        threading.Event().wait(0.001)
+    clock.now += 30
+    writer.write(FRAMES[2])
+    writer.close()
+
+    assert [f for (ts,f) in _readPcapng(filename+'.1')[1]]==FRAMES[:2]
+    assert [f for (ts,f) in _readPcapng(filename)[1]]==FRAMES[2:3]
+
+def test_queueFull(tmpdir):
+
+    filename = str(tmpdir.join('mesh.pcapng'))
+    release  = threading.Event()
+    def formatFrame(frame):
+        release.wait()
+        return frame
+    writer   = pcapngWriter.PcapngWriter(filename,formatFrame=formatFrame,maxQueue=2)
+
+    # the first frame blocks the writer thread, the next two fill the queue
+    writer.write(FRAMES[0])
+    while not writer.queue.empty():
+        threading.Event().wait(0.001)
+    for frame in FRAMES[1:]:
+        writer.write(frame)
+    release.set()
+    writer.close()
+
+    assert [f for (ts,f) in _readPcapng(filename)[1]]==FRAMES[:3]
+    assert writer.getStats()['dropped']==2
+
+def test_eventBusMonitor(tmpdir):
+
+    filename = str(tmpdir.join('mesh.pcapng'))
+    lowpan   = [0x78,0x33,0x3a,0x80,0x00]
+    sniffed  = FRAMES[0][:-2]+[0xaa,0xbb]+[20]            # body, crc, frequency
+
+    monitor  = eventBusMonitor.eventBusMonitor()
+    monitor._dispatchMeshDebugPacket = lambda zep: pytest.fail('ZEP debug is disabled')
+    try:
+        monitor.setPcapFile(filename)
+        monitor._eventBusNotification('infoDagRoot','test',{'isDAGroot':1,'eui64':MOTE_A})
+        monitor._eventBusNotification('bytesToMesh','test',(MOTE_B,lowpan))
+        monitor._eventBusNotification('fromMote.data','test',(MOTE_B,bytearray(lowpan)))
+        monitor._eventBusNotification('sniffedPacketMerged','test',(1000.5,'COM1',20,sniffed))
+        monitor.close()
+    finally:
+        eventBusMonitor.dispatcher.disconnect(monitor._eventBusNotification)
+
+    packets = _readPcapng(filename)[1]
+    assert packets[2][0]==1000.5
+    frames  = [f for (ts,f) in packets]
+    assert frames==[
+        monitor._wrapMac(MOTE_A,MOTE_B,lowpan),
+        monitor._wrapMac(MOTE_B,MOTE_A,lowpan),
+        FRAMES[0][:-2]+u.calculateFCS(FRAMES[0][:-2]),
+    ]
+    # the addresses are written in reverse order
+    assert frames[0][5:13]==MOTE_B[::-1]
+    assert monitor.getPcapStats() is None
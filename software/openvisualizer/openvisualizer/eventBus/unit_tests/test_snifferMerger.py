@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # eventBus/
+sys.path.insert(0, os.path.join(here, '..', 'PyDispatcher-2.0.3'))             # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import random
+import threading
+import time
+
+import pytest
+
+import snifferMerger
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_snifferMerger.log'
+
+import logging
+log = logging.getLogger('test_snifferMerger')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_snifferMerger',
+                   'snifferMerger',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+WINDOW             = 0.050
+
+NUM_PORTS          = 16
+NUM_BENCHMARK      = 2000
+
+#============================ helpers =========================================
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+def _newMerger(clock=None):
+    merger          = snifferMerger.SnifferMerger(
+        reorderWindow = WINDOW,
+        dedupWindow   = 4*WINDOW,
+        autoRelease   = False,
+        clock         = clock or FakeClock(),
+    )
+    merger.notifs   = []
+    merger.dispatch = lambda signal,data: merger.notifs.append((signal,data))
+    return merger
+
+def _frame(i,channel):
+    # frame, CRC, frequency
+    return [0x41,0xcc,i]+[0x00]*10+[0xaa,0xbb]+[channel]
+
+#============================ tests ===========================================
+
+def test_merge():
+
+    clock  = FakeClock()
+    merger = _newMerger(clock)
+
+    # the streams of two sniffers, delivered out of order
+    merger.addFrame('COM1',_frame(1,11),timestamp=1000.00)
+    merger.addFrame('COM2',_frame(3,12),timestamp=1000.02)
+    merger.addFrame('COM1',_frame(2,11),timestamp=1000.01)
+    merger.addFrame('COM2',_frame(4,12),timestamp=1000.04)
+
+    # only the frames older than the reorder window are released
+    assert merger.release(1000.065)==2
+    assert merger.notifs==[
+        ('sniffedPacketMerged',(1000.00,'COM1',11,_frame(1,11))),
+        ('sniffedPacketMerged',(1000.01,'COM1',11,_frame(2,11))),
+    ]
+    assert merger.release(float('inf'))==2
+    assert [data[0] for (signal,data) in merger.notifs]==[1000.00,1000.01,1000.02,1000.04]
+    assert merger.getStats()=={
+        'frames':     4,
+        'duplicates': 0,
+        'released':   4,
+        'late':       0,
+        'pending':    0,
+        'ports':      {'COM1': 2, 'COM2': 2},
+    }
+
+def test_dedup():
+
+    merger = _newMerger()
+
+    # the same frame heard by two sniffers on the same channel
+    assert merger.addFrame('COM1',_frame(1,11),timestamp=1000.000)==True
+    assert merger.addFrame('COM2',_frame(1,11),timestamp=1000.001)==False
+    # the same bytes on another channel are another frame
+    assert merger.addFrame('COM3',_frame(1,12),timestamp=1000.002)==True
+    # a retransmission, after the dedup window
+    assert merger.addFrame('COM1',_frame(1,11),timestamp=1000.300)==True
+
+    merger.release(float('inf'))
+    assert [data[:3] for (signal,data) in merger.notifs]==[
+        (1000.000,'COM1',11),
+        (1000.002,'COM3',12),
+        (1000.300,'COM1',11),
+    ]
+    assert merger.getStats()['duplicates']==1
+
+def test_late():
+
+    merger = _newMerger()
+
+    merger.addFrame('COM1',_frame(1,11),timestamp=1000.10)
+    merger.release(1000.20)
+    # delayed more than the reorder window
+    merger.addFrame('COM2',_frame(2,12),timestamp=1000.05)
+    merger.release(1000.20)
+
+    assert len(merger.notifs)==2
+    assert merger.getStats()['late']==1
+
+def test_notification():
+
+    clock  = FakeClock()
+    merger = _newMerger(clock)
+
+    merger._sniffedPacket_notif('moteConnector@/dev/ttyUSB3','fromMote.sniffedPacket',_frame(1,26))
+    merger.release(float('inf'))
+
+    assert merger.notifs==[('sniffedPacketMerged',(1000.0,'/dev/ttyUSB3',26,_frame(1,26)))]
+
+def test_releaseThread():
+
+    merger   = snifferMerger.SnifferMerger(reorderWindow=0.01)
+    received = threading.Event()
+    merger.dispatch = lambda signal,data: received.set()
+    try:
+        merger.addFrame('COM1',_frame(1,11))
+        assert received.wait(5)
+    finally:
+        merger.close()
+
+def test_benchmarkMerge():
+    '''
+    Log the number of frames per second merged from NUM_PORTS sniffers.
+    '''
+
+    rand   = random.Random(3)
+    merger = _newMerger()
+    frames = [
+        ('COM{0}'.format(i%NUM_PORTS),_frame(i&0xff,11+i%NUM_PORTS),1000+i*0.001+rand.random()*WINDOW/2)
+        for i in range(NUM_BENCHMARK)
+    ]
+
+    start = time.time()
+    for (port,frame,timestamp) in frames:
+        merger.addFrame(port,frame,timestamp)
+        merger.release(timestamp)
+    merger.release(float('inf'))
+    duration = time.time()-start
+
+    timestamps = [data[0] for (signal,data) in merger.notifs]
+    assert timestamps==sorted(timestamps)
+    assert merger.getStats()['late']==0
+    log.info("merge: {0:.0f} frames/s".format(NUM_BENCHMARK/max(duration,1e-9)))
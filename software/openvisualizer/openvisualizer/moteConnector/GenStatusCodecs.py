@@ -0,0 +1,402 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Standalone script to generate the StatusCodecs.py file.
+
+The layout of each status element a mote reports over its serial port is
+defined once, in STATUS_ELEMENTS below. From it, this script generates the
+StatusCodecs.py file, which contains, for each status element, a precompiled
+struct.Struct, a record class, and an entry in a dispatch table indexed by the
+status element code. Nothing is generated at runtime.
+
+If the openwsn-fw repository is checked out side-by-side with openwsn-sw, the
+status element codes are also checked against the STATUS_* enum of the
+openserial.h firmware header, and any drift is reported.
+
+To run it, just double-click on this file.
+
+To have to check out the openwsn-fw and openwsn-sw side-by-side, i.e.
+you should have a directory with two subdirectories openwsn-fw/ and
+openwsn-sw/ somewhere on your computer.
+'''
+
+import os
+import re
+import struct
+import sys
+import time
+
+#============================ defines =========================================
+
+INPUT_FILE    = os.path.join('..','..','..','..','..','openwsn-fw','drivers','common','openserial.h')
+OUTPUT_FILE   = 'StatusCodecs.py'
+
+# format of the header of a status notification: moteId, status element code
+HEADER_STRUCTURE = '<HB'
+
+# (firmware enum name, code, name, structure, fields)
+STATUS_ELEMENTS = [
+    (
+        'STATUS_ISSYNC',
+        0,
+        'IsSync',
+        '<B',
+        [
+            'isSync',                    # B
+        ],
+    ),
+    (
+        'STATUS_ID',
+        1,
+        'IdManager',
+        '<BBBBBBBBBBBBBBBBBBBBB',
+        [
+            'isDAGroot',                 # B
+            'myPANID_0',                 # B
+            'myPANID_1',                 # B
+            'my16bID_0',                 # B
+            'my16bID_1',                 # B
+            'my64bID_0',                 # B
+            'my64bID_1',                 # B
+            'my64bID_2',                 # B
+            'my64bID_3',                 # B
+            'my64bID_4',                 # B
+            'my64bID_5',                 # B
+            'my64bID_6',                 # B
+            'my64bID_7',                 # B
+            'myPrefix_0',                # B
+            'myPrefix_1',                # B
+            'myPrefix_2',                # B
+            'myPrefix_3',                # B
+            'myPrefix_4',                # B
+            'myPrefix_5',                # B
+            'myPrefix_6',                # B
+            'myPrefix_7',                # B
+        ],
+    ),
+    (
+        'STATUS_DAGRANK',
+        2,
+        'MyDagRank',
+        '<H',
+        [
+            'myDAGrank',                 # H
+        ],
+    ),
+    (
+        'STATUS_OUTBUFFERINDEXES',
+        3,
+        'OutputBuffer',
+        '<HH',
+        [
+            'index_write',               # H
+            'index_read',                # H
+        ],
+    ),
+    (
+        'STATUS_ASN',
+        4,
+        'Asn',
+        '<BHH',
+        [
+            'asn_4',                     # B
+            'asn_2_3',                   # H
+            'asn_0_1',                   # H
+        ],
+    ),
+    (
+        'STATUS_MACSTATS',
+        5,
+        'MacStats',
+        '<BBhhBII',
+        [
+            'numSyncPkt' ,               # B
+            'numSyncAck',                # B
+            'minCorrection',             # h
+            'maxCorrection',             # h
+            'numDeSync',                 # B
+            'numTicsOn',                 # I
+            'numTicsTotal',              # I
+        ],
+    ),
+    (
+        'STATUS_SCHEDULE',
+        6,
+        'ScheduleRow',
+        '<BHBBBBQQBBBBHH',
+        [
+            'row',                       # B
+            'slotOffset',                # H
+            'type',                      # B
+            'shared',                    # B
+            'channelOffset',             # B
+            'neighbor_type',             # B
+            'neighbor_bodyH',            # Q
+            'neighbor_bodyL',            # Q
+            'numRx',                     # B
+            'numTx',                     # B
+            'numTxACK',                  # B
+            'lastUsedAsn_4',             # B
+            'lastUsedAsn_2_3',           # H
+            'lastUsedAsn_0_1',           # H
+        ],
+    ),
+    (
+        'STATUS_BACKOFF',
+        7,
+        'Backoff',
+        '<BB',
+        [
+            'backoffExponent',           # B
+            'backoff',                   # B
+        ],
+    ),
+    (
+        'STATUS_QUEUE',
+        8,
+        'QueueRow',
+        '<BBBBBBBBBBBBBBBBBBBB',
+        [
+            'creator_0',                 # B
+            'owner_0',                   # B
+            'creator_1',                 # B
+            'owner_1',                   # B
+            'creator_2',                 # B
+            'owner_2',                   # B
+            'creator_3',                 # B
+            'owner_3',                   # B
+            'creator_4',                 # B
+            'owner_4',                   # B
+            'creator_5',                 # B
+            'owner_5',                   # B
+            'creator_6',                 # B
+            'owner_6',                   # B
+            'creator_7',                 # B
+            'owner_7',                   # B
+            'creator_8',                 # B
+            'owner_8',                   # B
+            'creator_9',                 # B
+            'owner_9',                   # B
+        ],
+    ),
+    (
+        'STATUS_NEIGHBORS',
+        9,
+        'NeighborsRow',
+        '<BBBBBBQQHbBBBBBHHB',
+        [
+            'row',                       # B
+            'used',                      # B
+            'parentPreference',          # B
+            'stableNeighbor',            # B
+            'switchStabilityCounter',    # B
+            'addr_type',                 # B
+            'addr_bodyH',                # Q
+            'addr_bodyL',                # Q
+            'DAGrank',                   # H
+            'rssi',                      # b
+            'numRx',                     # B
+            'numTx',                     # B
+            'numTxACK',                  # B
+            'numWraps',                  # B
+            'asn_4',                     # B
+            'asn_2_3',                   # H
+            'asn_0_1',                   # H
+            'joinPrio',                  # B
+        ],
+    ),
+    (
+        'STATUS_KAPERIOD',
+        10,
+        'kaPeriod',
+        '<H',
+        [
+            'kaPeriod',                  # H
+        ],
+    ),
+]
+
+#============================ helpers =========================================
+
+def checkLayouts():
+    '''
+    Verify the status element definitions are consistent with themselves.
+
+    :returns: A list of error strings, empty if all is well.
+    '''
+    errors = []
+    codes  = set()
+    names  = set()
+    for (enumName,code,name,structure,fields) in STATUS_ELEMENTS:
+        if code in codes:
+            errors += ["duplicate status element code {0} ({1})".format(code,name)]
+        if name in names:
+            errors += ["duplicate status element name {0}".format(name)]
+        codes.add(code)
+        names.add(name)
+        try:
+            numFields = len(struct.unpack(structure,'\x00'*struct.calcsize(structure)))
+        except struct.error as err:
+            errors += ["invalid structure {0} for {1}: {2}".format(structure,name,err)]
+            continue
+        if numFields!=len(fields):
+            errors += ["{0}: structure {1} has {2} fields, {3} names given".format(
+                name,
+                structure,
+                numFields,
+                len(fields),
+            )]
+    return errors
+
+def checkDrift(lines):
+    '''
+    Compare the status element codes to the STATUS_* enum of the firmware.
+
+    :param lines: [in] The lines of the openserial.h firmware header.
+
+    :returns: A list of drift description strings, empty if in sync.
+    '''
+
+    # find status element codes in openserial.h
+    codesFound = {}
+    for line in lines:
+        m = re.search('^\s*(STATUS_\w+)\s*=\s*(\w+)\s*,?',line)
+        if m:
+            try:
+                codesFound[m.group(1)] = int(m.group(2),0)
+            except ValueError:
+                pass
+    codesFound.pop('STATUS_MAX',None)
+
+    # compare to the layouts
+    drift = []
+    for (enumName,code,name,structure,fields) in STATUS_ELEMENTS:
+        if enumName not in codesFound:
+            drift += ["{0} ({1}) not defined in firmware".format(enumName,name)]
+        elif codesFound[enumName]!=code:
+            drift += ["{0} ({1}) is {2} in firmware, {3} here".format(
+                enumName,
+                name,
+                codesFound[enumName],
+                code,
+            )]
+    known = [e[0] for e in STATUS_ELEMENTS]
+    for enumName in sorted(codesFound.keys()):
+        if enumName not in known:
+            drift += ["{0}={1} has no layout".format(enumName,codesFound[enumName])]
+    return drift
+
+def genRecordClass(name,fields):
+    output  = ["class Status_{0}(StatusRecord):".format(name)]
+    output += ["    __slots__ = ("]
+    output += ["        '{0}',".format(f) for f in fields]
+    output += ["    )"]
+    output += ["    _fields   = __slots__"]
+    output += ["    "]
+    output += ["    def __init__(self,{0}):".format(','.join(fields))]
+    output += ["        self.{0:<25}= {0}".format(f) for f in fields]
+    return '\n'.join(output)
+
+def genOutput():
+    '''
+    Generate the contents of the StatusCodecs.py file, without the header
+    comment.
+    '''
+    output  = []
+    output += ["import struct"]
+    output += [""]
+    output += ["#============================ defines ========================================="]
+    output += [""]
+    output += ["HEADER = struct.Struct('{0}')".format(HEADER_STRUCTURE)]
+    output += [""]
+    for (enumName,code,name,structure,fields) in STATUS_ELEMENTS:
+        output += ["{0:<27} = {1}".format(enumName,code)]
+    output += [""]
+    output += ["#============================ records ========================================="]
+    output += [""]
+    output += ["class StatusRecord(object):"]
+    output += ["    __slots__ = ()"]
+    output += ["    _fields   = ()"]
+    output += ["    "]
+    output += ["    def __eq__(self,other):"]
+    output += ["        return type(self)==type(other) and self._astuple()==other._astuple()"]
+    output += ["    "]
+    output += ["    def __ne__(self,other):"]
+    output += ["        return not self==other"]
+    output += ["    "]
+    output += ["    def __repr__(self):"]
+    output += ["        return '{0}({1})'.format("]
+    output += ["            type(self).__name__,"]
+    output += ["            ', '.join(['{0}={1!r}'.format(f,getattr(self,f)) for f in self._fields]),"]
+    output += ["        )"]
+    output += ["    "]
+    output += ["    def _astuple(self):"]
+    output += ["        return tuple([getattr(self,f) for f in self._fields])"]
+    output += ["    "]
+    output += ["    def _asdict(self):"]
+    output += ["        return dict([(f,getattr(self,f)) for f in self._fields])"]
+    output += [""]
+    for (enumName,code,name,structure,fields) in STATUS_ELEMENTS:
+        output += [genRecordClass(name,fields)]
+        output += [""]
+    output += ["#============================ dispatch ========================================"]
+    output += [""]
+    output += ["# status element code -> (name, structure, record class)"]
+    output += ["parsers = {"]
+    for (enumName,code,name,structure,fields) in STATUS_ELEMENTS:
+        output += ["    {0:<27}: ('{1}', struct.Struct('{2}'), Status_{1}),".format(enumName,name,structure)]
+    output += ["}"]
+    output += [""]
+    output += ["# status element name -> record class"]
+    output += ["records = {"]
+    for (enumName,code,name,structure,fields) in STATUS_ELEMENTS:
+        output += ["    {0:<27}: Status_{1},".format("'{0}'".format(name),name)]
+    output += ["}"]
+    output += [""]
+    return '\n'.join(output)
+
+#============================ main ============================================
+
+def main():
+
+    errors = checkLayouts()
+    if errors:
+        print '\n'.join(["ERROR: {0}".format(e) for e in errors])
+        raw_input('\nScript ended. Press enter to close.')
+        sys.exit(1)
+
+    if os.path.exists(INPUT_FILE):
+        # we can access the openserial.h file
+        drift = checkDrift(open(INPUT_FILE,'r').readlines())
+        if drift:
+            print '\n'.join(["WARNING: {0}".format(d) for d in drift])
+        else:
+            print "status element codes match {0}".format(INPUT_FILE)
+    else:
+        # we can NOT access the openserial.h file
+        print "WARNING: could not open {0}, not checking for drift".format(INPUT_FILE)
+
+    # gather the information
+    output  = []
+    output += ["# DO NOT EDIT DIRECTLY!"]
+    output += ["# This file was generated automatically by GenStatusCodecs.py"]
+    output += ["# on {0}".format(time.strftime("%a, %d %b %Y %H:%M:%S"))]
+    output += ["#"]
+    output += [""]
+    output += [genOutput()]
+    output  = '\n'.join(output)
+
+    # write to file
+    file = open(OUTPUT_FILE,'w')
+    file.write(output)
+    file.close()
+
+    print "{0} created successfully.".format(OUTPUT_FILE)
+
+    raw_input('\nScript ended. Press enter to close.')
+
+if __name__ == '__main__':
+    main()
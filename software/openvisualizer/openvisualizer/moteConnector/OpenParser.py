@@ -36,7 +36,11 @@ class OpenParser(Parser.Parser):
     SERFRAME_ACTION_NO                 = ord('N')
     SERFRAME_ACTION_TOGGLE             = ord('T')
     
-    def __init__(self):
+    def __init__(self,network=None):
+        '''
+        :param network: [in] The network of the mote, see
+            ParserData.getLatencySamples().
+        '''
         
         # log
         log.info("create instance")
@@ -49,7 +53,7 @@ class OpenParser(Parser.Parser):
         self.parserInfo      = ParserIEC.ParserInfoErrorCritical(self.SERFRAME_MOTE2PC_INFO)
         self.parserError     = ParserIEC.ParserInfoErrorCritical(self.SERFRAME_MOTE2PC_ERROR)
         self.parserCritical  = ParserIEC.ParserInfoErrorCritical(self.SERFRAME_MOTE2PC_CRITICAL)
-        self.parserData      = ParserData.ParserData()
+        self.parserData      = ParserData.ParserData(network)
         self.parserPacket    = ParserPacket.ParserPacket()
         
         # register subparsers
@@ -8,13 +8,38 @@ log = logging.getLogger('ParserData')
 log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
+import collections
 import struct
-
-from pydispatch import dispatcher
+import threading
 
 from ParserException import ParserException
 import Parser
 
+# latency samples (node,latency,parent,SN) extracted from UDPLatency packets,
+# consumed by the UDPLatency component. A deque is used as appending and
+# popping from either end is atomic, so no lock needs to be taken on the data
+# path. When full, the oldest samples are dropped.
+LATENCY_QUEUE_SIZE = 1024
+latencySamples     = collections.deque(maxlen=LATENCY_QUEUE_SIZE)
+
+# the latency samples of the motes of the other networks, per network name
+networkLatencySamples = {}
+networkLatencyLock    = threading.Lock()
+
+def getLatencySamples(network=None):
+    '''
+    :param network: [in] The name of the network, None for the motes
+        connected to the global event bus.
+    
+    :returns: The queue of the latency samples of the motes of a network.
+    '''
+    if network is None:
+        return latencySamples
+    with networkLatencyLock:
+        if network not in networkLatencySamples:
+            networkLatencySamples[network] = collections.deque(maxlen=LATENCY_QUEUE_SIZE)
+        return networkLatencySamples[network]
+
 class ParserData(Parser.Parser):
     
     HEADER_LENGTH  = 2
@@ -23,8 +48,29 @@ class ParserData(Parser.Parser):
     IPHC_SAM       = 4
     IPHC_DAM       = 0
     
-     
-    def __init__(self):
+    # offsets in the input
+    OFFSET_ASN     = 2
+    OFFSET_DEST    = 7
+    OFFSET_SOURCE  = 15
+    OFFSET_PAYLOAD = 23
+    
+    # the UDP destination port 61001 (0xee49) identifies UDPLatency packets
+    OFFSET_LATENCY_PORT = OFFSET_PAYLOAD+36
+    
+    # the trailer of a UDPLatency packet, counted from its end:
+    # SN (2B), parent (8B), node (8B), ASN (5B)
+    TRAILER_SN     = 23
+    TRAILER_PARENT = 21
+    TRAILER_NODE   = 13
+    TRAILER_ASN    = 5
+    
+    ASN_STRUCT     = struct.Struct('<HHB')
+    SN_STRUCT      = struct.Struct('>H')
+    
+    def __init__(self,network=None):
+        '''
+        :param network: [in] The network of the mote, see getLatencySamples().
+        '''
         
         # log
         log.info("create instance")
@@ -32,10 +78,8 @@ class ParserData(Parser.Parser):
         # initialize parent class
         Parser.Parser.__init__(self,self.HEADER_LENGTH)
         
-        self._asn= ['asn_4',                     # B
-          'asn_2_3',                   # H
-          'asn_0_1',                   # H
-         ]
+        # local variables
+        self.latencySamples = getLatencySamples(network)
     
     
     #======================== public ==========================================
@@ -47,84 +91,71 @@ class ParserData(Parser.Parser):
         
         # ensure input not short longer than header
         self._checkLength(input)
-   
-        headerBytes = input[:2]
-        #asn comes in the next 5bytes.  
-        
-        asnbytes=input[2:7]
-        (self._asn) = struct.unpack('<BHH',''.join([chr(c) for c in asnbytes]))
         
-        #source and destination of the message
-        dest = input[7:15]
+        #asn comes in the next 5bytes.  
+        buf = bytearray(input)
+        try:
+            asn = self.ASN_STRUCT.unpack_from(buf,self.OFFSET_ASN)
+        except struct.error:
+            raise ParserException(ParserException.DESERIALIZE,"could not extract asn from {0}".format(input))
         
         #source is elided!!! so it is not there.. check that.
-        source = input[15:23]
+        source = input[self.OFFSET_SOURCE:self.OFFSET_PAYLOAD]
         
         if log.isEnabledFor(logging.DEBUG):
-            a="".join(hex(c) for c in dest)
+            a="".join(hex(c) for c in input[self.OFFSET_DEST:self.OFFSET_SOURCE])
             log.debug("destination address of the packet is {0} ".format(a))
-        
-        if log.isEnabledFor(logging.DEBUG):
             a="".join(hex(c) for c in source)
             log.debug("source address (just previous hop) of the packet is {0} ".format(a))
         
+        # cross layer trick here. capture UDP packet from udpLatency and get ASN to compute latency.
+        # then notify a latency component that will plot that information.
+        # port 61001==0xee,0x49
+        end = len(buf)
+        if (
+                end>self.OFFSET_LATENCY_PORT+1                 and
+                buf[self.OFFSET_LATENCY_PORT]==0xee            and
+                buf[self.OFFSET_LATENCY_PORT+1]==0x49
+            ):
+            # udp port 61001 for udplatency app.
+            diff     = self._asndiference(
+                self.ASN_STRUCT.unpack_from(buf,end-self.TRAILER_ASN), # last 5 bytes of the packet are the ASN in the UDP latency packet
+                asn,
+            )
+            timeinus = diff*self.MSPERSLOT                             # compute time in ms
+            
+            if (timeinus<0xFFFF):
+                # notify latency manager component. only if a valid value
+                self.latencySamples.append((
+                    bytes(buf[end-self.TRAILER_NODE:end-self.TRAILER_ASN]),     # the node address
+                    timeinus,
+                    bytes(buf[end-self.TRAILER_PARENT:end-self.TRAILER_NODE]),  # the parent node (used to know topology)
+                    self.SN_STRUCT.unpack_from(buf,end-self.TRAILER_SN)[0],     # SN sent by mote
+                ))
+            else:
+                # this usually happens when the serial port framing is not correct and more than one message is parsed at the same time. this will be solved with HDLC framing.
+                log.warning("Wrong latency computation {0} = {1} mS".format(
+                    ",".join(hex(c) for c in buf[end-self.TRAILER_NODE:end-self.TRAILER_ASN]),
+                    timeinus,
+                ))
+        
         # remove asn src and dest and mote id at the beginning.
-        # this is a hack for latency measurements... TODO, move latency to an app listening on the corresponding port.
-        # inject end_asn into the packet as well
-        input = input[23:]
+        input = input[self.OFFSET_PAYLOAD:]
         
         if log.isEnabledFor(logging.DEBUG):
             log.debug("packet without source,dest and asn {0}".format(input))
         
-        # when the packet goes to internet it comes with the asn at the beginning as timestamp.
-         
-        # cross layer trick here. capture UDP packet from udpLatency and get ASN to compute latency.
-        # then notify a latency component that will plot that information.
-        # port 61001==0xee,0x49
-        if (len(input) >37):
-           if (input[36]==238 and input[37]==73):
-            # udp port 61001 for udplatency app.
-               aux      = input[len(input)-5:]               # last 5 bytes of the packet are the ASN in the UDP latency packet
-               diff     = self._asndiference(aux,asnbytes)   # calculate difference 
-               timeinus = diff*self.MSPERSLOT                # compute time in ms
-               SN       = input[len(input)-23:len(input)-21] # SN sent by mote
-               parent   = input[len(input)-21:len(input)-13] # the parent node is the first element (used to know topology)
-               node     = input[len(input)-13:len(input)-5]  # the node address
-               
-               if (timeinus<0xFFFF):
-               # notify latency manager component. only if a valid value
-                  dispatcher.send(
-                     sender        = 'parserData',
-                     signal        = 'latency',
-                     data          = (node,timeinus,parent,SN),
-                  )
-               else:
-                   # this usually happens when the serial port framing is not correct and more than one message is parsed at the same time. this will be solved with HDLC framing.
-                   print "Wrong latency computation {0} = {1} mS".format(str(node),timeinus)
-                   print ",".join(hex(c) for c in input)
-                   log.warning("Wrong latency computation {0} = {1} mS".format(str(node),timeinus))
-                   pass
-               # in case we want to send the computed time to internet..
-               # computed=struct.pack('<H', timeinus)#to be appended to the pkt
-               # for x in computed:
-                   #input.append(x)
-           else:
-               # no udplatency
-               # print input
-               pass     
-        else:
-           pass      
-       
         eventType='data'
         # notify a tuple including source as one hop away nodes elide SRC address as can be inferred from MAC layer header
         return (eventType,(source,input))
 
  #======================== private =========================================
  
-    def _asndiference(self,init,end):
-      
-       asninit = struct.unpack('<HHB',''.join([chr(c) for c in init]))
-       asnend  = struct.unpack('<HHB',''.join([chr(c) for c in end]))
+    def _asndiference(self,asninit,asnend):
+       '''
+       :param asninit: [in] The ASN, as unpacked with ASN_STRUCT.
+       :param asnend:  [in] The ASN, as unpacked with ASN_STRUCT.
+       '''
        if (asnend[2] != asninit[2]): #'byte4'
           return 0xFFFFFFFF
        else:
@@ -140,4 +171,4 @@ class ParserData(Parser.Parser):
           else:   
               diff = 0xFFFFFFFF
        
-       return diff
\ No newline at end of file
+       return diff
@@ -8,13 +8,255 @@ log = logging.getLogger('ParserInfoErrorCritical')
 log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
+import collections
 import struct
+import threading
+import time
 
 from ParserException import ParserException
 import Parser
 
 import StackDefines
 
+# format of an info/error/critical notification: moteId,component,code,arg1,arg2
+NOTIF_STRUCT = struct.Struct('>HBBHH')
+
+class ErrorEntry(object):
+    '''
+    Occurrences of one error of one mote.
+    '''
+
+    __slots__ = [
+        'severity',
+        'count',
+        'reported',   # value of count at the last summary
+        'firstSeen',
+        'lastSeen',
+        'arg1',
+        'arg2',
+    ]
+
+    def __init__(self,severity,timestamp,arg1,arg2):
+        self.severity        = severity
+        self.count           = 1
+        self.reported        = 1
+        self.firstSeen       = timestamp
+        self.lastSeen        = timestamp
+        self.arg1            = arg1
+        self.arg2            = arg2
+
+class ErrorAggregator(threading.Thread):
+    '''
+    Counts the errors reported by all motes, and periodically logs a summary.
+
+    The first occurrence of each error is logged right away. At most
+    MAX_NUM_ENTRIES errors are tracked: the least recently seen one is
+    evicted to make room for a new one, and the errors not seen for
+    ENTRY_TIMEOUT are forgotten.
+
+    There is a single instance of this class, shared by all parsers. Once
+    closed, the next instantiation creates a new one.
+    '''
+
+    SEVERITY_ERROR       = ord('E')
+    SEVERITY_CRITICAL    = ord('C')
+
+    # period at which the summary is logged, in seconds
+    SUMMARY_PERIOD       = 10
+
+    # maximum number of distinct errors tracked, so memory stays bounded
+    MAX_NUM_ENTRIES      = 1024
+
+    # number of seconds after which an error not seen again is forgotten
+    ENTRY_TIMEOUT        = 3600
+
+    #======================== singleton pattern ===============================
+
+    _instance = None
+    _init     = False
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(ErrorAggregator, cls).__new__(cls, *args, **kwargs)
+        return cls._instance
+
+    #======================== main ============================================
+
+    def __init__(self):
+
+        # don't re-initialize an instance (singleton pattern)
+        if self._init:
+            return
+        self._init = True
+
+        # log
+        log.info("create instance")
+
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.entries              = collections.OrderedDict() # (moteId,component,errorCode) -> ErrorEntry, least recently seen first
+        self.numEvicted           = 0
+        self.goOn                 = True
+        self.closeEvent           = threading.Event()
+
+        # initialize the parent class
+        threading.Thread.__init__(self)
+
+        # give this thread a name
+        self.name                 = 'ErrorAggregator'
+        self.daemon               = True
+
+        # start myself
+        self.start()
+
+    def run(self):
+        while self.goOn:
+            self.closeEvent.wait(self.SUMMARY_PERIOD)
+            try:
+                self._logSummary()
+            except Exception as err:
+                log.critical('could not log error summary: {0}'.format(err))
+
+    #======================== public ==========================================
+
+    def close(self):
+        self.goOn = False
+        self.closeEvent.set()
+        # the next instantiation starts a new aggregator
+        with self.dataLock:
+            if ErrorAggregator._instance is self:
+                ErrorAggregator._instance = None
+
+    def indicateError(self,severity,moteId,component,errorCode,arg1,arg2):
+        '''
+        Account for an error reported by a mote.
+
+        :param severity:  [in] SEVERITY_ERROR or SEVERITY_CRITICAL.
+        :param moteId:    [in] 16-bit ID of the mote, as an int.
+        :param component: [in] Code of the component reporting the error.
+        :param errorCode: [in] Code of the error.
+        :param arg1:      [in] First argument of the error.
+        :param arg2:      [in] Second argument of the error.
+        '''
+        key     = (moteId,component,errorCode)
+        now     = time.time()
+        evicted = None
+
+        with self.dataLock:
+            entry = self.entries.pop(key,None)
+            if entry:
+                entry.count         += 1
+                entry.lastSeen       = now
+                entry.arg1           = arg1
+                entry.arg2           = arg2
+                # most recently seen last
+                self.entries[key]    = entry
+                return
+            if len(self.entries)>=self.MAX_NUM_ENTRIES:
+                evicted              = self._popRepeats(*self.entries.popitem(last=False))
+                self.numEvicted     += 1
+            self.entries[key] = ErrorEntry(severity,now,arg1,arg2)
+
+        # first occurrence is logged right away
+        self._log(severity,self._format(key,arg1,arg2))
+
+        # so are the repeats of the evicted error not summarized yet
+        if evicted:
+            self._logRepeats([evicted])
+
+    def getErrors(self):
+        '''
+        Retrieve the errors seen so far.
+
+        :returns: A list of dictionaries, one per (moteId, component,
+            errorCode), most recently seen first.
+        '''
+        with self.dataLock:
+            items = [(key,entry.severity,entry.count,entry.firstSeen,entry.lastSeen,entry.arg1,entry.arg2)
+                     for (key,entry) in self.entries.items()]
+
+        returnVal = []
+        for ((moteId,component,errorCode),severity,count,firstSeen,lastSeen,arg1,arg2) in items:
+            returnVal.append({
+                'moteId':       '{0:04x}'.format(moteId),
+                'severity':     chr(severity),
+                'component':    _translateCallingComponent(component),
+                'errorCode':    errorCode,
+                'description':  _translateErrorDescription(errorCode,arg1,arg2),
+                'count':        count,
+                'firstSeen':    firstSeen,
+                'lastSeen':     lastSeen,
+            })
+        returnVal.sort(key=lambda e: e['lastSeen'],reverse=True)
+        return returnVal
+
+    def getNumEvicted(self):
+        with self.dataLock:
+            return self.numEvicted
+
+    def clear(self):
+        with self.dataLock:
+            self.entries          = collections.OrderedDict()
+            self.numEvicted       = 0
+
+    #======================== private =========================================
+
+    def _logSummary(self):
+
+        # collect the errors which repeated since the last summary, and
+        # forget the ones not seen for a while
+        repeats = []
+        expiry  = time.time()-self.ENTRY_TIMEOUT
+        with self.dataLock:
+            for (key,entry) in self.entries.items():
+                repeat = self._popRepeats(key,entry)
+                if repeat:
+                    repeats.append(repeat)
+                if entry.lastSeen<expiry:
+                    del self.entries[key]
+
+        self._logRepeats(repeats)
+
+    def _popRepeats(self,key,entry):
+        '''
+        Marks the repeats of an error as summarized. Expects dataLock to be
+        held.
+
+        :returns: The repeats to log, see _logRepeats(), or None if the error
+            did not repeat since the last summary.
+        '''
+        if entry.count<=entry.reported:
+            return None
+        returnVal      = (key,entry.severity,entry.count-entry.reported,entry.count,entry.arg1,entry.arg2)
+        entry.reported = entry.count
+        return returnVal
+
+    def _logRepeats(self,repeats):
+        for (key,severity,numNew,count,arg1,arg2) in repeats:
+            self._log(
+                severity,
+                '{0} (repeated {1} times in the last {2}s, {3} total)'.format(
+                    self._format(key,arg1,arg2),
+                    numNew,
+                    self.SUMMARY_PERIOD,
+                    count,
+                ),
+            )
+
+    def _format(self,key,arg1,arg2):
+        (moteId,component,errorCode) = key
+        return "{MOTEID:x} [{COMPONENT}] {ERROR_DESC}".format(
+            COMPONENT  = _translateCallingComponent(component),
+            MOTEID     = moteId,
+            ERROR_DESC = _translateErrorDescription(errorCode,arg1,arg2),
+        )
+
+    def _log(self,severity,output):
+        if severity==self.SEVERITY_CRITICAL:
+            log.critical(output)
+        else:
+            log.error(output)
+
 class ParserInfoErrorCritical(Parser.Parser):
     
     HEADER_LENGTH       = 1
@@ -35,6 +277,12 @@ class ParserInfoErrorCritical(Parser.Parser):
         # store params
         self.severity   = severity
         
+        # local variables
+        if self.severity==self.SEVERITY_INFO:
+            self.errorAggregator = None
+        else:
+            self.errorAggregator = ErrorAggregator()
+        
         # initialize parent class
         Parser.Parser.__init__(self,self.HEADER_LENGTH)
     
@@ -47,44 +295,37 @@ class ParserInfoErrorCritical(Parser.Parser):
             log.debug("received data {0}".format(input))
         
         # parse packet
-        try:
-           (moteId,
-            callingComponent,
-            error_code,
-            arg1,
-            arg2) = struct.unpack('>HBBHH',''.join([chr(c) for c in input]))
-        except struct.error:
+        if len(input)!=NOTIF_STRUCT.size:
             raise ParserException(ParserException.DESERIALIZE,"could not extract data from {0}".format(input))
+        (moteId,
+         callingComponent,
+         error_code,
+         arg1,
+         arg2) = NOTIF_STRUCT.unpack(bytearray(input))
         
-        # turn into string
-        output = "{MOTEID:x} [{COMPONENT}] {ERROR_DESC}".format(
-            COMPONENT  = self._translateCallingComponent(callingComponent),
-            MOTEID     = moteId,
-            ERROR_DESC = self._translateErrorDescription(error_code,arg1,arg2),
-        )
-        
-        # log
-        if   self.severity==self.SEVERITY_INFO:
-            log.info(output)
-        elif self.severity==self.SEVERITY_ERROR:
-            log.error(output)
-        elif self.severity==self.SEVERITY_CRITICAL:
-            log.critical(output)
-        else:
-            raise SystemError("unexpected severity={0}".format(self.severity))
+        # errors and criticals are aggregated, only the first occurrence and
+        # periodic summaries are logged
+        if self.errorAggregator:
+            self.errorAggregator.indicateError(self.severity,moteId,callingComponent,error_code,arg1,arg2)
+        elif log.isEnabledFor(logging.INFO):
+            log.info("{MOTEID:x} [{COMPONENT}] {ERROR_DESC}".format(
+                COMPONENT  = _translateCallingComponent(callingComponent),
+                MOTEID     = moteId,
+                ERROR_DESC = _translateErrorDescription(error_code,arg1,arg2),
+            ))
         
         return ('error',input)
-    
-    #======================== private =========================================
-    
-    def _translateCallingComponent(self,callingComponent):
-        try:
-            return StackDefines.components[callingComponent]
-        except KeyError:
-            return "unknown component code {0}".format(callingComponent)
-    
-    def _translateErrorDescription(self,error_code,arg1,arg2):
-        try:
-            return StackDefines.errorDescriptions[error_code].format(arg1,arg2)
-        except KeyError:
-            return "unknown error {0} arg1={1} arg2={2}".format(error_code,arg1,arg2)
\ No newline at end of file
+
+#============================ helpers =========================================
+
+def _translateCallingComponent(callingComponent):
+    try:
+        return StackDefines.components[callingComponent]
+    except KeyError:
+        return "unknown component code {0}".format(callingComponent)
+
+def _translateErrorDescription(error_code,arg1,arg2):
+    try:
+        return StackDefines.errorDescriptions[error_code].format(arg1,arg2)
+    except KeyError:
+        return "unknown error {0} arg1={1} arg2={2}".format(error_code,arg1,arg2)
@@ -0,0 +1,335 @@
+# DO NOT EDIT DIRECTLY!
+# This file was generated automatically by GenStatusCodecs.py
+# on Mon, 19 Oct 2026 08:22:44
+#
+
+import struct
+
+#============================ defines =========================================
+
+HEADER = struct.Struct('<HB')
+
+STATUS_ISSYNC               = 0
+STATUS_ID                   = 1
+STATUS_DAGRANK              = 2
+STATUS_OUTBUFFERINDEXES     = 3
+STATUS_ASN                  = 4
+STATUS_MACSTATS             = 5
+STATUS_SCHEDULE             = 6
+STATUS_BACKOFF              = 7
+STATUS_QUEUE                = 8
+STATUS_NEIGHBORS            = 9
+STATUS_KAPERIOD             = 10
+
+#============================ records =========================================
+
+class StatusRecord(object):
+    __slots__ = ()
+    _fields   = ()
+    
+    def __eq__(self,other):
+        return type(self)==type(other) and self._astuple()==other._astuple()
+    
+    def __ne__(self,other):
+        return not self==other
+    
+    def __repr__(self):
+        return '{0}({1})'.format(
+            type(self).__name__,
+            ', '.join(['{0}={1!r}'.format(f,getattr(self,f)) for f in self._fields]),
+        )
+    
+    def _astuple(self):
+        return tuple([getattr(self,f) for f in self._fields])
+    
+    def _asdict(self):
+        return dict([(f,getattr(self,f)) for f in self._fields])
+
+class Status_IsSync(StatusRecord):
+    __slots__ = (
+        'isSync',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,isSync):
+        self.isSync                   = isSync
+
+class Status_IdManager(StatusRecord):
+    __slots__ = (
+        'isDAGroot',
+        'myPANID_0',
+        'myPANID_1',
+        'my16bID_0',
+        'my16bID_1',
+        'my64bID_0',
+        'my64bID_1',
+        'my64bID_2',
+        'my64bID_3',
+        'my64bID_4',
+        'my64bID_5',
+        'my64bID_6',
+        'my64bID_7',
+        'myPrefix_0',
+        'myPrefix_1',
+        'myPrefix_2',
+        'myPrefix_3',
+        'myPrefix_4',
+        'myPrefix_5',
+        'myPrefix_6',
+        'myPrefix_7',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,isDAGroot,myPANID_0,myPANID_1,my16bID_0,my16bID_1,my64bID_0,my64bID_1,my64bID_2,my64bID_3,my64bID_4,my64bID_5,my64bID_6,my64bID_7,myPrefix_0,myPrefix_1,myPrefix_2,myPrefix_3,myPrefix_4,myPrefix_5,myPrefix_6,myPrefix_7):
+        self.isDAGroot                = isDAGroot
+        self.myPANID_0                = myPANID_0
+        self.myPANID_1                = myPANID_1
+        self.my16bID_0                = my16bID_0
+        self.my16bID_1                = my16bID_1
+        self.my64bID_0                = my64bID_0
+        self.my64bID_1                = my64bID_1
+        self.my64bID_2                = my64bID_2
+        self.my64bID_3                = my64bID_3
+        self.my64bID_4                = my64bID_4
+        self.my64bID_5                = my64bID_5
+        self.my64bID_6                = my64bID_6
+        self.my64bID_7                = my64bID_7
+        self.myPrefix_0               = myPrefix_0
+        self.myPrefix_1               = myPrefix_1
+        self.myPrefix_2               = myPrefix_2
+        self.myPrefix_3               = myPrefix_3
+        self.myPrefix_4               = myPrefix_4
+        self.myPrefix_5               = myPrefix_5
+        self.myPrefix_6               = myPrefix_6
+        self.myPrefix_7               = myPrefix_7
+
+class Status_MyDagRank(StatusRecord):
+    __slots__ = (
+        'myDAGrank',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,myDAGrank):
+        self.myDAGrank                = myDAGrank
+
+class Status_OutputBuffer(StatusRecord):
+    __slots__ = (
+        'index_write',
+        'index_read',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,index_write,index_read):
+        self.index_write              = index_write
+        self.index_read               = index_read
+
+class Status_Asn(StatusRecord):
+    __slots__ = (
+        'asn_4',
+        'asn_2_3',
+        'asn_0_1',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,asn_4,asn_2_3,asn_0_1):
+        self.asn_4                    = asn_4
+        self.asn_2_3                  = asn_2_3
+        self.asn_0_1                  = asn_0_1
+
+class Status_MacStats(StatusRecord):
+    __slots__ = (
+        'numSyncPkt',
+        'numSyncAck',
+        'minCorrection',
+        'maxCorrection',
+        'numDeSync',
+        'numTicsOn',
+        'numTicsTotal',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,numSyncPkt,numSyncAck,minCorrection,maxCorrection,numDeSync,numTicsOn,numTicsTotal):
+        self.numSyncPkt               = numSyncPkt
+        self.numSyncAck               = numSyncAck
+        self.minCorrection            = minCorrection
+        self.maxCorrection            = maxCorrection
+        self.numDeSync                = numDeSync
+        self.numTicsOn                = numTicsOn
+        self.numTicsTotal             = numTicsTotal
+
+class Status_ScheduleRow(StatusRecord):
+    __slots__ = (
+        'row',
+        'slotOffset',
+        'type',
+        'shared',
+        'channelOffset',
+        'neighbor_type',
+        'neighbor_bodyH',
+        'neighbor_bodyL',
+        'numRx',
+        'numTx',
+        'numTxACK',
+        'lastUsedAsn_4',
+        'lastUsedAsn_2_3',
+        'lastUsedAsn_0_1',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,row,slotOffset,type,shared,channelOffset,neighbor_type,neighbor_bodyH,neighbor_bodyL,numRx,numTx,numTxACK,lastUsedAsn_4,lastUsedAsn_2_3,lastUsedAsn_0_1):
+        self.row                      = row
+        self.slotOffset               = slotOffset
+        self.type                     = type
+        self.shared                   = shared
+        self.channelOffset            = channelOffset
+        self.neighbor_type            = neighbor_type
+        self.neighbor_bodyH           = neighbor_bodyH
+        self.neighbor_bodyL           = neighbor_bodyL
+        self.numRx                    = numRx
+        self.numTx                    = numTx
+        self.numTxACK                 = numTxACK
+        self.lastUsedAsn_4            = lastUsedAsn_4
+        self.lastUsedAsn_2_3          = lastUsedAsn_2_3
+        self.lastUsedAsn_0_1          = lastUsedAsn_0_1
+
+class Status_Backoff(StatusRecord):
+    __slots__ = (
+        'backoffExponent',
+        'backoff',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,backoffExponent,backoff):
+        self.backoffExponent          = backoffExponent
+        self.backoff                  = backoff
+
+class Status_QueueRow(StatusRecord):
+    __slots__ = (
+        'creator_0',
+        'owner_0',
+        'creator_1',
+        'owner_1',
+        'creator_2',
+        'owner_2',
+        'creator_3',
+        'owner_3',
+        'creator_4',
+        'owner_4',
+        'creator_5',
+        'owner_5',
+        'creator_6',
+        'owner_6',
+        'creator_7',
+        'owner_7',
+        'creator_8',
+        'owner_8',
+        'creator_9',
+        'owner_9',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,creator_0,owner_0,creator_1,owner_1,creator_2,owner_2,creator_3,owner_3,creator_4,owner_4,creator_5,owner_5,creator_6,owner_6,creator_7,owner_7,creator_8,owner_8,creator_9,owner_9):
+        self.creator_0                = creator_0
+        self.owner_0                  = owner_0
+        self.creator_1                = creator_1
+        self.owner_1                  = owner_1
+        self.creator_2                = creator_2
+        self.owner_2                  = owner_2
+        self.creator_3                = creator_3
+        self.owner_3                  = owner_3
+        self.creator_4                = creator_4
+        self.owner_4                  = owner_4
+        self.creator_5                = creator_5
+        self.owner_5                  = owner_5
+        self.creator_6                = creator_6
+        self.owner_6                  = owner_6
+        self.creator_7                = creator_7
+        self.owner_7                  = owner_7
+        self.creator_8                = creator_8
+        self.owner_8                  = owner_8
+        self.creator_9                = creator_9
+        self.owner_9                  = owner_9
+
+class Status_NeighborsRow(StatusRecord):
+    __slots__ = (
+        'row',
+        'used',
+        'parentPreference',
+        'stableNeighbor',
+        'switchStabilityCounter',
+        'addr_type',
+        'addr_bodyH',
+        'addr_bodyL',
+        'DAGrank',
+        'rssi',
+        'numRx',
+        'numTx',
+        'numTxACK',
+        'numWraps',
+        'asn_4',
+        'asn_2_3',
+        'asn_0_1',
+        'joinPrio',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,row,used,parentPreference,stableNeighbor,switchStabilityCounter,addr_type,addr_bodyH,addr_bodyL,DAGrank,rssi,numRx,numTx,numTxACK,numWraps,asn_4,asn_2_3,asn_0_1,joinPrio):
+        self.row                      = row
+        self.used                     = used
+        self.parentPreference         = parentPreference
+        self.stableNeighbor           = stableNeighbor
+        self.switchStabilityCounter   = switchStabilityCounter
+        self.addr_type                = addr_type
+        self.addr_bodyH               = addr_bodyH
+        self.addr_bodyL               = addr_bodyL
+        self.DAGrank                  = DAGrank
+        self.rssi                     = rssi
+        self.numRx                    = numRx
+        self.numTx                    = numTx
+        self.numTxACK                 = numTxACK
+        self.numWraps                 = numWraps
+        self.asn_4                    = asn_4
+        self.asn_2_3                  = asn_2_3
+        self.asn_0_1                  = asn_0_1
+        self.joinPrio                 = joinPrio
+
+class Status_kaPeriod(StatusRecord):
+    __slots__ = (
+        'kaPeriod',
+    )
+    _fields   = __slots__
+    
+    def __init__(self,kaPeriod):
+        self.kaPeriod                 = kaPeriod
+
+#============================ dispatch ========================================
+
+# status element code -> (name, structure, record class)
+parsers = {
+    STATUS_ISSYNC              : ('IsSync', struct.Struct('<B'), Status_IsSync),
+    STATUS_ID                  : ('IdManager', struct.Struct('<BBBBBBBBBBBBBBBBBBBBB'), Status_IdManager),
+    STATUS_DAGRANK             : ('MyDagRank', struct.Struct('<H'), Status_MyDagRank),
+    STATUS_OUTBUFFERINDEXES    : ('OutputBuffer', struct.Struct('<HH'), Status_OutputBuffer),
+    STATUS_ASN                 : ('Asn', struct.Struct('<BHH'), Status_Asn),
+    STATUS_MACSTATS            : ('MacStats', struct.Struct('<BBhhBII'), Status_MacStats),
+    STATUS_SCHEDULE            : ('ScheduleRow', struct.Struct('<BHBBBBQQBBBBHH'), Status_ScheduleRow),
+    STATUS_BACKOFF             : ('Backoff', struct.Struct('<BB'), Status_Backoff),
+    STATUS_QUEUE               : ('QueueRow', struct.Struct('<BBBBBBBBBBBBBBBBBBBB'), Status_QueueRow),
+    STATUS_NEIGHBORS           : ('NeighborsRow', struct.Struct('<BBBBBBQQHbBBBBBHHB'), Status_NeighborsRow),
+    STATUS_KAPERIOD            : ('kaPeriod', struct.Struct('<H'), Status_kaPeriod),
+}
+
+# status element name -> record class
+records = {
+    'IsSync'                   : Status_IsSync,
+    'IdManager'                : Status_IdManager,
+    'MyDagRank'                : Status_MyDagRank,
+    'OutputBuffer'             : Status_OutputBuffer,
+    'Asn'                      : Status_Asn,
+    'MacStats'                 : Status_MacStats,
+    'ScheduleRow'              : Status_ScheduleRow,
+    'Backoff'                  : Status_Backoff,
+    'QueueRow'                 : Status_QueueRow,
+    'NeighborsRow'             : Status_NeighborsRow,
+    'kaPeriod'                 : Status_kaPeriod,
+}
@@ -24,7 +24,12 @@ import ParserException
 
 class moteConnector(eventBusClient.eventBusClient):
     
-    def __init__(self,serialport):
+    def __init__(self,serialport,network=None):
+        '''
+        :param serialport: [in] The serial port of the mote.
+        :param network:    [in] The network the mote belongs to, see
+            eventBusClient. If None, the global event bus.
+        '''
         
         # log
         log.info("creating instance")
@@ -33,9 +38,10 @@ class moteConnector(eventBusClient.eventBusClient):
         self.serialport                = serialport
         
         # local variables
-        self.parser                    = OpenParser.OpenParser()
+        self.parser                    = OpenParser.OpenParser(network)
         self.stateLock                 = threading.Lock()
         self.networkPrefix             = None
+        self.dagRootEui64              = None
         self._subcribedDataForDagRoot  = False
               
         # give this thread a name
@@ -44,6 +50,7 @@ class moteConnector(eventBusClient.eventBusClient):
         eventBusClient.eventBusClient.__init__(
             self,
             name             = self.name,
+            network          = network,
             registrations =  [
                 {
                     'sender'   : self.WILDCARD,
@@ -93,7 +100,13 @@ class moteConnector(eventBusClient.eventBusClient):
             return 
         
         with self.stateLock:
-        
+            
+            # remember the address of my mote, if it is a DAGroot
+            if data['isDAGroot']==1:
+                self.dagRootEui64 = list(data['eui64'])
+            else:
+                self.dagRootEui64 = None
+            
             if   data['isDAGroot']==1 and (not self._subcribedDataForDagRoot):
                 # this moteConnector is connected to a DAGroot
                 
@@ -219,9 +232,16 @@ class moteConnector(eventBusClient.eventBusClient):
 
     def _bytesToMesh_handler(self,sender,signal,data):
         assert type(data)==tuple
-        assert len(data)==2
+        assert len(data) in [2,3]
+        
+        (nextHop,lowpan) = data[:2]
         
-        (nextHop,lowpan) = data
+        # when several DAGroots are attached, only the one the packet is
+        # for sends it
+        if len(data)==3:
+            with self.stateLock:
+                if list(data[2])!=self.dagRootEui64:
+                    return
         
         self._sendToMoteProbe(
             dataToSend = [OpenParser.OpenParser.SERFRAME_PC2MOTE_DATA]+nextHop+lowpan,
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteConnector/
+
+import logging
+import logging.handlers
+import json
+import struct
+
+import pytest
+
+import ParserData
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_ParserData.log'
+
+import logging
+log = logging.getLogger('test_ParserData')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_ParserData',
+                   'ParserData',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+    
+#============================ defines =========================================
+
+DEST   = [0x11]*8
+SOURCE = [0x22]*8
+NODE   = [0xbb]*8
+PARENT = [0xaa]*8
+
+#============================ fixtures ========================================
+
+# (reception ASN, emission ASN, expected latency or None if not valid)
+LATENCIES = [
+    json.dumps(((0x0100,0x0007,0x00),(0x00f0,0x0007,0x00),16*ParserData.ParserData.MSPERSLOT)),
+    json.dumps(((0x0000,0x0008,0x00),(0xfffe,0x0007,0x00),2*ParserData.ParserData.MSPERSLOT)),
+    json.dumps(((0x0002,0x0009,0x00),(0xfffe,0x0007,0x00),None)),
+    json.dumps(((0x0002,0x0007,0x01),(0x0001,0x0007,0x00),None)),
+]
+
+@pytest.fixture(params=LATENCIES)
+def latency(request):
+    return request.param
+
+#============================ helpers =========================================
+
+def buildInput(asnRx,payload):
+    return [0x00,0x00]+[ord(b) for b in struct.pack('<HHB',*asnRx)]+DEST+SOURCE+payload
+
+def latencyPayload(asnTx,SN):
+    payload  = [0x00]*36+[0xee,0x49]+[0x00]*10
+    payload += [ord(b) for b in struct.pack('>H',SN)]+PARENT+NODE
+    payload += [ord(b) for b in struct.pack('<HHB',*asnTx)]
+    return payload
+
+#============================ tests ===========================================
+
+def test_data():
+    
+    ParserData.latencySamples.clear()
+    
+    payload   = [0x00]*48
+    input     = buildInput((0x0100,0x0007,0x00),payload)
+    
+    assert ParserData.ParserData().parseInput(input)==('data',(SOURCE,payload))
+    assert len(ParserData.latencySamples)==0
+
+def test_latency(latency):
+    
+    ParserData.latencySamples.clear()
+    
+    (asnRx,asnTx,expected) = json.loads(latency)
+    payload   = latencyPayload(asnTx,0x0102)
+    input     = buildInput(asnRx,payload)
+    
+    # the packet is forwarded unchanged
+    assert ParserData.ParserData().parseInput(input)==('data',(SOURCE,payload))
+    
+    if expected is None:
+        assert len(ParserData.latencySamples)==0
+    else:
+        assert list(ParserData.latencySamples)==[
+            (''.join([chr(b) for b in NODE]),expected,''.join([chr(b) for b in PARENT]),0x0102)
+        ]
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteConnector/
+
+import logging
+import logging.handlers
+
+import pytest
+
+import ParserInfoErrorCritical
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_ParserInfoErrorCritical.log'
+
+import logging
+log = logging.getLogger('test_ParserInfoErrorCritical')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_ParserInfoErrorCritical',
+                   'ParserInfoErrorCritical',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+ERROR     = ParserInfoErrorCritical.ErrorAggregator.SEVERITY_ERROR
+CRITICAL  = ParserInfoErrorCritical.ErrorAggregator.SEVERITY_CRITICAL
+
+#============================ helpers =========================================
+
+class RecordingHandler(logging.Handler):
+    '''
+    Records the messages logged by the aggregator.
+    '''
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+    def emit(self,record):
+        self.messages.append((record.levelno,record.getMessage()))
+
+@pytest.fixture
+def aggregator(request):
+    aggregator = ParserInfoErrorCritical.ErrorAggregator()
+    aggregator.clear()
+    handler    = RecordingHandler()
+    aggregator.messages = handler.messages
+    logging.getLogger('ParserInfoErrorCritical').addHandler(handler)
+    def fin():
+        logging.getLogger('ParserInfoErrorCritical').removeHandler(handler)
+        aggregator.close()
+    request.addfinalizer(fin)
+    return aggregator
+
+#============================ tests ===========================================
+
+def test_aggregation(aggregator):
+
+    for _ in range(3):
+        aggregator.indicateError(ERROR,0x0a1b,1,2,3,4)
+    aggregator.indicateError(CRITICAL,0x0a1c,1,2,3,4)
+
+    # only the first occurrences are logged
+    assert [level for (level,_) in aggregator.messages]==[logging.ERROR,logging.CRITICAL]
+    errors = aggregator.getErrors()
+    assert [(e['moteId'],e['severity'],e['count']) for e in errors]==[('0a1c','C',1),('0a1b','E',3)]
+
+def test_summary(aggregator):
+
+    for _ in range(3):
+        aggregator.indicateError(ERROR,0x0a1b,1,2,3,4)
+    aggregator.indicateError(ERROR,0x0a1c,1,2,3,4)
+    del aggregator.messages[:]
+
+    # only the errors which repeated are summarized, once
+    aggregator._logSummary()
+    assert len(aggregator.messages)==1
+    assert aggregator.messages[0][1].startswith('a1b ')
+    assert 'repeated 2 times' in aggregator.messages[0][1]
+    aggregator._logSummary()
+    assert len(aggregator.messages)==1
+
+def test_overflow(aggregator):
+
+    aggregator.MAX_NUM_ENTRIES = 2
+    aggregator.indicateError(ERROR,0x0001,1,2,3,4)
+    aggregator.indicateError(ERROR,0x0002,1,2,3,4)
+    aggregator.indicateError(ERROR,0x0002,1,2,3,4)
+    aggregator.indicateError(ERROR,0x0001,1,2,3,4)
+    del aggregator.messages[:]
+
+    # the least recently seen error makes room, its repeats are logged
+    aggregator.indicateError(ERROR,0x0003,1,2,3,4)
+    assert [e['moteId'] for e in aggregator.getErrors()]==['0003','0001']
+    assert aggregator.getNumEvicted()==1
+    assert len(aggregator.messages)==2
+    assert aggregator.messages[0][1].startswith('3 ')
+    assert aggregator.messages[1][1].startswith('2 ')
+    assert 'repeated 1 times' in aggregator.messages[1][1]
+
+def test_expiry(aggregator):
+
+    aggregator.indicateError(ERROR,0x0001,1,2,3,4)
+    aggregator.indicateError(ERROR,0x0002,1,2,3,4)
+    aggregator.entries[(0x0001,1,2)].lastSeen -= aggregator.ENTRY_TIMEOUT+1
+
+    aggregator._logSummary()
+    assert [e['moteId'] for e in aggregator.getErrors()]==['0002']
+
+    # a forgotten error is logged again
+    del aggregator.messages[:]
+    aggregator.indicateError(ERROR,0x0001,1,2,3,4)
+    assert len(aggregator.messages)==1
+
+def test_restart(aggregator):
+
+    assert ParserInfoErrorCritical.ErrorAggregator() is aggregator
+    aggregator.close()
+    aggregator.join()
+
+    newAggregator = ParserInfoErrorCritical.ErrorAggregator()
+    try:
+        assert newAggregator is not aggregator
+        assert newAggregator.isAlive()
+        assert ParserInfoErrorCritical.ErrorAggregator() is newAggregator
+    finally:
+        newAggregator.close()
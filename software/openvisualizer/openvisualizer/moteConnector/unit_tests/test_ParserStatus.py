@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteConnector/
+
+import logging
+import logging.handlers
+import json
+import struct
+
+import pytest
+
+import GenStatusCodecs
+import StatusCodecs
+import ParserStatus
+from ParserException import ParserException
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_ParserStatus.log'
+
+import logging
+log = logging.getLogger('test_ParserStatus')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_ParserStatus',
+                   'ParserStatus',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+    
+#============================ defines =========================================
+
+MOTEID = 0x0a1b
+
+OPENSERIAL_H = '''
+enum {
+   STATUS_ISSYNC                 =  0,
+   STATUS_ID                     =  1,
+   STATUS_DAGRANK                =  2,
+   STATUS_OUTBUFFERINDEXES       =  3,
+   STATUS_ASN                    =  4,
+   STATUS_MACSTATS               =  5,
+   STATUS_SCHEDULE               =  6,
+   STATUS_BACKOFF                =  7,
+   STATUS_QUEUE                  =  8,
+   STATUS_NEIGHBORS              =  9,
+   STATUS_KAPERIOD               = 10,
+   STATUS_MAX                    = 11,
+};
+'''
+
+#============================ fixtures ========================================
+
+STATUSELEMENTS = [
+    json.dumps(e) for e in GenStatusCodecs.STATUS_ELEMENTS
+]
+
+@pytest.fixture(params=STATUSELEMENTS)
+def statusElement(request):
+    return request.param
+
+#============================ helpers =========================================
+
+def sampleValues(structure):
+    # a distinct value for each field, in range of its type
+    return [(i+1)%0x7f for i in range(len(struct.unpack(structure,'\x00'*struct.calcsize(structure))))]
+
+#============================ tests ===========================================
+
+def test_generatedUpToDate():
+    '''
+    Verifies StatusCodecs.py was regenerated after the last change to
+    GenStatusCodecs.py.
+    '''
+    
+    path      = os.path.join(here, '..', 'StatusCodecs.py')
+    generated = open(path,'r').read()
+    generated = generated[generated.index('\n\n')+2:] # skip header comment
+    
+    assert generated==GenStatusCodecs.genOutput()
+
+def test_layouts():
+    assert GenStatusCodecs.checkLayouts()==[]
+
+def test_parse(statusElement):
+    
+    (enumName,code,name,structure,fields) = json.loads(statusElement)
+    
+    values    = sampleValues(structure)
+    input     = [ord(b) for b in struct.pack('<HB',MOTEID,code)+struct.pack(structure,*values)]
+    
+    (eventSubType,notif) = ParserStatus.ParserStatus().parseInput(input)
+    
+    log.debug('parsed {0} into {1}'.format(input,notif))
+    
+    assert eventSubType=='status'
+    assert type(notif)==StatusCodecs.records[name]
+    assert notif._fields==tuple(fields)
+    assert notif._astuple()==tuple(values)
+    assert notif==StatusCodecs.records[name](*values)
+
+def test_parseWrongLength(statusElement):
+    
+    (enumName,code,name,structure,fields) = json.loads(statusElement)
+    
+    input     = [ord(b) for b in struct.pack('<HB',MOTEID,code)+struct.pack(structure,*sampleValues(structure))]
+    
+    with pytest.raises(ParserException):
+        ParserStatus.ParserStatus().parseInput(input[:-1])
+    with pytest.raises(ParserException):
+        ParserStatus.ParserStatus().parseInput(input+[0x00])
+
+def test_parseUnknownElement():
+    
+    input     = [ord(b) for b in struct.pack('<HB',MOTEID,0xff)]+[0x00]
+    
+    with pytest.raises(ParserException):
+        ParserStatus.ParserStatus().parseInput(input)
+
+def test_noDrift():
+    assert GenStatusCodecs.checkDrift(OPENSERIAL_H.splitlines())==[]
+
+def test_drift():
+    
+    lines     = OPENSERIAL_H.replace('STATUS_KAPERIOD               = 10','STATUS_KAPERIOD               = 11')
+    lines     = lines.replace('STATUS_MAX                    = 11','STATUS_JOINED                 = 12')
+    drift     = GenStatusCodecs.checkDrift(lines.splitlines())
+    
+    assert len(drift)==2
+    assert drift[0].startswith('STATUS_KAPERIOD')
+    assert drift[1].startswith('STATUS_JOINED')
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteConnector/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+
+import pytest
+
+import moteConnector
+import OpenParser
+from pydispatch import dispatcher
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteConnector.log'
+
+import logging
+log = logging.getLogger('test_moteConnector')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_moteConnector',
+                   'moteConnector',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+ROOT_1   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+ROOT_2   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]
+MOTE_A   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]
+LOWPAN   = [0x78,0x33,0x3a,0x80,0x00]
+
+#============================ fixtures ========================================
+
+@pytest.fixture
+def connectors(request):
+    '''
+    The moteConnectors of two DAGroots, recording the data they send to
+    their mote.
+    '''
+    returnVal = []
+    for (port,root) in [('COM1',ROOT_1),('COM2',ROOT_2)]:
+        mc        = moteConnector.moteConnector(port)
+        mc.sent   = []
+        mc._sendToMoteProbe = lambda dataToSend, mc=mc: mc.sent.append(dataToSend)
+        mc._infoDagRoot_handler(None,'infoDagRoot',{'isDAGroot': 1, 'eui64': root, 'serialPort': port})
+        returnVal += [mc]
+    
+    def fin():
+        for mc in returnVal:
+            dispatcher.disconnect(mc._eventBusNotification)
+            dispatcher.disconnect(mc._sendToParser,signal='fromMoteProbe@'+mc.serialport)
+    request.addfinalizer(fin)
+    
+    return returnVal
+
+#============================ tests ===========================================
+
+def test_bytesToMeshDagRoot(connectors):
+    
+    # only the DAGroot the packet is for sends it
+    dispatcher.send(sender='test',signal='bytesToMesh',data=(MOTE_A,LOWPAN,ROOT_2))
+    
+    assert [mc.sent for mc in connectors]==[
+        [],
+        [[OpenParser.OpenParser.SERFRAME_PC2MOTE_DATA]+MOTE_A+LOWPAN],
+    ]
+
+def test_bytesToMeshAnyDagRoot(connectors):
+    
+    # no DAGroot given
+    dispatcher.send(sender='test',signal='bytesToMesh',data=(MOTE_A,LOWPAN))
+    
+    assert [len(mc.sent) for mc in connectors]==[1,1]
+
+def test_bytesToMeshNotDagRoot(connectors):
+    
+    (mc1,mc2) = connectors
+    mc2._infoDagRoot_handler(None,'infoDagRoot',{'isDAGroot': 0, 'eui64': ROOT_2, 'serialPort': 'COM2'})
+    
+    dispatcher.send(sender='test',signal='bytesToMesh',data=(MOTE_A,LOWPAN,ROOT_2))
+    
+    assert [mc.sent for mc in connectors]==[[],[]]
@@ -0,0 +1,225 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Contains the moteHistory class, which keeps a bounded time-series history of
+numeric metrics reported by a mote.
+
+Each metric is stored at several resolutions (raw samples, 10s averages and
+1min averages), each in a fixed-size ring buffer. The memory used per mote is
+therefore fixed, regardless of how long OpenVisualizer has been running.
+'''
+import logging
+log = logging.getLogger('moteHistory')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import array
+import collections
+import threading
+import time
+
+class RingBuffer(object):
+    '''
+    Fixed-capacity buffer of (timestamp,value) samples.
+
+    Storage is allocated once at creation; once full, the oldest sample is
+    overwritten.
+    '''
+
+    def __init__(self,capacity):
+        assert capacity>0
+
+        # store params
+        self.capacity        = capacity
+
+        # local variables
+        self.timestamps      = array.array('d',[0.0]*capacity)
+        self.values          = array.array('d',[0.0]*capacity)
+        self.head            = 0 # index of next write
+        self.count           = 0
+
+    #======================== public ==========================================
+
+    def append(self,timestamp,value):
+        self.timestamps[self.head]     = timestamp
+        self.values[self.head]         = value
+        self.head                      = (self.head+1)%self.capacity
+        if self.count<self.capacity:
+            self.count                += 1
+
+    def query(self,start,end):
+        '''
+        Retrieve the samples in a time range, oldest first.
+
+        :param start: [in] Start of the range (inclusive), or None.
+        :param end:   [in] End of the range (inclusive), or None.
+
+        :returns: A tuple (timestamps,values) of lists.
+        '''
+        timestamps           = []
+        values               = []
+        idx                  = (self.head-self.count)%self.capacity
+        for _ in range(self.count):
+            ts               = self.timestamps[idx]
+            if (start is None or ts>=start) and (end is None or ts<=end):
+                timestamps.append(ts)
+                values.append(self.values[idx])
+            idx              = (idx+1)%self.capacity
+        return (timestamps,values)
+
+class DownsampledBuffer(RingBuffer):
+    '''
+    Ring buffer which stores the average of the samples received during each
+    period, timestamped with the start of that period.
+    '''
+
+    def __init__(self,period,capacity):
+
+        # initialize parent class
+        RingBuffer.__init__(self,capacity)
+
+        # store params
+        self.period          = period
+
+        # local variables
+        self.bucketStart     = None
+        self.bucketSum       = 0.0
+        self.bucketNum       = 0
+
+    #======================== public ==========================================
+
+    def add(self,timestamp,value):
+        bucketStart          = timestamp-(timestamp%self.period)
+        if self.bucketStart!=None and bucketStart!=self.bucketStart:
+            self._closeBucket()
+        self.bucketStart     = bucketStart
+        self.bucketSum      += value
+        self.bucketNum      += 1
+
+    def query(self,start,end):
+        (timestamps,values)  = RingBuffer.query(self,start,end)
+
+        # the period in progress is returned as well
+        if self.bucketNum:
+            ts               = self.bucketStart
+            if (start is None or ts>=start) and (end is None or ts<=end):
+                timestamps.append(ts)
+                values.append(self.bucketSum/self.bucketNum)
+
+        return (timestamps,values)
+
+    #======================== private =========================================
+
+    def _closeBucket(self):
+        self.append(self.bucketStart,self.bucketSum/self.bucketNum)
+        self.bucketSum       = 0.0
+        self.bucketNum       = 0
+
+class MetricHistory(object):
+    '''
+    History of a single metric, at all resolutions.
+    '''
+
+    def __init__(self):
+        self.buffers         = {
+            moteHistory.RES_RAW:     RingBuffer(moteHistory.RAW_CAPACITY),
+            moteHistory.RES_10S:     DownsampledBuffer(10,moteHistory.DOWNSAMPLED_10S_CAPACITY),
+            moteHistory.RES_1MIN:    DownsampledBuffer(60,moteHistory.DOWNSAMPLED_1MIN_CAPACITY),
+        }
+
+    def add(self,timestamp,value):
+        self.buffers[moteHistory.RES_RAW].append(timestamp,value)
+        self.buffers[moteHistory.RES_10S].add(timestamp,value)
+        self.buffers[moteHistory.RES_1MIN].add(timestamp,value)
+
+    def query(self,start,end,resolution):
+        return self.buffers[resolution].query(start,end)
+
+class moteHistory(object):
+    '''
+    Memory-bounded time-series history of the metrics of a single mote.
+    '''
+
+    RES_RAW                     = 'raw'
+    RES_10S                     = '10s'
+    RES_1MIN                    = '1min'
+    RES_ALL                     = [
+        RES_RAW,
+        RES_10S,
+        RES_1MIN,
+    ]
+
+    # number of samples kept at each resolution
+    RAW_CAPACITY                = 360  # status elements arrive every few seconds
+    DOWNSAMPLED_10S_CAPACITY    = 360  # 1 hour
+    DOWNSAMPLED_1MIN_CAPACITY   = 1440 # 1 day
+
+    # maximum number of metrics tracked per mote, so memory stays fixed; the
+    # metric least recently recorded is forgotten to make room for a new one
+    MAX_NUM_METRICS             = 32
+
+    def __init__(self):
+
+        # local variables
+        self.dataLock        = threading.Lock()
+        self.metrics         = collections.OrderedDict() # name -> MetricHistory, least recently recorded first
+
+    #======================== public ==========================================
+
+    def record(self,metric,value,timestamp=None):
+        '''
+        Record a new sample of a metric.
+
+        :param metric:    [in] The name of the metric.
+        :param value:     [in] The numeric value of the sample.
+        :param timestamp: [in] Time of the sample, in seconds since the epoch.
+            Defaults to now.
+        '''
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.dataLock:
+            history = self.metrics.pop(metric,None)
+            if history is None:
+                if len(self.metrics)>=self.MAX_NUM_METRICS:
+                    (oldest,_) = self.metrics.popitem(last=False)
+                    log.info('too many metrics, forgetting {0}'.format(oldest))
+                history = MetricHistory()
+            history.add(timestamp,float(value))
+            # most recently recorded last
+            self.metrics[metric] = history
+
+    def getMetricNames(self):
+        with self.dataLock:
+            return sorted(self.metrics.keys())
+
+    def getHistory(self,metric,start=None,end=None,resolution=RES_RAW):
+        '''
+        Retrieve the history of a metric over a time range.
+
+        :param metric:     [in] The name of the metric.
+        :param start:      [in] Start of the range, in seconds since the epoch,
+            or None for the oldest sample available.
+        :param end:        [in] End of the range, in seconds since the epoch,
+            or None for the most recent sample available.
+        :param resolution: [in] One of RES_ALL.
+
+        :raises: ValueError if the metric or resolution is unknown.
+
+        :returns: A dictionary with a 'timestamps' and a 'values' array.
+        '''
+        if resolution not in self.RES_ALL:
+            raise ValueError('No resolution called {0}'.format(resolution))
+
+        with self.dataLock:
+            if metric not in self.metrics:
+                raise ValueError('No metric called {0}'.format(metric))
+            (timestamps,values) = self.metrics[metric].query(start,end,resolution)
+
+        return {
+            'timestamps':    timestamps,
+            'values':        values,
+        }
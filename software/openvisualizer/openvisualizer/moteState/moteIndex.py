@@ -0,0 +1,193 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Contains the moteIndex class, which allows moteState objects to be looked up
+by 16-bit ID, EUI-64 or serial port name without scanning all motes.
+'''
+import logging
+log = logging.getLogger('moteIndex')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+from openvisualizer.eventBus      import eventBusClient
+from openvisualizer.moteState     import moteState
+
+class moteIndex(eventBusClient.eventBusClient):
+    '''
+    Index of the moteState objects of the connected motes.
+
+    The index is kept up to date by listening to the 'infoMoteId' signal,
+    dispatched each time a mote reports a new address. The motes of a
+    network dispatch it on the event bus of that network, see addNetwork().
+    '''
+
+    def __init__(self):
+
+        # log
+        log.info("create instance")
+
+        # local variables
+        self.motes           = []  # moteState objects, in order of addition
+        self.bySerialPort    = {}  # serial port -> moteState
+        self.by16bId         = {}  # 16-bit ID, as hex string -> moteState
+        self.byEui64         = {}  # EUI-64, as tuple -> moteState
+        self.ids             = {}  # serial port -> (16-bit ID, EUI-64)
+
+        # initialize parent class
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name             = 'moteIndex',
+            registrations    = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'infoMoteId',
+                    'callback'    : self._infoMoteId_notif,
+                },
+            ]
+        )
+
+    #======================== public ==========================================
+
+    def addMote(self,ms):
+        '''
+        Add a mote to the index.
+
+        The addresses already known by the mote, if any, are indexed right
+        away, so no address change is missed.
+
+        :param ms: [in] The moteState object of the mote.
+        '''
+        serialPort = ms.moteConnector.serialport
+        idManager  = ms.getStateElem(moteState.moteState.ST_IDMANAGER)
+
+        with self.dataLock:
+            self.motes.append(ms)
+            self.bySerialPort[serialPort] = ms
+            self.ids[serialPort]          = (None,None)
+            my16bID = idManager.get16bAddr()
+            my64bID = idManager.get64bAddr()
+            if my16bID or my64bID:
+                self._updateIds(serialPort,my16bID,my64bID)
+
+    def removeMote(self,ms):
+        '''
+        Remove a mote from the index, e.g. when it is disconnected.
+
+        :param ms: [in] The moteState object of the mote.
+        '''
+        serialPort = ms.moteConnector.serialport
+
+        with self.dataLock:
+            if self.bySerialPort.get(serialPort) is not ms:
+                log.debug('removing unindexed mote {0}'.format(serialPort))
+                return
+            self._updateIds(serialPort,None,None)
+            self.motes.remove(ms)
+            del self.bySerialPort[serialPort]
+            del self.ids[serialPort]
+
+    def addNetwork(self,network):
+        '''
+        Also listen to the 'infoMoteId' signal on the event bus of a network,
+        so its motes are indexed too.
+
+        :param network: [in] The name of the network.
+        '''
+        eventBusClient.getNetwork(network).join(self)
+
+    def getBy16bId(self,moteid):
+        '''
+        :param moteid: [in] 16-bit ID of the mote, as a hex string, e.g. '0a1b'.
+        :rtype:        moteState or None if not found
+        '''
+        with self.dataLock:
+            return self.by16bId.get(moteid)
+
+    def getByEui64(self,eui64):
+        '''
+        :param eui64: [in] EUI-64 of the mote, as a list or tuple of 8 bytes.
+        :rtype:       moteState or None if not found
+        '''
+        with self.dataLock:
+            return self.byEui64.get(tuple(eui64))
+
+    def getBySerialPort(self,serialPort):
+        '''
+        :param serialPort: [in] Name of the serial port the mote is attached to.
+        :rtype:            moteState or None if not found
+        '''
+        with self.dataLock:
+            return self.bySerialPort.get(serialPort)
+
+    def getAllMotes(self):
+        '''
+        Lists all motes, in the order they were added.
+
+        :returns: A list of dictionaries, each with the 'serialPort', '16bID'
+            (hex string, or None if unknown), 'eui64' (tuple, or None if
+            unknown) and 'moteState' of a mote.
+        '''
+        with self.dataLock:
+            returnVal = []
+            for ms in self.motes:
+                serialPort        = ms.moteConnector.serialport
+                (my16bID,my64bID) = self.ids[serialPort]
+                returnVal.append({
+                    'serialPort': serialPort,
+                    '16bID':      my16bID,
+                    'eui64':      my64bID,
+                    'moteState':  ms,
+                })
+            return returnVal
+
+    def getMoteIds(self):
+        '''
+        Lists a printable identifier for each mote: its 16-bit ID as a hex
+        string if known, or the name of its serial port otherwise.
+        '''
+        with self.dataLock:
+            returnVal = []
+            for ms in self.motes:
+                serialPort = ms.moteConnector.serialport
+                my16bID    = self.ids[serialPort][0]
+                returnVal.append(my16bID if my16bID else serialPort)
+            return returnVal
+
+    #======================== private =========================================
+
+    def _infoMoteId_notif(self,sender,signal,data):
+        with self.dataLock:
+            if data['serialPort'] not in self.bySerialPort:
+                log.debug('address of unindexed mote {0}'.format(data['serialPort']))
+                return
+            self._updateIds(data['serialPort'],data['my16bID'],data['my64bID'])
+
+    def _updateIds(self,serialPort,my16bID,my64bID):
+        '''
+        Replace the addresses indexed for a mote. Expects dataLock to be held.
+        '''
+        ms = self.bySerialPort[serialPort]
+
+        (old16bID,old64bID) = self.ids[serialPort]
+        if old16bID and self.by16bId.get(old16bID) is ms:
+            del self.by16bId[old16bID]
+        if old64bID and self.byEui64.get(old64bID) is ms:
+            del self.byEui64[old64bID]
+
+        if my16bID:
+            my16bID = ''.join(['%02x'%b for b in my16bID])
+            self.by16bId[my16bID] = ms
+        else:
+            my16bID = None
+        if my64bID:
+            my64bID = tuple(my64bID)
+            self.byEui64[my64bID] = ms
+        else:
+            my64bID = None
+
+        self.ids[serialPort] = (my16bID,my64bID)
+
+        log.debug('indexed {0} as 16b={1} eui64={2}'.format(serialPort,my16bID,my64bID))
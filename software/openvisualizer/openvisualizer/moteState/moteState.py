@@ -18,8 +18,9 @@ import time
 import threading
 import json
 
-from openvisualizer.moteConnector import ParserStatus
+from openvisualizer.moteConnector import StatusCodecs
 from openvisualizer.eventBus      import eventBusClient
+from openvisualizer.moteState     import moteHistory
 from openvisualizer.openType      import openType,         \
                                          typeAsn,          \
                                          typeAddr,         \
@@ -272,6 +273,8 @@ class StateIdManager(StateElem):
         self.eventBusClient  = eventBusClient
         self.moteConnector   = moteConnector
         self.isDAGroot       = None
+        self.my16bID         = None
+        self.my64bID         = None
     
     def get16bAddr(self):
         try:
@@ -279,6 +282,12 @@ class StateIdManager(StateElem):
         except IndexError:
             return None
     
+    def get64bAddr(self):
+        try:
+            return self.data[0]['my64bID'].addr[:]
+        except IndexError:
+            return None
+    
     def update(self,notif):
     
         # update state
@@ -347,6 +356,26 @@ class StateIdManager(StateElem):
         
         # record isDAGroot
         self.isDAGroot = self.data[0]['isDAGroot']
+        
+        # announce address changes to the eventBus, so motes can be indexed
+        if  (
+                self.my16bID!=self.data[0]['my16bID'].addr or
+                self.my64bID!=self.data[0]['my64bID'].addr
+            ):
+            
+            # record addresses
+            self.my16bID = self.data[0]['my16bID'].addr[:]
+            self.my64bID = self.data[0]['my64bID'].addr[:]
+            
+            # dispatch
+            self.eventBusClient.dispatch(
+                signal        = 'infoMoteId',
+                data          = {
+                                    'my16bID':      self.my16bID,
+                                    'my64bID':      self.my64bID,
+                                    'serialPort':   self.moteConnector.serialport,
+                                },
+            )
 
 class StateMyDagRank(StateElem):
     
@@ -409,6 +438,15 @@ class moteState(eventBusClient.eventBusClient):
         ST_KAPERIOD,
     ]
     
+    # metrics recorded in the mote's history
+    HIST_DUTYCYCLE      = 'dutyCycle'
+    HIST_MYDAGRANK      = 'myDAGrank'
+    HIST_OUTPUTBUFFER   = 'outputBufferOccupancy'
+    HIST_NEIGHBORRSSI   = 'neighborRssi_{0}'
+    
+    # size of the mote's serial output buffer, used to compute its occupancy
+    OUTPUTBUFFER_SIZE   = 256
+    
     TRIGGER_DAGROOT     = 'DAGroot'
     SET_COMMAND         = 'imageCommand'
 
@@ -450,9 +488,9 @@ class moteState(eventBusClient.eventBusClient):
         
       
         # local variables
-        self.parserStatus                   = ParserStatus.ParserStatus()
         self.stateLock                      = threading.Lock()
         self.state                          = {}
+        self.history                        = moteHistory.moteHistory()
         
         self.state[self.ST_OUPUTBUFFER]     = StateOutputBuffer()
         self.state[self.ST_ASN]             = StateAsn()
@@ -503,34 +541,46 @@ class moteState(eventBusClient.eventBusClient):
         self.state[self.ST_KAPERIOD]        = StatekaPeriod()
         
         self.notifHandlers = {
-            self.parserStatus.named_tuple[self.ST_OUPUTBUFFER]:
+            StatusCodecs.records[self.ST_OUPUTBUFFER]:
                 self.state[self.ST_OUPUTBUFFER].update,
-            self.parserStatus.named_tuple[self.ST_ASN]:
+            StatusCodecs.records[self.ST_ASN]:
                 self.state[self.ST_ASN].update,
-            self.parserStatus.named_tuple[self.ST_MACSTATS]:
+            StatusCodecs.records[self.ST_MACSTATS]:
                 self.state[self.ST_MACSTATS].update,
-            self.parserStatus.named_tuple[self.ST_SCHEDULEROW]:
+            StatusCodecs.records[self.ST_SCHEDULEROW]:
                 self.state[self.ST_SCHEDULE].update,
-            self.parserStatus.named_tuple[self.ST_BACKOFF]:
+            StatusCodecs.records[self.ST_BACKOFF]:
                 self.state[self.ST_BACKOFF].update,
-            self.parserStatus.named_tuple[self.ST_QUEUEROW]:
+            StatusCodecs.records[self.ST_QUEUEROW]:
                 self.state[self.ST_QUEUE].update,
-            self.parserStatus.named_tuple[self.ST_NEIGHBORSROW]:
+            StatusCodecs.records[self.ST_NEIGHBORSROW]:
                 self.state[self.ST_NEIGHBORS].update,
-            self.parserStatus.named_tuple[self.ST_ISSYNC]:
+            StatusCodecs.records[self.ST_ISSYNC]:
                 self.state[self.ST_ISSYNC].update,
-            self.parserStatus.named_tuple[self.ST_IDMANAGER]:
+            StatusCodecs.records[self.ST_IDMANAGER]:
                 self.state[self.ST_IDMANAGER].update,
-            self.parserStatus.named_tuple[self.ST_MYDAGRANK]:
+            StatusCodecs.records[self.ST_MYDAGRANK]:
                 self.state[self.ST_MYDAGRANK].update,
-            self.parserStatus.named_tuple[self.ST_KAPERIOD]:
+            StatusCodecs.records[self.ST_KAPERIOD]:
                 self.state[self.ST_KAPERIOD].update,
         }
         
+        self.historyHandlers = {
+            StatusCodecs.records[self.ST_OUPUTBUFFER]:
+                self._recordOutputBuffer,
+            StatusCodecs.records[self.ST_MACSTATS]:
+                self._recordMacStats,
+            StatusCodecs.records[self.ST_NEIGHBORSROW]:
+                self._recordNeighborsRow,
+            StatusCodecs.records[self.ST_MYDAGRANK]:
+                self._recordMyDagRank,
+        }
+        
         # initialize parent class
         eventBusClient.eventBusClient.__init__(
             self,
             name             = 'moteState@{0}'.format(self.moteConnector.serialport),
+            network          = self.moteConnector.network,
             registrations    = [
                 {
                     'sender'      : 'moteConnector@{0}'.format(self.moteConnector.serialport),
@@ -561,6 +611,17 @@ class moteState(eventBusClient.eventBusClient):
         
         return returnVal
     
+    def getHistory(self,metric,start=None,end=None,resolution=moteHistory.moteHistory.RES_RAW):
+        '''
+        Retrieve the history of one of the metrics of this mote.
+        
+        See moteHistory.getHistory() for the parameters.
+        '''
+        return self.history.getHistory(metric,start,end,resolution)
+    
+    def getHistoryNames(self):
+        return self.history.getMetricNames()
+    
     def triggerAction(self,action):
         
         # dispatch
@@ -584,18 +645,39 @@ class moteState(eventBusClient.eventBusClient):
         self.stateLock.acquire()
         
         # call handler
-        found = False
-        for k,v in self.notifHandlers.items():
-            if self._isnamedtupleinstance(data,k):
-                found = True
-                v(data)
-                break
+        handler = self.notifHandlers.get(type(data))
+        if handler:
+            handler(data)
+            if type(data) in self.historyHandlers:
+                self.historyHandlers[type(data)](data)
         
         # unlock the state data
         self.stateLock.release()
         
-        if found==False:
+        if not handler:
             raise SystemError("No handler for data {0}".format(data))
     
-    def _isnamedtupleinstance(self,var,tupleInstance):
-        return var._fields==tupleInstance._fields
\ No newline at end of file
+    #===== history
+    
+    def _recordOutputBuffer(self,notif):
+        occupancy = (notif.index_write-notif.index_read)%self.OUTPUTBUFFER_SIZE
+        self.history.record(self.HIST_OUTPUTBUFFER,occupancy)
+    
+    def _recordMacStats(self,notif):
+        if notif.numTicsTotal!=0:
+            dutyCycle = (float(notif.numTicsOn)/float(notif.numTicsTotal))*100
+            self.history.record(self.HIST_DUTYCYCLE,dutyCycle)
+    
+    def _recordNeighborsRow(self,notif):
+        if notif.used:
+            # per neighbor, as the row of a neighbor changes
+            addr = typeAddr.typeAddr()
+            addr.update(notif.addr_type,notif.addr_bodyH,notif.addr_bodyL)
+            if addr.addr:
+                self.history.record(
+                    self.HIST_NEIGHBORRSSI.format(''.join(['%02x'%b for b in addr.addr])),
+                    notif.rssi,
+                )
+    
+    def _recordMyDagRank(self,notif):
+        self.history.record(self.HIST_MYDAGRANK,notif.myDAGrank)
\ No newline at end of file
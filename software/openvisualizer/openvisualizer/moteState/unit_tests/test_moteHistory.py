@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteState/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+
+import pytest
+
+import moteHistory
+import moteState
+from openvisualizer.eventBus      import eventBusClient
+from openvisualizer.moteConnector import moteConnector
+from openvisualizer.moteConnector import StatusCodecs
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteHistory.log'
+
+import logging
+log = logging.getLogger('test_moteHistory')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_moteHistory',
+                   'moteHistory',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+NETWORK      = 'test_moteHistory'
+T0           = 6000.0
+
+#============================ helpers =========================================
+
+def _neighborsRow(row,addrBodyH,rssi):
+    return StatusCodecs.Status_NeighborsRow(
+        row,1,0,1,0,
+        2,addrBodyH,0,       # 64-bit address, least significant byte first
+        256,rssi,
+        10,10,10,0,
+        0,0,0,0,
+    )
+
+@pytest.fixture
+def ms(request):
+    mc = moteConnector.moteConnector('COM1',network=NETWORK)
+    ms = moteState.moteState(mc)
+    def fin():
+        eventBusClient.dispatcher.disconnect(mc._sendToParser,signal='fromMoteProbe@COM1')
+        eventBusClient.closeNetwork(NETWORK)
+    request.addfinalizer(fin)
+    return ms
+
+#============================ tests ===========================================
+
+def test_record():
+
+    history = moteHistory.moteHistory()
+    for i in range(3):
+        history.record('rank',256+i,timestamp=T0+i)
+    history.record('dutyCycle',1.5,timestamp=T0)
+
+    assert history.getMetricNames()==['dutyCycle','rank']
+    assert history.getHistory('rank')=={
+        'timestamps': [T0,T0+1,T0+2],
+        'values':     [256.0,257.0,258.0],
+    }
+    with pytest.raises(ValueError):
+        history.getHistory('unknown')
+    with pytest.raises(ValueError):
+        history.getHistory('rank',resolution='1h')
+
+def test_ringBounds():
+
+    history  = moteHistory.moteHistory()
+    capacity = moteHistory.moteHistory.RAW_CAPACITY
+    for i in range(capacity+10):
+        history.record('rank',i,timestamp=T0+i)
+
+    # the oldest samples were overwritten
+    raw = history.getHistory('rank')
+    assert len(raw['values'])==capacity
+    assert raw['values'][0]==10
+    assert raw['values'][-1]==capacity+9
+
+def test_timeRange():
+
+    history  = moteHistory.moteHistory()
+    # 1 sample per second, over 30s
+    for i in range(30):
+        history.record('rank',i,timestamp=T0+i)
+
+    raw = history.getHistory('rank',start=T0+5,end=T0+7)
+    assert raw=={'timestamps': [T0+5,T0+6,T0+7], 'values': [5.0,6.0,7.0]}
+    assert history.getHistory('rank',start=T0+100)=={'timestamps': [], 'values': []}
+
+    # the averages per 10s, the last one in progress
+    averages = history.getHistory('rank',start=T0+10,resolution=moteHistory.moteHistory.RES_10S)
+    assert averages=={'timestamps': [T0+10,T0+20], 'values': [14.5,24.5]}
+
+def test_maxMetrics():
+
+    history = moteHistory.moteHistory()
+    for i in range(moteHistory.moteHistory.MAX_NUM_METRICS):
+        history.record('metric{0}'.format(i),i,timestamp=T0)
+    history.record('metric0',0,timestamp=T0+1)
+
+    # the metric least recently recorded makes room
+    history.record('new',0,timestamp=T0+2)
+    names = history.getMetricNames()
+    assert len(names)==moteHistory.moteHistory.MAX_NUM_METRICS
+    assert 'new' in names and 'metric0' in names
+    assert 'metric1' not in names
+
+def test_neighborRssi(ms):
+
+    # the neighbor moves from row 0 to row 1, a new neighbor takes row 0
+    ms._recordNeighborsRow(_neighborsRow(0,0x0a00000000921514,-60))
+    ms._recordNeighborsRow(_neighborsRow(1,0x0a00000000921514,-62))
+    ms._recordNeighborsRow(_neighborsRow(0,0x0b00000000921514,-80))
+
+    assert ms.getHistoryNames()==['neighborRssi_141592000000000a','neighborRssi_141592000000000b']
+    assert ms.getHistory('neighborRssi_141592000000000a')['values']==[-60.0,-62.0]
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteState/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+
+import pytest
+
+import moteIndex
+import moteState
+from openvisualizer.eventBus      import eventBusClient
+from openvisualizer.moteConnector import moteConnector
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteIndex.log'
+
+import logging
+log = logging.getLogger('test_moteIndex')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_moteIndex',
+                   'moteIndex',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+NETWORK      = 'test_moteIndex'
+MOTE_A       = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]
+MOTE_B       = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0b]
+MOTE_C       = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0c]
+
+#============================ helpers =========================================
+
+def _infoMoteId(ms,eui64):
+    # as StateIdManager reports a new address
+    ms.dispatch('infoMoteId',{
+        'my16bID':    eui64[6:],
+        'my64bID':    eui64,
+        'serialPort': ms.moteConnector.serialport,
+    })
+
+@pytest.fixture
+def index(request):
+    '''
+    An index of the motes of COM1 and COM2, connected to a network.
+    '''
+    index        = moteIndex.moteIndex()
+    index.addNetwork(NETWORK)
+    index.ms     = []
+    for port in ['COM1','COM2']:
+        mc        = moteConnector.moteConnector(port,network=NETWORK)
+        index.ms += [moteState.moteState(mc)]
+        index.addMote(index.ms[-1])
+
+    def fin():
+        eventBusClient.dispatcher.disconnect(index._eventBusNotification)
+        for ms in index.ms:
+            mc = ms.moteConnector
+            eventBusClient.dispatcher.disconnect(mc._sendToParser,signal='fromMoteProbe@'+mc.serialport)
+        eventBusClient.closeNetwork(NETWORK)
+    request.addfinalizer(fin)
+
+    return index
+
+#============================ tests ===========================================
+
+def test_add(index):
+
+    (ms1,ms2) = index.ms
+
+    # the addresses of the motes are not known yet
+    assert index.getBySerialPort('COM1') is ms1
+    assert index.getBySerialPort('COM3') is None
+    assert index.getMoteIds()==['COM1','COM2']
+    assert [(m['serialPort'],m['16bID'],m['eui64'],m['moteState']) for m in index.getAllMotes()]==[
+        ('COM1',None,None,ms1),
+        ('COM2',None,None,ms2),
+    ]
+
+def test_lookup(index):
+
+    (ms1,ms2) = index.ms
+    _infoMoteId(ms1,MOTE_A)
+    _infoMoteId(ms2,MOTE_B)
+
+    assert index.getBy16bId('000a') is ms1
+    assert index.getBy16bId('000b') is ms2
+    assert index.getBy16bId('000c') is None
+    assert index.getByEui64(MOTE_A) is ms1
+    assert index.getByEui64(tuple(MOTE_B)) is ms2
+    assert index.getByEui64(MOTE_C) is None
+    assert index.getBySerialPort('COM2') is ms2
+    assert index.getMoteIds()==['000a','000b']
+
+def test_reindex(index):
+
+    (ms1,ms2) = index.ms
+    _infoMoteId(ms1,MOTE_A)
+
+    # the mote changes address
+    _infoMoteId(ms1,MOTE_C)
+    assert index.getBy16bId('000a') is None
+    assert index.getByEui64(MOTE_A) is None
+    assert index.getBy16bId('000c') is ms1
+    assert index.getByEui64(MOTE_C) is ms1
+
+    # the address of a mote which is not indexed is ignored
+    eventBusClient.dispatcher.send(
+        sender = 'test_moteIndex',
+        signal = 'infoMoteId',
+        data   = {'my16bID': MOTE_B[6:], 'my64bID': MOTE_B, 'serialPort': 'COM3'},
+    )
+    assert index.getByEui64(MOTE_B) is None
+
+def test_globalBus(index):
+
+    (ms1,ms2) = index.ms
+
+    # the motes not in a network report their address on the global bus
+    eventBusClient.dispatcher.send(
+        sender = 'test_moteIndex',
+        signal = 'infoMoteId',
+        data   = {'my16bID': MOTE_B[6:], 'my64bID': MOTE_B, 'serialPort': 'COM2'},
+    )
+    assert index.getBy16bId('000b') is ms2
+
+def test_remove(index):
+
+    (ms1,ms2) = index.ms
+    _infoMoteId(ms1,MOTE_A)
+    _infoMoteId(ms2,MOTE_B)
+
+    index.removeMote(ms1)
+    assert index.getBySerialPort('COM1') is None
+    assert index.getBy16bId('000a') is None
+    assert index.getByEui64(MOTE_A) is None
+    assert index.getMoteIds()==['000b']
+
+    # its later addresses are ignored, removing it again does nothing
+    _infoMoteId(ms1,MOTE_C)
+    assert index.getByEui64(MOTE_C) is None
+    index.removeMote(ms1)
+    assert index.getBy16bId('000b') is ms2
@@ -0,0 +1,173 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Accounting of the traffic OpenLbr forwards, per flow.
+'''
+import logging
+log = logging.getLogger('flowTable')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import bisect
+import collections
+import threading
+import time
+
+import openvisualizer.openvisualizer_utils as u
+
+#============================ defines =========================================
+
+DIRECTION_UP                  = 'up'       # from the mesh to the Internet
+DIRECTION_DOWN                = 'down'     # from the Internet to the mesh
+
+# upper bounds, in seconds, of the buckets of the processing time histogram;
+# the last bucket holds the longer processing times
+PROCESSING_TIME_BUCKETS       = [
+    0.0001,0.0002,0.0005,
+    0.001, 0.002, 0.005,
+    0.010, 0.020, 0.050,
+    0.100,
+]
+
+#============================ classes =========================================
+
+class FlowTable(object):
+    '''
+    Bounded table of the flows, indexed by (src,dst,proto,port).
+
+    The port is the UDP destination port, or the ICMPv6 type. When the table
+    is full, the least recently seen flow is evicted.
+    '''
+
+    # maximum number of flows in the table
+    MAX_FLOWS                = 1024
+    # sort keys of getTopFlows()
+    SORT_KEYS                = ['packets','bytes']
+
+    def __init__(self,maxFlows=MAX_FLOWS,clock=time.time):
+        '''
+        :param maxFlows: [in] Maximum number of flows in the table.
+        :param clock:    [in] Function returning the current time, in
+            seconds.
+        '''
+
+        # store params
+        self.maxFlows             = maxFlows
+        self.clock                = clock
+
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.flows                = collections.OrderedDict() # (src,dst,proto,port) -> _Flow, least recently seen first
+        self.numEvicted           = 0
+
+    #======================== public ==========================================
+
+    def update(self,src,dst,proto,port,numBytes,direction,processingTime=None):
+        '''
+        Account for a packet.
+
+        :param src:            [in] The IPv6 source address.
+        :param dst:            [in] The IPv6 destination address.
+        :param proto:          [in] The IANA protocol number.
+        :param port:           [in] The UDP destination port or ICMPv6
+            type, None if there is none.
+        :param numBytes:       [in] The size of the packet.
+        :param direction:      [in] DIRECTION_UP or DIRECTION_DOWN.
+        :param processingTime: [in] The number of seconds it took to
+            forward the packet, None if not measured.
+        '''
+        key = (bytes(bytearray(src)),bytes(bytearray(dst)),proto,port)
+        now = self.clock()
+
+        with self.dataLock:
+            flow = self.flows.pop(key,None)
+            if flow is None:
+                if len(self.flows)>=self.maxFlows:
+                    self.flows.popitem(last=False)
+                    self.numEvicted   += 1
+                flow = _Flow(direction,now)
+            # most recently seen last
+            self.flows[key]            = flow
+
+            flow.packets              += 1
+            flow.bytes                += numBytes
+            flow.lastSeen              = now
+            if processingTime is not None:
+                flow.histogram[bisect.bisect_left(PROCESSING_TIME_BUCKETS,processingTime)] += 1
+
+    def getFlows(self):
+        '''
+        :returns: A list of all the flows, least recently seen first, see
+            getTopFlows() for their format.
+        '''
+        with self.dataLock:
+            return [self._formatFlow(key,flow) for (key,flow) in self.flows.items()]
+
+    def getTopFlows(self,num,sortBy='packets'):
+        '''
+        :param num:    [in] The maximum number of flows returned.
+        :param sortBy: [in] 'packets' or 'bytes'.
+
+        :raises: ValueError if sortBy is not valid.
+
+        :returns: A list of the num flows with the most packets, or bytes,
+            each a dictionary with the flow's 'src', 'dst' (formatted IPv6
+            addresses), 'proto', 'port', 'direction', number of 'packets'
+            and 'bytes', 'firstSeen' and 'lastSeen' times, and the
+            'processingTime' histogram, a list of [upper bound, count], the
+            last bound being None.
+        '''
+        if sortBy not in self.SORT_KEYS:
+            raise ValueError('invalid sort key {0}'.format(sortBy))
+        with self.dataLock:
+            if sortBy=='packets':
+                top = sorted(self.flows.items(),key=lambda (k,f): f.packets,reverse=True)[:num]
+            else:
+                top = sorted(self.flows.items(),key=lambda (k,f): f.bytes,reverse=True)[:num]
+            return [self._formatFlow(key,flow) for (key,flow) in top]
+
+    def getStats(self):
+        '''
+        :returns: A dictionary with the number of 'flows' in the table and
+            the number of flows 'evicted' to make room.
+        '''
+        with self.dataLock:
+            return {
+                'flows':   len(self.flows),
+                'evicted': self.numEvicted,
+            }
+
+    #======================== private =========================================
+
+    def _formatFlow(self,key,flow):
+        (src,dst,proto,port) = key
+        return {
+            'src':            u.formatIPv6Addr([ord(b) for b in src]),
+            'dst':            u.formatIPv6Addr([ord(b) for b in dst]),
+            'proto':          proto,
+            'port':           port,
+            'direction':      flow.direction,
+            'packets':        flow.packets,
+            'bytes':          flow.bytes,
+            'firstSeen':      flow.firstSeen,
+            'lastSeen':       flow.lastSeen,
+            'processingTime': [
+                [bound,count] for (bound,count) in zip(PROCESSING_TIME_BUCKETS+[None],flow.histogram)
+            ],
+        }
+
+class _Flow(object):
+    '''
+    The counters of a flow.
+    '''
+
+    def __init__(self,direction,now):
+        self.direction        = direction
+        self.packets          = 0
+        self.bytes            = 0
+        self.firstSeen        = now
+        self.lastSeen         = now
+        self.histogram        = [0]*(len(PROCESSING_TIME_BUCKETS)+1)
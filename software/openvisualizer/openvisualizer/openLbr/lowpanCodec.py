@@ -0,0 +1,920 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Encoding and decoding of IPv6 and 6LoWPAN (IPHC) headers.
+
+Packets are handled as bytearrays. Headers are read and written at their
+offset with precompiled structs, and the output packet is allocated once at
+its final size, rather than built by concatenating lists of ints.
+
+This module implements the subset of the following RFCs used by OpenLbr:
+
+* *http://tools.ietf.org/html/rfc4944*
+  Transmission of IPv6 Packets over IEEE 802.15.4 Networks.
+* *http://tools.ietf.org/html/rfc6282*
+  Compression Format for IPv6 Datagrams over IEEE 802.15.4-Based Networks.
+* *http://tools.ietf.org/html/rfc6554*
+  An IPv6 Routing Header for Source Routes with RPL.
+* *http://tools.ietf.org/html/rfc2460*
+  Internet Protocol, Version 6 (IPv6) Specification
+'''
+import logging
+log = logging.getLogger('lowpanCodec')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import struct
+
+#============================ defines =========================================
+
+# http://www.iana.org/assignments/protocol-numbers/protocol-numbers.xml
+IANA_PROTOCOL_IPv6ROUTE  = 43
+IANA_UDP                 = 17
+IANA_ICMPv6              = 58
+IANA_IPv6HOPHEADER       = 0
+# there is no IANA for IPV6 HEADER right now, we use NHC identifier for it
+IPV6_HEADER              = 0xEE #https://tools.ietf.org/html/rfc6282#section-4.2
+
+# Number of bytes in an IPv6 header.
+IPv6_HEADER_LEN          = 40
+
+IPHC_DISPATCH            = 3
+
+IPHC_TF_4B               = 0
+IPHC_TF_3B               = 1
+IPHC_TF_1B               = 2
+IPHC_TF_ELIDED           = 3
+
+IPHC_NH_INLINE           = 0
+IPHC_NH_COMPRESSED       = 1
+
+IPHC_HLIM_INLINE         = 0
+IPHC_HLIM_1              = 1
+IPHC_HLIM_64             = 2
+IPHC_HLIM_255            = 3
+
+IPHC_CID_NO              = 0
+IPHC_CID_YES             = 1
+
+IPHC_SAC_STATELESS       = 0
+IPHC_SAC_STATEFUL        = 1
+
+IPHC_SAM_128B            = 0
+IPHC_SAM_64B             = 1
+IPHC_SAM_16B             = 2
+IPHC_SAM_ELIDED          = 3
+
+IPHC_M_NO                = 0
+IPHC_M_YES               = 1
+
+IPHC_DAC_STATELESS       = 0
+IPHC_DAC_STATEFUL        = 1
+
+IPHC_DAM_128B            = 0
+IPHC_DAM_64B             = 1
+IPHC_DAM_16B             = 2
+IPHC_DAM_ELIDED          = 3
+
+NHC_DISPATCH             = 0x0E
+
+NHC_EID_MASK             = 0x0E
+NHC_EID_HOPBYHOP         = 0
+NHC_EID_ROUTING          = 1
+NHC_EID_IPV6             = 7
+
+NHC_NH_INLINE            = 0
+NHC_NH_COMPRESSED        = 1
+
+#=== RPL source routing header (RFC6554)
+SR_FIR_TYPE              = 0x03
+
+#=== UDP Header compression (RFC6282)
+NHC_UDP_MASK             = 0xF8
+NHC_UDP_ID               = 0xF0
+
+NHC_UDP_C_ELIDED         = 0x04
+
+NHC_UDP_PORTS_INLINE     = 0
+NHC_UDP_PORTS_DST_8B     = 1
+NHC_UDP_PORTS_SRC_8B     = 2
+NHC_UDP_PORTS_4B         = 3
+
+# ports which can be compressed to 8 and 4 bits
+NHC_UDP_PORT_8B_MASK     = 0xFF00
+NHC_UDP_PORT_8B_PREFIX   = 0xF000
+NHC_UDP_PORT_4B_MASK     = 0xFFF0
+NHC_UDP_PORT_4B_PREFIX   = 0xF0B0
+
+# source port, destination port, length, checksum
+UDP_STRUCT               = struct.Struct('>HHHH')
+UDP_HEADER_LEN           = UDP_STRUCT.size
+
+# address mode, as a function of the number of address bytes carried inline
+SAM_FROM_LEN             = {
+    16:  IPHC_SAM_128B,
+    8:   IPHC_SAM_64B,
+    2:   IPHC_SAM_16B,
+    0:   IPHC_SAM_ELIDED,
+}
+DAM_FROM_LEN             = {
+    16:  IPHC_DAM_128B,
+    8:   IPHC_DAM_64B,
+    2:   IPHC_DAM_16B,
+    0:   IPHC_DAM_ELIDED,
+}
+
+# version/traffic class/flow label, payload length, next header, hop limit
+IPV6_STRUCT              = struct.Struct('>IHBB')
+
+# NHC, Hdr Ext Len, Routing Type, Segments Left, CmprI|CmprE, padding+reserved
+RH3_STRUCT               = struct.Struct('>BBBBB3x')
+RH3_LEN                  = RH3_STRUCT.size
+
+# IPv6 NHC, then inner IPHC header with next header and hop limit inline
+INNER_STRUCT             = struct.Struct('>BBBBB')
+INNER_LEN                = INNER_STRUCT.size
+
+# RPL option in hop-by-hop header: type, length, flags, instance ID, rank
+RPL_OPTION_STRUCT        = struct.Struct('>BBBBH')
+
+# IPHC byte 0 of the outer header: TF elided, NH compressed, HLIM inline
+IPHC_OUTER_BYTE0         = (IPHC_DISPATCH<<5) + (IPHC_TF_ELIDED<<3) + (IPHC_NH_COMPRESSED<<2) + (IPHC_HLIM_INLINE<<0)
+# IPHC bytes of the inner header: TF elided, NH and HLIM inline, addresses elided
+IPHC_INNER_BYTE0         = (IPHC_DISPATCH<<5) + (IPHC_TF_ELIDED<<3) + (IPHC_NH_INLINE<<2) + (IPHC_HLIM_INLINE<<0)
+IPHC_INNER_BYTE1         = (IPHC_CID_NO<<7) + (IPHC_SAC_STATELESS<<6) + (IPHC_SAM_ELIDED<<4) + (IPHC_M_NO<<3) + (IPHC_DAC_STATELESS<<2) + (IPHC_DAM_ELIDED<<0)
+
+NHC_ROUTING_BYTE         = (NHC_DISPATCH<<4) + (NHC_EID_ROUTING<<1) + (NHC_NH_COMPRESSED<<0)
+NHC_IPV6_BYTE            = (NHC_DISPATCH<<4) + (NHC_EID_IPV6<<1) + (NHC_NH_INLINE<<0)
+
+# offset of the hop limit in the outer IPHC header, carried inline, when
+# there is no CID extension byte
+OUTER_HLIM_OFFSET        = 2
+
+# number of contexts a CID extension byte can refer to
+NUM_CONTEXTS             = 16
+
+# length of a prefix in a context
+CONTEXT_PREFIX_LEN       = 8
+
+# maximum number of octets elided from the addresses of a routing header,
+# leaving one octet inline (RFC6554, section 3)
+MAX_CMPR                 = 15
+
+#=== fragmentation (RFC4944)
+FRAG1_DISPATCH           = 0x18
+FRAGN_DISPATCH           = 0x1C
+
+# dispatch and datagram size, datagram tag
+FRAG1_STRUCT             = struct.Struct('>HH')
+FRAG1_HEADER_LEN         = FRAG1_STRUCT.size
+# dispatch and datagram size, datagram tag, datagram offset
+FRAGN_STRUCT             = struct.Struct('>HHB')
+FRAGN_HEADER_LEN         = FRAGN_STRUCT.size
+
+# the datagram size is carried on 11 bits
+MAX_DATAGRAM_SIZE        = 0x07FF
+
+# fragment offsets are expressed in units of 8 octets
+FRAG_OFFSET_UNIT         = 8
+
+# number of bytes a compressed hop-by-hop header with a RPL option
+# decompresses to
+HOPBYHOP_LEN             = 8
+
+# number of bytes of an address carried inline, as a function of the
+# address mode (stateless compression, or stateful not unspecified)
+INLINE_ADDR_LEN          = {
+    IPHC_SAM_128B:       16,
+    IPHC_SAM_64B:        8,
+    IPHC_SAM_16B:        2,
+    IPHC_SAM_ELIDED:     0,
+}
+
+#============================ IPv6 ============================================
+
+def disassembleIpv6(ipv6):
+    '''
+    Read the fields of an IPv6 header.
+
+    See http://tools.ietf.org/html/rfc2460#page-4.
+
+    :param ipv6: [in] The IPv6 packet, as a bytearray or list of bytes.
+
+    :raises: ValueError if the packet is not an IPv6 packet.
+
+    :returns: A dictionary of fields. Addresses and payload are bytearrays.
+    '''
+    if not isinstance(ipv6,bytearray):
+        ipv6 = bytearray(ipv6)
+
+    if len(ipv6)<IPv6_HEADER_LEN:
+        raise ValueError('Packet too small ({0} bytes) no space for IPv6 header'.format(len(ipv6)))
+
+    (vtf,payloadLength,nextHeader,hopLimit) = IPV6_STRUCT.unpack_from(ipv6)
+
+    version = vtf>>28
+    if version!=6:
+        raise ValueError('Not an IPv6 packet, version=={0}'.format(version))
+
+    return {
+        'version':           version,
+        'traffic_class':     (vtf>>20) & 0xFF,
+        'flow_label':        vtf & 0xFFFFF,
+        'payload_length':    payloadLength,
+        'next_header':       nextHeader,
+        'hop_limit':         hopLimit,
+        'src_addr':          ipv6[8:24],
+        'dst_addr':          ipv6[24:40],
+        'payload':           ipv6[40:],
+    }
+
+def assembleIpv6(pkt):
+    '''
+    Write an IPv6 packet.
+
+    :param pkt: [in] A dictionary of fields, as returned by disassembleIpv6()
+        or disassembleLowpan().
+
+    :returns: The IPv6 packet, as a bytearray.
+    '''
+    payload = pkt['payload']
+    out     = bytearray(IPv6_HEADER_LEN+len(payload))
+    IPV6_STRUCT.pack_into(
+        out,
+        0,
+        (6<<28) + (pkt['traffic_class']<<20) + pkt['flow_label'],
+        pkt['payload_length'],
+        pkt['next_header'],
+        pkt['hop_limit'],
+    )
+    out[8:24]                = pkt['src_addr'][:16]
+    out[24:40]               = pkt['dst_addr'][:16]
+    out[IPv6_HEADER_LEN:]    = payload
+    return out
+
+#============================ 6LoWPAN =========================================
+
+def assembleLowpan(srcAddr,dstAddr,nextHeader,hopLimit,payload,route,nhc=None,contexts=None,srcLinkAddr=None):
+    '''
+    Write a 6LoWPAN packet to be sent into the mesh.
+
+    The packet is made of an outer IPHC header, a RPL source routing header
+    if the destination is more than one hop away, and an IPv6-in-IPv6 inner
+    IPHC header followed by the payload.
+
+    :param srcAddr:    [in] The source address (16, 8, 2 or 0 bytes).
+    :param dstAddr:    [in] The destination address (16, 8, 2 or 0 bytes).
+    :param nextHeader: [in] The next header of the IPv6 packet.
+    :param hopLimit:   [in] The hop limit of the IPv6 packet.
+    :param payload:    [in] The payload of the IPv6 packet.
+    :param route:      [in] The source route: the list of the 8-byte addresses
+        of the hops from the destination to the next hop, next hop last.
+    :param nhc:        [in] The compressed next header, as returned by
+        compressUdp(), or None to carry the next header inline.
+    :param contexts:   [in] The context table, see assembleLowpanHeader().
+    :param srcLinkAddr:[in] The 8-byte link-layer address of the sender.
+
+    :raises: NotImplementedError if the address format is not supported.
+
+    :returns: The 6LoWPAN packet, as a bytearray.
+    '''
+    return fillLowpanHeader(
+        assembleLowpanHeader(srcAddr,dstAddr,route,contexts,srcLinkAddr),
+        nextHeader,
+        hopLimit,
+        payload,
+        nhc,
+    )
+
+def assembleLowpanHeader(srcAddr,dstAddr,route,contexts=None,srcLinkAddr=None):
+    '''
+    Write the 6LoWPAN header of the packets to a destination.
+
+    The header only depends on the addresses and the source route, so it can
+    be computed once and re-used for all the packets to that destination,
+    see fillLowpanHeader(). The next header and hop limit fields are left
+    zeroed.
+
+    Without a context table, addresses are compressed statelessly and the
+    routing header elides the prefix of the addresses only. With a context
+    table, addresses whose prefix is in the table are compressed statefully
+    (SAC/DAC), their interface identifier elided when it is the link-layer
+    address, and the routing header elides all the leading octets the hops
+    have in common with the destination.
+
+    :param srcAddr:    [in] The source address (16, 8, 2 or 0 bytes).
+    :param dstAddr:    [in] The destination address (16, 8, 2 or 0 bytes).
+    :param route:      [in] The source route, as for assembleLowpan().
+    :param contexts:   [in] The context table, a dictionary of 8-byte
+        prefixes indexed by context identifier, or None.
+    :param srcLinkAddr:[in] The 8-byte link-layer address of the sender.
+
+    :raises: NotImplementedError if the address format is not supported.
+
+    :returns: The 6LoWPAN header, as a bytearray.
+    '''
+    lenSrc  = len(srcAddr)
+    lenDst  = len(dstAddr)
+    numHops = len(route)
+
+    try:
+        sam = SAM_FROM_LEN[lenSrc]
+        dam = DAM_FROM_LEN[lenDst]
+    except KeyError:
+        raise NotImplementedError('unsupported address length src={0} dst={1}'.format(lenSrc,lenDst))
+
+    if numHops>1:
+        if lenDst!=16:
+            # the prefix of the destination address is re-used for the next hop
+            raise NotImplementedError('source routing to a {0}-byte address unsupported'.format(lenDst))
+        # dest address is next hop in source routing
+        outerDst   = bytearray(dstAddr[:8])+bytearray(route[-1])
+    else:
+        # in case of 1hop destination address is the same as ipv6 destination address
+        outerDst   = bytearray(dstAddr)
+
+    # stateful compression
+    sac     = IPHC_SAC_STATELESS
+    dac     = IPHC_DAC_STATELESS
+    sci     = 0
+    dci     = 0
+    if contexts is not None:
+        if lenSrc==16:
+            sci = _findContext(contexts,srcAddr)
+            if sci is not None:
+                sac     = IPHC_SAC_STATEFUL
+                if srcLinkAddr is not None and bytearray(srcAddr[8:])==bytearray(srcLinkAddr):
+                    sam = IPHC_SAM_ELIDED
+                    srcAddr = srcAddr[:0]
+                else:
+                    sam = IPHC_SAM_64B
+                    srcAddr = srcAddr[8:]
+            else:
+                sci     = 0
+        if lenDst==16:
+            dci = _findContext(contexts,outerDst)
+            if dci is not None:
+                dac     = IPHC_DAC_STATEFUL
+                if outerDst[8:]==bytearray(route[-1]):
+                    # the link-layer destination is the next hop
+                    dam = IPHC_DAM_ELIDED
+                    outerDst = outerDst[:0]
+                else:
+                    dam = IPHC_DAM_64B
+                    outerDst = outerDst[8:]
+            else:
+                dci     = 0
+    cid     = IPHC_CID_YES if (sci or dci) else IPHC_CID_NO
+
+    if numHops>1:
+        if contexts is None:
+            cmpr = CONTEXT_PREFIX_LEN
+        else:
+            cmpr = CONTEXT_PREFIX_LEN+_commonPrefixLen(route,MAX_CMPR-CONTEXT_PREFIX_LEN)
+        lenAddresses   = (numHops-1)*(16-cmpr)
+        pad            = (8-lenAddresses%8)%8
+        lenRouting     = RH3_LEN+lenAddresses+pad
+    else:
+        lenRouting     = 0
+
+    # allocate header
+    lenSrc  = len(srcAddr)
+    lenDst  = len(outerDst)
+    out     = bytearray(3+cid+lenSrc+lenDst+lenRouting+INNER_LEN)
+
+    # ===================== 1. IPHC outer header ==============================
+
+    # Byte1: 011(3b) TF(2b) NH(1b) HLIM(2b)
+    out[0]                   = IPHC_OUTER_BYTE0
+    # Byte2: CID(1b) SAC(1b) SAM(2b) M(1b) DAC(2b) DAM(2b)
+    out[1]                   = (cid<<7) + (sac<<6) + (sam<<4) + (IPHC_M_NO<<3) + (dac<<2) + (dam<<0)
+    ptr                      = 2
+    if cid:
+        # CID extension
+        out[ptr]             = (sci<<4) + dci
+        ptr                 += 1
+    # hlim, filled in per packet
+    ptr                     += 1
+    # src_addr
+    out[ptr:ptr+lenSrc]      = srcAddr
+    ptr                     += lenSrc
+    # dst_addr
+    out[ptr:ptr+lenDst]      = outerDst
+    ptr                     += lenDst
+
+    if numHops>1:
+        # ===================== 2. ipv6 routing header ========================
+        # RPL Routing Header (RFC6554: https://tools.ietf.org/html/rfc6554#page-6)
+        RH3_STRUCT.pack_into(
+            out,
+            ptr,
+            NHC_ROUTING_BYTE,
+            lenRouting-2,            # Hdr Ext Len. the length following content until address field
+            SR_FIR_TYPE,             # Routing Type. 3 for source routing
+            numHops-1,               # Segments Left. the first hop goes to the ipv6 destination address
+            cmpr<<4 | cmpr,          # CmprI | CmprE. octets elided from each address
+        )
+        out[ptr+RH3_LEN-3]   = pad<<4
+        ptr                 += RH3_LEN
+        for i in range(numHops-2,-1,-1):
+            out[ptr:ptr+16-cmpr] = route[i][cmpr-CONTEXT_PREFIX_LEN:]
+            ptr             += 16-cmpr
+        ptr                 += pad
+
+    # ===================== 3. IPv6 header and 4. IPHC inner header ===========
+    # next header and hop limit are the last two bytes, filled in per packet
+    INNER_STRUCT.pack_into(
+        out,
+        ptr,
+        NHC_IPV6_BYTE,
+        IPHC_INNER_BYTE0,
+        IPHC_INNER_BYTE1,
+        0,
+        0,
+    )
+
+    return out
+
+def fillLowpanHeader(header,nextHeader,hopLimit,payload,nhc=None):
+    '''
+    Write a 6LoWPAN packet from a header returned by assembleLowpanHeader().
+
+    :param header:     [in] The 6LoWPAN header. It is not modified.
+    :param nextHeader: [in] The next header of the IPv6 packet.
+    :param hopLimit:   [in] The hop limit of the IPv6 packet.
+    :param payload:    [in] The payload of the IPv6 packet, without the
+        header compressed into nhc, if any.
+    :param nhc:        [in] The compressed next header, as returned by
+        compressUdp(), or None to carry the next header inline.
+
+    :returns: The 6LoWPAN packet, as a bytearray.
+    '''
+    lenHeader                = len(header)
+    if nhc is None:
+        out                  = bytearray(header)
+        out.extend(payload)
+        out[lenHeader-2]     = nextHeader
+    else:
+        # the inner IPHC header announces a compressed next header instead
+        # of carrying it inline
+        out                  = header[:lenHeader-1]
+        out[lenHeader-4]    |= IPHC_NH_COMPRESSED<<2
+        out.extend(nhc)
+        out.extend(payload)
+        lenHeader           -= 1
+    # the hop limit follows the CID extension byte, if any
+    out[OUTER_HLIM_OFFSET+(out[1]>>7)] = hopLimit
+    out[lenHeader-1]         = hopLimit
+    return out
+
+def compressUdp(udp,elideChecksum=False):
+    '''
+    Compress a UDP header (RFC6282, section 4.3.3).
+
+    The length is always elided, ports in the 0xF0Bx and 0xF0xx ranges are
+    carried on 4 and 8 bits.
+
+    :param udp:           [in] The UDP datagram, header first.
+    :param elideChecksum: [in] If True, the checksum is elided. RFC6282
+        only allows this when the upper layer authorizes it.
+
+    :returns: The compressed header, as a bytearray, or None if the header
+        can not be compressed, i.e. its length does not match the datagram.
+    '''
+    if not isinstance(udp,bytearray):
+        udp = bytearray(udp)
+
+    if len(udp)<UDP_HEADER_LEN:
+        return None
+    (srcPort,dstPort,length,checksum) = UDP_STRUCT.unpack_from(udp)
+    if length!=len(udp):
+        return None
+
+    if   (srcPort & NHC_UDP_PORT_4B_MASK)==NHC_UDP_PORT_4B_PREFIX and \
+         (dstPort & NHC_UDP_PORT_4B_MASK)==NHC_UDP_PORT_4B_PREFIX:
+        out = bytearray([
+            NHC_UDP_ID | NHC_UDP_PORTS_4B,
+            ((srcPort & 0x0F)<<4) | (dstPort & 0x0F),
+        ])
+    elif (dstPort & NHC_UDP_PORT_8B_MASK)==NHC_UDP_PORT_8B_PREFIX:
+        out = bytearray([
+            NHC_UDP_ID | NHC_UDP_PORTS_DST_8B,
+            srcPort>>8,
+            srcPort & 0xFF,
+            dstPort & 0xFF,
+        ])
+    elif (srcPort & NHC_UDP_PORT_8B_MASK)==NHC_UDP_PORT_8B_PREFIX:
+        out = bytearray([
+            NHC_UDP_ID | NHC_UDP_PORTS_SRC_8B,
+            srcPort & 0xFF,
+            dstPort>>8,
+            dstPort & 0xFF,
+        ])
+    else:
+        out = bytearray([
+            NHC_UDP_ID | NHC_UDP_PORTS_INLINE,
+            srcPort>>8,
+            srcPort & 0xFF,
+            dstPort>>8,
+            dstPort & 0xFF,
+        ])
+
+    if elideChecksum:
+        out[0]              |= NHC_UDP_C_ELIDED
+    else:
+        out.extend([checksum>>8,checksum & 0xFF])
+
+    return out
+
+def decompressUdp(nhc):
+    '''
+    Read a compressed UDP header (RFC6282, section 4.3.3).
+
+    :param nhc: [in] The compressed header, followed by the UDP payload.
+
+    :raises: ValueError if nhc is not a valid compressed UDP header.
+
+    :returns: A tuple (srcPort,dstPort,checksum,length), checksum None if
+        elided, length the number of bytes of the compressed header.
+    '''
+    try:
+        if (nhc[0] & NHC_UDP_MASK)!=NHC_UDP_ID:
+            raise ValueError('not a compressed UDP header')
+        ports = nhc[0] & 0x03
+        if   ports==NHC_UDP_PORTS_INLINE:
+            srcPort = (nhc[1]<<8) | nhc[2]
+            dstPort = (nhc[3]<<8) | nhc[4]
+            ptr     = 5
+        elif ports==NHC_UDP_PORTS_DST_8B:
+            srcPort = (nhc[1]<<8) | nhc[2]
+            dstPort = NHC_UDP_PORT_8B_PREFIX | nhc[3]
+            ptr     = 4
+        elif ports==NHC_UDP_PORTS_SRC_8B:
+            srcPort = NHC_UDP_PORT_8B_PREFIX | nhc[1]
+            dstPort = (nhc[2]<<8) | nhc[3]
+            ptr     = 4
+        else:
+            srcPort = NHC_UDP_PORT_4B_PREFIX | (nhc[1]>>4)
+            dstPort = NHC_UDP_PORT_4B_PREFIX | (nhc[1] & 0x0F)
+            ptr     = 2
+        if nhc[0] & NHC_UDP_C_ELIDED:
+            checksum = None
+        else:
+            checksum = (nhc[ptr]<<8) | nhc[ptr+1]
+            ptr     += 2
+    except IndexError:
+        raise ValueError('compressed UDP header too short ({0} bytes)'.format(len(nhc)))
+    return (srcPort,dstPort,checksum,ptr)
+
+def disassembleLowpan(prevHop,lowpan,networkPrefix,dagRootEui64,contexts=None):
+    '''
+    Read the fields of a 6LoWPAN packet received from the mesh.
+
+    :param prevHop:       [in] The 8-byte address of the previous hop.
+    :param lowpan:        [in] The 6LoWPAN packet, as a bytearray or list.
+    :param networkPrefix: [in] The 8-byte network prefix.
+    :param dagRootEui64:  [in] The 8-byte EUI64 of the DAGroot.
+    :param contexts:      [in] The context table, a dictionary of 8-byte
+        prefixes indexed by context identifier. If None, context 0 is the
+        network prefix.
+
+    :raises: ValueError if the packet is not a valid 6LoWPAN packet.
+    :raises: NotImplementedError if the packet uses compression features
+        not implemented in this module.
+
+    :returns: A dictionary of fields. Addresses and payload are bytearrays.
+    '''
+    if not isinstance(lowpan,bytearray):
+        lowpan = bytearray(lowpan)
+
+    pkt = {}
+    ptr = 2
+
+    try:
+        if (lowpan[0]>>5)!=IPHC_DISPATCH:
+            raise ValueError('not a 6LoWPAN packet')
+
+        # cid
+        if (lowpan[1]>>7)==IPHC_CID_YES:
+            sci  = lowpan[ptr]>>4
+            dci  = lowpan[ptr] & 0x0F
+            ptr += 1
+        else:
+            sci  = 0
+            dci  = 0
+        if contexts is None:
+            contexts = {0: networkPrefix}
+
+        # tf
+        tf = (lowpan[0]>>3) & 0x03
+        if   tf==IPHC_TF_3B:
+            pkt['flow_label'] = (lowpan[ptr]<<16) + (lowpan[ptr+1]<<8) + (lowpan[ptr+2]<<0)
+            ptr += 3
+        elif tf==IPHC_TF_ELIDED:
+            pkt['flow_label'] = 0
+        else:
+            raise NotImplementedError('unsupported tf=={0}'.format(tf))
+
+        # nh
+        nh = (lowpan[0]>>2) & 0x01
+        if nh==IPHC_NH_INLINE:
+            pkt['next_header'] = lowpan[ptr]
+            ptr += 1
+
+        # hlim
+        hlim = lowpan[0] & 0x03
+        if   hlim==IPHC_HLIM_INLINE:
+            pkt['hop_limit'] = lowpan[ptr]
+            ptr += 1
+        elif hlim==IPHC_HLIM_1:
+            pkt['hop_limit'] = 1
+        elif hlim==IPHC_HLIM_64:
+            pkt['hop_limit'] = 64
+        else:
+            pkt['hop_limit'] = 255
+
+        # sam
+        sam = (lowpan[1]>>4) & 0x03
+        if ((lowpan[1]>>6) & 0x01)==IPHC_SAC_STATEFUL:
+            if sam==IPHC_SAM_128B:
+                # unspecified address
+                pkt['src_addr'] = bytearray(16)
+            else:
+                (pkt['src_addr'],ptr) = _readAddr(sam,lowpan,ptr,_getContext(contexts,sci),prevHop)
+        else:
+            (pkt['src_addr'],ptr) = _readAddr(sam,lowpan,ptr,networkPrefix,prevHop)
+
+        # dam
+        dam = lowpan[1] & 0x03
+        if dam==IPHC_DAM_ELIDED and log.isEnabledFor(logging.DEBUG):
+            log.debug("IPHC_DAM_ELIDED this packet is for the dagroot!")
+        if ((lowpan[1]>>2) & 0x01)==IPHC_DAC_STATEFUL:
+            if dam==IPHC_DAM_128B or ((lowpan[1]>>3) & 0x01)==IPHC_M_YES:
+                raise NotImplementedError('unsupported stateful dam=={0}'.format(dam))
+            (pkt['dst_addr'],ptr) = _readAddr(dam,lowpan,ptr,_getContext(contexts,dci),dagRootEui64)
+        else:
+            (pkt['dst_addr'],ptr) = _readAddr(dam,lowpan,ptr,networkPrefix,dagRootEui64)
+
+        if nh==IPHC_NH_COMPRESSED:
+            if (lowpan[ptr] & NHC_UDP_MASK)==NHC_UDP_ID:
+                # the compressed UDP header is left in the payload, as its
+                # checksum may depend on addresses of the outer header
+                pkt['next_header'] = IANA_UDP
+                pkt['udp_nhc']     = True
+            elif ((lowpan[ptr]>>4) & 0x0f)!=NHC_DISPATCH:
+                raise NotImplementedError('unsupported NHC 0x{0:02x}'.format(lowpan[ptr]))
+            else:
+                eid = (lowpan[ptr] & NHC_EID_MASK)>>1
+                if   eid==NHC_EID_HOPBYHOP:
+                    pkt['next_header'] = IANA_IPv6HOPHEADER
+                elif eid==NHC_EID_IPV6:
+                    pkt['next_header'] = IPV6_HEADER
+                else:
+                    raise NotImplementedError('wrong NH_EID=={0}'.format(eid))
+
+        # hop by hop header
+        # composed of NHC, NextHeader,Len + Rpl Option
+        if pkt['next_header']==IANA_IPv6HOPHEADER:
+            pkt['hop_nhc'] = lowpan[ptr]
+            ptr += 1
+            if (pkt['hop_nhc'] & 0x01)==0:
+                pkt['hop_next_header'] = lowpan[ptr]
+                ptr += 1
+            pkt['hop_hdr_len'] = lowpan[ptr]
+            ptr += 1
+            (
+                pkt['hop_optionType'],
+                pkt['hop_optionLen'],
+                pkt['hop_flags'],
+                pkt['hop_rplInstanceID'],
+                pkt['hop_senderRank'],
+            ) = RPL_OPTION_STRUCT.unpack_from(lowpan,ptr)
+            ptr += RPL_OPTION_STRUCT.size
+            if (pkt['hop_nhc'] & 0x01)==1:
+                if ((lowpan[ptr]>>1) & 0x07)==NHC_EID_IPV6:
+                    pkt['hop_next_header'] = IPV6_HEADER
+    except (IndexError,struct.error):
+        raise ValueError('6LoWPAN packet too short ({0} bytes)'.format(len(lowpan)))
+
+    # payload
+    pkt['version']           = 6
+    pkt['traffic_class']     = 0
+    pkt['payload']           = lowpan[ptr:]
+    pkt['payload_length']    = len(pkt['payload'])
+    pkt['pre_hop']           = prevHop
+    return pkt
+
+def lenIpv6Headers(header):
+    '''
+    Compute the number of bytes the IPv6 headers of a header returned by
+    assembleLowpanHeader() decompress to.
+
+    :param header: [in] The 6LoWPAN header.
+
+    :returns: The length of the outer IPv6 header, routing header and inner
+        IPv6 header.
+    '''
+    cid        = header[1]>>7
+    lenSrc     = INLINE_ADDR_LEN[(header[1]>>4) & 0x03]
+    lenDst     = INLINE_ADDR_LEN[header[1] & 0x03]
+    ptr        = 3+cid+lenSrc+lenDst
+    if header[ptr]==NHC_ROUTING_BYTE:
+        # the Hdr Ext Len excludes the first 2 octets
+        lenRouting = header[ptr+1]+2
+    else:
+        lenRouting = 0
+    return 2*IPv6_HEADER_LEN+lenRouting
+
+def uncompressedLen(prevHop,lowpan,networkPrefix,dagRootEui64,contexts=None):
+    '''
+    Compute the number of bytes a 6LoWPAN packet received from the mesh
+    decompresses to.
+
+    The packet can be the content of a first fragment, as long as it
+    contains all the compressed headers.
+
+    :param prevHop:       [in] As for disassembleLowpan().
+    :param lowpan:        [in] As for disassembleLowpan().
+    :param networkPrefix: [in] As for disassembleLowpan().
+    :param dagRootEui64:  [in] As for disassembleLowpan().
+    :param contexts:      [in] As for disassembleLowpan().
+
+    :raises: ValueError and NotImplementedError as disassembleLowpan().
+
+    :returns: The length of the IPv6 packet.
+    '''
+    length = 0
+    while True:
+        pkt         = disassembleLowpan(prevHop,lowpan,networkPrefix,dagRootEui64,contexts)
+        length     += IPv6_HEADER_LEN
+        nextHeader  = pkt['next_header']
+        if nextHeader==IANA_IPv6HOPHEADER:
+            length     += HOPBYHOP_LEN
+            nextHeader  = pkt.get('hop_next_header')
+        if nextHeader==IPV6_HEADER:
+            # the IPv6 NHC is followed by the inner IPHC header
+            lowpan      = pkt['payload'][1:]
+            continue
+        if pkt.get('udp_nhc'):
+            lenNhc      = decompressUdp(pkt['payload'])[3]
+            return length+UDP_HEADER_LEN+len(pkt['payload'])-lenNhc
+        return length+len(pkt['payload'])
+
+#============================ fragmentation ===================================
+
+def isFragment(lowpan):
+    '''
+    :returns: True if the 6LoWPAN packet is a fragment.
+    '''
+    return len(lowpan)>0 and (lowpan[0]>>3) in (FRAG1_DISPATCH,FRAGN_DISPATCH)
+
+def fragmentLowpan(lowpan,lenHeader,lenIpv6Header,tag,maxLen):
+    '''
+    Split a 6LoWPAN packet into fragments (RFC4944, section 5.3).
+
+    The first fragment carries all the compressed headers. Offsets refer to
+    the uncompressed IPv6 packet, so the payload in the first fragment is cut
+    where the uncompressed packet reaches a multiple of 8 octets.
+
+    :param lowpan:        [in] The 6LoWPAN packet.
+    :param lenHeader:     [in] The number of bytes of compressed headers at
+        the start of lowpan.
+    :param lenIpv6Header: [in] The number of bytes these headers decompress
+        to.
+    :param tag:           [in] The datagram tag, 0-0xffff.
+    :param maxLen:        [in] The maximum number of bytes of a fragment.
+
+    :raises: ValueError if the packet is too large, or its headers do not fit
+        in a fragment.
+
+    :returns: The list of fragments, as bytearrays.
+    '''
+    size             = lenIpv6Header+len(lowpan)-lenHeader
+    if size>MAX_DATAGRAM_SIZE:
+        raise ValueError('datagram too large ({0} bytes)'.format(size))
+
+    # first fragment
+    lenPayload       = (lenIpv6Header+maxLen-FRAG1_HEADER_LEN-lenHeader)//FRAG_OFFSET_UNIT*FRAG_OFFSET_UNIT-lenIpv6Header
+    if lenPayload<0:
+        raise ValueError('{0} bytes of headers do not fit in a fragment'.format(lenHeader))
+    ptr              = lenHeader+lenPayload
+    frag             = bytearray(FRAG1_STRUCT.pack((FRAG1_DISPATCH<<11) | size,tag))
+    frag.extend(lowpan[:ptr])
+    returnVal        = [frag]
+
+    # subsequent fragments
+    offset           = lenIpv6Header+lenPayload
+    step             = (maxLen-FRAGN_HEADER_LEN)//FRAG_OFFSET_UNIT*FRAG_OFFSET_UNIT
+    while ptr<len(lowpan):
+        frag         = bytearray(FRAGN_STRUCT.pack((FRAGN_DISPATCH<<11) | size,tag,offset//FRAG_OFFSET_UNIT))
+        frag.extend(lowpan[ptr:ptr+step])
+        returnVal   += [frag]
+        ptr         += step
+        offset      += step
+
+    return returnVal
+
+def parseFragment(frag):
+    '''
+    Read the header of a fragment.
+
+    :param frag: [in] The fragment, as a bytearray or list.
+
+    :raises: ValueError if frag is not a valid fragment.
+
+    :returns: A tuple (size,tag,offset,payload), offset in bytes, None for
+        a first fragment.
+    '''
+    if not isinstance(frag,bytearray):
+        frag = bytearray(frag)
+    try:
+        dispatch = frag[0]>>3
+        if   dispatch==FRAG1_DISPATCH:
+            (sizeField,tag)         = FRAG1_STRUCT.unpack_from(frag)
+            offset                  = None
+            payload                 = frag[FRAG1_HEADER_LEN:]
+        elif dispatch==FRAGN_DISPATCH:
+            (sizeField,tag,offset)  = FRAGN_STRUCT.unpack_from(frag)
+            offset                 *= FRAG_OFFSET_UNIT
+            payload                 = frag[FRAGN_HEADER_LEN:]
+        else:
+            raise ValueError('not a fragment')
+    except (IndexError,struct.error):
+        raise ValueError('fragment too short ({0} bytes)'.format(len(frag)))
+    return (sizeField & MAX_DATAGRAM_SIZE,tag,offset,payload)
+
+#============================ helpers =========================================
+
+def _findContext(contexts,addr):
+    '''
+    :returns: The identifier of the context with the prefix of addr, or None.
+    '''
+    prefix = bytearray(addr[:CONTEXT_PREFIX_LEN])
+    for cid in sorted(contexts.keys()):
+        if contexts[cid] is not None and bytearray(contexts[cid])==prefix:
+            return cid
+    return None
+
+def _getContext(contexts,cid):
+    '''
+    :raises: ValueError if the context is unknown.
+
+    :returns: The prefix of a context.
+    '''
+    prefix = contexts.get(cid)
+    if prefix is None:
+        raise ValueError('unknown context {0}'.format(cid))
+    return prefix
+
+def _commonPrefixLen(route,maxLen):
+    '''
+    :returns: The number of leading octets all the addresses of route have
+        in common, at most maxLen.
+    '''
+    first  = route[0]
+    length = 0
+    while length<maxLen:
+        for hop in route:
+            if hop[length]!=first[length]:
+                return length
+        length += 1
+    return length
+
+def _readAddr(mode,lowpan,ptr,networkPrefix,elidedIid):
+    '''
+    Read a compressed address.
+
+    SAM and DAM share the same encoding. For stateful compression,
+    networkPrefix is the prefix of the context.
+
+    :returns: A tuple (address,ptr), the address as a bytearray and ptr
+        pointing past the inline bytes of the address.
+    '''
+    if mode==IPHC_SAM_128B:
+        if len(lowpan)<ptr+16:
+            raise IndexError()
+        return (lowpan[ptr:ptr+16],ptr+16)
+
+    if networkPrefix is None:
+        raise ValueError('no network prefix to decompress address')
+    if mode==IPHC_SAM_ELIDED and elidedIid is None:
+        raise ValueError('no link-layer address to decompress elided address')
+
+    addr                     = bytearray(16)
+    addr[0:8]                = networkPrefix
+    if   mode==IPHC_SAM_ELIDED:
+        addr[8:16]           = elidedIid
+    elif mode==IPHC_SAM_64B:
+        if len(lowpan)<ptr+8:
+            raise IndexError()
+        addr[8:16]           = lowpan[ptr:ptr+8]
+        ptr                 += 8
+    else:
+        if len(lowpan)<ptr+2:
+            raise IndexError()
+        addr[14:16]          = lowpan[ptr:ptr+2]
+        ptr                 += 2
+    return (addr,ptr)
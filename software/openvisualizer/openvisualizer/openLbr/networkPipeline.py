@@ -0,0 +1,371 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Runs several independent meshes in one OpenVisualizer, each with its own
+pipeline.
+'''
+import logging
+log = logging.getLogger('networkPipeline')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import multiprocessing
+import threading
+import time
+import Queue
+
+from pydispatch import dispatcher
+
+import openvisualizer.openvisualizer_utils as u
+from openvisualizer.eventBus      import eventBusClient
+from openvisualizer.moteConnector import moteConnector
+from openvisualizer.moteState     import moteState
+from openvisualizer.RPL           import RPL
+from openvisualizer.RPL           import topology
+from openvisualizer.RPL           import UDPLatency
+import openLbr
+
+#============================ defines =========================================
+
+## Offset of the prefix of the destination address in an IPv6 packet.
+DST_PREFIX_OFFSET  = 24
+
+#============================ classes =========================================
+
+class NetworkPipeline(eventBusClient.eventBusClient):
+    '''
+    The pipeline of one mesh: its own OpenLbr, RPL, topology and UDPLatency
+    instances, and the motes of its serial ports, all connected to the
+    event bus of the network rather than to the global one. The pipelines
+    of different meshes share no state and no lock.
+
+    The pipeline announces its prefix on the network, and answers
+    'getNetworkPrefix' with it. It forwards into the network the 'v6ToMesh'
+    packets of the global event bus destined to its prefix, and the
+    'v6ToInternet' packets of the network to the global event bus, i.e. to
+    the TUN interface.
+    '''
+
+    def __init__(self,prefix,serialPorts=[],name=None,toInternet=None):
+        '''
+        :param prefix:      [in] The 8-byte prefix of the network.
+        :param serialPorts: [in] The serial ports of the motes of the network.
+        :param name:        [in] The name of the network, by default its
+            formatted prefix.
+        :param toInternet:  [in] The function called with the packets the
+            network sends to the Internet. If None, they are dispatched on the
+            global event bus.
+        '''
+
+        # store params
+        self.prefix               = list(prefix)
+        self.serialPorts          = list(serialPorts)
+        self.toInternet           = toInternet
+
+        # log
+        log.info("create instance")
+
+        # local variables
+        self.statsLock            = threading.Lock()
+        self.numToMesh            = 0
+        self.numToInternet        = 0
+
+        # initialize parent class
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'networkPipeline',
+            network               = name or u.formatIPv6Addr(self.prefix),
+            registrations         = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'getNetworkPrefix',
+                    'callback'    : self._getNetworkPrefix_notif,
+                },
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'v6ToInternet',
+                    'callback'    : self._v6ToInternet_notif,
+                },
+            ]
+        )
+
+        # the components of the network
+        self.openLbr              = openLbr.OpenLbr(network=self.network)
+        self.rpl                  = RPL.RPL(network=self.network)
+        self.topology             = topology.topology(network=self.network)
+        self.udpLatency           = UDPLatency.UDPLatency(network=self.network)
+        if self.serialPorts:
+            # imported on the fly, as it needs the serial library
+            from openvisualizer.moteProbe import moteProbe
+            self.moteProbes       = [
+                moteProbe.moteProbe(serialport=p) for p in self.serialPorts
+            ]
+        else:
+            self.moteProbes       = []
+        self.moteConnectors       = [
+            moteConnector.moteConnector(mp.getPortName(),network=self.network) for mp in self.moteProbes
+        ]
+        self.moteStates           = [
+            moteState.moteState(mc) for mc in self.moteConnectors
+        ]
+
+        # receive the packets from the Internet
+        if self.toInternet is None:
+            self.internetClient   = eventBusClient.eventBusClient(
+                name              = 'networkPipeline@{0}'.format(self.network),
+                registrations     = [
+                    {
+                        'sender'  : self.WILDCARD,
+                        'signal'  : 'v6ToMesh',
+                        'callback': self._v6ToMesh_notif,
+                    },
+                ]
+            )
+        else:
+            self.internetClient   = None
+
+        # announce network prefix
+        self.dispatch(
+            signal                = 'networkPrefix',
+            data                  = self.prefix,
+        )
+
+    #======================== public ==========================================
+
+    def close(self):
+        if self.internetClient:
+            dispatcher.disconnect(self.internetClient._eventBusNotification)
+        self.openLbr.close()
+        self.rpl.close()
+        self.topology.close()
+        self.udpLatency.close()
+        for probe in self.moteProbes:
+            probe.close()
+        eventBusClient.closeNetwork(self.network)
+
+    def fromInternet(self,ipv6):
+        '''
+        Sends a packet from the Internet into the network.
+
+        :param ipv6: [in] The IPv6 packet, as a list of bytes.
+        '''
+        with self.statsLock:
+            self.numToMesh       += 1
+        self.dispatch(
+            signal                = 'v6ToMesh',
+            data                  = ipv6,
+        )
+
+    def getStats(self):
+        '''
+        :returns: A dictionary with the 'network' name, its 'prefix'
+            (formatted), the number of packets forwarded 'toMesh' and
+            'toInternet', and the statistics of its event bus ('bus', see
+            NetworkBus.getStats()), of its 6LoWPAN header 'templates' and of
+            its 'daos'.
+        '''
+        with self.statsLock:
+            returnVal = {
+                'network':    self.network,
+                'prefix':     u.formatIPv6Addr(self.prefix),
+                'toMesh':     self.numToMesh,
+                'toInternet': self.numToInternet,
+            }
+        returnVal['bus']       = self.networkBus.getStats()
+        returnVal['templates'] = self.openLbr.getTemplateStats()
+        returnVal['daos']      = self.rpl.getDAOStats()
+        return returnVal
+
+    #======================== private =========================================
+
+    def _getNetworkPrefix_notif(self,sender,signal,data):
+        return self.prefix
+
+    def _v6ToMesh_notif(self,sender,signal,data):
+        '''
+        Called when a packet is received from the Internet, on the global
+        event bus.
+
+        Only the packets destined to the prefix of the network are forwarded.
+        '''
+        if list(data[DST_PREFIX_OFFSET:DST_PREFIX_OFFSET+8])!=self.prefix:
+            return None
+        self.fromInternet(data)
+        return True
+
+    def _v6ToInternet_notif(self,sender,signal,data):
+        '''
+        Called when the network sends a packet to the Internet.
+        '''
+        with self.statsLock:
+            self.numToInternet   += 1
+        if self.toInternet:
+            self.toInternet(data)
+        else:
+            self.internetClient.dispatch(
+                signal            = 'v6ToInternet',
+                data              = data,
+            )
+
+class NetworkProcess(object):
+    '''
+    Runs a NetworkPipeline in a worker process, so the meshes also run on
+    several cores.
+
+    The packets exchanged with the Internet and the statistics cross the
+    process boundary through a pipe; everything else stays in the worker.
+    The motes of the network are not visible to the user interfaces of the
+    main process.
+    '''
+
+    # number of seconds getStats() waits for the worker
+    STATS_TIMEOUT         = 5
+
+    def __init__(self,prefix,serialPorts=[],name=None):
+        '''
+        :param prefix:      [in] The 8-byte prefix of the network.
+        :param serialPorts: [in] The serial ports of the motes of the network.
+        :param name:        [in] The name of the network, by default its
+            formatted prefix.
+        '''
+
+        # store params
+        self.prefix               = list(prefix)
+        self.network              = name or u.formatIPv6Addr(self.prefix)
+
+        # log
+        log.info("create instance")
+
+        # start the worker first, no thread of ours is forked with it
+        (self.conn,workerConn)    = multiprocessing.Pipe()
+        self.process              = multiprocessing.Process(
+            target                = _runWorker,
+            args                  = (workerConn,self.prefix,serialPorts,self.network),
+            name                  = 'networkProcess@{0}'.format(self.network),
+        )
+        self.process.daemon       = True
+        self.process.start()
+        workerConn.close()
+
+        # local variables
+        self.sendLock             = threading.Lock()
+        self.statsLock            = threading.Lock()
+        self.statsQueue           = Queue.Queue()             # (sequence number of the request,statistics)
+        self.statsSeq             = 0
+
+        # receive the packets from the Internet
+        self.internetClient       = eventBusClient.eventBusClient(
+            name                  = 'networkProcess@{0}'.format(self.network),
+            registrations         = [
+                {
+                    'sender'      : eventBusClient.eventBusClient.WILDCARD,
+                    'signal'      : 'v6ToMesh',
+                    'callback'    : self._v6ToMesh_notif,
+                },
+            ]
+        )
+
+        # receive the packets and statistics from the worker
+        self.readThread           = threading.Thread(target=self._readFromWorker)
+        self.readThread.name      = 'networkProcess@{0}'.format(self.network)
+        self.readThread.daemon    = True
+        self.readThread.start()
+
+    #======================== public ==========================================
+
+    def close(self):
+        dispatcher.disconnect(self.internetClient._eventBusNotification)
+        self._sendToWorker('close',None)
+        self.process.join(self.STATS_TIMEOUT)
+        self.readThread.join(self.STATS_TIMEOUT)
+
+    def isAlive(self):
+        return self.process.is_alive()
+
+    def getStats(self):
+        '''
+        :returns: The statistics of the pipeline, see
+            NetworkPipeline.getStats(), or None if the worker does not
+            answer.
+        '''
+        with self.statsLock:
+            self.statsSeq        += 1
+            self._sendToWorker('getStats',self.statsSeq)
+            deadline              = time.time()+self.STATS_TIMEOUT
+            while True:
+                try:
+                    (seq,stats)   = self.statsQueue.get(timeout=max(deadline-time.time(),0))
+                except Queue.Empty:
+                    log.warning('no statistics from network {0}'.format(self.network))
+                    return None
+                if seq==self.statsSeq:
+                    return stats
+                # the late answer to a request which timed out
+                log.debug('dropping statistics {0} of network {1}'.format(seq,self.network))
+
+    #======================== private =========================================
+
+    def _v6ToMesh_notif(self,sender,signal,data):
+        if list(data[DST_PREFIX_OFFSET:DST_PREFIX_OFFSET+8])!=self.prefix:
+            return None
+        if not self.process.is_alive():
+            log.debug('network {0} exited, not forwarding'.format(self.network))
+            return None
+        self._sendToWorker('v6ToMesh',list(data))
+        return True
+
+    def _sendToWorker(self,command,data):
+        try:
+            with self.sendLock:
+                self.conn.send((command,data))
+        except (IOError,EOFError) as err:
+            log.error('cannot send {0} to network {1}: {2}'.format(command,self.network,err))
+
+    def _readFromWorker(self):
+        while True:
+            try:
+                (command,data) = self.conn.recv()
+            except (IOError,EOFError):
+                # the worker exited
+                break
+            if   command=='v6ToInternet':
+                self.internetClient.dispatch(
+                    signal        = 'v6ToInternet',
+                    data          = data,
+                )
+            elif command=='stats':
+                self.statsQueue.put(data)
+
+#============================ worker ==========================================
+
+def _runWorker(conn,prefix,serialPorts,name):
+    '''
+    The main function of the worker process of a NetworkProcess.
+    '''
+    sendLock = threading.Lock()
+
+    def toInternet(ipv6):
+        with sendLock:
+            conn.send(('v6ToInternet',list(ipv6)))
+
+    pipeline = NetworkPipeline(prefix,serialPorts,name,toInternet=toInternet)
+    try:
+        while True:
+            try:
+                (command,data) = conn.recv()
+            except (IOError,EOFError):
+                # the main process exited
+                break
+            if   command=='v6ToMesh':
+                pipeline.fromInternet(data)
+            elif command=='getStats':
+                # answered with the sequence number of the request
+                with sendLock:
+                    conn.send(('stats',(data,pipeline.getStats())))
+            elif command=='close':
+                break
+    finally:
+        pipeline.close()
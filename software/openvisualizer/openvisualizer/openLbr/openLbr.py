@@ -9,8 +9,13 @@ log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
 from openvisualizer.eventBus import eventBusClient
+import collections
 import threading
+import time
 import openvisualizer.openvisualizer_utils as u
+import lowpanCodec
+import reassemblyBuffer
+import flowTable
 
 #============================ parameters ======================================
 
@@ -27,16 +32,20 @@ class OpenLbr(eventBusClient.eventBusClient):
       Internet Protocol, Version 6 (IPv6) Specification
     * *http://tools.ietf.org/html/draft-thubert-6man-flow-label-for-rpl-03
        The IPv6 Flow Label within a RPL domain  
+    
+    Several DAGroots can be attached, serving the same prefix. A packet
+    sent into the mesh goes through the DAGroot its source route ends at,
+    i.e. the DAGroot of the destination's subtree.
     '''
     #implementing http://tools.ietf.org/html/draft-thubert-6man-flow-label-for-rpl-03
     
     # http://www.iana.org/assignments/protocol-numbers/protocol-numbers.xml 
-    IANA_PROTOCOL_IPv6ROUTE  = 43
-    IANA_UDP                 = 17
-    IANA_ICMPv6              = 58
-    IANA_IPv6HOPHEADER       = 0
+    IANA_PROTOCOL_IPv6ROUTE  = lowpanCodec.IANA_PROTOCOL_IPv6ROUTE
+    IANA_UDP                 = lowpanCodec.IANA_UDP
+    IANA_ICMPv6              = lowpanCodec.IANA_ICMPv6
+    IANA_IPv6HOPHEADER       = lowpanCodec.IANA_IPv6HOPHEADER
     # there is no IANA for IPV6 HEADER right now, we use NHC identifier for it
-    IPV6_HEADER              = 0xEE #https://tools.ietf.org/html/rfc6282#section-4.2
+    IPV6_HEADER              = lowpanCodec.IPV6_HEADER
     
     #hop header flags
     O_FLAG                   = 0x80
@@ -44,77 +53,140 @@ class OpenLbr(eventBusClient.eventBusClient):
     F_FLAG                   = 0x20
     
     # Number of bytes in an IPv6 header.
-    IPv6_HEADER_LEN          = 40
+    IPv6_HEADER_LEN          = lowpanCodec.IPv6_HEADER_LEN
     
-    IPHC_DISPATCH            = 3
+    IPHC_DISPATCH            = lowpanCodec.IPHC_DISPATCH
     
-    IPHC_TF_4B               = 0
-    IPHC_TF_3B               = 1
-    IPHC_TF_1B               = 2
-    IPHC_TF_ELIDED           = 3
+    IPHC_TF_4B               = lowpanCodec.IPHC_TF_4B
+    IPHC_TF_3B               = lowpanCodec.IPHC_TF_3B
+    IPHC_TF_1B               = lowpanCodec.IPHC_TF_1B
+    IPHC_TF_ELIDED           = lowpanCodec.IPHC_TF_ELIDED
 
-    IPHC_NH_INLINE           = 0
-    IPHC_NH_COMPRESSED       = 1
+    IPHC_NH_INLINE           = lowpanCodec.IPHC_NH_INLINE
+    IPHC_NH_COMPRESSED       = lowpanCodec.IPHC_NH_COMPRESSED
 
-    IPHC_HLIM_INLINE         = 0
-    IPHC_HLIM_1              = 1
-    IPHC_HLIM_64             = 2
-    IPHC_HLIM_255            = 3 
+    IPHC_HLIM_INLINE         = lowpanCodec.IPHC_HLIM_INLINE
+    IPHC_HLIM_1              = lowpanCodec.IPHC_HLIM_1
+    IPHC_HLIM_64             = lowpanCodec.IPHC_HLIM_64
+    IPHC_HLIM_255            = lowpanCodec.IPHC_HLIM_255
 
-    IPHC_CID_NO              = 0
-    IPHC_CID_YES             = 1
+    IPHC_CID_NO              = lowpanCodec.IPHC_CID_NO
+    IPHC_CID_YES             = lowpanCodec.IPHC_CID_YES
 
-    IPHC_SAC_STATELESS       = 0
-    IPHC_SAC_STATEFUL        = 1
+    IPHC_SAC_STATELESS       = lowpanCodec.IPHC_SAC_STATELESS
+    IPHC_SAC_STATEFUL        = lowpanCodec.IPHC_SAC_STATEFUL
 
-    IPHC_SAM_128B            = 0
-    IPHC_SAM_64B             = 1
-    IPHC_SAM_16B             = 2
-    IPHC_SAM_ELIDED          = 3
+    IPHC_SAM_128B            = lowpanCodec.IPHC_SAM_128B
+    IPHC_SAM_64B             = lowpanCodec.IPHC_SAM_64B
+    IPHC_SAM_16B             = lowpanCodec.IPHC_SAM_16B
+    IPHC_SAM_ELIDED          = lowpanCodec.IPHC_SAM_ELIDED
 
-    IPHC_M_NO                = 0
-    IPHC_M_YES               = 1
+    IPHC_M_NO                = lowpanCodec.IPHC_M_NO
+    IPHC_M_YES               = lowpanCodec.IPHC_M_YES
 
-    IPHC_DAC_STATELESS       = 0
-    IPHC_DAC_STATEFUL        = 1
+    IPHC_DAC_STATELESS       = lowpanCodec.IPHC_DAC_STATELESS
+    IPHC_DAC_STATEFUL        = lowpanCodec.IPHC_DAC_STATEFUL
 
-    IPHC_DAM_128B            = 0
-    IPHC_DAM_64B             = 1
-    IPHC_DAM_16B             = 2
-    IPHC_DAM_ELIDED          = 3
+    IPHC_DAM_128B            = lowpanCodec.IPHC_DAM_128B
+    IPHC_DAM_64B             = lowpanCodec.IPHC_DAM_64B
+    IPHC_DAM_16B             = lowpanCodec.IPHC_DAM_16B
+    IPHC_DAM_ELIDED          = lowpanCodec.IPHC_DAM_ELIDED
 
-    NHC_DISPATCH             = 0x0E
+    NHC_DISPATCH             = lowpanCodec.NHC_DISPATCH
     
-    NHC_EID_MASK             = 0x0E
-    NHC_EID_HOPBYHOP         = 0
-    NHC_EID_ROUTING          = 1
-    NHC_EID_IPV6             = 7
+    NHC_EID_MASK             = lowpanCodec.NHC_EID_MASK
+    NHC_EID_HOPBYHOP         = lowpanCodec.NHC_EID_HOPBYHOP
+    NHC_EID_ROUTING          = lowpanCodec.NHC_EID_ROUTING
+    NHC_EID_IPV6             = lowpanCodec.NHC_EID_IPV6
 
-    NHC_NH_INLINE            = 0
-    NHC_NH_COMPRESSED        = 1
+    NHC_NH_INLINE            = lowpanCodec.NHC_NH_INLINE
+    NHC_NH_COMPRESSED        = lowpanCodec.NHC_NH_COMPRESSED
     
     #=== RPL source routing header (RFC6554)
-    SR_FIR_TYPE              = 0x03
+    SR_FIR_TYPE              = lowpanCodec.SR_FIR_TYPE
     
     #=== UDP Header compression (RFC6282) 
     
-    NHC_UDP_MASK             = 0xF8
-    NHC_UDP_ID               = 0xF0
+    NHC_UDP_MASK             = lowpanCodec.NHC_UDP_MASK
+    NHC_UDP_ID               = lowpanCodec.NHC_UDP_ID
+    UDP_HEADER_LEN           = lowpanCodec.UDP_HEADER_LEN
+    
+    # maximum number of destinations a 6LoWPAN header template is kept for
+    MAX_NUM_TEMPLATES        = 256
+    # maximum number of destinations header statistics are kept for
+    MAX_NUM_HEADER_STATS     = 256
+    
+    # maximum number of bytes of a 6LoWPAN packet in an 802.15.4 frame: 127
+    # bytes, minus a MAC header with long addresses (21 bytes) and the FCS
+    MAX_LOWPAN_LEN           = 127-21-2
     
-    def __init__(self):
+    # period at which the datagrams being reassembled are checked for
+    # timeouts, in seconds
+    REASSEMBLY_EXPIRY_PERIOD = 5
+    
+    #=== contexts (RFC6282, section 3.1.2)
+    NUM_CONTEXTS             = lowpanCodec.NUM_CONTEXTS
+    # context of the network prefix announced by the DAGroot
+    PREFIX_CONTEXT           = 0
+    
+    def __init__(self,compressUdp=True,elideUdpChecksum=False,compressAddresses=True,maxLowpanLen=MAX_LOWPAN_LEN,
+            maxFlows=flowTable.FlowTable.MAX_FLOWS,network=None):
+        '''
+        :param compressUdp:      [in] If True, the UDP header of the packets
+            sent into the mesh is compressed (RFC6282, section 4.3).
+        :param elideUdpChecksum: [in] If True, the UDP checksum is elided
+            when compressing. RFC6282 only allows this when the upper layer
+            authorizes it, e.g. when the payload carries its own integrity
+            check.
+        :param compressAddresses: [in] If True, the addresses of the packets
+            sent into the mesh are compressed with the context table, and
+            the routing header elides all the octets the hops have in common.
+            If False, only stateless compression is used.
+        :param maxLowpanLen:     [in] Packets sent into the mesh larger than
+            this number of bytes are fragmented (RFC4944, section 5.3).
+        :param maxFlows:         [in] Maximum number of flows the traffic is
+            accounted for, see getTopFlows().
+        :param network:          [in] The network the instance is connected
+            to, see eventBusClient. If None, the global event bus.
+        '''
         
         # log
         log.info("create instance")
         
         # store params
+        self.compressUdp          = compressUdp
+        self.elideUdpChecksum     = elideUdpChecksum
+        self.compressAddresses    = compressAddresses
+        self.maxLowpanLen         = maxLowpanLen
         self.stateLock            = threading.Lock()
         self.networkPrefix        = None
-        self.dagRootEui64         = None
+        self.dagRootEui64         = None                      # default DAGroot
+        self.dagRoots             = collections.OrderedDict() # DAGroot EUI64 tuple -> serial port
+        self.contexts             = {}                        # cid -> prefix
+        self.templateLock         = threading.Lock()
+        self.templates            = collections.OrderedDict() # (src,dst) -> (header,nextHop,route)
+        self.templateGeneration   = 0
+        self.templateHits         = 0
+        self.templateMisses       = 0
+        self.statsLock            = threading.Lock()
+        self.numUdpCompressed     = 0
+        self.udpBytesSaved        = 0
+        self.headerStats          = collections.OrderedDict() # dst -> [numPackets,headerBytes,lastHeaderLen]
+        self.dagRootStats         = {}                        # DAGroot EUI64 tuple -> [packetsToMesh,bytesToMesh,packetsFromMesh,bytesFromMesh]
+        self.fragTag              = 0
+        self.numFragmented        = 0
+        self.numFragmentsSent     = 0
+        self.reassembly           = reassemblyBuffer.ReassemblyBuffer(self._uncompressedLen)
+        self.expiryThread         = None                      # started with the first fragment buffered
+        self.goOn                 = True
+        self.closeEvent           = threading.Event()
+        self.flows                = flowTable.FlowTable(maxFlows)
          
         # initialize parent class
         eventBusClient.eventBusClient.__init__(
             self,
             name             = 'OpenLBR',
+            network          = network,
             registrations =  [
                 {
                     'sender'   : self.WILDCARD, #signal from internet to the mesh network
@@ -136,6 +208,11 @@ class OpenLbr(eventBusClient.eventBusClient):
                     'signal'   : 'fromMote.data', #only to data (any), not status nor error
                     'callback' : self._meshToV6_notif, 
                 },
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : 'sourceRoutesChanged', #signal once the source routes through motes were dropped
+                    'callback' : self._sourceRoutesChanged_notif,
+                },
             ]
         )
         
@@ -143,6 +220,149 @@ class OpenLbr(eventBusClient.eventBusClient):
             
     #======================== public ==========================================
     
+    def close(self):
+        self.goOn = False
+        self.closeEvent.set()
+    
+    def getTemplateStats(self):
+        '''
+        Retrieve statistics about the 6LoWPAN header templates.
+        
+        :returns: A dictionary with the number of 'hits' and 'misses' of the
+            template cache, and the number of 'templates' it contains.
+        '''
+        with self.templateLock:
+            return {
+                'hits':      self.templateHits,
+                'misses':    self.templateMisses,
+                'templates': len(self.templates),
+            }
+    
+    def getCompressionStats(self):
+        '''
+        Retrieve statistics about the compression of the packets sent into
+        the mesh.
+        
+        :returns: A dictionary with the number of packets which had their
+            UDP header compressed ('udpCompressed') and the total number of
+            bytes this saved ('udpBytesSaved').
+        '''
+        with self.statsLock:
+            return {
+                'udpCompressed': self.numUdpCompressed,
+                'udpBytesSaved': self.udpBytesSaved,
+            }
+    
+    def getHeaderStats(self):
+        '''
+        Retrieve the size of the 6LoWPAN headers of the packets sent into the
+        mesh, per destination.
+        
+        :returns: A dictionary indexed by destination IPv6 address (a tuple),
+            each value a dictionary with the number of 'packets' sent, the
+            total number of 'headerBytes' and the 'lastHeaderLen'.
+        '''
+        with self.statsLock:
+            return dict([
+                (
+                    tuple(bytearray(dst)),
+                    {
+                        'packets':       numPackets,
+                        'headerBytes':   headerBytes,
+                        'lastHeaderLen': lastHeaderLen,
+                    }
+                )
+                for (dst,(numPackets,headerBytes,lastHeaderLen)) in self.headerStats.items()
+            ])
+    
+    def getFragmentationStats(self):
+        '''
+        Retrieve statistics about fragmentation and reassembly.
+        
+        :returns: A dictionary with the number of packets sent into the mesh
+            which were 'fragmented', the number of 'fragmentsSent', and the
+            statistics of the reassembly of the fragments received from the
+            mesh, see ReassemblyBuffer.getStats().
+        '''
+        returnVal = self.reassembly.getStats()
+        with self.statsLock:
+            returnVal['fragmented']    = self.numFragmented
+            returnVal['fragmentsSent'] = self.numFragmentsSent
+        return returnVal
+    
+    def getTopFlows(self,num,sortBy='packets'):
+        '''
+        Retrieve the flows which carried the most traffic through the mesh,
+        in both directions. The bytes counted are the 6LoWPAN bytes.
+        
+        :param num:    [in] The maximum number of flows returned.
+        :param sortBy: [in] 'packets' or 'bytes'.
+        
+        :raises: ValueError if sortBy is not valid.
+        
+        :returns: A list of flows, see FlowTable.getTopFlows().
+        '''
+        return self.flows.getTopFlows(num,sortBy)
+    
+    def getFlowStats(self):
+        '''
+        :returns: The statistics of the flow table, see FlowTable.getStats().
+        '''
+        return self.flows.getStats()
+    
+    def getDagRootStats(self):
+        '''
+        Retrieve the traffic through each DAGroot.
+        
+        :returns: A dictionary indexed by DAGroot EUI64 (a tuple), each value
+            a dictionary with its 'serialPort' (None if the DAGroot is not
+            attached anymore), the number of 'packetsToMesh' and
+            'packetsFromMesh' it forwarded, and the corresponding number of
+            6LoWPAN bytes, 'bytesToMesh' and 'bytesFromMesh'.
+        '''
+        with self.stateLock:
+            dagRoots = dict(self.dagRoots)
+        with self.statsLock:
+            returnVal = {}
+            for root in set(dagRoots.keys()+self.dagRootStats.keys()):
+                stats = self.dagRootStats.get(root,[0,0,0,0])
+                returnVal[root] = {
+                    'serialPort':      dagRoots.get(root),
+                    'packetsToMesh':   stats[0],
+                    'bytesToMesh':     stats[1],
+                    'packetsFromMesh': stats[2],
+                    'bytesFromMesh':   stats[3],
+                }
+            return returnVal
+    
+    def getContexts(self):
+        '''
+        :returns: The context table, a dictionary of prefixes indexed by
+            context identifier.
+        '''
+        with self.stateLock:
+            return dict([(cid,list(prefix)) for (cid,prefix) in self.contexts.items()])
+    
+    def setContext(self,cid,prefix):
+        '''
+        Add a context to the context table, or remove it.
+        
+        :param cid:    [in] The context identifier, 0-15.
+        :param prefix: [in] The 8-byte prefix, None to remove the context.
+        
+        :raises: ValueError if the context identifier or prefix is invalid.
+        '''
+        if not 0<=cid<self.NUM_CONTEXTS:
+            raise ValueError('invalid context identifier {0}'.format(cid))
+        if prefix is not None and len(prefix)!=8:
+            raise ValueError('invalid context prefix {0}'.format(prefix))
+        with self.stateLock:
+            if prefix is None:
+                self.contexts.pop(cid,None)
+            else:
+                self.contexts[cid] = bytearray(prefix)
+        self._invalidateTemplates()
+    
     #======================== private =========================================
     
     #===== IPv6 -> 6LoWPAN
@@ -161,9 +381,9 @@ class OpenLbr(eventBusClient.eventBusClient):
             
             ipv6_bytes       = data
             
-            # turn raw byte into dictionary of fields
-            ipv6             = self.disassemble_ipv6(ipv6_bytes)
-
+            # read the fields of the IPv6 header
+            ipv6             = lowpanCodec.disassembleIpv6(ipv6_bytes)
+            
              # filter out multicast packets
             if ipv6['dst_addr'][0]==0xff:
                 return
@@ -172,42 +392,90 @@ class OpenLbr(eventBusClient.eventBusClient):
             if log.isEnabledFor(logging.DEBUG):
                 log.debug(self._format_IPv6(ipv6,ipv6_bytes))
             
-            # convert IPv6 dictionary into 6LoWPAN dictionary
-            lowpan           = self.ipv6_to_lowpan(ipv6)
-            
-            # add the source route to this destination
-            if (len(lowpan['dst_addr'])==16):
-                dst_addr=lowpan['dst_addr'][8:]
-            elif (len(lowpan['dst_addr'])==8):
-                dst_addr=lowpan['dst_addr']
-            else:
-                log.warning('unsupported address format {0}'.format(lowpan['dst_addr']))
-                    
-            lowpan['route'] = self._getSourceRoute(dst_addr)
+            # tf
+            if ipv6['traffic_class']!=0:
+                raise NotImplementedError('traffic_class={0} unsupported'.format(ipv6['traffic_class']))
+            if ipv6['flow_label']!=0:
+                raise NotImplementedError('flow_label={0} unsupported'.format(ipv6['flow_label']))
             
-            if len(lowpan['route'])<2:
+            # get the 6LoWPAN header to this destination
+            template         = self._getTemplate(ipv6['src_addr'],ipv6['dst_addr'])
+            if not template:
                 # no source route could be found
-                log.warning('no source route to {0}'.format(lowpan['dst_addr']))
+                log.warning('no source route to {0}'.format(list(ipv6['dst_addr'])))
                 # TODO: return ICMPv6 message
                 return
+            (header,nextHop,route,root) = template
             
-            lowpan['route'].pop() #remove last as this is me.
+            # compress UDP header
+            nhc              = None
+            payload          = ipv6['payload']
+            if self.compressUdp and ipv6['next_header']==self.IANA_UDP:
+                nhc          = lowpanCodec.compressUdp(payload,self.elideUdpChecksum)
+                if nhc is not None:
+                    payload  = payload[self.UDP_HEADER_LEN:]
+                    with self.statsLock:
+                        self.numUdpCompressed += 1
+                        # the next header is not carried inline anymore
+                        self.udpBytesSaved    += self.UDP_HEADER_LEN+1-len(nhc)
+            
+            # compress IPv6 header into 6LoWPAN header
+            lowpan_bytes     = lowpanCodec.fillLowpanHeader(
+                header,
+                ipv6['next_header'],
+                ipv6['hop_limit'],
+                payload,
+                nhc,
+            )
             
-            lowpan['nextHop'] = lowpan['route'][len(lowpan['route'])-1] #get next hop as this has to be the destination address, this is the last element on the list
-            # turn dictionary of fields into raw bytes
-            lowpan_bytes     = self.reassemble_lowpan(lowpan)
-            #print lowpan_bytes
             # log
             if log.isEnabledFor(logging.DEBUG):
+                lowpan          = self.ipv6_to_lowpan(ipv6)
+                lowpan['route'] = route
                 log.debug(self._format_lowpan(lowpan,lowpan_bytes))
             
-            #print "output:"
-            #print lowpan_bytes
-            # dispatch
-            self.dispatch(
-                signal       = 'bytesToMesh',
-                data         = (lowpan['nextHop'],lowpan_bytes),
+            # statistics
+            self._updateHeaderStats(ipv6['dst_addr'],len(lowpan_bytes)-len(payload))
+            
+            # fragment
+            if len(lowpan_bytes)>self.maxLowpanLen:
+                lenIpv6Header = lowpanCodec.lenIpv6Headers(header)
+                if nhc is not None:
+                    lenIpv6Header += self.UDP_HEADER_LEN
+                with self.statsLock:
+                    tag           = self.fragTag
+                    self.fragTag  = (self.fragTag+1) & 0xffff
+                frags         = lowpanCodec.fragmentLowpan(
+                    lowpan_bytes,
+                    len(lowpan_bytes)-len(payload),
+                    lenIpv6Header,
+                    tag,
+                    self.maxLowpanLen,
+                )
+                with self.statsLock:
+                    self.numFragmented    += 1
+                    self.numFragmentsSent += len(frags)
+            else:
+                frags         = [lowpan_bytes]
+            
+            # dispatch, to the DAGroot of the destination's subtree
+            for frag in frags:
+                self.dispatch(
+                    signal       = 'bytesToMesh',
+                    data         = (nextHop,list(frag),root),
+                )
+            
+            # account
+            numBytes = sum([len(frag) for frag in frags])
+            self.flows.update(
+                ipv6['src_addr'],
+                ipv6['dst_addr'],
+                ipv6['next_header'],
+                self._flowPort(ipv6['next_header'],ipv6['payload']),
+                numBytes,
+                flowTable.DIRECTION_DOWN,
             )
+            self._updateDagRootStats(root,0,numBytes)
             
         except (ValueError,NotImplementedError) as err:
             log.error(err)
@@ -220,12 +488,23 @@ class OpenLbr(eventBusClient.eventBusClient):
         
         This function dispatches the IPv6 packet with signal 'according to the destination address, protocol_type and port'.
         '''
+        start = time.time()
+        root  = self._getDagRoot(sender)
         try:
+            # reassemble fragments
+            if lowpanCodec.isFragment(data[1]):
+                lowpan = self.reassembly.add(data[0],data[1],root)
+                if lowpan is None:
+                    self._startReassemblyExpiry()
+                    return
+                data = (data[0],list(lowpan))
+            
             ipv6dic={}
             #build lowpan dictionary from the data
-            ipv6dic = self.lowpan_to_ipv6(data)
+            ipv6dic = self.lowpan_to_ipv6(data,root)
             success = True
             dispatchSignal = None
+            dispatchData = None
             
             #read next header
             if (ipv6dic['next_header']==self.IANA_IPv6HOPHEADER):
@@ -249,6 +528,7 @@ class OpenLbr(eventBusClient.eventBusClient):
                 # prasing the iphc inner header and get the next_header
                 ipv6dic_inner = self.lowpan_to_ipv6([ipv6dic['pre_hop'],ipv6dic['payload']])
                 ipv6dic['next_header'] = ipv6dic_inner['next_header']
+                ipv6dic['udp_nhc'] = ipv6dic_inner.get('udp_nhc',False)
                 ipv6dic['payload'] = ipv6dic_inner['payload']
                 ipv6dic['payload_length'] = ipv6dic_inner['payload_length']
 
@@ -257,7 +537,6 @@ class OpenLbr(eventBusClient.eventBusClient):
                 #icmp header
                 if (len(ipv6dic['payload'])<5):
                     log.critical("wrong payload lenght on ICMPv6 packet {0}".format(",".join(str(c) for c in data)))
-                    print "wrong payload lenght on ICMPv6 packet {0}".format(",".join(str(c) for c in data))
                     return
                 
                 
@@ -269,64 +548,51 @@ class OpenLbr(eventBusClient.eventBusClient):
                 
                 #this function does the job
                 dispatchSignal=(tuple(ipv6dic['dst_addr']),self.PROTO_ICMPv6,ipv6dic['icmpv6_type'])
+                dispatchData=(ipv6dic['src_addr'],ipv6dic['app_payload'])
                  
             elif(ipv6dic['next_header']==self.IANA_UDP):
-                #udp header -- can be compressed.. assume first it is not compressed.
+                #udp header -- can be compressed.
+                if ipv6dic.get('udp_nhc'):
+                    ipv6dic['payload']        = self._inflateUdp(ipv6dic)
+                    ipv6dic['payload_length'] = len(ipv6dic['payload'])
+                
                 if (len(ipv6dic['payload'])<5):
                     log.critical("wrong payload lenght on UDP packet {0}".format(",".join(str(c) for c in data)))
-                    print "wrong payload lenght on UDP packet {0}".format(",".join(str(c) for c in data))
                     return
                 
-                if (ipv6dic['payload'][0] & self.NHC_UDP_MASK==self.NHC_UDP_ID):
-                    
-                    oldUdp=ipv6dic['payload'][:5]
-                    #re-arrange fields and inflate
-                    newUdp = []
-                    newUdp += oldUdp[1:3] # Source Port
-                    newUdp += oldUdp[3:5] # Destination Port
-                    length = 8+len(pkt[5:])
-                    newUdp += [(length & 0xFF00) >> 8] # Length
-                    newUdp += [(length & 0x00FF) >> 0]
-                    idxCS = len(newUdp) # remember index of checksum
-                    newUdp += [0x00,0x00] # Checksum (placeholder)
-                    #append payload to compute crc again
-                    newUdp += ipv6dic['payload'][5:] # data octets
-                    
-                    checksum = u.calculateCRC(newUdp)
-                    #fill crc with the right value.
-                    newUdp[idxCS] = checksum[0]
-                    newUdp[idxCS+1] = checksum[1]
-                    #keep fields for later processing if needed
-                    ipv6dic['udp_src_port']=newUdp[:2]
-                    ipv6dic['udp_dest_port']=newUdp[2:4]
-                    ipv6dic['udp_length']=newUdp[4:6]
-                    ipv6dic['udp_checksum']=newUdp[6:8]
-                    ipv6dic['app_payload']=newUdp[8:]
-                    
-                    #substitute udp header by the uncompressed header.               
-                    ipv6dic['payload'] =newUdp[:8] + ipv6dic['payload'][5:]
-                else:
-                    #No UDP header compressed    
-                    ipv6dic['udp_src_port']=ipv6dic['payload'][:2]
-                    ipv6dic['udp_dest_port']=ipv6dic['payload'][2:4]
-                    ipv6dic['udp_length']=ipv6dic['payload'][4:6]
-                    ipv6dic['udp_checksum']=ipv6dic['payload'][6:8]
-                    ipv6dic['app_payload']=ipv6dic['payload'][8:]
+                ipv6dic['udp_src_port']=ipv6dic['payload'][:2]
+                ipv6dic['udp_dest_port']=ipv6dic['payload'][2:4]
+                ipv6dic['udp_length']=ipv6dic['payload'][4:6]
+                ipv6dic['udp_checksum']=ipv6dic['payload'][6:8]
+                ipv6dic['app_payload']=ipv6dic['payload'][8:]
                 dispatchSignal=(tuple(ipv6dic['dst_addr']),self.PROTO_UDP,tuple(ipv6dic['udp_dest_port']))
+                # the source port, so the receiver can answer
+                dispatchData=(ipv6dic['src_addr'],ipv6dic['app_payload'],u.buf2int(ipv6dic['udp_src_port']))
             
             #keep payload and app_payload in case we want to assemble the message later. 
             #ass source address is being retrieved from the IPHC header, the signal includes it in case
             #receiver such as RPL DAO processing needs to know the source.               
             
-            success = self._dispatchProtocol(dispatchSignal,(ipv6dic['src_addr'],ipv6dic['app_payload']))    
-            
-            if success == True:
-                return
+            success = self._dispatchProtocol(dispatchSignal,dispatchData)
             
-            # assemble the packet and dispatch it again as nobody answer 
-            ipv6pkt=self.reassemble_ipv6_packet(ipv6dic)       
+            if success != True:
+                # assemble the packet and dispatch it again as nobody answer 
+                ipv6pkt=self.reassemble_ipv6_packet(ipv6dic)       
+                
+                self.dispatch('v6ToInternet',ipv6pkt)
             
-            self.dispatch('v6ToInternet',ipv6pkt)
+            # account
+            self.flows.update(
+                ipv6dic['src_addr'],
+                ipv6dic['dst_addr'],
+                ipv6dic['next_header'],
+                self._flowPort(ipv6dic['next_header'],ipv6dic['payload']),
+                len(data[1]),
+                flowTable.DIRECTION_UP,
+                time.time()-start,
+            )
+            if root is not None:
+                self._updateDagRootStats(root,2,len(data[1]))
             
         except (ValueError,NotImplementedError) as err:
             log.error(err)
@@ -349,22 +615,10 @@ class OpenLbr(eventBusClient.eventBusClient):
         :returns: A dictionary of fields.
         '''
         
-        if len(ipv6)<self.IPv6_HEADER_LEN:
-            raise ValueError('Packet too small ({0} bytes) no space for IPv6 header'.format(len(ipv6)))
-        
-        returnVal                      = {}
-        returnVal['version']           = ipv6[0] >> 4
-        if returnVal['version']!=6:
-            raise ValueError('Not an IPv6 packet, version=={0}'.format(returnVal['version']))
-        
-        returnVal['traffic_class']     = ((ipv6[0] & 0x0F) << 4) + (ipv6[1] >> 4)
-        returnVal['flow_label']        = ((ipv6[1] & 0x0F) << 16) + (ipv6[2] << 8) + ipv6[3]
-        returnVal['payload_length']    = u.buf2int(ipv6[4:6])
-        returnVal['next_header']       = ipv6[6]
-        returnVal['hop_limit']         = ipv6[7]
-        returnVal['src_addr']          = ipv6[8:8+16]
-        returnVal['dst_addr']          = ipv6[24:24+16]
-        returnVal['payload']           = ipv6[40:]
+        returnVal                      = lowpanCodec.disassembleIpv6(ipv6)
+        returnVal['src_addr']          = list(returnVal['src_addr'])
+        returnVal['dst_addr']          = list(returnVal['dst_addr'])
+        returnVal['payload']           = list(returnVal['payload'])
         
         return returnVal
     
@@ -421,305 +675,132 @@ class OpenLbr(eventBusClient.eventBusClient):
         
         :returns: A list of bytes representing the 6LoWPAN packet.
         '''
-        returnVal            = []
-
         # the 6lowpan packet contains 4 parts
         # 1. IPHC outer header
         # 2. extention header (except ipv6 header)
         # 3. ipv6 header
         # 4. IPHC inner header
+        # see lowpanCodec.assembleLowpan()
         
-        # ===================== 1. IPHC outer header ==========================
-
-        # Byte1: 011(3b) TF(2b) NH(1b) HLIM(2b)
-        if len(lowpan['tf'])==0:
-            tf               = self.IPHC_TF_ELIDED
-        else:
+        if len(lowpan['tf'])!=0:
+            raise NotImplementedError()
+        if len(lowpan['cid'])!=0:
             raise NotImplementedError()
-        # next header is in NHC format
-        nh               = self.IPHC_NH_COMPRESSED
-        if   lowpan['hlim']==1:
-            hlim             = self.IPHC_HLIM_1
-            lowpan['hlim'] = []
-        elif lowpan['hlim']==64:
-            hlim             = self.IPHC_HLIM_64
-            lowpan['hlim'] = []
-        elif lowpan['hlim']==255:
-            hlim             = self.IPHC_HLIM_255
-            lowpan['hlim'] = []
-        else:
-            hlim             = self.IPHC_HLIM_INLINE
-        returnVal           += [(self.IPHC_DISPATCH<<5) + (tf<<3) + (nh<<2) + (hlim<<0)]
         
-        # Byte2: CID(1b) SAC(1b) SAM(2b) M(1b) DAC(2b) DAM(2b)
-        if len(lowpan['cid'])==0:
-            cid              = self.IPHC_CID_NO
-        else:
-            cid              = self.IPHC_CID_YES
-        sac                  = self.IPHC_SAC_STATELESS
-        if   len(lowpan['src_addr'])==128/8:
-            sam              = self.IPHC_SAM_128B
-        elif len(lowpan['src_addr'])==64/8:
-            sam              = IPHC_SAM_64B
-        elif len(lowpan['src_addr'])==16/8:
-            sam              = self.IPHC_SAM_16B
-        elif len(lowpan['src_addr'])==0:
-            sam              = self.IPHC_SAM_ELIDED
-        else:
-            raise SystemError()
-        dac                  = self.IPHC_DAC_STATELESS
-        m                    = self.IPHC_M_NO
-        if   len(lowpan['dst_addr'])==128/8:
-            dam              = self.IPHC_DAM_128B
-        elif len(lowpan['dst_addr'])==64/8:
-            dam              = self.IPHC_DAM_64B
-        elif len(lowpan['dst_addr'])==16/8:
-            dam              = self.IPHC_DAM_16B
-        elif len(lowpan['dst_addr'])==0:
-            dam              = self.IPHC_DAM_ELIDED
-        else:
-            raise SystemError()
-        returnVal           += [(cid << 7) + (sac << 6) + (sam << 4) + (m << 3) + (dac << 2) + (dam << 0)]
-
-        # tf
-        returnVal           += lowpan['tf']
+        return list(lowpanCodec.assembleLowpan(
+            lowpan['src_addr'],
+            lowpan['dst_addr'],
+            lowpan['nh'][0],
+            lowpan['hlim'][0],
+            lowpan['payload'],
+            lowpan['route'],
+        ))
+    
+    #===== 6LoWPAN -> IPv6
+    
+    def lowpan_to_ipv6(self,data,dagRootEui64=None):
+        '''
+        Turn a 6LoWPAN packet into a dictionary of IPv6 fields.
         
-        # hlim
-        returnVal           += lowpan['hlim']
+        :param data:         [in] A tuple (previous hop, 6LoWPAN packet).
+        :param dagRootEui64: [in] The EUI64 of the DAGroot which received
+            the packet, by default the default DAGroot.
         
-        # cid
-        returnVal           += lowpan['cid']
-
-        # src_addr
-        returnVal           += lowpan['src_addr']
-        
-        if len(lowpan['route'])>1:
-            # source route needed
-            if (len(lowpan['dst_addr'])==16): #this is a hack by now as the src routing table is only 8B and not 128, so I need to get the prefix from the destination address as I know are the same.
-                prefix=lowpan['dst_addr'][:8]
-                    
-            returnVal       += prefix + lowpan['nextHop']                # dest address is next hop in source routing -- poipoi xv prefix needs to be removed once hc works well
-            # ========================= 2. ipv6 routing header ====================
-            # RPL Routing Header (RFC6554: https://tools.ietf.org/html/rfc6554#page-6)  
-            returnVal       += [(self.NHC_DISPATCH << 4) + (self.NHC_EID_ROUTING << 1) + (self.NHC_NH_COMPRESSED << 0)]
-            returnVal       += [8*(len(lowpan['route'])-1)+6]     # Hdr Ext Len. -1 to remove last element. 6 to the length following content until address field
-            returnVal       += [self.SR_FIR_TYPE]               # Routing Type. 3 for source routing
-            returnVal       += [len(lowpan['route'])-1]           # Segments Left. -1 because the first hop goes to the ipv6 destination address.
-            returnVal       += [0x08 << 4 | 0x08]               # CmprI | CmprE. All prefixes elided.
-            returnVal       += [0x00,0x00,0x00]                 # padding (4b) + reserved (20b)
-            for hop in list(reversed(lowpan['route'][:len(lowpan['route'])-1])):  #skip first hop as it is in the destination address
-               returnVal    += hop
-        
-        else:# in case of 1hop destination address is the same as ipv6 destination address
-            # dst_addr
-            returnVal           += lowpan['dst_addr']
-        # ========================= 3. Ipv6 header ============================ 
-        # IPv6 Header (RFC6554: https://tools.ietf.org/html/rfc6554#page-6)
-        returnVal           += [(self.NHC_DISPATCH << 4) + (self.NHC_EID_IPV6 << 1) + (self.NHC_NH_INLINE << 0)]
-        # ========================= 4. IPHC inner header ======================
-        # Byte1: 011(3b) TF(2b) NH(1b) HLIM(2b)
-        if len(lowpan['tf'])==0:
-            tf               = self.IPHC_TF_ELIDED
-        else:
-            raise NotImplementedError()
-        if len(lowpan['nh'])==1:
-            nh               = self.IPHC_NH_INLINE
-        else:
-            nh               = self.IPHC_NH_COMPRESSED
-        if   lowpan['hlim']==1:
-            hlim             = self.IPHC_HLIM_1
-            lowpan['hlim'] = []
-        elif lowpan['hlim']==64:
-            hlim             = self.IPHC_HLIM_64
-            lowpan['hlim'] = []
-        elif lowpan['hlim']==255:
-            hlim             = self.IPHC_HLIM_255
-            lowpan['hlim'] = []
-        else:
-            hlim             = self.IPHC_HLIM_INLINE
-        returnVal           += [(self.IPHC_DISPATCH<<5) + (tf<<3) + (nh<<2) + (hlim<<0)]
-
-        # Byte2: CID(1b) SAC(1b) SAM(2b) M(1b) DAC(2b) DAM(2b)
-        if len(lowpan['cid'])==0:
-            cid              = self.IPHC_CID_NO
-        else:
-            cid              = self.IPHC_CID_YES
-        sac                  = self.IPHC_SAC_STATELESS
-        sam                  = self.IPHC_SAM_ELIDED
-        dac                  = self.IPHC_DAC_STATELESS
-        m                    = self.IPHC_M_NO
-        dam                  = self.IPHC_DAM_ELIDED
-        returnVal           += [(cid << 7) + (sac << 6) + (sam << 4) + (m << 3) + (dac << 2) + (dam << 0)]
+        :raises: ValueError when the packet is not a valid 6LoWPAN packet.
+        :raises: NotImplementedError when the packet uses compression features
+            not implemented in this module.
         
-        # tf
-        returnVal           += lowpan['tf']
+        :returns: A dictionary of fields.
+        '''
+        pkt_ipv6 = lowpanCodec.disassembleLowpan(
+            data[0],
+            data[1],
+            self.networkPrefix,
+            dagRootEui64 or self.dagRootEui64,
+            self.contexts or None,
+        )
+        pkt_ipv6['src_addr']       = list(pkt_ipv6['src_addr'])
+        pkt_ipv6['dst_addr']       = list(pkt_ipv6['dst_addr'])
+        pkt_ipv6['payload']        = list(pkt_ipv6['payload'])
+        return pkt_ipv6
+    
+    def reassemble_ipv6_packet(self, pkt):
+        return list(lowpanCodec.assembleIpv6(pkt))
+    
+    def _startReassemblyExpiry(self):
+        '''
+        Start the thread dropping the datagrams which timed out, so they do
+        not stay buffered when no more fragments are received.
+        '''
+        with self.stateLock:
+            if self.expiryThread or not self.goOn:
+                return
+            self.expiryThread         = threading.Thread(target=self._runReassemblyExpiry)
+            self.expiryThread.name    = 'openLbr'
+            self.expiryThread.daemon  = True
+            self.expiryThread.start()
+    
+    def _runReassemblyExpiry(self):
+        while self.goOn:
+            self.closeEvent.wait(self.REASSEMBLY_EXPIRY_PERIOD)
+            if not self.goOn:
+                break
+            try:
+                self.reassembly.expire()
+            except Exception as err:
+                log.critical('could not expire datagrams: {0}'.format(err))
+    
+    def _uncompressedLen(self,src,lowpan,dagRootEui64=None):
+        '''
+        :param dagRootEui64: [in] The EUI64 of the DAGroot which received
+            the first fragment, by default the default DAGroot.
+        '''
+        return lowpanCodec.uncompressedLen(
+            src,
+            lowpan,
+            self.networkPrefix,
+            dagRootEui64 or self.dagRootEui64,
+            self.contexts or None,
+        )
+    
+    def _inflateUdp(self,ipv6dic):
+        '''
+        Turn a compressed UDP header (RFC6282, section 4.3) back into a UDP
+        header.
         
-        # nh
-        returnVal           += lowpan['nh']
+        :param ipv6dic: [in] The fields of the packet, its payload starting
+            with the compressed UDP header.
         
-        # hlim
-        returnVal           += lowpan['hlim']
+        :raises: ValueError if the compressed header is not valid.
         
-        # cid
-        returnVal           += lowpan['cid']
-
-        # payload
-        returnVal           += lowpan['payload']
+        :returns: The UDP datagram, as a list of bytes.
+        '''
+        (srcPort,dstPort,checksum,lenNhc) = lowpanCodec.decompressUdp(ipv6dic['payload'])
         
-        return returnVal
-    
-    #===== 6LoWPAN -> IPv6
-    
-    def lowpan_to_ipv6(self,data):
-                
-        pkt_ipv6 = {}
-        mac_prev_hop=data[0]
-        pkt_lowpan=data[1]
-        ptr = 2
-        if ((pkt_lowpan[0] >> 5) != 0x003):
-            log.error("ERROR not a 6LowPAN packet")
-            return   
+        length       = self.UDP_HEADER_LEN+len(ipv6dic['payload'])-lenNhc
+        udp          = [
+            srcPort>>8, srcPort & 0xFF,
+            dstPort>>8, dstPort & 0xFF,
+            length>>8,  length & 0xFF,
+            0x00,       0x00,
+        ]
+        udp         += ipv6dic['payload'][lenNhc:]
         
-        # tf
-        tf = ((pkt_lowpan[0]) >> 3) & 0x03
-        if (tf == self.IPHC_TF_3B):
-            pkt_ipv6['flow_label'] = ((pkt_lowpan[ptr]) << 16) + ((pkt_lowpan[ptr+1]) << 8) + ((pkt_lowpan[ptr+2]) << 0)
-            ptr = ptr + 3
-        elif (tf == self.IPHC_TF_ELIDED):
-            pkt_ipv6['flow_label'] = 0
-        else:
-            log.error("Unsupported or wrong tf")
-        # nh
-        nh = ((pkt_lowpan[0]) >> 2) & 0x01
-        if (nh == self.IPHC_NH_INLINE):
-            pkt_ipv6['next_header'] = (pkt_lowpan[ptr])
-            ptr = ptr+1
-        elif (nh == self.IPHC_NH_COMPRESSED):
-            # log.error("unsupported nh==IPHC_NH_COMPRESSED")
-            # the next header will be retrieved later
-            pass
-        else:
-            log.error("wrong nh field nh="+str(nh))
-            
-        # hlim
-        hlim = (pkt_lowpan[0]) & 0x03
-        if (hlim == self.IPHC_HLIM_INLINE):
-            pkt_ipv6['hop_limit'] = (pkt_lowpan[ptr])
-            ptr = ptr+1
-        elif (hlim == self.IPHC_HLIM_1):
-            pkt_ipv6['hop_limit'] = 1
-        elif (hlim == self.IPHC_HLIM_64):
-            pkt_ipv6['hop_limit'] = 64
-        elif (hlim == self.IPHC_HLIM_255):
-            pkt_ipv6['hop_limit'] = 255
-        else:
-            log.error("wrong hlim=="+str(hlim))
-        # sam
-        sam = ((pkt_lowpan[1]) >> 4) & 0x03
-        if (sam == self.IPHC_SAM_ELIDED):
-            #pkt from the previous hop
-            pkt_ipv6['src_addr'] = self.networkPrefix + mac_prev_hop
-            
-        elif (sam == self.IPHC_SAM_16B):
-            a1 = pkt_lowpan[ptr]
-            a2 = pkt_lowpan[ptr+1]
-            ptr = ptr+2
-            s = ''.join(['\x00','\x00','\x00','\x00','\x00','\x00',a1,a2])
-            pkt_ipv6['src_addr'] = self.networkPrefix+s
-    
-        elif (sam == self.IPHC_SAM_64B):
-            pkt_ipv6['src_addr'] = self.networkPrefix+pkt_lowpan[ptr:ptr+8]
-            ptr = ptr + 8
-        elif (sam == self.IPHC_SAM_128B):
-            pkt_ipv6['src_addr'] = pkt_lowpan[ptr:ptr+16]
-            ptr = ptr + 16
-        else:
-            log.error("wrong sam=="+str(sam))
-            
-        # dam
-        dam = ((pkt_lowpan[1]) & 0x03)
-        if (dam == self.IPHC_DAM_ELIDED):
-            if log.isEnabledFor(logging.DEBUG):
-                log.debug("IPHC_DAM_ELIDED this packet is for the dagroot!")
-            pkt_ipv6['dst_addr'] = self.networkPrefix+self.dagRootEui64
-        elif (dam == self.IPHC_DAM_16B):
-            a1 = pkt_lowpan[ptr]
-            a2 = pkt_lowpan[ptr+1]
-            ptr = ptr+2
-            s = ''.join(['\x00','\x00','\x00','\x00','\x00','\x00',a1,a2])
-            pkt_ipv6['dst_addr'] = self.networPrefix+s
-        elif (dam == self.IPHC_DAM_64B):
-            pkt_ipv6['dst_addr'] = self.networkPrefix+pkt_lowpan[ptr:ptr+8]
-            ptr = ptr + 8
-        elif (dam == self.IPHC_DAM_128B):
-            pkt_ipv6['dst_addr'] = pkt_lowpan[ptr:ptr+16]
-            ptr = ptr + 16
+        if checksum is None:
+            # elided, compute it from the IPv6 pseudo-header
+            udp[6:8] = u.calculatePseudoHeaderCRC(
+                ipv6dic['src_addr'],
+                ipv6dic['dst_addr'],
+                [0x00,0x00,length>>8,length & 0xFF],
+                [0x00,0x00,0x00,self.IANA_UDP],
+                udp,
+            )
+            if udp[6:8]==[0x00,0x00]:
+                udp[6:8] = [0xFF,0xFF]
         else:
-            log.error("wrong dam=="+str(dam))
-
-        if (nh == self.IPHC_NH_COMPRESSED):
-            if (((pkt_lowpan[ptr] >> 4) & 0x0f) == self.NHC_DISPATCH):
-                eid = (pkt_lowpan[ptr] & self.NHC_EID_MASK) >> 1
-                if (eid == self.NHC_EID_HOPBYHOP):
-                    pkt_ipv6['next_header'] = self.IANA_IPv6HOPHEADER
-                elif (eid == self.NHC_EID_IPV6):
-                    pkt_ipv6['next_header'] = self.IPV6_HEADER
-                else:
-                    log.error("wrong NH_EID=="+str(eid))
-        
-        #hop by hop header 
-        #composed of NHC, NextHeader,Len + Rpl Option
-        if  (pkt_ipv6['next_header'] == self.IANA_IPv6HOPHEADER) : 
-             pkt_ipv6['hop_nhc'] = pkt_lowpan[ptr]
-             ptr = ptr+1
-             if ((pkt_ipv6['hop_nhc'] & 0x01) == 0):
-                pkt_ipv6['hop_next_header'] = pkt_lowpan[ptr]
-                ptr = ptr+1
-             else :
-                # the next header filed will be elided
-                pass
-             pkt_ipv6['hop_hdr_len'] = pkt_lowpan[ptr]
-             ptr = ptr+1
-             #start of RPL Option
-             pkt_ipv6['hop_optionType'] = pkt_lowpan[ptr]
-             ptr = ptr+1
-             pkt_ipv6['hop_optionLen'] = pkt_lowpan[ptr]
-             ptr = ptr+1
-             pkt_ipv6['hop_flags'] = pkt_lowpan[ptr]
-             ptr = ptr+1
-             pkt_ipv6['hop_rplInstanceID'] = pkt_lowpan[ptr]
-             ptr = ptr+1
-             pkt_ipv6['hop_senderRank'] = ((pkt_lowpan[ptr]) << 8) + ((pkt_lowpan[ptr+1]) << 0)
-             ptr = ptr+2
-             #end RPL option
-             if ((pkt_ipv6['hop_nhc'] & 0x01) == 1):
-                 if (((pkt_lowpan[ptr]>>1) & 0x07) == self.NHC_EID_IPV6):
-                     pkt_ipv6['hop_next_header'] = self.IPV6_HEADER
-
-        # payload
-        pkt_ipv6['version']        = 6
-        pkt_ipv6['traffic_class']  = 0
-        pkt_ipv6['payload']        = pkt_lowpan[ptr:len(pkt_lowpan)]
-        pkt_ipv6['payload_length'] = len(pkt_ipv6['payload'])
-        pkt_ipv6['pre_hop']        = mac_prev_hop
-        return pkt_ipv6
-    
-    def reassemble_ipv6_packet(self, pkt):
-        pktw = []
-        pktw.append(((6 << 4) + (pkt['traffic_class'] >> 4)))
-        pktw.append(( ((pkt['traffic_class'] & 0x0F) << 4) + (pkt['flow_label'] >> 16) ))
-        pktw.append(( (pkt['flow_label'] >> 8) & 0x00FF ))
-        pktw.append(( pkt['flow_label'] & 0x0000FF ))
-        pktw.append(( pkt['payload_length'] >> 8 ))
-        pktw.append(( pkt['payload_length'] & 0x00FF ))
-        pktw.append(( pkt['next_header'] ))
-        pktw.append(( pkt['hop_limit'] ))
-        for i in range(0,16):
-            pktw.append( (pkt['src_addr'][i]) )
-        for i in range(0,16):
-            pktw.append( (pkt['dst_addr'][i]) ) 
+            udp[6:8] = [checksum>>8,checksum & 0xFF]
         
-        return pktw + pkt['payload']
+        return udp
         
     
     
@@ -728,29 +809,189 @@ class OpenLbr(eventBusClient.eventBusClient):
     #===== source route
     
     def _getSourceRoute(self,destination):
-        returnVal = self._dispatchAndGetResult(
-            signal       = 'getSourceRoute',
-            data         = destination,
-        )
+        try:
+            returnVal = self._dispatchAndGetResult(
+                signal       = 'getSourceRoute',
+                data         = destination,
+            )
+        except SystemError:
+            # nobody computes the source routes, e.g. no RPL instance
+            returnVal = []
         return returnVal
     
+    def _getTemplate(self,srcAddr,dstAddr):
+        '''
+        Retrieve the 6LoWPAN header of the packets from a source to a
+        destination, computing it if it is not cached.
+        
+        :param srcAddr: [in] The IPv6 source address, as a bytearray.
+        :param dstAddr: [in] The IPv6 destination address, as a bytearray.
+        
+        :returns: A tuple (header,nextHop,route,root), root being the
+            DAGroot the source route ends at, or None if there is no source
+            route to the destination.
+        '''
+        key = (bytes(srcAddr),bytes(dstAddr))
+        
+        with self.templateLock:
+            template = self.templates.get(key)
+            if template:
+                self.templateHits       += 1
+                return template
+            self.templateMisses         += 1
+            generation                   = self.templateGeneration
+        
+        # add the source route to this destination
+        route = self._getSourceRoute(list(dstAddr[8:]))
+        
+        if len(route)<2:
+            return None
+        
+        # remove last as this is me, the DAGroot of the destination's subtree
+        root = route.pop()
+        
+        nextHop = route[len(route)-1] #get next hop as this has to be the destination address, this is the last element on the list
+        
+        with self.stateLock:
+            if self.compressAddresses and self.contexts:
+                contexts    = dict(self.contexts)
+                srcLinkAddr = root
+            else:
+                contexts    = None
+                srcLinkAddr = None
+        
+        template = (
+            lowpanCodec.assembleLowpanHeader(srcAddr,dstAddr,route,contexts,srcLinkAddr),
+            nextHop,
+            route,
+            root,
+        )
+        
+        with self.templateLock:
+            # don't cache a template computed from a route which changed since
+            if generation==self.templateGeneration:
+                if len(self.templates)>=self.MAX_NUM_TEMPLATES:
+                    self.templates.popitem(last=False)
+                self.templates[key] = template
+        
+        return template
+    
+    def _invalidateTemplates(self,nodes=None):
+        '''
+        Drop the cached 6LoWPAN headers.
+        
+        :param nodes: [in] Drop only the headers whose source route goes
+            through one of these nodes, given as EUI64 tuples. If None, drop
+            all headers.
+        '''
+        with self.templateLock:
+            self.templateGeneration     += 1
+            if nodes is None:
+                self.templates.clear()
+                return
+            nodes = set([tuple(n) for n in nodes])
+            for (key,(header,nextHop,route,root)) in self.templates.items():
+                for hop in route:
+                    if tuple(hop) in nodes:
+                        del self.templates[key]
+                        break
+    
+    def _flowPort(self,nextHeader,payload):
+        '''
+        :returns: The UDP destination port or the ICMPv6 type of a packet,
+            None for other protocols.
+        '''
+        if nextHeader==self.IANA_UDP and len(payload)>=4:
+            return u.buf2int(payload[2:4])
+        if nextHeader==self.IANA_ICMPv6 and len(payload)>=1:
+            return payload[0]
+        return None
+    
+    def _getDagRoot(self,sender):
+        '''
+        :param sender: [in] The sender of a 'fromMote.data' notification,
+            'moteConnector@<serial port>'.
+        
+        :returns: The EUI64 of the DAGroot attached to the serial port, the
+            default DAGroot if there is none.
+        '''
+        port = sender.split('@',1)[-1] if isinstance(sender,str) else None
+        with self.stateLock:
+            for (root,rootPort) in self.dagRoots.items():
+                if rootPort==port:
+                    return list(root)
+            return self.dagRootEui64
+    
+    def _updateDagRootStats(self,root,index,numBytes):
+        '''
+        Account for a packet forwarded by a DAGroot, index being 0 for the
+        packets sent into the mesh, 2 for the packets received from it.
+        '''
+        key = tuple(root)
+        with self.statsLock:
+            stats = self.dagRootStats.get(key)
+            if stats is None:
+                stats = [0,0,0,0]
+                self.dagRootStats[key] = stats
+            stats[index]   += 1
+            stats[index+1] += numBytes
+    
+    def _updateHeaderStats(self,dstAddr,headerLen):
+        key = bytes(dstAddr)
+        with self.statsLock:
+            stats = self.headerStats.get(key)
+            if stats is None:
+                if len(self.headerStats)>=self.MAX_NUM_HEADER_STATS:
+                    self.headerStats.popitem(last=False)
+                stats = [0,0,0]
+                self.headerStats[key] = stats
+            stats[0] += 1
+            stats[1] += headerLen
+            stats[2]  = headerLen
+    
+    def _sourceRoutesChanged_notif(self,sender,signal,data):
+        '''
+        Invalidate the 6LoWPAN headers with a source route through motes whose
+        parents changed.
+        
+        This follows the invalidation of the routes SourceRoute cached, so a
+        header computed from a route it returned before that is not cached.
+        '''
+        self._invalidateTemplates(data)
+    
     def _setPrefix_notif(self,sender,signal, data):
         '''
         Record the network prefix.
         '''
         with self.stateLock:
             self.networkPrefix    = data  
+            self.contexts[self.PREFIX_CONTEXT] = bytearray(data)
             log.info('Set network prefix  {0}'.format(u.formatIPv6Addr(data)))
+        self._invalidateTemplates()
             
             
     def _infoDagRoot_notif(self,sender,signal,data):
         '''
-        Record the DAGroot's EUI64 address.
+        Record the EUI64 address and serial port of the DAGroots.
+        
+        The first DAGroot attached is the default DAGroot. There is none
+        once the last DAGroot is demoted.
         '''
+        root = tuple(data['eui64'])
         
-        if data['isDAGroot']==1:
-            with self.stateLock:
-                self.dagRootEui64     = data['eui64'][:]
+        with self.stateLock:
+            if data['isDAGroot']==1:
+                changed               = (self.dagRoots.get(root,False)!=data.get('serialPort'))
+                self.dagRoots[root]   = data.get('serialPort')
+            else:
+                changed               = (root in self.dagRoots)
+                self.dagRoots.pop(root,None)
+            if self.dagRoots:
+                self.dagRootEui64     = list(self.dagRoots.keys()[0])
+            elif changed:
+                self.dagRootEui64     = None
+        if changed:
+            self._invalidateTemplates()
 
 #===== formatting
     
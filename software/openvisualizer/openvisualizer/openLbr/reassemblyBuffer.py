@@ -0,0 +1,220 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Reassembly of the 6LoWPAN fragments received from the mesh (RFC4944,
+section 5.3).
+'''
+import logging
+log = logging.getLogger('reassemblyBuffer')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import collections
+import threading
+import time
+
+import lowpanCodec
+
+class ReassemblyBuffer(object):
+    '''
+    Buffer of the datagrams being reassembled.
+
+    Datagrams are indexed by (link-layer source, tag, size), in the order
+    their first fragment arrived, so the ones which timed out are always at
+    the front. When the buffer is full, the oldest datagrams are dropped to
+    make room.
+    '''
+
+    # maximum number of bytes of fragments buffered
+    MAX_BYTES               = 16*1024
+    # number of seconds after the first fragment a datagram is dropped, if
+    # not complete (RFC4944 sets an upper bound of 60 seconds)
+    TIMEOUT                 = 60
+
+    def __init__(self,uncompressedLen,maxBytes=MAX_BYTES,timeout=TIMEOUT,clock=time.time):
+        '''
+        :param uncompressedLen: [in] A function which, given the link-layer
+            source, the payload and the receiver of a first fragment,
+            returns the number of bytes it decompresses to.
+        :param maxBytes:        [in] Maximum number of bytes of fragments
+            buffered.
+        :param timeout:         [in] Number of seconds after which a
+            datagram is dropped, if not complete.
+        :param clock:           [in] Function returning the current time, in
+            seconds.
+        '''
+
+        # store params
+        self.uncompressedLen      = uncompressedLen
+        self.maxBytes             = maxBytes
+        self.timeout              = timeout
+        self.clock                = clock
+
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.datagrams            = collections.OrderedDict() # (src,tag,size) -> datagram
+        self.numBytes             = 0
+        self.numFragments         = 0
+        self.numReassembled       = 0
+        self.numTimeouts          = 0
+        self.numEvicted           = 0
+        self.numDropped           = 0
+
+    #======================== public ==========================================
+
+    def add(self,src,frag,receiver=None):
+        '''
+        Add a fragment to the buffer.
+
+        :param src:      [in] The 8-byte link-layer source of the fragment.
+        :param frag:     [in] The fragment.
+        :param receiver: [in] The node which received the fragment, passed
+            on to uncompressedLen.
+
+        :raises: ValueError if the fragment is not valid.
+
+        :returns: The reassembled 6LoWPAN packet, as a bytearray, if this
+            fragment completed it, None otherwise.
+        '''
+        (size,tag,offset,payload) = lowpanCodec.parseFragment(frag)
+        if offset is None:
+            # first fragment, find out how much of the datagram it carries
+            length = self.uncompressedLen(src,payload,receiver)
+        else:
+            length = len(payload)
+
+        key = (tuple(src),tag,size)
+
+        with self.dataLock:
+            self.numFragments        += 1
+            self._expire(self.clock())
+
+            datagram = self.datagrams.get(key)
+            if datagram is None:
+                datagram = _Datagram(self.clock())
+                self.datagrams[key] = datagram
+
+            if offset is None:
+                if datagram.first is not None:
+                    # duplicate
+                    return None
+                datagram.first        = payload
+                datagram.firstLen     = length
+            else:
+                if offset in datagram.fragments:
+                    # duplicate
+                    return None
+                datagram.fragments[offset] = payload
+            datagram.received        += length
+            datagram.numBytes        += len(payload)
+            self.numBytes            += len(payload)
+
+            if datagram.received<size:
+                self._evict(key)
+                return None
+
+            del self.datagrams[key]
+            self.numBytes            -= datagram.numBytes
+            lowpan = datagram.reassemble(size)
+            if lowpan is None:
+                # overlapping fragments
+                self.numDropped      += 1
+                log.warning('dropping datagram {0}: inconsistent fragments'.format(key))
+                return None
+            self.numReassembled      += 1
+            return lowpan
+
+    def expire(self):
+        '''
+        Drop the datagrams which timed out.
+        '''
+        with self.dataLock:
+            self._expire(self.clock())
+
+    def getStats(self):
+        '''
+        :returns: A dictionary with the number of 'fragments' received,
+            of datagrams 'reassembled', dropped because of 'timeouts',
+            'evicted' to make room or 'dropped' because inconsistent, and
+            the number of 'datagrams' and 'bytes' currently buffered.
+        '''
+        with self.dataLock:
+            self._expire(self.clock())
+            return {
+                'fragments':   self.numFragments,
+                'reassembled': self.numReassembled,
+                'timeouts':    self.numTimeouts,
+                'evicted':     self.numEvicted,
+                'dropped':     self.numDropped,
+                'datagrams':   len(self.datagrams),
+                'bytes':       self.numBytes,
+            }
+
+    #======================== private =========================================
+
+    def _expire(self,now):
+        '''
+        Expects dataLock to be held.
+        '''
+        while self.datagrams:
+            (key,datagram) = next(self.datagrams.iteritems())
+            if now-datagram.created<self.timeout:
+                break
+            del self.datagrams[key]
+            self.numBytes    -= datagram.numBytes
+            self.numTimeouts += 1
+
+    def _evict(self,keep):
+        '''
+        Drop the oldest datagrams until the buffer fits in its bound, except
+        the one with key keep. Expects dataLock to be held.
+        '''
+        if self.numBytes<=self.maxBytes:
+            return
+        for key in self.datagrams.keys():
+            if self.numBytes<=self.maxBytes:
+                break
+            if key==keep:
+                continue
+            datagram = self.datagrams.pop(key)
+            self.numBytes    -= datagram.numBytes
+            self.numEvicted  += 1
+        if self.numBytes>self.maxBytes:
+            # a single datagram larger than the buffer
+            datagram = self.datagrams.pop(keep)
+            self.numBytes    -= datagram.numBytes
+            self.numEvicted  += 1
+
+class _Datagram(object):
+    '''
+    The fragments of a datagram received so far.
+    '''
+
+    def __init__(self,created):
+        self.created          = created
+        self.first            = None      # payload of the first fragment
+        self.firstLen         = 0         # number of bytes it decompresses to
+        self.fragments        = {}        # offset -> payload
+        self.received         = 0         # number of bytes of the datagram received
+        self.numBytes         = 0         # number of bytes buffered
+
+    def reassemble(self,size):
+        '''
+        :returns: The 6LoWPAN packet, or None if the fragments do not cover
+            the datagram exactly.
+        '''
+        if self.first is None:
+            return None
+        returnVal = bytearray(self.first)
+        expected  = self.firstLen
+        for offset in sorted(self.fragments.keys()):
+            if offset!=expected:
+                return None
+            returnVal.extend(self.fragments[offset])
+            expected += len(self.fragments[offset])
+        if expected!=size:
+            return None
+        return returnVal
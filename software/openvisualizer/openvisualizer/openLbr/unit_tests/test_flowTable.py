@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openLbr/
+
+import logging
+import logging.handlers
+
+import pytest
+
+import flowTable
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_flowTable.log'
+
+import logging
+log = logging.getLogger('test_flowTable')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_flowTable',
+                   'flowTable',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+ADDR_ROOT  = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+ADDR_A     = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]
+ADDR_B     = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0b]
+ADDR_C     = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0c]
+
+UDP        = 17
+ICMPv6     = 58
+
+#============================ helpers =========================================
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+#============================ tests ===========================================
+
+def test_update():
+
+    clock = FakeClock()
+    table = flowTable.FlowTable(clock=clock)
+
+    table.update(ADDR_A,ADDR_ROOT,UDP,5683,40,flowTable.DIRECTION_UP,0.0004)
+    clock.now += 10
+    table.update(ADDR_A,ADDR_ROOT,UDP,5683,60,flowTable.DIRECTION_UP,0.003)
+    table.update(ADDR_A,ADDR_ROOT,UDP,5683,50,flowTable.DIRECTION_UP,1.5)
+
+    (flow,) = table.getFlows()
+    assert flow['src']=='bbbb:0:0:0:1415:9200:0:a'
+    assert (flow['proto'],flow['port'],flow['direction'])==(UDP,5683,'up')
+    assert (flow['packets'],flow['bytes'])==(3,150)
+    assert (flow['firstSeen'],flow['lastSeen'])==(1000.0,1010.0)
+    histogram = dict([(bound,count) for (bound,count) in flow['processingTime']])
+    assert histogram[0.0005]==1
+    assert histogram[0.005]==1
+    assert histogram[None]==1
+    assert sum(histogram.values())==3
+
+def test_topFlows():
+
+    table = flowTable.FlowTable()
+
+    for _ in range(5):
+        table.update(ADDR_A,ADDR_ROOT,UDP,5683,10,flowTable.DIRECTION_UP)
+    table.update(ADDR_ROOT,ADDR_B,ICMPv6,128,500,flowTable.DIRECTION_DOWN)
+    for _ in range(2):
+        table.update(ADDR_C,ADDR_ROOT,UDP,61617,20,flowTable.DIRECTION_UP)
+
+    assert [f['packets'] for f in table.getTopFlows(2)]==[5,2]
+    assert [f['bytes'] for f in table.getTopFlows(10,'bytes')]==[500,50,40]
+
+    with pytest.raises(ValueError):
+        table.getTopFlows(2,'time')
+
+def test_lru():
+
+    table = flowTable.FlowTable(maxFlows=2)
+
+    table.update(ADDR_A,ADDR_ROOT,UDP,1,10,flowTable.DIRECTION_UP)
+    table.update(ADDR_B,ADDR_ROOT,UDP,1,10,flowTable.DIRECTION_UP)
+    # ADDR_A is now the most recently seen
+    table.update(ADDR_A,ADDR_ROOT,UDP,1,10,flowTable.DIRECTION_UP)
+    table.update(ADDR_C,ADDR_ROOT,UDP,1,10,flowTable.DIRECTION_UP)
+
+    assert [f['src'][-1] for f in table.getFlows()]==['a','c']
+    assert table.getStats()=={'flows': 2, 'evicted': 1}
@@ -0,0 +1,518 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openLbr/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import json
+import time
+
+import pytest
+
+import openLbr
+import lowpanCodec
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_lowpanCodec.log'
+
+import logging
+log = logging.getLogger('test_lowpanCodec')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_lowpanCodec',
+                   'lowpanCodec',
+                   'openLbr',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+NETWORK_PREFIX = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
+DAGROOT_EUI64  = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+PREVIOUS_HOP   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x21]
+
+NUM_BENCHMARK  = 2000
+
+#============================ fixtures ========================================
+
+#===== expectedLowpan
+
+# The expected 6LoWPAN packets were generated by the list-based implementation
+# of OpenLbr, which the codec replaces.
+
+EXPECTEDLOWPAN = [
+    json.dumps(
+        (
+            [
+                0x60,0x00,0x00,0x00,0x00,0x0c,0x11,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x11,0x00,0x07,0x0e,0x15,0x1c,0x23,0x2a,0x31,
+                0x38,0x3f,0x46,0x4d,
+            ], # IPv6
+            [[0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x11]], # route
+            [
+                0x7c,0x00,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x11,0xee,0x78,0x33,0x11,0x40,0x00,0x07,0x0e,0x15,0x1c,0x23,0x2a,0x31,
+                0x38,0x3f,0x46,0x4d,
+            ], # 6LoWPAN
+        )
+    ),
+    json.dumps(
+        (
+            [
+                0x60,0x00,0x00,0x00,0x00,0x08,0x3a,0xff,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x11,0x00,0x07,0x0e,0x15,0x1c,0x23,0x2a,0x31,
+            ], # IPv6
+            [[0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x11]], # route
+            [
+                0x7c,0x00,0xff,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x11,0xee,0x78,0x33,0x3a,0xff,0x00,0x07,0x0e,0x15,0x1c,0x23,0x2a,0x31,
+            ], # 6LoWPAN
+        )
+    ),
+    json.dumps(
+        (
+            [
+                0x60,0x00,0x00,0x00,0x00,0x1e,0x11,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x12,0x00,0x07,0x0e,0x15,0x1c,0x23,0x2a,0x31,
+                0x38,0x3f,0x46,0x4d,0x54,0x5b,0x62,0x69,0x70,0x77,0x7e,0x85,0x8c,0x93,0x9a,0xa1,
+                0xa8,0xaf,0xb6,0xbd,0xc4,0xcb,
+            ], # IPv6
+            [[0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x12], [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x11]], # route
+            [
+                0x7c,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x11,0xe3,0x0e,0x03,0x01,0x88,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x12,0xee,0x78,0x33,0x11,0x01,0x00,0x07,0x0e,0x15,0x1c,0x23,0x2a,0x31,
+                0x38,0x3f,0x46,0x4d,0x54,0x5b,0x62,0x69,0x70,0x77,0x7e,0x85,0x8c,0x93,0x9a,0xa1,
+                0xa8,0xaf,0xb6,0xbd,0xc4,0xcb,
+            ], # 6LoWPAN
+        )
+    ),
+    json.dumps(
+        (
+            [
+                0x60,0x00,0x00,0x00,0x00,0x04,0x3a,0x11,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x13,0x00,0x07,0x0e,0x15,
+            ], # IPv6
+            [[0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x13], [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x12], [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x11]], # route
+            [
+                0x7c,0x00,0x11,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x11,0xe3,0x16,0x03,0x02,0x88,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x12,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x13,0xee,0x78,0x33,0x3a,0x11,
+                0x00,0x07,0x0e,0x15,
+            ], # 6LoWPAN
+        )
+    ),
+    json.dumps(
+        (
+            [
+                0x60,0x00,0x00,0x00,0x00,0x64,0x11,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x15,0x00,0x07,0x0e,0x15,0x1c,0x23,0x2a,0x31,
+                0x38,0x3f,0x46,0x4d,0x54,0x5b,0x62,0x69,0x70,0x77,0x7e,0x85,0x8c,0x93,0x9a,0xa1,
+                0xa8,0xaf,0xb6,0xbd,0xc4,0xcb,0xd2,0xd9,0xe0,0xe7,0xee,0xf5,0xfc,0x03,0x0a,0x11,
+                0x18,0x1f,0x26,0x2d,0x34,0x3b,0x42,0x49,0x50,0x57,0x5e,0x65,0x6c,0x73,0x7a,0x81,
+                0x88,0x8f,0x96,0x9d,0xa4,0xab,0xb2,0xb9,0xc0,0xc7,0xce,0xd5,0xdc,0xe3,0xea,0xf1,
+                0xf8,0xff,0x06,0x0d,0x14,0x1b,0x22,0x29,0x30,0x37,0x3e,0x45,0x4c,0x53,0x5a,0x61,
+                0x68,0x6f,0x76,0x7d,0x84,0x8b,0x92,0x99,0xa0,0xa7,0xae,0xb5,
+            ], # IPv6
+            [[0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x15], [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x14], [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x13], [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x12], [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x11]], # route
+            [
+                0x7c,0x00,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x11,0xe3,0x26,0x03,0x04,0x88,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x12,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x13,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x14,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x15,0xee,0x78,0x33,0x11,0x40,
+                0x00,0x07,0x0e,0x15,0x1c,0x23,0x2a,0x31,0x38,0x3f,0x46,0x4d,0x54,0x5b,0x62,0x69,
+                0x70,0x77,0x7e,0x85,0x8c,0x93,0x9a,0xa1,0xa8,0xaf,0xb6,0xbd,0xc4,0xcb,0xd2,0xd9,
+                0xe0,0xe7,0xee,0xf5,0xfc,0x03,0x0a,0x11,0x18,0x1f,0x26,0x2d,0x34,0x3b,0x42,0x49,
+                0x50,0x57,0x5e,0x65,0x6c,0x73,0x7a,0x81,0x88,0x8f,0x96,0x9d,0xa4,0xab,0xb2,0xb9,
+                0xc0,0xc7,0xce,0xd5,0xdc,0xe3,0xea,0xf1,0xf8,0xff,0x06,0x0d,0x14,0x1b,0x22,0x29,
+                0x30,0x37,0x3e,0x45,0x4c,0x53,0x5a,0x61,0x68,0x6f,0x76,0x7d,0x84,0x8b,0x92,0x99,
+                0xa0,0xa7,0xae,0xb5,
+            ], # 6LoWPAN
+        )
+    ),
+    json.dumps(
+        (
+            [
+                0x60,0x00,0x00,0x00,0x00,0x00,0x3a,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x12,
+            ], # IPv6
+            [[0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x12], [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x11]], # route
+            [
+                0x7c,0x00,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x00,0x00,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x11,0xe3,0x0e,0x03,0x01,0x88,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x12,0xee,0x78,0x33,0x3a,0x40,
+            ], # 6LoWPAN
+        )
+    ),
+]
+
+@pytest.fixture(params=EXPECTEDLOWPAN)
+def expectedLowpan(request):
+    return request.param
+
+#===== expectedUdp
+
+EXPECTEDUDP = [
+    #          UDP header                                  elide  compressed header
+    json.dumps(([0x12,0x34,0x56,0x78,0x00,0x0a,0xab,0xcd], False, [0xf0,0x12,0x34,0x56,0x78,0xab,0xcd])),
+    json.dumps(([0x12,0x34,0xf0,0x78,0x00,0x0a,0xab,0xcd], False, [0xf1,0x12,0x34,0x78,0xab,0xcd])),
+    json.dumps(([0xf0,0x12,0x56,0x78,0x00,0x0a,0xab,0xcd], False, [0xf2,0x12,0x56,0x78,0xab,0xcd])),
+    json.dumps(([0xf0,0xb1,0xf0,0xb2,0x00,0x0a,0xab,0xcd], False, [0xf3,0x12,0xab,0xcd])),
+    json.dumps(([0xf0,0xb1,0xf0,0xb2,0x00,0x0a,0xab,0xcd], True,  [0xf7,0x12])),
+    json.dumps(([0x12,0x34,0x56,0x78,0x00,0x0a,0xab,0xcd], True,  [0xf4,0x12,0x34,0x56,0x78])),
+]
+
+@pytest.fixture(params=EXPECTEDUDP)
+def expectedUdp(request):
+    return request.param
+
+#===== expectedIpv6
+
+EXPECTEDIPv6 = [
+    json.dumps(
+        (
+            [0x78,0x33,0x11,0x40,0x01,0x02,0x03,0x04,0x05,0x06], # 6LoWPAN
+            {'flow_label': 0, 'hop_limit': 64, 'next_header': 17, 'payload_length': 6, 'traffic_class': 0, 'version': 6}, # fields
+            [
+                0x60,0x00,0x00,0x00,0x00,0x06,0x11,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x21,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01,0x01,0x02,0x03,0x04,0x05,0x06,
+            ], # IPv6
+        )
+    ),
+    json.dumps(
+        (
+            [
+                0x7a,0x00,0x3a,0xfe,0x80,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x33,0x20,0x01,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x44,0x01,0x02,0x03,0x04,0x05,0x06,
+            ], # 6LoWPAN
+            {'flow_label': 0, 'hop_limit': 64, 'next_header': 58, 'payload_length': 6, 'traffic_class': 0, 'version': 6}, # fields
+            [
+                0x60,0x00,0x00,0x00,0x00,0x06,0x3a,0x40,0xfe,0x80,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x33,0x20,0x01,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x44,0x01,0x02,0x03,0x04,0x05,0x06,
+            ], # IPv6
+        )
+    ),
+    json.dumps(
+        (
+            [
+                0x79,0x11,0x11,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x55,0x14,0x15,0x92,0x00,0x00,
+                0x00,0x00,0x66,0x01,0x02,0x03,0x04,0x05,0x06,
+            ], # 6LoWPAN
+            {'flow_label': 0, 'hop_limit': 1, 'next_header': 17, 'payload_length': 6, 'traffic_class': 0, 'version': 6}, # fields
+            [
+                0x60,0x00,0x00,0x00,0x00,0x06,0x11,0x01,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x55,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x66,0x01,0x02,0x03,0x04,0x05,0x06,
+            ], # IPv6
+        )
+    ),
+    json.dumps(
+        (
+            [
+                0x7c,0x33,0x40,0xe0,0x11,0x06,0x63,0x04,0x00,0x00,0x01,0x00,0x01,0x02,0x03,0x04,
+                0x05,0x06,
+            ], # 6LoWPAN
+            {'flow_label': 0, 'hop_flags': 0, 'hop_hdr_len': 6, 'hop_limit': 64, 'hop_next_header': 17, 'hop_nhc': 224, 'hop_optionLen': 4, 'hop_optionType': 99, 'hop_rplInstanceID': 0, 'hop_senderRank': 256, 'next_header': 0, 'payload_length': 6, 'traffic_class': 0, 'version': 6}, # fields
+            [
+                0x60,0x00,0x00,0x00,0x00,0x06,0x00,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x21,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01,0x01,0x02,0x03,0x04,0x05,0x06,
+            ], # IPv6
+        )
+    ),
+    json.dumps(
+        (
+            [
+                0x7c,0x33,0x40,0xe1,0x06,0x63,0x04,0x80,0x00,0x02,0x00,0xee,0x78,0x33,0x11,0x40,
+                0x01,0x02,0x03,0x04,0x05,0x06,
+            ], # 6LoWPAN
+            {'flow_label': 0, 'hop_flags': 128, 'hop_hdr_len': 6, 'hop_limit': 64, 'hop_next_header': 238, 'hop_nhc': 225, 'hop_optionLen': 4, 'hop_optionType': 99, 'hop_rplInstanceID': 0, 'hop_senderRank': 512, 'next_header': 0, 'payload_length': 11, 'traffic_class': 0, 'version': 6}, # fields
+            [
+                0x60,0x00,0x00,0x00,0x00,0x0b,0x00,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x21,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01,0xee,0x78,0x33,0x11,0x40,0x01,0x02,0x03,
+                0x04,0x05,0x06,
+            ], # IPv6
+        )
+    ),
+    json.dumps(
+        (
+            [0x7c,0x33,0x40,0xee,0x78,0x33,0x3a,0x40,0x01,0x02,0x03,0x04,0x05,0x06], # 6LoWPAN
+            {'flow_label': 0, 'hop_limit': 64, 'next_header': 238, 'payload_length': 11, 'traffic_class': 0, 'version': 6}, # fields
+            [
+                0x60,0x00,0x00,0x00,0x00,0x0b,0xee,0x40,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x21,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01,0xee,0x78,0x33,0x3a,0x40,0x01,0x02,0x03,
+                0x04,0x05,0x06,
+            ], # IPv6
+        )
+    ),
+    json.dumps(
+        (
+            [0x6b,0x33,0x01,0x02,0x03,0x11,0x01,0x02,0x03,0x04,0x05,0x06], # 6LoWPAN
+            {'flow_label': 66051, 'hop_limit': 255, 'next_header': 17, 'payload_length': 6, 'traffic_class': 0, 'version': 6}, # fields
+            [
+                0x60,0x01,0x02,0x03,0x00,0x06,0x11,0xff,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x21,0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,
+                0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01,0x01,0x02,0x03,0x04,0x05,0x06,
+            ], # IPv6
+        )
+    ),
+]
+
+
+@pytest.fixture(params=EXPECTEDIPv6)
+def expectedIpv6(request):
+    return request.param
+
+@pytest.fixture
+def lbr(request):
+    lbr = openLbr.OpenLbr()
+    lbr.networkPrefix  = NETWORK_PREFIX
+    lbr.dagRootEui64   = DAGROOT_EUI64
+    def fin():
+        openLbr.eventBusClient.dispatcher.disconnect(lbr._eventBusNotification)
+    request.addfinalizer(fin)
+    return lbr
+
+#============================ tests ===========================================
+
+def test_assembleLowpan(expectedLowpan):
+
+    (ipv6,route,lowpan) = json.loads(expectedLowpan)
+
+    log.debug("ipv6   {0}".format(ipv6))
+    log.debug("route  {0}".format(route))
+
+    pkt = lowpanCodec.disassembleIpv6(ipv6)
+
+    assert list(lowpanCodec.assembleLowpan(
+        pkt['src_addr'],
+        pkt['dst_addr'],
+        pkt['next_header'],
+        pkt['hop_limit'],
+        pkt['payload'],
+        [bytearray(hop) for hop in route],
+    ))==lowpan
+
+def test_fillLowpanHeader(expectedLowpan):
+
+    (ipv6,route,lowpan) = json.loads(expectedLowpan)
+
+    pkt    = lowpanCodec.disassembleIpv6(ipv6)
+    header = lowpanCodec.assembleLowpanHeader(
+        pkt['src_addr'],
+        pkt['dst_addr'],
+        [bytearray(hop) for hop in route],
+    )
+    headerCopy = bytearray(header)
+
+    assert list(lowpanCodec.fillLowpanHeader(
+        header,
+        pkt['next_header'],
+        pkt['hop_limit'],
+        pkt['payload'],
+    ))==lowpan
+
+    # the header can be re-used
+    assert header==headerCopy
+
+def test_reassemble_lowpan(expectedLowpan,lbr):
+
+    (ipv6,route,lowpan) = json.loads(expectedLowpan)
+
+    # same steps as OpenLbr._v6ToMesh_notif
+    lowpanFields            = lbr.ipv6_to_lowpan(lbr.disassemble_ipv6(ipv6))
+    lowpanFields['route']   = route
+    lowpanFields['nextHop'] = route[-1]
+
+    assert lbr.reassemble_lowpan(lowpanFields)==lowpan
+
+def test_ipv6RoundTrip(expectedLowpan):
+
+    (ipv6,route,lowpan) = json.loads(expectedLowpan)
+
+    assert list(lowpanCodec.assembleIpv6(lowpanCodec.disassembleIpv6(ipv6)))==ipv6
+
+def test_disassembleLowpan(expectedIpv6,lbr):
+
+    (lowpan,fields,ipv6) = json.loads(expectedIpv6)
+
+    log.debug("lowpan {0}".format(lowpan))
+
+    pkt = lbr.lowpan_to_ipv6([PREVIOUS_HOP,lowpan])
+
+    for (k,v) in fields.items():
+        assert pkt[k]==v
+    assert pkt['pre_hop']==PREVIOUS_HOP
+    assert lbr.reassemble_ipv6_packet(pkt)==ipv6
+
+def test_compressUdp(expectedUdp):
+
+    (udp,elideChecksum,nhc) = json.loads(expectedUdp)
+
+    # 2 bytes of payload
+    assert list(lowpanCodec.compressUdp(udp+[0x01,0x02],elideChecksum))==nhc
+
+    (srcPort,dstPort,checksum,length) = lowpanCodec.decompressUdp(nhc+[0x01,0x02])
+    assert srcPort==(udp[0]<<8)+udp[1]
+    assert dstPort==(udp[2]<<8)+udp[3]
+    assert checksum==(None if elideChecksum else (udp[6]<<8)+udp[7])
+    assert length==len(nhc)
+
+def test_compressUdp_invalid():
+
+    # length does not match the datagram
+    assert lowpanCodec.compressUdp([0x12,0x34,0x56,0x78,0x00,0x0a,0xab,0xcd])==None
+
+    # too short
+    assert lowpanCodec.compressUdp([0x12,0x34,0x56,0x78])==None
+
+    with pytest.raises(ValueError):
+        lowpanCodec.decompressUdp([0xf0,0x12,0x34,0x56,0x78,0xab])
+
+    with pytest.raises(ValueError):
+        lowpanCodec.decompressUdp([0xe0,0x12,0x34,0x56,0x78,0xab,0xcd])
+
+def test_contexts():
+
+    contexts = {0: NETWORK_PREFIX, 1: [0xaa]*8}
+    src      = NETWORK_PREFIX+DAGROOT_EUI64
+    dst      = [0xaa]*8+PREVIOUS_HOP
+
+    header = lowpanCodec.assembleLowpanHeader(src,dst,[PREVIOUS_HOP],contexts,DAGROOT_EUI64)
+    lowpan = lowpanCodec.fillLowpanHeader(header,lowpanCodec.IANA_UDP,64,[0x01,0x02])
+
+    # CID extension, both addresses elided
+    assert list(lowpan[:4])==[0x7c,0xf7,0x01,0x40]
+    assert len(header)==4+lowpanCodec.INNER_LEN
+
+    # decoded by the next hop
+    pkt = lowpanCodec.disassembleLowpan(DAGROOT_EUI64,lowpan,NETWORK_PREFIX,PREVIOUS_HOP,contexts)
+    assert list(pkt['src_addr'])==src
+    assert list(pkt['dst_addr'])==dst
+    assert pkt['hop_limit']==64
+
+    # unknown context
+    with pytest.raises(ValueError):
+        lowpanCodec.disassembleLowpan(DAGROOT_EUI64,lowpan,NETWORK_PREFIX,PREVIOUS_HOP,{0: NETWORK_PREFIX})
+
+def test_contextsRoutingHeader():
+
+    route  = [[0x14,0x15,0x92,0x00,0x00,0x00,0x00,i] for i in [0x0e,0x0b,0x0a]]
+    header = lowpanCodec.assembleLowpanHeader(
+        NETWORK_PREFIX+DAGROOT_EUI64,
+        NETWORK_PREFIX+route[0],
+        route,
+        {0: NETWORK_PREFIX},
+        DAGROOT_EUI64,
+    )
+
+    assert list(header[3:])==[
+        0xe3,0x0e,0x03,0x02,0xff,0x60,0x00,0x00,    # 15 octets elided, 6 octets pad
+        0x0b,0x0e,0x00,0x00,0x00,0x00,0x00,0x00,    # addresses
+        0xee,0x78,0x33,0x00,0x00,                   # inner header
+    ]
+
+def test_disassembleIpv6_invalid():
+
+    with pytest.raises(ValueError):
+        lowpanCodec.disassembleIpv6([0x60]*39)
+
+    with pytest.raises(ValueError):
+        lowpanCodec.disassembleIpv6([0x40]+[0x00]*39)
+
+def test_disassembleLowpan_invalid():
+
+    # not a 6LoWPAN packet
+    with pytest.raises(ValueError):
+        lowpanCodec.disassembleLowpan(PREVIOUS_HOP,[0x41,0x33],NETWORK_PREFIX,DAGROOT_EUI64)
+
+    # truncated source address
+    with pytest.raises(ValueError):
+        lowpanCodec.disassembleLowpan(PREVIOUS_HOP,[0x78,0x13,0x11,0x40,0x00],NETWORK_PREFIX,DAGROOT_EUI64)
+
+    # no prefix known yet
+    with pytest.raises(ValueError):
+        lowpanCodec.disassembleLowpan(PREVIOUS_HOP,[0x78,0x33,0x11,0x40],None,DAGROOT_EUI64)
+
+    # traffic class inline
+    with pytest.raises(NotImplementedError):
+        lowpanCodec.disassembleLowpan(PREVIOUS_HOP,[0x60,0x33,0x00,0x00,0x00,0x00,0x11],NETWORK_PREFIX,DAGROOT_EUI64)
+
+def test_benchmarkToMesh(expectedLowpan):
+    '''
+    Log the number of packets per second the codec compresses.
+    '''
+
+    (ipv6,route,lowpan) = json.loads(expectedLowpan)
+
+    route  = [bytearray(hop) for hop in route]
+    ipv6   = bytearray(ipv6)
+
+    start = time.time()
+    for _ in range(NUM_BENCHMARK):
+        pkt = lowpanCodec.disassembleIpv6(ipv6)
+        lowpanCodec.assembleLowpan(
+            pkt['src_addr'],
+            pkt['dst_addr'],
+            pkt['next_header'],
+            pkt['hop_limit'],
+            pkt['payload'],
+            route,
+        )
+    duration = time.time()-start
+
+    log.info("{0}-byte packet, {1} hop(s): {2:.0f} pkt/s to mesh".format(
+        len(ipv6),
+        len(route),
+        NUM_BENCHMARK/max(duration,1e-9),
+    ))
+
+def test_benchmarkFromMesh(expectedIpv6):
+    '''
+    Log the number of packets per second the codec decompresses.
+    '''
+
+    (lowpan,fields,ipv6) = json.loads(expectedIpv6)
+
+    lowpan = bytearray(lowpan)
+
+    start = time.time()
+    for _ in range(NUM_BENCHMARK):
+        lowpanCodec.assembleIpv6(
+            lowpanCodec.disassembleLowpan(PREVIOUS_HOP,lowpan,NETWORK_PREFIX,DAGROOT_EUI64)
+        )
+    duration = time.time()-start
+
+    log.info("{0}-byte packet: {1:.0f} pkt/s from mesh".format(
+        len(lowpan),
+        NUM_BENCHMARK/max(duration,1e-9),
+    ))
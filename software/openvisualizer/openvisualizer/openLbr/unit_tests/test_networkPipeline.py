@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openLbr/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import struct
+import threading
+
+import pytest
+
+import networkPipeline
+from openvisualizer.eventBus      import eventBusClient
+from openvisualizer.moteConnector import moteConnector
+from openvisualizer.moteState     import moteIndex
+from openvisualizer.moteState     import moteState
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_networkPipeline.log'
+
+import logging
+log = logging.getLogger('test_networkPipeline')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_networkPipeline',
+                   'networkPipeline',
+                   'openLbr',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+PREFIX_A       = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x0a]
+PREFIX_B       = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x0b]
+HOST           = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x01]
+DAGROOT_EUI64  = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+MOTE_A         = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]
+
+TIMEOUT        = 5
+
+#============================ helpers =========================================
+
+class Listener(eventBusClient.eventBusClient):
+    '''
+    Records the notifications of a signal, on a network or on the global
+    event bus.
+    '''
+    def __init__(self,signal,network=None):
+        self.notifs   = []
+        self.received = threading.Event()
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name          = 'test_networkPipeline',
+            network       = network,
+            registrations = [
+                {
+                    'sender'   : self.WILDCARD,
+                    'signal'   : signal,
+                    'callback' : self._notif,
+                },
+            ]
+        )
+    def _notif(self,sender,signal,data):
+        self.notifs.append(data)
+        self.received.set()
+
+def _udpPacket(dst,payload=[0x01,0x02,0x03]):
+    length  = 8+len(payload)
+    udp     = list(bytearray(struct.pack('>HHHH',61000,61000,length,0)))+payload
+    return list(bytearray(struct.pack('>IHBB',6<<28,length,17,64)))+HOST+dst+udp
+
+def _dao(prefix,parent):
+    # RPL instance, flags, reserved, sequence, DODAGID, transit information
+    dao  = [0x00,0x00,0x00,0x01]+prefix+DAGROOT_EUI64
+    dao += [0x06,0x14,0x00,0x00,0x00,0xaa]+prefix+parent
+    return dao
+
+@pytest.fixture
+def pipelines(request):
+    pipelineA = networkPipeline.NetworkPipeline(PREFIX_A)
+    pipelineB = networkPipeline.NetworkPipeline(PREFIX_B)
+    def fin():
+        pipelineA.close()
+        pipelineB.close()
+    request.addfinalizer(fin)
+    return (pipelineA,pipelineB)
+
+#============================ tests ===========================================
+
+def test_toMesh(pipelines):
+
+    (pipelineA,pipelineB) = pipelines
+    toMeshA  = Listener('bytesToMesh',network=pipelineA.network)
+    toMeshB  = Listener('bytesToMesh',network=pipelineB.network)
+    client   = eventBusClient.eventBusClient('test_networkPipeline',[],network=pipelineA.network)
+
+    # the DAGroot of network A, and a mote below it
+    client.dispatch('infoDagRoot',{'isDAGroot':1,'eui64':DAGROOT_EUI64,'serialPort':'COM1'})
+    assert pipelineA.openLbr.dagRootEui64==DAGROOT_EUI64
+    assert pipelineB.openLbr.dagRootEui64 is None
+    assert client._dispatchProtocol(
+        (tuple(PREFIX_A+DAGROOT_EUI64),client.PROTO_ICMPv6,pipelineA.rpl.IANA_ICMPv6_RPL_TYPE),
+        (PREFIX_A+MOTE_A,_dao(PREFIX_A,DAGROOT_EUI64)),
+    )
+    while pipelineA.rpl.getDAOStats()['batches']<1:
+        threading.Event().wait(0.01)
+
+    # a packet from the Internet only enters the network of its prefix
+    for pipeline in pipelines:
+        pipeline.internetClient._eventBusNotification('v6ToMesh','test_networkPipeline',_udpPacket(PREFIX_A+MOTE_A))
+
+    assert toMeshA.received.wait(TIMEOUT)
+    (nextHop,lowpan,root) = toMeshA.notifs[0]
+    assert nextHop==MOTE_A
+    assert root==DAGROOT_EUI64
+    assert toMeshB.notifs==[]
+    assert pipelineA.getStats()['toMesh']==1
+    assert pipelineB.getStats()['toMesh']==0
+    assert pipelineB.openLbr.getTemplateStats()['misses']==0
+
+def test_toInternet(pipelines):
+
+    (pipelineA,pipelineB) = pipelines
+    internet = Listener('v6ToInternet')
+    client   = eventBusClient.eventBusClient('test_networkPipeline',[],network=pipelineA.network)
+    try:
+        client.dispatch('v6ToInternet',_udpPacket(HOST))
+    finally:
+        eventBusClient.dispatcher.disconnect(internet._eventBusNotification)
+
+    assert internet.notifs==[_udpPacket(HOST)]
+    assert pipelineA.getStats()['toInternet']==1
+    assert pipelineB.getStats()['toInternet']==0
+
+def test_prefix(pipelines):
+
+    (pipelineA,pipelineB) = pipelines
+    clientA = eventBusClient.eventBusClient('test_networkPipeline',[],network=pipelineA.network)
+    clientB = eventBusClient.eventBusClient('test_networkPipeline',[],network=pipelineB.network)
+
+    assert clientA._dispatchAndGetResult('getNetworkPrefix',[])==PREFIX_A
+    assert clientB._dispatchAndGetResult('getNetworkPrefix',[])==PREFIX_B
+    assert pipelineA.openLbr.networkPrefix==PREFIX_A
+    assert pipelineA.rpl.networkPrefix==PREFIX_A
+
+    stats   = pipelineA.getStats()
+    assert stats['network']=='bbbb:0:0:a'
+    assert stats['bus']['signals']['networkPrefix']==1
+
+def test_moteIndex(pipelines):
+
+    (pipelineA,pipelineB) = pipelines
+    mc    = moteConnector.moteConnector('COM9',network=pipelineA.network)
+    ms    = moteState.moteState(mc)
+    index = moteIndex.moteIndex()
+    try:
+        index.addNetwork(pipelineA.network)
+        index.addMote(ms)
+
+        # the mote reports its address on the bus of its network
+        ms.dispatch('infoMoteId',{'my16bID':MOTE_A[6:],'my64bID':MOTE_A,'serialPort':'COM9'})
+
+        assert index.getBy16bId('000a') is ms
+        assert index.getByEui64(MOTE_A) is ms
+    finally:
+        eventBusClient.dispatcher.disconnect(index._eventBusNotification)
+        eventBusClient.dispatcher.disconnect(mc._sendToParser,signal='fromMoteProbe@COM9')
+
+def test_process():
+
+    process  = networkPipeline.NetworkProcess(PREFIX_A)
+    internet = process.internetClient
+    try:
+        assert process.getStats()['prefix']=='bbbb:0:0:a'
+
+        # the packets for the prefix reach the worker
+        for dst in [PREFIX_B+MOTE_A,PREFIX_A+MOTE_A]:
+            internet._eventBusNotification('v6ToMesh','test_networkPipeline',_udpPacket(dst))
+        stats = process.getStats()
+        assert stats['toMesh']==1
+        # there is no route in the network
+        assert stats['templates']['misses']==1
+
+        # the late answer to a former request is not returned
+        process.statsQueue.put((process.statsSeq,{'toMesh': 0}))
+        assert process.getStats()['toMesh']==1
+    finally:
+        process.close()
+    assert not process.isAlive()
+
+    # the packets are not taken by a worker which exited
+    assert process._v6ToMesh_notif('test_networkPipeline','v6ToMesh',_udpPacket(PREFIX_A+MOTE_A)) is None
@@ -0,0 +1,507 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openLbr/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import json
+
+import pytest
+
+import openLbr
+import lowpanCodec
+import openvisualizer.openvisualizer_utils as u
+from openvisualizer.eventBus import eventBusClient
+from openvisualizer.RPL      import SourceRoute
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_openLbr.log'
+
+import logging
+log = logging.getLogger('test_openLbr')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_openLbr',
+                   'lowpanCodec',
+                   'openLbr',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+NETWORK_PREFIX = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
+DAGROOT_EUI64  = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+DAGROOT2_EUI64 = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]
+MOTE_A         = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]
+MOTE_B         = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0b]
+MOTE_C         = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0c]
+MOTE_D         = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0d]
+MOTE_E         = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0e]
+MOTE_F         = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0f]
+
+# DAGROOT <- MOTE_A <- MOTE_B <- MOTE_E
+# DAGROOT <- MOTE_C
+# DAGROOT2 <- MOTE_F
+PARENTS        = {
+    tuple(MOTE_A): DAGROOT_EUI64,
+    tuple(MOTE_B): MOTE_A,
+    tuple(MOTE_C): DAGROOT_EUI64,
+    tuple(MOTE_E): MOTE_B,
+    tuple(MOTE_F): DAGROOT2_EUI64,
+}
+
+#============================ helpers =========================================
+
+class LbrUnderTest(object):
+    '''
+    Wraps an OpenLbr, answering its source route requests from PARENTS and
+    recording the packets it sends into the mesh.
+    '''
+
+    def __init__(self,**kwargs):
+        self.lbr                   = openLbr.OpenLbr(**kwargs)
+        self.lbr._setPrefix_notif(None,'networkPrefix',NETWORK_PREFIX)
+        self.lbr.dagRootEui64      = DAGROOT_EUI64
+        self.lbr._getSourceRoute   = self._getSourceRoute
+        self.lbr.dispatch          = self._dispatch
+        self.lbr._dispatchProtocol = lambda signal,data: False
+        self.numRouteRequests      = 0
+        self.toMesh                = []
+        self.toMeshRoots           = []
+        self.toInternet            = []
+        self.onRouteRequest        = None
+
+    def _getSourceRoute(self,destination):
+        self.numRouteRequests     += 1
+        if self.onRouteRequest:
+            self.onRouteRequest()
+        route                      = [destination]
+        while tuple(route[-1]) in PARENTS:
+            route                 += [PARENTS[tuple(route[-1])]]
+        return route
+
+    def _dispatch(self,signal,data):
+        if signal=='v6ToInternet':
+            self.toInternet       += [data]
+        else:
+            assert signal=='bytesToMesh'
+            (nextHop,lowpan,root)  = data
+            self.toMesh           += [(nextHop,lowpan)]
+            self.toMeshRoots      += [root]
+
+def _ipv6(dst,hopLimit=64):
+    payload = [0x00,0x01,0x02,0x03]
+    return [0x60,0x00,0x00,0x00,0x00,len(payload),lowpanCodec.IANA_UDP,hopLimit]+ \
+           NETWORK_PREFIX+DAGROOT_EUI64+ \
+           NETWORK_PREFIX+dst+ \
+           payload
+
+def _udp(dst,srcPort,dstPort,appPayload,hopLimit=64):
+    length  = 8+len(appPayload)
+    udp     = [srcPort>>8,srcPort&0xff,dstPort>>8,dstPort&0xff,length>>8,length&0xff,0x00,0x00]+appPayload
+    udp[6:8] = u.calculatePseudoHeaderCRC(
+        NETWORK_PREFIX+DAGROOT_EUI64,
+        NETWORK_PREFIX+dst,
+        [0x00,0x00,length>>8,length&0xff],
+        [0x00,0x00,0x00,lowpanCodec.IANA_UDP],
+        udp,
+    )
+    return [0x60,0x00,0x00,0x00,length>>8,length&0xff,lowpanCodec.IANA_UDP,hopLimit]+ \
+           NETWORK_PREFIX+DAGROOT_EUI64+ \
+           NETWORK_PREFIX+dst+ \
+           udp
+
+def _receiver(eui64):
+    '''
+    An OpenLbr decoding packets as the mote with address eui64 would.
+    '''
+    rx                      = LbrUnderTest()
+    rx.lbr.dagRootEui64     = eui64
+    return rx
+
+def _expectedLowpan(ipv6,route):
+    pkt = lowpanCodec.disassembleIpv6(ipv6)
+    return list(lowpanCodec.assembleLowpan(
+        pkt['src_addr'],
+        pkt['dst_addr'],
+        pkt['next_header'],
+        pkt['hop_limit'],
+        pkt['payload'],
+        route,
+        contexts    = {0: NETWORK_PREFIX},
+        srcLinkAddr = DAGROOT_EUI64,
+    ))
+
+#============================ tests ===========================================
+
+def test_templateHit():
+
+    t = LbrUnderTest()
+
+    for hopLimit in [64,63]:
+        t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_B,hopLimit))
+
+    assert t.numRouteRequests==1
+    assert t.lbr.getTemplateStats()=={'hits': 1, 'misses': 1, 'templates': 1}
+    assert t.toMesh==[
+        (MOTE_A,_expectedLowpan(_ipv6(MOTE_B,64),[MOTE_B,MOTE_A])),
+        (MOTE_A,_expectedLowpan(_ipv6(MOTE_B,63),[MOTE_B,MOTE_A])),
+    ]
+
+def test_templateNoRoute():
+
+    t = LbrUnderTest()
+
+    for _ in range(2):
+        t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_D))
+
+    assert t.numRouteRequests==2
+    assert t.toMesh==[]
+    assert t.lbr.getTemplateStats()['templates']==0
+
+def test_templateNoRouter():
+
+    # nobody answers the source route requests on the network
+    lbr = openLbr.OpenLbr(network='test_openLbr')
+    try:
+        lbr._setPrefix_notif(None,'networkPrefix',NETWORK_PREFIX)
+        lbr.dagRootEui64 = DAGROOT_EUI64
+
+        # the packet is dropped
+        lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_B))
+
+        assert lbr.getTemplateStats()=={'hits': 0, 'misses': 1, 'templates': 0}
+        assert lbr.networkBus.getStats()['signals'].get('bytesToMesh',0)==0
+    finally:
+        openLbr.eventBusClient.closeNetwork('test_openLbr')
+
+def test_templateParentsChanged():
+
+    t = LbrUnderTest()
+
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_B))
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_C))
+    assert t.lbr.getTemplateStats()['templates']==2
+
+    # only the route to MOTE_B goes through MOTE_A
+    t.lbr._sourceRoutesChanged_notif(None,'sourceRoutesChanged',[tuple(MOTE_A)])
+    assert t.lbr.getTemplateStats()['templates']==1
+
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_B))
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_C))
+    assert t.numRouteRequests==3
+    assert t.lbr.getTemplateStats()=={'hits': 1, 'misses': 3, 'templates': 2}
+
+def test_templatePrefixChanged():
+
+    t = LbrUnderTest()
+
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_B))
+    t.lbr._setPrefix_notif(None,'networkPrefix',NETWORK_PREFIX)
+    assert t.lbr.getTemplateStats()['templates']==0
+
+def test_templateRouteChangedDuringLookup():
+
+    t = LbrUnderTest()
+
+    # the route changes while it is being computed
+    t.onRouteRequest = lambda : t.lbr._sourceRoutesChanged_notif(None,'sourceRoutesChanged',[tuple(MOTE_B)])
+
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_B))
+
+    assert len(t.toMesh)==1
+    assert t.lbr.getTemplateStats()['templates']==0
+
+def test_templateParentsChangedDuringLookup():
+
+    network  = 'test_openLbr'
+    parents  = {
+        tuple(MOTE_A): [DAGROOT_EUI64],
+        tuple(MOTE_B): [MOTE_A],
+        tuple(MOTE_C): [DAGROOT_EUI64],
+    }
+    ipv6     = _ipv6(MOTE_B)
+
+    # created before RPL, as in the applications
+    lbr      = openLbr.OpenLbr(network=network)
+    # a packet from the Internet, while the other clients are notified
+    tun      = eventBusClient.eventBusClient('test_openLbr',[],network=network)
+    tun.register(tun.WILDCARD,'parentsChanged',lambda sender,signal,data: lbr._v6ToMesh_notif(None,'v6ToMesh',ipv6))
+    topo     = eventBusClient.eventBusClient('test_openLbr',[],network=network)
+    topo.register(topo.WILDCARD,'getParents',lambda sender,signal,data: parents)
+    # as RPL
+    topo.register(topo.WILDCARD,'getSourceRoute',lambda sender,signal,data: routes.getSourceRoute(data))
+    routes   = SourceRoute.SourceRoute(network=network)
+    try:
+        lbr._setPrefix_notif(None,'networkPrefix',NETWORK_PREFIX)
+        lbr.dagRootEui64 = DAGROOT_EUI64
+        assert routes.getSourceRoute(MOTE_B)==[MOTE_B,MOTE_A,DAGROOT_EUI64]
+
+        # MOTE_B changes parent, the packet looks its route up meanwhile
+        parents[tuple(MOTE_B)] = [MOTE_C]
+        topo.dispatch('parentsChanged',[tuple(MOTE_B)])
+        assert lbr.getTemplateStats()['misses']==1
+
+        # the header built on the former route was not kept
+        (header,nextHop,route,root) = lbr._getTemplate(bytearray(ipv6[8:24]),bytearray(ipv6[24:40]))
+        assert route==[MOTE_B,MOTE_C]
+        assert lbr.getTemplateStats()['misses']==2
+    finally:
+        eventBusClient.closeNetwork(network)
+
+def test_udpCompression():
+
+    t = LbrUnderTest()
+
+    # ports in 0xf0bx, compressed into 1 byte
+    ipv6 = _udp(MOTE_B,0xf0b1,0xf0b2,[0xaa,0xbb])
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',ipv6)
+
+    (nextHop,lowpan) = t.toMesh[0]
+    uncompressed     = _expectedLowpan(ipv6,[MOTE_B,MOTE_A])
+    assert nextHop==MOTE_A
+    assert len(lowpan)==len(uncompressed)-5
+    assert lowpan[-7:]==[0x40,0xf3,0x12]+ipv6[46:48]+[0xaa,0xbb]
+    assert t.lbr.getCompressionStats()=={'udpCompressed': 1, 'udpBytesSaved': 5}
+
+def test_udpCompressionDisabled():
+
+    t = LbrUnderTest(compressUdp=False)
+
+    ipv6 = _udp(MOTE_B,0xf0b1,0xf0b2,[0xaa,0xbb])
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',ipv6)
+
+    assert t.toMesh==[(MOTE_A,_expectedLowpan(ipv6,[MOTE_B,MOTE_A]))]
+    assert t.lbr.getCompressionStats()=={'udpCompressed': 0, 'udpBytesSaved': 0}
+
+@pytest.mark.parametrize('elideUdpChecksum',[False,True])
+@pytest.mark.parametrize('ports',[(0xf0b1,0xf0b2),(0x1234,0xf012),(0xf012,0x1234),(0x1234,0x5678)])
+def test_udpRoundTrip(ports,elideUdpChecksum):
+
+    t  = LbrUnderTest(elideUdpChecksum=elideUdpChecksum)
+    rx = _receiver(MOTE_C)
+
+    # MOTE_C is a neighbor of the DAGroot, so the packet can be decoded as
+    # MOTE_C would
+    ipv6 = _udp(MOTE_C,ports[0],ports[1],[0x01,0x02,0x03])
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',ipv6)
+    (nextHop,lowpan) = t.toMesh[0]
+    rx.lbr._meshToV6_notif(None,'fromMote.data',(DAGROOT_EUI64,lowpan))
+
+    assert rx.toInternet==[ipv6]
+
+def test_v6ToMeshBytearray():
+
+    t = LbrUnderTest()
+
+    # openTunLinux reads the packets as bytearrays
+    ipv6 = _udp(MOTE_B,0xf0b1,5683,[0x01,0x02,0x03])
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',bytearray(ipv6))
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',ipv6)
+
+    assert len(t.toMesh)==2
+    assert t.toMesh[0]==t.toMesh[1]
+
+def test_contextCompression():
+
+    t         = LbrUnderTest()
+    stateless = LbrUnderTest(compressAddresses=False)
+
+    for lbr in [t,stateless]:
+        lbr.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_E))
+        lbr.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_E))
+
+    # addresses elided, 1 octet per hop in the routing header
+    assert t.lbr.getHeaderStats()=={
+        tuple(NETWORK_PREFIX+MOTE_E): {'packets': 2, 'headerBytes': 48, 'lastHeaderLen': 24},
+    }
+    assert stateless.lbr.getHeaderStats()=={
+        tuple(NETWORK_PREFIX+MOTE_E): {'packets': 2, 'headerBytes': 128, 'lastHeaderLen': 64},
+    }
+
+def test_contextChanged():
+
+    t = LbrUnderTest()
+
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_B))
+    t.lbr.setContext(1,[0xaa]*8)
+    assert t.lbr.getTemplateStats()['templates']==0
+    assert t.lbr.getContexts()=={0: NETWORK_PREFIX, 1: [0xaa]*8}
+
+    with pytest.raises(ValueError):
+        t.lbr.setContext(16,[0xaa]*8)
+
+    t.lbr.setContext(1,None)
+    assert t.lbr.getContexts()=={0: NETWORK_PREFIX}
+
+@pytest.mark.parametrize('reverse',[False,True])
+def test_fragmentation(reverse):
+
+    t  = LbrUnderTest()
+    rx = _receiver(MOTE_C)
+
+    ipv6 = _udp(MOTE_C,0xf0b1,0xf0b2,range(256)+range(44))
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',ipv6)
+
+    assert len(t.toMesh)==4
+    for (nextHop,frag) in t.toMesh:
+        assert nextHop==MOTE_C
+        assert len(frag)<=openLbr.OpenLbr.MAX_LOWPAN_LEN
+    assert t.lbr.getFragmentationStats()['fragmented']==1
+    assert t.lbr.getFragmentationStats()['fragmentsSent']==4
+
+    frags = [frag for (nextHop,frag) in t.toMesh]
+    if reverse:
+        frags.reverse()
+    for frag in frags:
+        rx.lbr._meshToV6_notif(None,'fromMote.data',(DAGROOT_EUI64,frag))
+
+    assert rx.toInternet==[ipv6]
+    stats = rx.lbr.getFragmentationStats()
+    assert stats['fragments']==4
+    assert stats['reassembled']==1
+    assert stats['datagrams']==0
+
+def test_fragmentationTimeout():
+
+    t  = LbrUnderTest()
+    rx = _receiver(MOTE_C)
+    rx.lbr.REASSEMBLY_EXPIRY_PERIOD = 0.01
+    rx.lbr.reassembly.timeout       = 0
+
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_udp(MOTE_C,0xf0b1,0xf0b2,range(200)))
+    try:
+        # the other fragments never arrive
+        rx.lbr._meshToV6_notif(None,'fromMote.data',(DAGROOT_EUI64,t.toMesh[0][1]))
+        for _ in range(500):
+            if not rx.lbr.reassembly.datagrams:
+                break
+            rx.lbr.closeEvent.wait(0.01)
+        assert not rx.lbr.reassembly.datagrams
+        assert rx.lbr.getFragmentationStats()['timeouts']==1
+    finally:
+        rx.lbr.close()
+    rx.lbr.expiryThread.join(1)
+    assert not rx.lbr.expiryThread.isAlive()
+
+def test_fragmentationSourceRoute():
+
+    t = LbrUnderTest()
+
+    ipv6 = _udp(MOTE_E,0x1234,0x5678,range(200))
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',ipv6)
+
+    (size,tag,offset,first) = lowpanCodec.parseFragment(t.toMesh[0][1])
+    assert size==len(ipv6)+40+16   # inner IPv6 header, routing header
+    assert offset==None
+    offsets = []
+    for (nextHop,frag) in t.toMesh[1:]:
+        assert nextHop==MOTE_A
+        (size,tag,offset,payload) = lowpanCodec.parseFragment(frag)
+        assert tag==0
+        offsets += [offset]
+    assert offsets[0]%8==0
+    assert offsets==range(offsets[0],size,offsets[1]-offsets[0])
+
+def test_flows():
+
+    t  = LbrUnderTest()
+    rx = _receiver(MOTE_C)
+
+    for _ in range(3):
+        t.lbr._v6ToMesh_notif(None,'v6ToMesh',_udp(MOTE_C,0xf0b1,5683,[0x01,0x02,0x03]))
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_ipv6(MOTE_B))
+
+    # upstream, decoded as MOTE_C would
+    (nextHop,lowpan) = t.toMesh[0]
+    rx.lbr._meshToV6_notif(None,'fromMote.data',(DAGROOT_EUI64,lowpan))
+
+    flows = t.lbr.getTopFlows(10)
+    assert [(f['dst'],f['proto'],f['port'],f['direction'],f['packets']) for f in flows]==[
+        (u.formatIPv6Addr(NETWORK_PREFIX+MOTE_C),lowpanCodec.IANA_UDP,5683,'down',3),
+        (u.formatIPv6Addr(NETWORK_PREFIX+MOTE_B),lowpanCodec.IANA_UDP,0x0203,'down',1),
+    ]
+    assert flows[0]['bytes']==3*len(lowpan)
+    assert t.lbr.getFlowStats()=={'flows': 2, 'evicted': 0}
+
+    (flow,) = rx.lbr.getTopFlows(10,'bytes')
+    assert (flow['direction'],flow['packets'],flow['bytes'])==('up',1,len(lowpan))
+    assert sum([count for (bound,count) in flow['processingTime']])==1
+
+def test_multipleDagRoots():
+
+    t  = LbrUnderTest()
+    for (root,port) in [(DAGROOT_EUI64,'COM1'),(DAGROOT2_EUI64,'COM2')]:
+        t.lbr._infoDagRoot_notif(None,'infoDagRoot',{'isDAGroot': 1, 'eui64': root, 'serialPort': port})
+
+    # each packet goes through the DAGroot of the destination's subtree
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_udp(MOTE_B,0xf0b1,5683,[0x01]))
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_udp(MOTE_C,0xf0b1,5683,[0x01]))
+    t.lbr._v6ToMesh_notif(None,'v6ToMesh',_udp(MOTE_F,0xf0b1,5683,[0x01,0x02]))
+    assert t.toMeshRoots==[DAGROOT_EUI64,DAGROOT_EUI64,DAGROOT2_EUI64]
+
+    # decoded as MOTE_F would, a neighbor of the second DAGroot
+    rx = _receiver(MOTE_F)
+    rx.lbr._meshToV6_notif(None,'fromMote.data',(DAGROOT2_EUI64,t.toMesh[2][1]))
+    assert rx.toInternet==[_udp(MOTE_F,0xf0b1,5683,[0x01,0x02])]
+
+    # upstream, the destination address is elided, relative to the DAGroot
+    # which received the packet
+    tx = LbrUnderTest()
+    tx.lbr.dagRootEui64      = MOTE_F
+    tx.lbr._getSourceRoute   = lambda destination: [DAGROOT2_EUI64,MOTE_F]
+    ipv6 = _udp(MOTE_F,0xf0b1,5683,[0x03])
+    ipv6[8:40] = NETWORK_PREFIX+MOTE_F+NETWORK_PREFIX+DAGROOT2_EUI64
+    tx.lbr._v6ToMesh_notif(None,'v6ToMesh',ipv6)
+    t.lbr._meshToV6_notif('moteConnector@COM2','fromMote.data',(MOTE_F,tx.toMesh[0][1]))
+    assert [p[24:40] for p in t.toInternet]==[NETWORK_PREFIX+DAGROOT2_EUI64]
+
+    stats = t.lbr.getDagRootStats()
+    assert [(s['serialPort'],s['packetsToMesh'],s['packetsFromMesh']) for (r,s) in sorted(stats.items())]==[
+        ('COM1',2,0),
+        ('COM2',1,1),
+    ]
+    assert stats[tuple(DAGROOT2_EUI64)]['bytesToMesh']==len(t.toMesh[2][1])
+    assert stats[tuple(DAGROOT2_EUI64)]['bytesFromMesh']==len(tx.toMesh[0][1])
+
+    # a fragmented packet is decompressed relative to the DAGroot which
+    # received it as well
+    roots = []
+    def uncompressedLen(prevHop,lowpan,networkPrefix,dagRootEui64,contexts=None):
+        roots.append(dagRootEui64)
+        return uncompressedLenOrig(prevHop,lowpan,networkPrefix,dagRootEui64,contexts)
+    uncompressedLenOrig = lowpanCodec.uncompressedLen
+    lowpanCodec.uncompressedLen = uncompressedLen
+    try:
+        ipv6 = _udp(MOTE_F,0xf0b1,5683,range(200))
+        ipv6[8:40] = NETWORK_PREFIX+MOTE_F+NETWORK_PREFIX+DAGROOT2_EUI64
+        tx.lbr._v6ToMesh_notif(None,'v6ToMesh',ipv6)
+        for (nextHop,frag) in tx.toMesh[1:]:
+            t.lbr._meshToV6_notif('moteConnector@COM2','fromMote.data',(MOTE_F,frag))
+    finally:
+        lowpanCodec.uncompressedLen = uncompressedLenOrig
+    assert roots==[DAGROOT2_EUI64]
+    assert t.toInternet[-1][24:40]==NETWORK_PREFIX+DAGROOT2_EUI64
+    assert t.lbr.getFragmentationStats()['reassembled']==1
+
+    # the second DAGroot becomes the default one
+    t.lbr._infoDagRoot_notif(None,'infoDagRoot',{'isDAGroot': 0, 'eui64': DAGROOT_EUI64, 'serialPort': 'COM1'})
+    assert t.lbr.dagRootEui64==DAGROOT2_EUI64
+    assert t.lbr.getDagRootStats()[tuple(DAGROOT_EUI64)]['serialPort'] is None
+
+    # then there is none left
+    t.lbr._infoDagRoot_notif(None,'infoDagRoot',{'isDAGroot': 0, 'eui64': DAGROOT2_EUI64, 'serialPort': 'COM2'})
+    assert t.lbr.dagRootEui64 is None
+    assert t.lbr._getDagRoot('moteConnector@COM2') is None
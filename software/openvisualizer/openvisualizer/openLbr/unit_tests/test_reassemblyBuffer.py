@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openLbr/
+
+import logging
+import logging.handlers
+
+import pytest
+
+import lowpanCodec
+import reassemblyBuffer
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_reassemblyBuffer.log'
+
+import logging
+log = logging.getLogger('test_reassemblyBuffer')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_reassemblyBuffer',
+                   'reassemblyBuffer',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+MOTE_A   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]
+MOTE_B   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0b]
+
+MAX_LEN  = 40
+
+#============================ helpers =========================================
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+def _newBuffer(clock=None,maxBytes=reassemblyBuffer.ReassemblyBuffer.MAX_BYTES):
+    # the payload of the fragments is not compressed
+    return reassemblyBuffer.ReassemblyBuffer(
+        uncompressedLen = lambda src,payload,receiver: len(payload),
+        maxBytes        = maxBytes,
+        clock           = clock or FakeClock(),
+    )
+
+def _fragments(length,tag=0x0102):
+    datagram = bytearray([i&0xff for i in range(length)])
+    return (datagram,lowpanCodec.fragmentLowpan(datagram,0,0,tag,MAX_LEN))
+
+#============================ tests ===========================================
+
+def test_fragmentLowpan():
+
+    (datagram,frags) = _fragments(100)
+
+    assert [len(f) for f in frags]==[4+32,5+32,5+32,5+4]
+    assert list(frags[0][:4])==[0xc0,100,0x01,0x02]
+    assert list(frags[1][:5])==[0xe0,100,0x01,0x02,32/8]
+
+    with pytest.raises(ValueError):
+        lowpanCodec.fragmentLowpan(bytearray(3000),0,0,0,MAX_LEN)
+
+    # headers do not fit
+    with pytest.raises(ValueError):
+        lowpanCodec.fragmentLowpan(bytearray(100),40,40,0,MAX_LEN)
+
+def test_reassemble():
+
+    buf              = _newBuffer()
+    (datagram,frags) = _fragments(100)
+
+    # out of order, with a duplicate
+    assert buf.add(MOTE_A,frags[2])==None
+    assert buf.add(MOTE_A,frags[0])==None
+    assert buf.add(MOTE_A,frags[0])==None
+    assert buf.add(MOTE_A,frags[3])==None
+    assert buf.add(MOTE_A,frags[1])==datagram
+
+    assert buf.getStats()=={
+        'fragments':   5,
+        'reassembled': 1,
+        'timeouts':    0,
+        'evicted':     0,
+        'dropped':     0,
+        'datagrams':   0,
+        'bytes':       0,
+    }
+
+def test_reassembleInterleaved():
+
+    buf                = _newBuffer()
+    (datagramA,fragsA) = _fragments(100)
+    (datagramB,fragsB) = _fragments(70)
+
+    # same tag, different sources or sizes
+    for (f1,f2,f3) in zip(fragsA,fragsA,fragsB):
+        buf.add(MOTE_A,f1)
+        buf.add(MOTE_B,f2)
+        assert buf.add(MOTE_A,f3) in [None,datagramB]
+    assert buf.add(MOTE_B,fragsA[3])==datagramA
+    assert buf.add(MOTE_A,fragsA[3])==datagramA
+    assert buf.getStats()['reassembled']==3
+
+def test_timeout():
+
+    clock            = FakeClock()
+    buf              = _newBuffer(clock)
+    (datagram,frags) = _fragments(100)
+
+    for frag in frags[:3]:
+        buf.add(MOTE_A,frag)
+    clock.now += buf.TIMEOUT
+    buf.expire()
+    assert buf.add(MOTE_A,frags[3])==None
+
+    stats = buf.getStats()
+    assert stats['timeouts']==1
+    assert stats['datagrams']==1
+    assert stats['bytes']==4
+
+    # the statistics are up to date, without any more fragments
+    clock.now += buf.TIMEOUT
+    stats = buf.getStats()
+    assert (stats['timeouts'],stats['datagrams'],stats['bytes'])==(2,0,0)
+
+def test_memoryBound():
+
+    buf = _newBuffer(maxBytes=150)
+
+    datagrams = [_fragments(100,tag) for tag in range(3)]
+    for (datagram,frags) in datagrams:
+        for frag in frags[:3]:
+            buf.add(MOTE_A,frag)
+
+    # only the last one fits
+    stats = buf.getStats()
+    assert stats['evicted']==2
+    assert stats['datagrams']==1
+    assert stats['bytes']==96
+    assert buf.add(MOTE_A,datagrams[2][1][3])==datagrams[2][0]
+
+def test_inconsistent():
+
+    buf              = _newBuffer()
+    (datagram,frags) = _fragments(100)
+
+    # a fragment at an offset the others do not line up with
+    bogus            = bytearray(frags[2])
+    bogus[4]         = 5
+    for frag in [frags[0],frags[1],bogus]:
+        assert buf.add(MOTE_A,frag)==None
+    assert buf.add(MOTE_A,frags[3])==None
+    assert buf.getStats()['dropped']==1
+
+    with pytest.raises(ValueError):
+        buf.add(MOTE_A,[0xc0,0x10])
@@ -10,11 +10,14 @@ sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'
 import logging
 import logging.handlers
 import json
+import random
+import time
 
 import pytest
 
 import openLbr
 import openvisualizer.openvisualizer_utils as u
+from openvisualizer.eventBus import eventBusMonitor
 
 #============================ logging =========================================
 
@@ -37,6 +40,15 @@ for loggerName in ['test_utils',
     
 #============================ defines =========================================
 
+NUM_RANDOM_CHECKSUMS   = 2000
+BENCHMARK_LEN          = 1280
+NUM_BENCHMARK          = 2000
+NUM_RANDOM_FCS         = 500
+NUM_BENCHMARK_ZEP      = 2000
+
+SRC_ADDR = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+DST_ADDR = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00,0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0c]
+
 #============================ fixtures ========================================
 
 #===== expectedBuf2int
@@ -114,8 +126,79 @@ EXPECTEDFORMATIPv6 = [
 def expectedformatipv6(request):
     return request.param
 
+#===== expectedCRC
+
+EXPECTEDCRC = [
+    #           payload                                      checksum
+    json.dumps(([0x00,0x01,0xf2,0x03,0xf4,0xf5,0xf6,0xf7],   [0x22,0x0d])), # RFC1071
+    json.dumps(([0x01],                                      [0xfe,0xff])),
+    json.dumps(([],                                          [0xff,0xff])),
+    json.dumps(([0xff,0xff],                                 [0x00,0x00])),
+]
+
+@pytest.fixture(params=EXPECTEDCRC)
+def expectedCRC(request):
+    return request.param
+
+#===== expectedPseudoHeaderCRC
+
+EXPECTEDPSEUDOHEADERCRC = [
+    #           length            nh                checksum
+    json.dumps(([0x00,0x00,0x00,0x0b], [0x00,0x00,0x00,0x11], [0x56,0xc2])),
+    json.dumps(([0x00,0x0b],          [0x11],                [0x45,0xd3])), # odd-length field
+]
+
+@pytest.fixture(params=EXPECTEDPSEUDOHEADERCRC)
+def expectedPseudoHeaderCRC(request):
+    return request.param
+
+#===== expectedFCS
+
+EXPECTEDFCS = [
+    #           payload                                      fcs
+    json.dumps(([ord(c) for c in '123456789'],               [0x89,0x21])), # CRC-16/KERMIT check
+    json.dumps(([],                                          [0x00,0x00])),
+    json.dumps(([0xff],                                      [0x78,0x0f])),
+    json.dumps(([0x41,0xcc,0x66,0xfe,0xca],                  [0x51,0x3a])),
+]
+
+@pytest.fixture(params=EXPECTEDFCS)
+def expectedFCS(request):
+    return request.param
+
 #============================ helpers =========================================
 
+def _oneComplementSumReference(field,checksum):
+    '''
+    The byte-by-byte implementation _oneComplementSum replaced.
+    '''
+    sum            = 0xFFFF & (checksum[0] << 8 | checksum[1])
+    i              = len(field)
+    while (i > 1):
+        sum       += 0xFFFF & (field[-i] << 8 | (field[-i+1]))
+        i         -= 2
+    if i:
+        sum       += (0xFF & field[-1]) << 8
+    while (sum >> 16):
+        sum        = (sum & 0xFFFF) + (sum >> 16)
+    return [(sum >> 8) & 0xFF,sum & 0xFF]
+
+def _calculateFCSReference(rpayload):
+    '''
+    Bit-by-bit version of the FCS the reflected table replaced: each byte is
+    bit-reversed, run through the CRC most significant bit first, and the
+    result is bit-reversed back.
+    '''
+    crc            = 0x0000
+    for b in rpayload:
+        crc       ^= u.byteinverse(b) << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xffff
+            else:
+                crc = (crc << 1) & 0xffff
+    return [u.byteinverse(crc >> 8),u.byteinverse(crc & 0xff)]
+
 #============================ tests ===========================================
 
 def test_buf2int(expectedBuf2int):
@@ -142,4 +225,91 @@ def test_formatIPv6Addr(expectedformatipv6):
     
     print ipv6_string
     
-    assert u.formatIPv6Addr(ipv6_list)==ipv6_string
\ No newline at end of file
+    assert u.formatIPv6Addr(ipv6_list)==ipv6_string
+
+def test_calculateCRC(expectedCRC):
+    
+    (payload,checksum) = json.loads(expectedCRC)
+    
+    assert u.calculateCRC(payload)==checksum
+    assert u.calculateCRC(bytearray(payload))==checksum
+    assert u.calculateCRC(str(bytearray(payload)))==checksum
+
+def test_calculatePseudoHeaderCRC(expectedPseudoHeaderCRC):
+    
+    (length,nh,checksum) = json.loads(expectedPseudoHeaderCRC)
+    udp = [0xf0,0xb1,0xf0,0xb2,0x00,0x0b,0x00,0x00,0x01,0x02,0x03]
+    
+    assert u.calculatePseudoHeaderCRC(SRC_ADDR,DST_ADDR,length,nh,udp)==checksum
+
+def test_calculateFCS(expectedFCS):
+    
+    (payload,fcs) = json.loads(expectedFCS)
+    
+    assert u.calculateFCS(payload)==fcs
+    assert u.calculateFCS(bytearray(payload))==fcs
+    assert u.calculateFCS(str(bytearray(payload)))==fcs
+    assert _calculateFCSReference(payload)==fcs
+
+def test_calculateFCSRandom():
+    
+    rand = random.Random(11)
+    
+    for _ in range(NUM_RANDOM_FCS):
+        payload = [rand.randint(0,255) for _ in range(rand.randint(0,127))]
+        assert u.calculateFCS(payload)==_calculateFCSReference(payload)
+
+def test_oneComplementSum():
+    
+    rand = random.Random(5)
+    
+    for _ in range(NUM_RANDOM_CHECKSUMS):
+        # favor 0x00 and 0xff, to hit the carries and the zero cases
+        field    = [rand.choice([0x00,0xff,rand.randint(0,255)]) for _ in range(rand.randint(0,64))]
+        checksum = [rand.choice([0x00,0xff,rand.randint(0,255)]) for _ in range(2)]
+        assert u._oneComplementSum(field,list(checksum))==_oneComplementSumReference(field,checksum)
+
+def test_benchmarkChecksum():
+    '''
+    Log the throughput of the checksum, in MB/s.
+    '''
+    
+    rand    = random.Random(7)
+    payload = bytearray([rand.randint(0,255) for _ in range(BENCHMARK_LEN)])
+    
+    for (name,f) in [
+            ('bulk',     lambda : u._oneComplementSum(payload,[0x00,0x00])),
+            ('per byte', lambda : _oneComplementSumReference(payload,[0x00,0x00])),
+        ]:
+        start = time.time()
+        for _ in range(NUM_BENCHMARK):
+            f()
+        duration = time.time()-start
+        log.info("{0}: {1:.1f} MB/s".format(
+            name,
+            NUM_BENCHMARK*BENCHMARK_LEN/max(duration,1e-9)/1e6,
+        ))
+
+def test_benchmarkZep():
+    '''
+    Log the number of ZEP frames per second the eventBusMonitor builds for
+    the packets sent into the mesh, with Wireshark debugging enabled.
+    '''
+    
+    rand    = random.Random(13)
+    nextHop = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]
+    lowpan  = [rand.randint(0,255) for _ in range(100)]
+    
+    monitor = eventBusMonitor.eventBusMonitor()
+    monitor.setWiresharkDebug(True)
+    monitor._dispatchMeshDebugPacket = lambda zep: None
+    
+    try:
+        start = time.time()
+        for _ in range(NUM_BENCHMARK_ZEP):
+            monitor._eventBusNotification('bytesToMesh','test_utils',(nextHop,lowpan))
+        duration = time.time()-start
+    finally:
+        eventBusMonitor.dispatcher.disconnect(monitor._eventBusNotification)
+    
+    log.info("ZEP: {0:.0f} frames/s".format(NUM_BENCHMARK_ZEP/max(duration,1e-9)))
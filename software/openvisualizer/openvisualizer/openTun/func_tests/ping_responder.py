@@ -89,7 +89,7 @@ class ReadThread(eventBusClient.eventBusClient):
     
     def _v6ToMesh_notif(self,sender,signal,data):
         
-        p = data
+        p = list(data)
         
         assert (p[0]&0xf0)==0x60
         
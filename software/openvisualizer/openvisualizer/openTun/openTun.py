@@ -19,13 +19,19 @@ from   openvisualizer.eventBus import eventBusClient
 IPV6PREFIX = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
 IPV6HOST   = [0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x01]
     
-def create():
+def create(udpGatewayPorts=None):
     '''
     Module-based Factory method to create instance based on operating system
+    
+    :param udpGatewayPorts: [in] If not None, creates a userspace UDP gateway
+        instead of a TUN interface, see OpenTunUdpGateway.
     '''
     # Must import here rather than at top of module to avoid a circular 
     # reference to OpenTun class.
     
+    if udpGatewayPorts is not None:
+        from openTunUdpGateway import OpenTunUdpGateway
+        return OpenTunUdpGateway(udpGatewayPorts)
     
     if sys.platform.startswith('win32'):
         from openTunWindows import OpenTunWindows
@@ -11,12 +11,15 @@ log = logging.getLogger('openTunLinux')
 import threading
 import time
 import os
+import io
 import sys
+import select
 import struct
 import traceback
 
 import openvisualizer.openvisualizer_utils as u
 import openTun
+import fcntl
 from   fcntl     import ioctl
 from   openvisualizer.eventBus  import eventBusClient
 
@@ -29,6 +32,7 @@ TUN_IPv4_NETMASK   = [255,255,0,0] ##< The IPv4 netmask of the TUN interface.
 
 ## insert 4 octedts ID tun for compatibility (it'll be discard) 
 VIRTUALTUNID = [0x00,0x00,0x86,0xdd]
+TUN_HEADER_LENGTH  = len(VIRTUALTUNID)
 
 IFF_TUN            = 0x0001
 TUNSETIFF          = 0x400454ca
@@ -40,11 +44,18 @@ class TunReadThread(threading.Thread):
     Thread which continously reads input from a TUN interface.
     
     When data is received from the interface, it calls a callback configured
-    during instantiation.
+    during instantiation, with the IPv6 packet as a bytearray.
+    
+    The packets are read into a buffer allocated once, and all the packets
+    ready are read at each wakeup, up to MAX_BATCH.
     '''
     
     ETHERNET_MTU        = 1500
     IPv6_HEADER_LENGTH  = 40
+    # maximum number of packets read per wakeup
+    MAX_BATCH           = 64
+    # number of seconds between checks of goOn
+    SELECT_TIMEOUT      = 0.5
     
     def __init__(self,tunIf,callback):
     
@@ -54,6 +65,12 @@ class TunReadThread(threading.Thread):
         
         # local variables
         self.goOn                 = True
+        self.buf                  = bytearray(TUN_HEADER_LENGTH+self.ETHERNET_MTU)
+        self.tunFile              = io.FileIO(tunIf,'r',closefd=False)
+        
+        # read until there is no packet left, without blocking
+        flags = fcntl.fcntl(tunIf,fcntl.F_GETFL)
+        fcntl.fcntl(tunIf,fcntl.F_SETFL,flags|os.O_NONBLOCK)
         
         # initialize parent
         threading.Thread.__init__(self)
@@ -66,34 +83,24 @@ class TunReadThread(threading.Thread):
     
     def run(self):
         try:
-            p =[]
-            
             while self.goOn:
                 
                 # wait for data
-                p =  os.read(self.tunIf,self.ETHERNET_MTU)
-           
-                # convert input from a string to a byte list
-                p = [ord(b) for b in p]
-                
-                # debug info
-                if log.isEnabledFor(logging.DEBUG):
-                    log.debug('packet captured on tun interface: {0}'.format(u.formatBuf(p)))
-    
-                # remove tun ID octets
-                p = p[4:]
-                
-                # make sure it's an IPv6 packet (i.e., starts with 0x6x)
-                if (p[0]&0xf0) != 0x60:
-                    log.info('this is not an IPv6 packet')
+                (readable,_,_) = select.select([self.tunIf],[],[],self.SELECT_TIMEOUT)
+                if not readable:
                     continue
                 
-                # because of the nature of tun for Windows, p contains ETHERNET_MTU
-                # bytes. Cut at length of IPv6 packet.
-                p = p[:self.IPv6_HEADER_LENGTH+256*p[4]+p[5]]
-                
-                # call the callback
-                self.callback(p)
+                # drain the interface
+                for _ in xrange(self.MAX_BATCH):
+                    numBytes = self.tunFile.readinto(self.buf)
+                    if numBytes is None:
+                        # no packet left
+                        break
+                    if numBytes==0:
+                        # interface closed
+                        self.goOn = False
+                        break
+                    self._handlePacket(numBytes)
         except Exception as err:
             errMsg=u.formatCrashMessage(self.name,err)
             print errMsg
@@ -107,6 +114,26 @@ class TunReadThread(threading.Thread):
     
     #======================== private =========================================
     
+    def _handlePacket(self,numBytes):
+        '''
+        Passes the packet of numBytes bytes in the buffer to the callback.
+        '''
+        
+        # debug info
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('packet captured on tun interface: {0}'.format(u.formatBuf(self.buf[:numBytes])))
+        
+        # make sure it's an IPv6 packet (i.e., starts with 0x6x), after the tun ID octets
+        if numBytes<TUN_HEADER_LENGTH+self.IPv6_HEADER_LENGTH or (self.buf[TUN_HEADER_LENGTH]&0xf0)!=0x60:
+            log.info('this is not an IPv6 packet')
+            return
+        
+        # cut at length of IPv6 packet
+        length = self.IPv6_HEADER_LENGTH+(self.buf[TUN_HEADER_LENGTH+4]<<8)+self.buf[TUN_HEADER_LENGTH+5]
+        
+        # call the callback, with a copy of the packet as the buffer is reused
+        self.callback(self.buf[TUN_HEADER_LENGTH:min(numBytes,TUN_HEADER_LENGTH+length)])
+    
 #============================ main class ======================================
 
 class OpenTunLinux(openTun.OpenTun):
@@ -118,11 +145,21 @@ class OpenTunLinux(openTun.OpenTun):
         # log
         log.info("create instance")
         
+        # local variables
+        self.writeLock            = threading.Lock()
+        self.writeBuf             = bytearray(VIRTUALTUNID)
+        
         # initialize parent class
         openTun.OpenTun.__init__(self)
     
     #======================== public ==========================================
     
+    def close(self):
+        # the read thread does not block, it exits within its select timeout
+        if self.tunReadThread:
+            self.tunReadThread.close()
+            self.tunReadThread.join()
+    
     #======================== private =========================================
     
     def _v6ToInternet_notif(self,sender,signal,data):
@@ -137,15 +174,14 @@ class OpenTunLinux(openTun.OpenTun):
         if not self.tunIf:
             return
         
-        # add tun header
-        data  = VIRTUALTUNID + data
-        
-        # convert data to string
-        data  = ''.join([chr(b) for b in data])
-        
         try:
-            # write over tuntap interface
-            os.write(self.tunIf, data)
+            with self.writeLock:
+                # copy the packet after the tun header, data being a list of
+                # bytes, a bytearray or a string
+                self.writeBuf[TUN_HEADER_LENGTH:] = data
+                
+                # write over tuntap interface
+                os.write(self.tunIf, self.writeBuf)
             if log.isEnabledFor(logging.DEBUG):
                 log.debug("data dispatched to tun correctly {0}, {1}".format(signal,sender))
         except Exception as err:
@@ -0,0 +1,268 @@
+# Copyright (c) 2010-2013, Regents of the University of California.
+# All rights reserved.
+#
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('openTunUdpGateway')
+# Do not set the default null log handlers here. Logging already will have been
+# configured, because this class is imported later, on the fly, by OpenTun.
+
+import select
+import socket
+import struct
+import threading
+
+import openvisualizer.openvisualizer_utils as u
+import openTun
+
+#============================ defines =========================================
+
+IANA_UDP           = 17
+HOP_LIMIT          = 64
+
+## Host the sockets of the gateway are bound to, and the applications run on.
+LOCAL_HOST         = '::1'
+
+## Header of the datagrams exchanged with the local applications: the IPv6
+## address and UDP port of the mote, in network order.
+GATEWAY_HEADER     = struct.Struct('>16sH')
+
+#============================ helper classes ==================================
+
+class GatewayReadThread(threading.Thread):
+    '''
+    Thread which continuously reads the datagrams the local applications
+    send to the sockets of the gateway.
+
+    When a datagram is received, it calls a callback configured during
+    instantiation, with the mesh port of the socket and the datagram.
+    '''
+
+    MAX_DATAGRAM_LEN    = 1500
+    # number of seconds between checks of goOn
+    SELECT_TIMEOUT      = 0.5
+
+    def __init__(self,socks,callback):
+        '''
+        :param socks:    [in] A dictionary of sockets, indexed by mesh port.
+        :param callback: [in] The function called for each datagram.
+        '''
+
+        # store params
+        self.socks                = socks
+        self.callback             = callback
+
+        # local variables
+        self.goOn                 = True
+        self.meshPorts            = dict([(s,port) for (port,s) in socks.items()])
+
+        # initialize parent
+        threading.Thread.__init__(self)
+
+        # give this thread a name
+        self.name                 = 'GatewayReadThread'
+        self.daemon               = True
+
+        # start myself
+        self.start()
+
+    def run(self):
+        try:
+            while self.goOn:
+
+                # wait for data
+                (readable,_,_) = select.select(self.meshPorts.keys(),[],[],self.SELECT_TIMEOUT)
+
+                for sock in readable:
+                    try:
+                        (datagram,addr) = sock.recvfrom(self.MAX_DATAGRAM_LEN)
+                    except socket.error as err:
+                        log.warning('cannot read from gateway socket: {0}'.format(err))
+                        continue
+                    self.callback(self.meshPorts[sock],datagram)
+        except Exception as err:
+            if self.goOn:
+                errMsg=u.formatCrashMessage(self.name,err)
+                print errMsg
+                log.critical(errMsg)
+
+    #======================== public ==========================================
+
+    def close(self):
+        self.goOn = False
+
+#============================ main class ======================================
+
+class OpenTunUdpGateway(openTun.OpenTun):
+    '''
+    Userspace gateway between the UDP applications of the mesh and local
+    UDP sockets, used instead of a TUN interface.
+
+    For each mesh port, a socket is bound to a local port. The payload of
+    the UDP packets the motes send to the mesh port, whatever their
+    destination address, is sent from that socket to a local application
+    port. The datagrams the applications send to the socket are sent into
+    the mesh, from the mesh port of the socket.
+
+    The datagrams exchanged with the applications start with GATEWAY_HEADER,
+    the IPv6 address and UDP port of the mote, followed by the payload.
+
+    This needs neither root privileges nor kernel forwarding, but only
+    carries UDP. Packets for other protocols are dropped.
+    '''
+
+    def __init__(self,ports,localHost=LOCAL_HOST):
+        '''
+        :param ports:     [in] A dictionary of (local port, application port)
+            tuples, indexed by mesh port.
+        :param localHost: [in] The host the sockets are bound to and the
+            applications run on.
+        '''
+        # log
+        log.info("create instance")
+
+        # store params
+        self.ports                = dict(ports)
+        self.localHost            = localHost
+
+        # local variables
+        self.statsLock            = threading.Lock()
+        self.numFromMesh          = 0
+        self.numToMesh            = 0
+        self.numDropped           = 0
+        if ':' in localHost:
+            self.family           = socket.AF_INET6
+        else:
+            self.family           = socket.AF_INET
+        self.socks                = {}
+        for (meshPort,(localPort,appPort)) in self.ports.items():
+            sock = socket.socket(self.family,socket.SOCK_DGRAM)
+            sock.bind((localHost,localPort))
+            self.socks[meshPort]  = sock
+
+        # initialize parent class
+        openTun.OpenTun.__init__(self)
+
+        # receive the UDP packets from the mesh
+        for meshPort in self.ports.keys():
+            self.register(
+                sender            = self.WILDCARD,
+                signal            = (self.WILDCARD,self.PROTO_UDP,(meshPort>>8,meshPort&0xff)),
+                callback          = self._fromMesh_notif,
+            )
+
+        # receive the datagrams from the applications
+        self.gatewayReadThread    = GatewayReadThread(self.socks,self._fromApp)
+
+    #======================== public ==========================================
+
+    def close(self):
+        self.gatewayReadThread.close()
+        self.gatewayReadThread.join()
+        for sock in self.socks.values():
+            sock.close()
+
+    def getLocalPort(self,meshPort):
+        '''
+        :returns: The local port the socket of a mesh port is bound to.
+        '''
+        return self.socks[meshPort].getsockname()[1]
+
+    def getStats(self):
+        '''
+        :returns: A dictionary with the number of datagrams forwarded
+            'fromMesh' and 'toMesh', and the number of packets 'dropped'.
+        '''
+        with self.statsLock:
+            return {
+                'fromMesh': self.numFromMesh,
+                'toMesh':   self.numToMesh,
+                'dropped':  self.numDropped,
+            }
+
+    #======================== private =========================================
+
+    def _fromMesh_notif(self,sender,signal,data):
+        '''
+        Called when OpenLbr receives a UDP packet for one of the mesh ports.
+
+        This function sends its payload to the application.
+        '''
+        meshPort                  = u.buf2int(signal[2])
+        (src,payload,srcPort)     = data
+        (localPort,appPort)       = self.ports[meshPort]
+
+        datagram = GATEWAY_HEADER.pack(str(bytearray(src)),srcPort)+str(bytearray(payload))
+        try:
+            self.socks[meshPort].sendto(datagram,(self.localHost,appPort))
+        except socket.error as err:
+            log.warning('cannot send to application port {0}: {1}'.format(appPort,err))
+            with self.statsLock:
+                self.numDropped  += 1
+        else:
+            with self.statsLock:
+                self.numFromMesh += 1
+
+        # the packet was handled, do not forward it to the Internet
+        return True
+
+    def _fromApp(self,meshPort,datagram):
+        '''
+        Called when an application sends a datagram to the socket of a mesh
+        port.
+
+        This function sends it into the mesh.
+        '''
+        if len(datagram)<GATEWAY_HEADER.size:
+            log.warning('datagram too short for gateway header ({0} bytes)'.format(len(datagram)))
+            with self.statsLock:
+                self.numDropped  += 1
+            return
+
+        (dst,dstPort)             = GATEWAY_HEADER.unpack_from(datagram)
+        payload                   = datagram[GATEWAY_HEADER.size:]
+
+        self._v6ToMesh_notif(self._buildUdpPacket(bytearray(dst),meshPort,dstPort,payload))
+        with self.statsLock:
+            self.numToMesh       += 1
+
+    def _buildUdpPacket(self,dst,srcPort,dstPort,payload):
+        '''
+        :returns: The IPv6 packet, as a list of bytes, carrying the payload
+            from the host to a mote.
+        '''
+        src       = bytearray(openTun.IPV6PREFIX+openTun.IPV6HOST)
+        length    = 8+len(payload)
+
+        udp       = bytearray(struct.pack('>HHHH',srcPort,dstPort,length,0))+bytearray(payload)
+        udp[6:8]  = u.calculatePseudoHeaderCRC(
+            src,
+            dst,
+            [0x00,0x00,length>>8,length&0xff],
+            [0x00,0x00,0x00,IANA_UDP],
+            udp,
+        )
+
+        ipv6      = bytearray(struct.pack('>IHBB',6<<28,length,IANA_UDP,HOP_LIMIT))
+        ipv6     += src
+        ipv6     += dst
+        ipv6     += udp
+        return list(ipv6)
+
+    def _v6ToInternet_notif(self,sender,signal,data):
+        '''
+        Called when receiving data from the EventBus.
+
+        There is no Internet interface, the packet is dropped.
+        '''
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('no Internet interface, dropping {0}'.format(u.formatBuf(data)))
+        with self.statsLock:
+            self.numDropped      += 1
+
+    def _createTunIf(self):
+        '''
+        There is no TUN interface.
+        '''
+        return None
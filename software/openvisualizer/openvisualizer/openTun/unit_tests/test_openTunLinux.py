@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openTun/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import Queue
+import socket
+import threading
+import time
+
+import pytest
+
+if not sys.platform.startswith('linux'):
+    pytest.skip('openTunLinux only runs on Linux',allow_module_level=True)
+
+import openTun
+import openTunLinux
+from pydispatch import dispatcher
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_openTunLinux.log'
+
+import logging
+log = logging.getLogger('test_openTunLinux')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_openTunLinux',
+                   'openTunLinux',
+                   'openTun',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT        = 5
+NUM_BENCHMARK  = 20000
+
+#============================ helpers =========================================
+
+class OpenTunUnderTest(openTunLinux.OpenTunLinux):
+    '''
+    An OpenTunLinux whose TUN interface is one end of a socket pair, which
+    keeps the packet boundaries as a TUN interface does.
+    '''
+    
+    def __init__(self):
+        (self.host,self.tun) = socket.socketpair(socket.AF_UNIX,socket.SOCK_SEQPACKET)
+        self.host.settimeout(TIMEOUT)
+        self.toMesh          = Queue.Queue()
+        openTunLinux.OpenTunLinux.__init__(self)
+    
+    def close(self):
+        openTunLinux.OpenTunLinux.close(self)
+        self.host.close()
+        self.tun.close()
+        dispatcher.disconnect(self._eventBusNotification)
+    
+    def _createTunIf(self):
+        return self.tun.fileno()
+    
+    def _v6ToMesh_notif(self,data):
+        self.toMesh.put(data)
+
+@pytest.fixture
+def tun(request):
+    t = OpenTunUnderTest()
+    request.addfinalizer(t.close)
+    return t
+
+def _ipv6(payload):
+    return [0x60,0x00,0x00,0x00,0x00,len(payload),0x11,0x40]+ \
+           openTun.IPV6PREFIX+openTun.IPV6HOST+ \
+           openTun.IPV6PREFIX+[0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0a]+ \
+           payload
+
+def _str(buf):
+    return str(bytearray(buf))
+
+#============================ tests ===========================================
+
+def test_read(tun):
+    
+    packets = [_ipv6([i]*i) for i in range(1,5)]
+    for p in packets:
+        tun.host.send(_str(openTunLinux.VIRTUALTUNID+p))
+    
+    received = [tun.toMesh.get(timeout=TIMEOUT) for _ in packets]
+    
+    assert [type(p) for p in received]==[bytearray]*len(packets)
+    assert received==[bytearray(p) for p in packets]
+
+def test_readNotIpv6(tun):
+    
+    # an IPv4 packet, a truncated packet, then an IPv6 packet
+    tun.host.send(_str(openTunLinux.VIRTUALTUNID+[0x45]+[0x00]*39))
+    tun.host.send(_str(openTunLinux.VIRTUALTUNID+[0x60]))
+    tun.host.send(_str(openTunLinux.VIRTUALTUNID+_ipv6([0x01])))
+    
+    assert tun.toMesh.get(timeout=TIMEOUT)==bytearray(_ipv6([0x01]))
+    assert tun.toMesh.empty()
+
+def test_readTrailingBytes(tun):
+    
+    # the packet is cut at the length in its IPv6 header
+    tun.host.send(_str(openTunLinux.VIRTUALTUNID+_ipv6([0x01,0x02])+[0xff]*10))
+    
+    assert tun.toMesh.get(timeout=TIMEOUT)==bytearray(_ipv6([0x01,0x02]))
+
+@pytest.mark.parametrize('convert',[list,bytearray,_str])
+def test_write(tun,convert):
+    
+    for p in [_ipv6([0x01]*100),_ipv6([0x02])]:
+        tun._v6ToInternet_notif('test','v6ToInternet',convert(p))
+        
+        assert tun.host.recv(2048)==_str(openTunLinux.VIRTUALTUNID+p)
+
+def test_close(tun):
+    
+    start = time.time()
+    openTunLinux.OpenTunLinux.close(tun)
+    
+    assert not tun.tunReadThread.isAlive()
+    assert time.time()-start<2*openTunLinux.TunReadThread.SELECT_TIMEOUT+1
+
+def test_benchmark(tun,request):
+    '''
+    Log the number of packets per second read from and written to the TUN
+    interface.
+    '''
+    
+    packet = _ipv6([0xaa]*64)
+    frame  = _str(openTunLinux.VIRTUALTUNID+packet)
+    
+    # do not measure the debug logs of each packet
+    tunLog = logging.getLogger('openTunLinux')
+    level  = tunLog.level
+    tunLog.setLevel(logging.INFO)
+    request.addfinalizer(lambda : tunLog.setLevel(level))
+    
+    # read
+    received = threading.Event()
+    numRead  = [0]
+    def callback(p):
+        numRead[0] += 1
+        if numRead[0]==NUM_BENCHMARK:
+            received.set()
+    tun.tunReadThread.callback = callback
+    start = time.time()
+    for _ in xrange(NUM_BENCHMARK):
+        tun.host.send(frame)
+    assert received.wait(TIMEOUT)
+    readDuration = time.time()-start
+    
+    # write
+    start = time.time()
+    for _ in xrange(NUM_BENCHMARK):
+        tun._v6ToInternet_notif('test','v6ToInternet',packet)
+        tun.host.recv(2048)
+    writeDuration = time.time()-start
+    
+    log.info("read: {0:.0f} packets/s, write: {1:.0f} packets/s".format(
+        NUM_BENCHMARK/max(readDuration,1e-9),
+        NUM_BENCHMARK/max(writeDuration,1e-9),
+    ))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openTun/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import logging
+import logging.handlers
+import Queue
+import socket
+
+import pytest
+
+import openTun
+import openTunUdpGateway
+import openvisualizer.openvisualizer_utils as u
+from openvisualizer.openLbr import openLbr
+from openvisualizer.openLbr import lowpanCodec
+from pydispatch import dispatcher
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_openTunUdpGateway.log'
+
+import logging
+log = logging.getLogger('test_openTunUdpGateway')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_openTunUdpGateway',
+                   'openTunUdpGateway',
+                   'openTun',
+                   'openLbr',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+LOCAL_HOST     = '::1'
+TIMEOUT        = 5
+
+MESH_PORT      = 5683
+MOTE_PORT      = 0xf0b1
+
+DAGROOT_EUI64  = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+MOTE_C         = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x0c]
+MOTE_ADDR      = openTun.IPV6PREFIX+MOTE_C
+HOST_ADDR      = openTun.IPV6PREFIX+openTun.IPV6HOST
+
+#============================ fixtures ========================================
+
+@pytest.fixture
+def gateway(request):
+    '''
+    A gateway for MESH_PORT, and the socket of the application, as a tuple.
+    '''
+    app      = socket.socket(socket.AF_INET6,socket.SOCK_DGRAM)
+    app.bind((LOCAL_HOST,0))
+    app.settimeout(TIMEOUT)
+    gw       = openTunUdpGateway.OpenTunUdpGateway(
+        ports     = {MESH_PORT: (0,app.getsockname()[1])},
+        localHost = LOCAL_HOST,
+    )
+    gw.toMesh = Queue.Queue()
+    gw.dispatch = lambda signal,data: gw.toMesh.put((signal,data))
+
+    def fin():
+        gw.close()
+        app.close()
+        dispatcher.disconnect(gw._eventBusNotification)
+    request.addfinalizer(fin)
+
+    return (gw,app)
+
+#============================ helpers =========================================
+
+def _lowpan(srcPort,dstPort,appPayload):
+    '''
+    The 6LoWPAN packet a neighbor of the DAGroot, MOTE_C, sends to the host.
+    '''
+    length  = 8+len(appPayload)
+    udp     = [srcPort>>8,srcPort&0xff,dstPort>>8,dstPort&0xff,length>>8,length&0xff,0x00,0x00]+appPayload
+    udp[6:8] = u.calculatePseudoHeaderCRC(
+        MOTE_ADDR,
+        HOST_ADDR,
+        [0x00,0x00,length>>8,length&0xff],
+        [0x00,0x00,0x00,lowpanCodec.IANA_UDP],
+        udp,
+    )
+    return list(lowpanCodec.assembleLowpan(
+        MOTE_ADDR,
+        HOST_ADDR,
+        lowpanCodec.IANA_UDP,
+        64,
+        udp,
+        [HOST_ADDR[8:]],
+        srcLinkAddr = MOTE_C,
+    ))
+
+#============================ tests ===========================================
+
+def test_fromMesh(gateway):
+
+    (gw,app) = gateway
+    lbr      = openLbr.OpenLbr()
+    lbr._setPrefix_notif(None,'networkPrefix',openTun.IPV6PREFIX)
+    lbr.dagRootEui64 = openTun.IPV6HOST
+    toInternet = []
+    lbr.dispatch = lambda signal,data: toInternet.append(data) if signal=='v6ToInternet' else lbr.__class__.dispatch(lbr,signal,data)
+    try:
+        lbr._meshToV6_notif(None,'fromMote.data',(MOTE_C,_lowpan(MOTE_PORT,MESH_PORT,[0x01,0x02,0x03])))
+    finally:
+        dispatcher.disconnect(lbr._eventBusNotification)
+
+    (datagram,_) = app.recvfrom(1500)
+    assert openTunUdpGateway.GATEWAY_HEADER.unpack_from(datagram)==(str(bytearray(MOTE_ADDR)),MOTE_PORT)
+    assert datagram[openTunUdpGateway.GATEWAY_HEADER.size:]=='\x01\x02\x03'
+    # handled by the gateway, not forwarded to the Internet
+    assert toInternet==[]
+    assert gw.getStats()=={'fromMesh': 1, 'toMesh': 0, 'dropped': 0}
+
+def test_fromMeshOtherPort(gateway):
+
+    (gw,app) = gateway
+    del gw.dispatch
+
+    handled = gw._dispatchProtocol(
+        (tuple(HOST_ADDR),gw.PROTO_UDP,(0x16,0x34)),
+        (MOTE_ADDR,[0x01],MOTE_PORT),
+    )
+
+    assert handled==False
+    assert gw.getStats()['fromMesh']==0
+
+def test_toMesh(gateway):
+
+    (gw,app) = gateway
+    payload  = '\xaa\xbb\xcc'
+
+    app.sendto(
+        openTunUdpGateway.GATEWAY_HEADER.pack(str(bytearray(MOTE_ADDR)),MOTE_PORT)+payload,
+        (LOCAL_HOST,gw.getLocalPort(MESH_PORT)),
+    )
+    (signal,ipv6) = gw.toMesh.get(timeout=TIMEOUT)
+
+    assert signal=='v6ToMesh'
+    pkt = lowpanCodec.disassembleIpv6(ipv6)
+    assert list(pkt['src_addr'])==HOST_ADDR
+    assert list(pkt['dst_addr'])==MOTE_ADDR
+    assert pkt['next_header']==lowpanCodec.IANA_UDP
+    udp = list(pkt['payload'])
+    assert udp[:4]==[MESH_PORT>>8,MESH_PORT&0xff,MOTE_PORT>>8,MOTE_PORT&0xff]
+    assert udp[4:6]==[0x00,8+len(payload)]
+    assert udp[8:]==[ord(b) for b in payload]
+    # the checksum covers the pseudo-header
+    assert udp[6:8]==u.calculatePseudoHeaderCRC(
+        HOST_ADDR,
+        MOTE_ADDR,
+        [0x00,0x00,0x00,8+len(payload)],
+        [0x00,0x00,0x00,lowpanCodec.IANA_UDP],
+        udp[:6]+[0x00,0x00]+udp[8:],
+    )
+    assert gw.getStats()=={'fromMesh': 0, 'toMesh': 1, 'dropped': 0}
+
+def test_toMeshTooShort(gateway):
+
+    (gw,app) = gateway
+
+    app.sendto('\x00'*4,(LOCAL_HOST,gw.getLocalPort(MESH_PORT)))
+    app.sendto(openTunUdpGateway.GATEWAY_HEADER.pack(str(bytearray(MOTE_ADDR)),MOTE_PORT),(LOCAL_HOST,gw.getLocalPort(MESH_PORT)))
+    gw.toMesh.get(timeout=TIMEOUT)
+
+    # datagrams are read in order, the first one was dropped
+    assert gw.toMesh.empty()
+    assert gw.getStats()=={'fromMesh': 0, 'toMesh': 1, 'dropped': 1}
+
+def test_toInternet(gateway):
+
+    (gw,app) = gateway
+
+    gw._v6ToInternet_notif(None,'v6ToInternet',[0x60]+[0x00]*39)
+
+    assert gw.getStats()['dropped']==1